@@ -3,6 +3,7 @@ from django.dispatch import receiver
 from django.utils import timezone
 from .models import Message
 from .tasks import send_message_notification
+from apps.notifications.outbox import enqueue_task
 
 @receiver(post_save, sender=Message)
 def handle_new_message(sender, instance, created, **kwargs):
@@ -11,7 +12,8 @@ def handle_new_message(sender, instance, created, **kwargs):
     """
     if created:
         # Send real-time notification via WebSocket
-        send_message_notification.delay(
+        enqueue_task(
+            send_message_notification,
             message_id=instance.id,
             conversation_id=str(instance.conversation.id),
             sender_id=str(instance.sender.id)
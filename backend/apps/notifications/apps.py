@@ -1,4 +1,8 @@
+import logging
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,3 +10,9 @@ class NotificationsConfig(AppConfig):
 
     def ready(self):
         import apps.notifications.signals
+
+        if not settings.DEBUG and not getattr(settings, 'SHARED_CACHE', False):
+            logger.warning(
+                "REDIS_CACHE_URL is not set: every process uses its own memory cache, so cached "
+                "values are not shared and unread and quota counters are counted in the database"
+            )
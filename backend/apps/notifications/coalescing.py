@@ -0,0 +1,127 @@
+"""
+Notification coalescing.
+
+Events of the same type about the same target (e.g. status changes of
+tasks in one project) sent to a user within
+``settings.NOTIFICATION_COALESCE_WINDOW`` seconds are merged into a single
+unread notification whose message and ``event_count`` are updated in
+place, so a burst costs one row and one push per recipient instead of one
+per event. Every raw event is kept as a NotificationEvent for drill-down.
+"""
+from collections import Counter, OrderedDict, namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationEvent
+from .unread import adjust_unread_counts
+from .utils import push_notifications
+
+# An event to notify about. ``target`` identifies what it is about (for
+# example "project:<id>") and ``label`` names it in merged messages.
+PendingNotification = namedtuple(
+    'PendingNotification',
+    ['recipient', 'message', 'notification_type', 'target', 'label', 'data'],
+    defaults=('', '', '', None)
+)
+
+# Message of a notification merging several events, per notification type
+COALESCED_MESSAGES = {
+    'task_status_update': "{count} task updates in {label}",
+    'deadline_approaching': "{count} task deadlines approaching in {label}",
+    'task_overdue': "{count} tasks overdue in {label}",
+}
+DEFAULT_COALESCED_MESSAGE = "{count} notifications about {label}"
+
+
+def coalesced_message(notification_type, count, label):
+    template = COALESCED_MESSAGES.get(notification_type, DEFAULT_COALESCED_MESSAGE)
+    return template.format(count=count, label=label)
+
+
+def notify_coalesced(events, window=None):
+    """
+    Store and push notifications, merging events per (recipient, type, target).
+
+    Open groups are found with one query (unread notifications of the same
+    key created within the window), new and updated notifications are
+    written with one ``bulk_create``/``bulk_update`` and raw events with
+    one more ``bulk_create``. Events without a type and target are never merged.
+
+    Args:
+        events: Iterable of PendingNotification
+        window: Coalescing window in seconds (default:
+            settings.NOTIFICATION_COALESCE_WINDOW; 0 disables merging)
+
+    Returns:
+        dict: Number of ``events`` received and ``notifications`` written/pushed
+    """
+    if window is None:
+        window = getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 300)
+    now = timezone.now()
+
+    groups = OrderedDict()
+    for event in events:
+        if event.recipient is None:
+            continue
+        if window > 0 and event.notification_type and event.target:
+            key = (event.recipient.pk, event.notification_type, event.target)
+        else:
+            key = id(event)
+        groups.setdefault(key, []).append(event)
+    if not groups:
+        return {'events': 0, 'notifications': 0}
+
+    with transaction.atomic():
+        open_notifications = {}
+        keys = [key for key in groups if isinstance(key, tuple)]
+        if keys:
+            for notification in Notification.objects.select_for_update().filter(
+                recipient_id__in={key[0] for key in keys},
+                notification_type__in={key[1] for key in keys},
+                target__in={key[2] for key in keys},
+                read=False,
+                created_at__gte=now - timedelta(seconds=window),
+            ).order_by('created_at'):
+                # The most recent open notification of a key wins
+                open_notifications[
+                    (notification.recipient_id, notification.notification_type, notification.target)
+                ] = notification
+
+        created, updated, raw_events = [], [], []
+        for key, group in groups.items():
+            first = group[0]
+            notification = open_notifications.get(key)
+            if notification is None:
+                notification = Notification(
+                    recipient=first.recipient,
+                    notification_type=first.notification_type,
+                    target=first.target,
+                    event_count=len(group),
+                    message=first.message if len(group) == 1 else coalesced_message(
+                        first.notification_type, len(group), first.label or first.target
+                    ),
+                )
+                created.append(notification)
+            else:
+                notification.event_count += len(group)
+                notification.message = coalesced_message(
+                    first.notification_type, notification.event_count, first.label or first.target
+                )
+                notification.updated_at = now
+                updated.append(notification)
+            raw_events.extend(
+                NotificationEvent(notification=notification, message=event.message, data=event.data or {})
+                for event in group
+            )
+
+        Notification.objects.bulk_create(created)
+        Notification.objects.bulk_update(updated, ['event_count', 'message', 'updated_at'])
+        NotificationEvent.objects.bulk_create(raw_events)
+
+    # Merged notifications were already unread; only new ones add to the badge
+    adjust_unread_counts(Counter(notification.recipient_id for notification in created))
+
+    push_notifications(created + updated)
+    return {'events': len(raw_events), 'notifications': len(created) + len(updated)}
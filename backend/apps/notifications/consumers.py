@@ -1,11 +1,13 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .utils import user_group_name
+
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope['user']
         if user.is_authenticated:
-            self.group_name = f'notifications_{user.id}'
+            self.group_name = user_group_name(user.id)
             await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
 
@@ -18,5 +20,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def send_notification(self, event):
         await self.send(text_data=json.dumps({
-            'message': event['message']
+            'id': event.get('id'),
+            'message': event['message'],
+            # Coalesced notifications are re-sent with the same id and a higher count
+            'event_count': event.get('event_count', 1),
         }))
@@ -0,0 +1,104 @@
+"""
+Debounced Celery tasks.
+
+A debounced task is enqueued at most once per key (e.g. a project id)
+while a run for that key is pending: the first enqueue claims the key in
+the cache (Redis in production) and schedules the run ``window`` seconds
+later, further enqueues are dropped and counted. The claim is released
+when the run starts, so the run reads the latest state and changes made
+while it runs schedule another one.
+
+Enqueues through ``.delay()``/``.apply_async()`` and through the outbox
+relay (apps.notifications.outbox) are both debounced.
+"""
+from celery import Task, shared_task
+from django.core.cache import cache
+
+# Default seconds a debounced run waits for further enqueues
+DEBOUNCE_WINDOW = 5
+# Claims expire this long after the scheduled run, in case it never starts
+DEBOUNCE_CLAIM_GRACE = 60
+
+
+class DebouncedTask(Task):
+    """
+    Celery task base class collapsing enqueues with the same debounce key.
+    """
+    # Callable taking the task arguments and returning the debounce key
+    debounce_key = None
+    debounce_window = DEBOUNCE_WINDOW
+
+    def _claim_key(self, args, kwargs):
+        return f'debounce:{self.name}:{self.debounce_key(*(args or ()), **(kwargs or {}))}'
+
+    def _suppressed_key(self):
+        return f'debounce:{self.name}:suppressed'
+
+    def claim_run(self, args=None, kwargs=None):
+        """
+        Claim the pending run for the arguments' key.
+
+        Returns:
+            bool: True if the caller should schedule the run, False if one
+            is already pending (the enqueue is counted as suppressed)
+        """
+        if cache.add(self._claim_key(args, kwargs), 1, self.debounce_window + DEBOUNCE_CLAIM_GRACE):
+            return True
+        cache.add(self._suppressed_key(), 0, None)
+        cache.incr(self._suppressed_key())
+        return False
+
+    def release_run(self, args=None, kwargs=None):
+        cache.delete(self._claim_key(args, kwargs))
+
+    def suppressed_count(self):
+        """Number of enqueues dropped because a run was already pending."""
+        return cache.get(self._suppressed_key(), 0)
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        # Retries and other explicitly scheduled runs bypass the debounce window
+        if options.get('countdown') is not None or options.get('eta') is not None:
+            return super().apply_async(args, kwargs, **options)
+        if not self.claim_run(args, kwargs):
+            return None
+        options.setdefault('countdown', self.debounce_window)
+        return super().apply_async(args, kwargs, **options)
+
+    def __call__(self, *args, **kwargs):
+        # Release the claim first so changes made during the run are not lost
+        self.release_run(args, kwargs)
+        return super().__call__(*args, **kwargs)
+
+
+def debounced_task(key, window=DEBOUNCE_WINDOW, **options):
+    """
+    Declare a shared task whose enqueues are collapsed per key.
+
+    Args:
+        key: Callable taking the task arguments (without ``self`` for bound
+            tasks) and returning the key runs are collapsed on
+        window: Seconds a run waits for further enqueues
+        **options: Options passed on to ``shared_task``
+
+    Example::
+
+        @debounced_task(key=lambda project_id: project_id, bind=True)
+        def update_project_progress(self, project_id):
+            ...
+    """
+    return shared_task(base=DebouncedTask, debounce_key=staticmethod(key), debounce_window=window, **options)
+
+
+def suppressed_counts(app=None):
+    """
+    Return the number of suppressed enqueues of every registered
+    debounced task, by task name.
+    """
+    from celery import current_app
+
+    app = app or current_app
+    return {
+        name: task.suppressed_count()
+        for name, task in app.tasks.items()
+        if isinstance(task, DebouncedTask)
+    }
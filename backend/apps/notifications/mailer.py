@@ -0,0 +1,267 @@
+"""
+Batched outgoing mail.
+
+Messages are described by JSON-serializable payloads (see ``build_email``)
+so they can travel through Celery. Bulk senders hand them to
+``queue_emails``, which groups them into ``send_email_batch`` tasks; every
+batch, and every single-message task, is sent over the worker's pooled
+SMTP connection instead of opening a new connection per message. A
+per-minute budget shared by all workers (EMAIL_RATE_LIMIT_PER_MINUTE)
+keeps the SMTP provider from throttling us.
+"""
+import logging
+import math
+import re
+import smtplib
+import threading
+import time
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils.html import escape, strip_tags
+
+logger = logging.getLogger(__name__)
+
+_pool = threading.local()
+
+
+def build_email(subject, body, to, html_message=None, from_email=None, reply_to=None):
+    """
+    Describe an email as a payload accepted by the dispatcher.
+
+    Args:
+        subject: Subject line
+        body: Plain text body
+        to: Recipient address or list of addresses
+        html_message: Optional HTML alternative
+        from_email: Sender, defaults to DEFAULT_FROM_EMAIL
+        reply_to: Reply-To address or list of addresses
+
+    Returns:
+        dict: JSON-serializable message payload
+    """
+    if isinstance(to, str):
+        to = [to]
+    if isinstance(reply_to, str):
+        reply_to = [reply_to]
+    return {
+        'subject': subject,
+        'body': body,
+        'to': list(to),
+        'html_message': html_message,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'reply_to': list(reply_to or []),
+    }
+
+
+def prerender_email(template_name, context, fields):
+    """
+    Render an email template once for many recipients.
+
+    The template is rendered with a marker in place of each per-recipient
+    field and split at the markers, so filling it in for a recipient is a
+    string join instead of a template render. Per-recipient fields must be
+    output as plain variables (``{{ recipient_name }}``), not passed through
+    filters or tags.
+
+    Args:
+        template_name: HTML email template
+        context: Context shared by all recipients
+        fields: Names of the per-recipient variables
+
+    Returns:
+        callable: Takes a dict of per-recipient values and returns the
+        (html, plain text) bodies
+    """
+    markers = {field: f'\x00{field}\x00' for field in fields}
+    html = render_to_string(template_name, {**context, **markers})
+    pattern = re.compile('\x00(%s)\x00' % '|'.join(map(re.escape, fields)))
+    # Literal text at even indexes, field names at odd indexes
+    html_parts = pattern.split(html)
+    text_parts = pattern.split(strip_tags(html))
+
+    def fill(parts, values, convert):
+        filled = parts[:]
+        for index in range(1, len(parts), 2):
+            filled[index] = convert(values[parts[index]])
+        return ''.join(filled)
+
+    def render(values):
+        return fill(html_parts, values, escape), fill(text_parts, values, str)
+
+    return render
+
+
+def _to_message(payload, connection):
+    message = EmailMultiAlternatives(
+        subject=payload['subject'],
+        body=payload['body'],
+        from_email=payload.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+        to=payload['to'],
+        reply_to=payload.get('reply_to') or None,
+        connection=connection,
+    )
+    if payload.get('html_message'):
+        message.attach_alternative(payload['html_message'], "text/html")
+    return message
+
+
+def _connection_key():
+    return (settings.EMAIL_BACKEND, getattr(settings, 'EMAIL_HOST', None), getattr(settings, 'EMAIL_PORT', None))
+
+
+def get_pooled_connection():
+    """
+    Return this worker thread's open mail connection, opening a new one
+    when there is none, it sat idle longer than EMAIL_CONNECTION_MAX_IDLE
+    or the email settings changed.
+    """
+    connection = getattr(_pool, 'connection', None)
+    if connection is not None and (
+        getattr(_pool, 'key', None) != _connection_key()
+        or time.monotonic() - _pool.last_used > getattr(settings, 'EMAIL_CONNECTION_MAX_IDLE', 60)
+    ):
+        close_pooled_connection()
+        connection = None
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _pool.connection = connection
+        _pool.key = _connection_key()
+    _pool.last_used = time.monotonic()
+    return connection
+
+
+def close_pooled_connection():
+    connection = getattr(_pool, 'connection', None)
+    _pool.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing mail connection: {e}")
+
+
+@worker_process_shutdown.connect
+def _close_connection_on_shutdown(**kwargs):
+    close_pooled_connection()
+
+
+def _send_one(payload):
+    connection = get_pooled_connection()
+    try:
+        return connection.send_messages([_to_message(payload, connection)])
+    except smtplib.SMTPServerDisconnected:
+        # The server dropped the pooled connection; reconnect once
+        close_pooled_connection()
+        connection = get_pooled_connection()
+        return connection.send_messages([_to_message(payload, connection)])
+
+
+def reserve_send_slots(count, now=None):
+    """
+    Take up to ``count`` messages from the current minute's sending budget.
+
+    Args:
+        count: Number of messages about to be sent
+        now: Timestamp to use instead of the current time
+
+    Returns:
+        int: Number of messages that may be sent now
+    """
+    limit = getattr(settings, 'EMAIL_RATE_LIMIT_PER_MINUTE', 0)
+    if not limit or count <= 0:
+        return max(count, 0)
+    key = f'email_rate:{int((now or time.time()) // 60)}'
+    cache.add(key, 0, 120)
+    try:
+        used = cache.incr(key, count)
+    except ValueError:
+        # The window expired between add() and incr()
+        cache.add(key, 0, 120)
+        used = cache.incr(key, count)
+    granted = max(0, min(count, limit - (used - count)))
+    if granted < count:
+        cache.decr(key, count - granted)
+    return granted
+
+
+def seconds_until_next_window(now=None):
+    """Seconds until the per-minute sending budget is renewed."""
+    return max(1, math.ceil(60 - (now or time.time()) % 60))
+
+
+def deliver_emails(payloads):
+    """
+    Send a batch of messages over one pooled connection.
+
+    A failing message does not abort the batch: it is reported in
+    ``failed`` so the caller can retry it on its own.
+
+    Args:
+        payloads: Message payloads from ``build_email``
+
+    Returns:
+        dict: ``sent`` count, ``failed`` payloads and elapsed ``seconds``
+    """
+    started = time.monotonic()
+    sent = 0
+    failed = []
+    for payload in payloads:
+        try:
+            sent += _send_one(payload)
+        except Exception as e:
+            logger.warning(f"Error sending email to {', '.join(payload['to'])}: {e}")
+            failed.append(payload)
+            if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                # The connection may be in an unknown state
+                close_pooled_connection()
+    return {'sent': sent, 'failed': failed, 'seconds': time.monotonic() - started}
+
+
+def send_email(payload):
+    """
+    Send one message over the pooled connection, within the rate limit.
+
+    Returns:
+        bool: False when this minute's budget is used up and the caller
+        should retry after ``seconds_until_next_window()``
+
+    Raises:
+        The backend's exception when the message could not be sent
+    """
+    if not reserve_send_slots(1):
+        return False
+    _send_one(payload)
+    return True
+
+
+def queue_emails(payloads, batch_size=None):
+    """
+    Group messages into batches and enqueue one ``send_email_batch`` task
+    per batch.
+
+    Args:
+        payloads: Iterable of message payloads from ``build_email``
+        batch_size: Messages per batch, defaults to EMAIL_BATCH_SIZE
+
+    Returns:
+        int: Number of batches queued
+    """
+    from .tasks import send_email_batch
+
+    batch_size = batch_size or getattr(settings, 'EMAIL_BATCH_SIZE', 50)
+    batches = 0
+    batch = []
+    for payload in payloads:
+        batch.append(payload)
+        if len(batch) >= batch_size:
+            send_email_batch.delay(batch)
+            batches += 1
+            batch = []
+    if batch:
+        send_email_batch.delay(batch)
+        batches += 1
+    return batches
@@ -0,0 +1,90 @@
+"""
+Management command measuring real-time task latency while a bulk job runs.
+
+Needs Redis and the workers described in docs/task_management.md, started
+with ``--include`` of this module so they can run the benchmark tasks below.
+"""
+import statistics
+import time
+from celery import shared_task
+from django.core.management.base import BaseCommand
+
+
+@shared_task(name='benchmark_task_queues.probe')
+def queue_benchmark_probe(sent_at):
+    """
+    Return how long this probe waited before running.
+    """
+    return time.time() - sent_at
+
+
+@shared_task(name='benchmark_task_queues.load')
+def queue_benchmark_load(duration):
+    """
+    Simulate one bulk job item.
+    """
+    time.sleep(duration)
+
+
+class Command(BaseCommand):
+    help = 'Measure how long real-time tasks wait in their queue while a bulk job is running'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--load',
+            type=int,
+            default=2000,
+            help='Number of bulk tasks enqueued before probing (default: 2000)'
+        )
+        parser.add_argument(
+            '--load-duration',
+            type=float,
+            default=0.05,
+            help='Seconds each bulk task runs (default: 0.05)'
+        )
+        parser.add_argument(
+            '--probes',
+            type=int,
+            default=50,
+            help='Number of real-time probe tasks (default: 50)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0.1,
+            help='Seconds between probes (default: 0.1)'
+        )
+        parser.add_argument(
+            '--single-queue',
+            action='store_true',
+            help='Send the probes to the bulk queue, as before queues were split'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=300,
+            help='Seconds to wait for each probe result (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        probe_options = {'queue': 'bulk_email' if options['single_queue'] else 'realtime'}
+
+        started = time.monotonic()
+        for _ in range(options['load']):
+            queue_benchmark_load.apply_async((options['load_duration'],), queue='bulk_email')
+        self.stdout.write(
+            f"Enqueued {options['load']} bulk tasks in {time.monotonic() - started:.2f}s"
+        )
+
+        results = []
+        for _ in range(options['probes']):
+            results.append(queue_benchmark_probe.apply_async((time.time(),), **probe_options))
+            time.sleep(options['interval'])
+
+        waits = sorted(result.get(timeout=options['timeout']) * 1000 for result in results)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"Real-time wait over {len(waits)} probes "
+            f"({'bulk queue' if options['single_queue'] else 'realtime queue'}): "
+            f"p50 {statistics.median(waits):.1f}ms, p95 {p95:.1f}ms, max {waits[-1]:.1f}ms"
+        ))
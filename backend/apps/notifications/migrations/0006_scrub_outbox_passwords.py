@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def scrub_passwords(apps, schema_editor):
+    """Replace plaintext passwords queued for welcome emails with the set-password flag."""
+    OutboxMessage = apps.get_model('notifications', 'OutboxMessage')
+    messages = OutboxMessage.objects.filter(
+        task_name='apps.users.tasks.send_welcome_email_task', kwargs__has_key='password'
+    )
+    for message in messages.iterator():
+        message.kwargs.pop('password', None)
+        message.kwargs['set_password'] = True
+        message.save(update_fields=['kwargs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_outbox_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(scrub_passwords, migrations.RunPython.noop),
+    ]
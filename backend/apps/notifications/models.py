@@ -1,4 +1,5 @@
 import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -8,8 +9,66 @@ class Notification(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
+    notification_type = models.CharField(max_length=50, blank=True, default='')
+    # What the notification is about, e.g. "project:<id>"; used for coalescing
+    target = models.CharField(max_length=100, blank=True, default='')
+    # Number of events merged into this notification
+    event_count = models.PositiveIntegerField(default=1)
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Notification for {self.recipient.username}"
+
+    class Meta:
+        indexes = [
+            # Inbox pages and unread counts of a recipient
+            models.Index(fields=['recipient', 'read', '-created_at'], name='notification_inbox_idx'),
+            # Open coalescing groups of a recipient
+            models.Index(fields=['recipient', 'notification_type', 'target', 'created_at'],
+                         name='notification_coalesce_idx'),
+        ]
+
+
+class NotificationEvent(models.Model):
+    """
+    A raw event merged into a coalesced notification, kept for drill-down.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='events')
+    message = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Event of notification {self.notification_id}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task call recorded in the transaction of the change that
+    triggered it and published by the outbox relay once committed; see
+    apps.notifications.outbox.
+    """
+    id = models.BigAutoField(primary_key=True)
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Messages still waiting for the relay
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True),
+                         name='outbox_pending_idx'),
+            models.Index(fields=['dispatched_at'], name='outbox_dispatched_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} ({'dispatched' if self.dispatched_at else 'pending'})"
@@ -0,0 +1,132 @@
+"""
+Transactional outbox for Celery tasks triggered by model changes.
+
+Signal receivers call ``enqueue_task`` instead of ``task.delay()``: the
+call is stored as an OutboxMessage in the same transaction as the change,
+so a task never runs before its row is committed and never runs for a
+rolled back write. ``relay_outbox`` publishes pending messages in batches
+over one broker connection and marks them dispatched. It is woken at most
+once per OUTBOX_WAKEUP_DELAY after commits and also runs from beat, so
+messages written while the broker was unreachable are sent later.
+
+Delivery is at least once: a relay that dies between publishing and
+marking a batch publishes it again. Messages for debounced tasks
+(apps.notifications.debounce) are dropped while a run for the same key
+is pending.
+"""
+import logging
+from datetime import timedelta
+from celery import current_app
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .debounce import DebouncedTask
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Messages published per relay transaction
+OUTBOX_BATCH_SIZE = 500
+# Seconds between a commit and the relay run it wakes; commits in between share the run
+OUTBOX_WAKEUP_DELAY = 1
+OUTBOX_WAKEUP_KEY = 'outbox_relay_wakeup'
+# Dispatched messages are kept this long for inspection
+OUTBOX_RETENTION = timedelta(days=1)
+
+
+def enqueue_task(task, *args, **kwargs):
+    """
+    Record a Celery task call in the outbox, in the caller's transaction.
+
+    Args:
+        task: Celery task to run once the transaction commits
+        *args: JSON-serializable positional arguments of the task
+        **kwargs: JSON-serializable keyword arguments of the task
+
+    Returns:
+        OutboxMessage: The recorded message
+    """
+    message = OutboxMessage.objects.create(task_name=task.name, args=list(args), kwargs=kwargs)
+    transaction.on_commit(wake_outbox_relay)
+    return message
+
+
+def wake_outbox_relay():
+    """
+    Schedule a relay run unless one is already scheduled.
+    """
+    from .tasks import relay_outbox_messages
+
+    if not cache.add(OUTBOX_WAKEUP_KEY, 1, OUTBOX_WAKEUP_DELAY):
+        return
+    try:
+        relay_outbox_messages.apply_async(countdown=OUTBOX_WAKEUP_DELAY)
+    except Exception as e:
+        # The messages are safe in the outbox; the beat relay picks them up
+        logger.warning(f"Could not wake the outbox relay: {e}")
+
+
+def relay_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Publish pending outbox messages to Celery and mark them dispatched.
+
+    Each batch is locked with SKIP LOCKED, so concurrent relays never
+    publish the same message, and published over a single producer.
+
+    Args:
+        batch_size: Messages published per transaction
+
+    Returns:
+        int: Number of messages published
+    """
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not messages:
+                break
+            claimed = []
+            try:
+                with current_app.producer_or_acquire() as producer:
+                    for message in messages:
+                        options = {}
+                        task = current_app.tasks.get(message.task_name)
+                        if isinstance(task, DebouncedTask):
+                            if not task.claim_run(message.args, message.kwargs):
+                                # A run for the same key is already pending
+                                continue
+                            claimed.append((task, message))
+                            options['countdown'] = task.debounce_window
+                        current_app.send_task(
+                            message.task_name, args=message.args, kwargs=message.kwargs,
+                            producer=producer, **options
+                        )
+            except Exception:
+                # The batch is relayed again; its debounced runs must not look pending
+                for task, message in claimed:
+                    task.release_run(message.args, message.kwargs)
+                raise
+            OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+                dispatched_at=timezone.now()
+            )
+        relayed += len(messages)
+        if len(messages) < batch_size:
+            break
+    return relayed
+
+
+def purge_dispatched_outbox(now=None):
+    """
+    Delete messages dispatched longer than OUTBOX_RETENTION ago.
+
+    Returns:
+        int: Number of deleted messages
+    """
+    cutoff = (now or timezone.now()) - OUTBOX_RETENTION
+    deleted, _ = OutboxMessage.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
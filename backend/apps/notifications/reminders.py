@@ -0,0 +1,137 @@
+"""
+Deadline reminder scheduling.
+
+Models with a deadline store the time of their next reminder in an indexed
+``next_reminder_at`` column and the index of that reminder in
+``reminder_stage``. Beat jobs only fetch rows whose reminder is due, send it
+and move the row to its next stage, so every reminder is sent once and no
+periodic job has to scan every open task or project.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+# (stage name, time before the deadline at which the reminder fires)
+TASK_REMINDER_OFFSETS = (
+    ('24h', timedelta(hours=24)),
+    ('1h', timedelta(hours=1)),
+    ('overdue', timedelta(0)),
+)
+
+PROJECT_REMINDER_OFFSETS = (
+    ('7d', timedelta(days=7)),
+    ('24h', timedelta(hours=24)),
+    ('overdue', timedelta(0)),
+)
+
+
+def next_reminder(due_at, offsets, from_stage=0, now=None):
+    """
+    Work out the next reminder to send for a deadline.
+
+    If several reminders from ``from_stage`` onwards are already in the
+    past, only the latest of them is returned (due immediately) so a late
+    schedule never sends a burst of stale reminders.
+
+    Args:
+        due_at: The deadline (aware datetime) or None
+        offsets: Sequence of (name, timedelta) ordered from earliest to latest
+        from_stage: Index of the first reminder that may still be sent
+        now: Current time (default: timezone.now())
+
+    Returns:
+        tuple: (stage index, fire time), or (len(offsets), None) when no
+        reminder is left
+    """
+    if due_at is None or from_stage >= len(offsets):
+        return len(offsets), None
+
+    now = now or timezone.now()
+    stage = from_stage
+    for index in range(from_stage, len(offsets)):
+        if due_at - offsets[index][1] <= now:
+            stage = index
+    return stage, due_at - offsets[stage][1]
+
+
+def schedule_reminder(instance, due_at, offsets, active, now=None):
+    """
+    Reset an instance's reminder schedule after its deadline or state changed.
+
+    Args:
+        instance: Model instance with next_reminder_at/reminder_stage fields
+        due_at: The instance's deadline as an aware datetime (or None)
+        offsets: The reminder offsets for this model
+        active: Whether the instance should still receive reminders
+    """
+    if not active:
+        instance.reminder_stage, instance.next_reminder_at = len(offsets), None
+    else:
+        instance.reminder_stage, instance.next_reminder_at = next_reminder(due_at, offsets, 0, now)
+
+
+def save_rescheduled_reminder(instance, update_fields):
+    """
+    Write a reminder schedule reset in ``pre_save`` when the save's
+    ``update_fields`` left the reminder fields out.
+
+    Receivers that call ``schedule_reminder`` before a save flag the
+    instance with ``_reminder_rescheduled``; call this from ``post_save``.
+    """
+    if not instance.__dict__.pop('_reminder_rescheduled', False) or update_fields is None:
+        return
+    if not {'next_reminder_at', 'reminder_stage'} <= set(update_fields):
+        type(instance)._default_manager.filter(pk=instance.pk).update(
+            next_reminder_at=instance.next_reminder_at, reminder_stage=instance.reminder_stage
+        )
+
+
+def dispatch_due_reminders(queryset, due_at, offsets, notify, batch_size=500, now=None):
+    """
+    Send every reminder that is due and advance the rows to their next stage.
+
+    Rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` (where the
+    database supports it) through the partial index on ``next_reminder_at``,
+    advanced with one ``bulk_update`` per batch and notified after commit, so
+    concurrent workers never send the same reminder twice.
+
+    Args:
+        queryset: Queryset of the model to scan (already restricted to active rows)
+        due_at: Callable returning an instance's deadline as an aware datetime
+        offsets: The reminder offsets for this model
+        notify: Callable(instances_with_stage) invoked after commit with a list
+            of (instance, stage name) pairs
+        batch_size: Maximum rows claimed per transaction
+
+    Returns:
+        int: Number of reminders sent
+    """
+    now = now or timezone.now()
+    sent = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                queryset.filter(next_reminder_at__lte=now)
+                .order_by('next_reminder_at')
+                .select_for_update(skip_locked=True, of=('self',))[:batch_size]
+            )
+            if not batch:
+                break
+
+            reminders = []
+            for instance in batch:
+                stage, fire_at = next_reminder(due_at(instance), offsets, instance.reminder_stage, now)
+                if fire_at is not None and fire_at <= now:
+                    # Send only the latest reminder that is due; stale ones are skipped
+                    reminders.append((instance, offsets[stage][0]))
+                    stage, fire_at = next_reminder(due_at(instance), offsets, stage + 1, now)
+                instance.reminder_stage, instance.next_reminder_at = stage, fire_at
+
+            type(batch[0]).objects.bulk_update(batch, ['reminder_stage', 'next_reminder_at'])
+            if reminders:
+                transaction.on_commit(lambda reminders=reminders: notify(reminders))
+            sent += len(reminders)
+
+        if len(batch) < batch_size:
+            break
+    return sent
@@ -1,7 +1,18 @@
 from rest_framework import serializers
-from .models import Notification
+from .models import Notification, NotificationEvent
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
+
+
+class NotificationEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationEvent
+        fields = ['id', 'message', 'data', 'created_at']
+
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    before = serializers.DateTimeField(required=False)
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=500)
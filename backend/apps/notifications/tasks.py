@@ -1,9 +1,82 @@
+import logging
 from celery import shared_task
 from .models import Notification
+from .unread import adjust_unread_counts, reconcile_unread_counts
 from django.contrib.auth import get_user_model
 
+logger = logging.getLogger(__name__)
+
 @shared_task
 def create_notification(recipient_id, message):
     User = get_user_model()
     user = User.objects.get(id=recipient_id)
     Notification.objects.create(recipient=user, message=message)
+    adjust_unread_counts({user.pk: 1})
+
+
+@shared_task
+def send_notifications_task(recipient_ids, message, data=None, notification_type=''):
+    """
+    Send one notification to many users from a worker; see
+    apps.notifications.utils.send_notifications.
+    """
+    from .utils import send_notifications
+
+    User = get_user_model()
+    report = send_notifications(
+        User.objects.filter(id__in=recipient_ids), message, data, notification_type=notification_type
+    )
+    return f"Sent {report['sent']} notifications in {len(report['batches'])} batches"
+
+
+@shared_task
+def reconcile_unread_notification_counts():
+    """
+    Rewrite cached unread notification counters from the database.
+    """
+    written = reconcile_unread_counts()
+    return f"Reconciled {written} unread notification counters"
+
+
+# Messages that keep failing are given up after this many attempts
+EMAIL_MAX_ATTEMPTS = 3
+
+
+@shared_task
+def send_email_batch(payloads, attempt=0):
+    """
+    Send a batch of emails over one SMTP connection; see
+    apps.notifications.mailer.queue_emails.
+
+    Messages over the per-minute rate limit are requeued for the next
+    window, failed messages are retried one by one with backoff.
+    """
+    from .mailer import deliver_emails, reserve_send_slots, seconds_until_next_window
+
+    allowed = reserve_send_slots(len(payloads))
+    if allowed < len(payloads):
+        send_email_batch.apply_async(
+            (payloads[allowed:], attempt), countdown=seconds_until_next_window()
+        )
+    report = deliver_emails(payloads[:allowed])
+    if attempt + 1 < EMAIL_MAX_ATTEMPTS:
+        for payload in report['failed']:
+            send_email_batch.apply_async(([payload], attempt + 1), countdown=60 * 2 ** attempt)
+    elif report['failed']:
+        logger.error(f"Giving up on {len(report['failed'])} emails after {EMAIL_MAX_ATTEMPTS} attempts")
+    return (
+        f"Sent {report['sent']} emails in {report['seconds']:.2f}s, "
+        f"deferred {len(payloads) - allowed}, failed {len(report['failed'])}"
+    )
+
+
+@shared_task
+def relay_outbox_messages():
+    """
+    Publish pending outbox messages; see apps.notifications.outbox.
+    """
+    from .outbox import purge_dispatched_outbox, relay_outbox
+
+    relayed = relay_outbox()
+    purged = purge_dispatched_outbox()
+    return f"Relayed {relayed} outbox messages, purged {purged}"
@@ -0,0 +1,460 @@
+import socket
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from celery import Task, current_app
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.notifications.mailer import build_email, close_pooled_connection, deliver_emails, queue_emails
+from apps.notifications.tasks import create_notification, send_email_batch
+from apps.notifications.coalescing import PendingNotification, notify_coalesced
+from apps.notifications.debounce import suppressed_counts
+from apps.notifications.models import Notification, OutboxMessage
+from apps.notifications.outbox import enqueue_task, purge_dispatched_outbox, relay_outbox, wake_outbox_relay
+from apps.notifications.unread import get_unread_count, reconcile_unread_counts, unread_count_key
+from apps.notifications.utils import send_notifications, user_group_name
+from apps.users.tasks import send_welcome_email_task
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+User = get_user_model()
+
+
+@override_settings(
+    SEND_WELCOME_EMAIL=False,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+)
+class SendNotificationsTests(TestCase):
+    """Test the batched notification fan-out."""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(email=f'user{index}@example.com') for index in range(5)]
+
+    def test_one_insert_per_batch_and_push_to_every_recipient(self):
+        """Notifications are bulk inserted per batch and pushed to each user's group."""
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(user_group_name(self.users[0].id), channel)
+
+        with self.assertNumQueries(2):
+            report = send_notifications(self.users + [self.users[0]], 'Deploy finished', batch_size=3)
+
+        self.assertEqual(report['sent'], 5)
+        self.assertEqual([batch['size'] for batch in report['batches']], [3, 2])
+        self.assertIn('db_ms', report['batches'][0])
+        self.assertEqual(Notification.objects.filter(message='Deploy finished').count(), 5)
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event['message'], 'Deploy finished')
+
+    def test_data_is_included_in_message(self):
+        """Extra data is appended to the message like send_notification does."""
+        send_notifications(self.users[:1], 'Invoice sent', data={'invoice': 7})
+
+        notification = Notification.objects.get(recipient=self.users[0])
+        self.assertIn("{'invoice': 7}", notification.message)
+
+    def test_notification_type_is_stored(self):
+        """The type given by the caller is kept on every notification."""
+        send_notifications(self.users[:2], 'Task assigned', notification_type='task_assigned')
+
+        self.assertEqual(
+            set(Notification.objects.values_list('notification_type', flat=True)), {'task_assigned'}
+        )
+
+
+@override_settings(
+    SEND_WELCOME_EMAIL=False,
+    NOTIFICATION_COALESCE_WINDOW=300,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+)
+class NotificationCoalescingTests(APITestCase):
+    """Test merging of bursty notifications per (recipient, type, target)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='dev@example.com')
+        self.other = User.objects.create_user(email='other@example.com')
+
+    def _event(self, index, recipient=None, target='project:1'):
+        return PendingNotification(
+            recipient=recipient or self.user,
+            message=f'Task {index} updated',
+            notification_type='task_status_update',
+            target=target,
+            label='Project X',
+            data={'task': index},
+        )
+
+    def test_burst_is_merged_into_one_notification(self):
+        """Events within the window update one notification and keep raw events."""
+        notify_coalesced([self._event(1)])
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.message, 'Task 1 updated')
+
+        report = notify_coalesced([self._event(index) for index in range(2, 6)])
+
+        self.assertEqual(report, {'events': 4, 'notifications': 1})
+        notification.refresh_from_db()
+        self.assertEqual(notification.event_count, 5)
+        self.assertEqual(notification.message, '5 task updates in Project X')
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 1)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse('notifications:notification-events', args=[notification.pk])
+        )
+        self.assertEqual([event['data']['task'] for event in response.data], [1, 2, 3, 4, 5])
+
+    def test_groups_are_kept_apart(self):
+        """Different recipients, targets and read or expired notifications are not merged."""
+        notify_coalesced([
+            self._event(1), self._event(2, recipient=self.other), self._event(3, target='project:2')
+        ])
+        self.assertEqual(Notification.objects.count(), 3)
+
+        Notification.objects.filter(recipient=self.other).update(read=True)
+        notify_coalesced([self._event(4, recipient=self.other)])
+        self.assertEqual(Notification.objects.filter(recipient=self.other).count(), 2)
+
+        notify_coalesced([self._event(5)], window=0)
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 3)
+
+
+@override_settings(
+    SEND_WELCOME_EMAIL=False,
+    UNREAD_COUNT_COUNTERS=True,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+)
+class NotificationInboxTests(APITestCase):
+    """Test the inbox pagination, watermark mark-read and unread counter."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='reader@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.list_url = reverse('notifications:notification-list')
+        self.count_url = reverse('notifications:notification-unread-count')
+        self.mark_url = reverse('notifications:notification-mark-read')
+
+    def test_unread_counter_is_maintained_without_counting(self):
+        """After the first read the badge is served from the cache and kept in sync."""
+        send_notifications([self.user], 'First')
+        self.assertEqual(self.client.get(self.count_url).data['unread'], 1)
+
+        send_notifications([self.user], 'Second')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.pk), 2)
+
+        cache.set(unread_count_key(self.user.pk), 42)
+        reconcile_unread_counts()
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+    @override_settings(UNREAD_COUNT_COUNTERS=False)
+    def test_unread_count_is_counted_without_a_shared_cache(self):
+        """A per-process cache is not trusted with the badge."""
+        send_notifications([self.user], 'First')
+        cache.set(unread_count_key(self.user.pk), 42)
+
+        self.assertEqual(self.client.get(self.count_url).data['unread'], 1)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+    def test_cursor_pages_and_watermark(self):
+        """Pages follow the cursor; marking up to a watermark spares newer notifications."""
+        send_notifications([self.user], 'Old', batch_size=1)
+        for index in range(4):
+            send_notifications([self.user], f'Message {index}')
+        Notification.objects.filter(message='Old').update(created_at=timezone.now() - timedelta(hours=1))
+
+        response = self.client.get(self.list_url, {'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['message'] for row in response.data['results']][-1], 'Old')
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.post(self.mark_url, {
+            'before': (timezone.now() - timedelta(minutes=30)).isoformat()
+        }, format='json')
+        self.assertEqual(response.data, {'updated': 1, 'unread': 4})
+
+        response = self.client.get(self.list_url, {'unread': 'true'})
+        self.assertEqual(len(response.data['results']), 4)
+
+        response = self.client.post(self.mark_url, {}, format='json')
+        self.assertEqual(response.data, {'updated': 4, 'unread': 0})
+
+
+class RecordingSMTPHandler:
+    """aiosmtpd handler keeping received messages and client connections."""
+
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.messages = []
+        self.peers = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return '550 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(list(envelope.rcpt_tos))
+        self.peers.add(session.peer)
+        return '250 Message accepted for delivery'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@skipUnless(Controller, 'aiosmtpd is not installed')
+class EmailDispatcherTests(TestCase):
+    """Test batched email delivery against an in-process SMTP server."""
+
+    def setUp(self):
+        self.handler = RecordingSMTPHandler(refuse={'bounce@example.com'})
+        port = _free_port()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        email_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            DEFAULT_FROM_EMAIL='noreply@example.com',
+            EMAIL_RATE_LIMIT_PER_MINUTE=0,
+        )
+        email_settings.enable()
+        self.addCleanup(email_settings.disable)
+        self.addCleanup(close_pooled_connection)
+        cache.clear()
+
+    def _payloads(self, count, prefix='user'):
+        return [
+            build_email('Digest', 'Your digest', f'{prefix}{index}@example.com', html_message='<p>Your digest</p>')
+            for index in range(count)
+        ]
+
+    def test_batch_is_sent_over_one_connection(self):
+        """A batch reuses one SMTP connection where send_mail opens one per message."""
+        count = 200
+        report = deliver_emails(self._payloads(count))
+
+        self.assertEqual(report['sent'], count)
+        self.assertEqual(report['failed'], [])
+        self.assertEqual(len(self.handler.messages), count)
+        self.assertEqual(len(self.handler.peers), 1)
+
+        for index in range(count):
+            send_mail('Digest', 'Your digest', None, [f'single{index}@example.com'])
+        self.assertEqual(len(self.handler.peers), count + 1)
+
+    @mock.patch('apps.notifications.tasks.send_email_batch.apply_async')
+    def test_failed_recipient_is_retried_alone(self, apply_async):
+        """A refused recipient does not sink the batch and is retried on its own."""
+        payloads = self._payloads(2)
+        bounce = build_email('Digest', 'Your digest', 'bounce@example.com')
+
+        send_email_batch([payloads[0], bounce, payloads[1]])
+
+        self.assertEqual(self.handler.messages, [['user0@example.com'], ['user1@example.com']])
+        apply_async.assert_called_once_with(([bounce], 1), countdown=60)
+
+    @mock.patch('apps.notifications.tasks.send_email_batch.apply_async')
+    def test_rate_limit_defers_the_rest_of_the_batch(self, apply_async):
+        """Messages over the per-minute budget are requeued for the next window."""
+        payloads = self._payloads(5)
+
+        with self.settings(EMAIL_RATE_LIMIT_PER_MINUTE=3):
+            send_email_batch(payloads)
+
+        self.assertEqual(len(self.handler.messages), 3)
+        args, kwargs = apply_async.call_args
+        self.assertEqual(args[0], (payloads[3:], 0))
+        self.assertGreater(kwargs['countdown'], 0)
+
+    @mock.patch('apps.notifications.tasks.send_email_batch.delay')
+    def test_queue_emails_groups_messages_into_batches(self, delay):
+        """queue_emails enqueues one task per batch rather than per message."""
+        batches = queue_emails(iter(self._payloads(5)), batch_size=2)
+
+        self.assertEqual(batches, 3)
+        self.assertEqual([len(call.args[0]) for call in delay.call_args_list], [2, 2, 1])
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class OutboxTests(TestCase):
+    """Test the transactional outbox and its relay."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='outbox@example.com')
+        cache.clear()
+
+    @mock.patch('apps.notifications.outbox.current_app')
+    @mock.patch('apps.notifications.outbox.wake_outbox_relay')
+    def test_messages_are_relayed_in_batches_after_commit(self, wake, app):
+        """Committed messages are published over one producer per batch and marked dispatched."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for index in range(5):
+                enqueue_task(create_notification, self.user.id, f'Message {index}')
+        self.assertEqual(len(callbacks), 5)
+        self.assertEqual(wake.call_count, 5)
+
+        self.assertEqual(relay_outbox(batch_size=2), 5)
+
+        self.assertEqual(app.producer_or_acquire.call_count, 3)
+        self.assertEqual(app.send_task.call_count, 5)
+        name, = app.send_task.call_args_list[0].args
+        self.assertEqual(name, 'apps.notifications.tasks.create_notification')
+        self.assertEqual(app.send_task.call_args_list[0].kwargs['args'], [str(self.user.id), 'Message 0'])
+        self.assertFalse(OutboxMessage.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(relay_outbox(), 0)
+
+    @mock.patch('apps.notifications.outbox.wake_outbox_relay')
+    def test_rolled_back_write_leaves_no_message(self, wake):
+        """A task call recorded in a rolled back transaction is never published."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    enqueue_task(create_notification, self.user.id, 'Never sent')
+                    raise ValueError('rollback')
+            except ValueError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(OutboxMessage.objects.exists())
+        wake.assert_not_called()
+
+    @mock.patch('apps.notifications.tasks.relay_outbox_messages.apply_async')
+    def test_wakeups_share_one_relay_run(self, apply_async):
+        """Commits within the wake-up delay schedule a single relay run."""
+        wake_outbox_relay()
+        wake_outbox_relay()
+
+        apply_async.assert_called_once_with(countdown=1)
+
+    @override_settings(SEND_WELCOME_EMAIL=True)
+    @mock.patch('apps.notifications.outbox.wake_outbox_relay')
+    def test_welcome_email_does_not_queue_the_password(self, wake):
+        """Admin-created users are sent a set-password link; the password never reaches the outbox."""
+        admin = User.objects.create_superuser('root', 'root@example.com', 'Sup3r-secret!')
+
+        message = OutboxMessage.objects.get(task_name='apps.users.tasks.send_welcome_email_task')
+        self.assertEqual((message.args, message.kwargs), ([str(admin.id)], {'set_password': True}))
+
+        with mock.patch('apps.users.tasks.send_email', return_value=True) as send_email:
+            send_welcome_email_task(*message.args, **message.kwargs)
+        payload, = send_email.call_args.args
+        self.assertIn('/reset-password/?uid=', payload['html_message'])
+        self.assertNotIn('Sup3r-secret!', payload['html_message'])
+
+    def test_purge_keeps_recent_and_pending_messages(self):
+        """Only messages dispatched before the retention period are purged."""
+        now = timezone.now()
+        OutboxMessage.objects.create(task_name='old', dispatched_at=now - timedelta(days=2))
+        OutboxMessage.objects.create(task_name='recent', dispatched_at=now - timedelta(hours=1))
+        OutboxMessage.objects.create(task_name='pending')
+
+        self.assertEqual(purge_dispatched_outbox(now), 1)
+        self.assertEqual(sorted(OutboxMessage.objects.values_list('task_name', flat=True)), ['pending', 'recent'])
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class DebouncedTaskTests(TestCase):
+    """Test collapsing of repeated enqueues of debounced tasks."""
+
+    def setUp(self):
+        from apps.projects.tasks import update_project_progress
+
+        self.task = update_project_progress
+        cache.clear()
+
+    @mock.patch.object(Task, 'apply_async')
+    def test_enqueues_collapse_until_the_run_starts(self, apply_async):
+        """Only the first enqueue per key is published; starting the run re-arms it."""
+        for _ in range(3):
+            self.task.delay('project-1')
+        self.task.delay('project-2')
+
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(apply_async.call_args_list[0].kwargs['countdown'], 5)
+        self.assertEqual(self.task.suppressed_count(), 2)
+        self.assertEqual(suppressed_counts()[self.task.name], 2)
+
+        with mock.patch('apps.projects.tasks.recompute_task_counters', return_value=0):
+            self.task('project-1')
+        self.task.delay('project-1')
+        self.assertEqual(apply_async.call_count, 3)
+
+    @mock.patch.object(Task, 'apply_async')
+    def test_explicit_countdown_bypasses_debouncing(self, apply_async):
+        """Retries, which carry their own countdown, are always published."""
+        self.task.delay('project-1')
+        self.task.apply_async(('project-1',), countdown=300)
+
+        self.assertEqual(apply_async.call_count, 2)
+
+    @mock.patch('apps.notifications.outbox.wake_outbox_relay')
+    def test_outbox_relay_drops_pending_duplicates(self, wake):
+        """The relay publishes one debounced run per key and every other message."""
+        for _ in range(3):
+            enqueue_task(self.task, 'project-1')
+        enqueue_task(create_notification, 'user-1', 'Hello')
+
+        with mock.patch.object(current_app, 'producer_or_acquire'), \
+                mock.patch.object(current_app, 'send_task') as send_task:
+            self.assertEqual(relay_outbox(), 4)
+
+        self.assertEqual(
+            [(call.args[0], call.kwargs.get('countdown')) for call in send_task.call_args_list],
+            [(self.task.name, 5), ('apps.notifications.tasks.create_notification', None)]
+        )
+        self.assertEqual(self.task.suppressed_count(), 2)
+        self.assertFalse(OutboxMessage.objects.filter(dispatched_at__isnull=True).exists())
+
+
+class TaskRoutingTests(TestCase):
+    """Test the Celery queue routing table."""
+
+    def route(self, name):
+        return current_app.amqp.router.route({}, name)
+
+    def test_every_task_has_a_queue(self):
+        """No application task silently falls back to the default queue."""
+        from backend.celery import TASK_QUEUES
+
+        unrouted = [
+            name for name in current_app.tasks
+            if name.startswith('apps.') and name not in current_app.conf.task_routes
+        ]
+        self.assertEqual(unrouted, [])
+        self.assertTrue(all(
+            route['queue'] in TASK_QUEUES for route in current_app.conf.task_routes.values()
+        ))
+
+    def test_realtime_and_bulk_work_use_separate_queues(self):
+        """Chat notifications never share a queue with digest batches."""
+        realtime = self.route('apps.messaging.tasks.send_message_notification')
+        bulk = self.route('apps.notifications.tasks.send_email_batch')
+
+        self.assertEqual(realtime['queue'].name, 'realtime')
+        self.assertEqual(realtime['priority'], 0)
+        self.assertEqual(bulk['queue'].name, 'bulk_email')
@@ -0,0 +1,123 @@
+"""
+Per-user unread notification counters.
+
+The unread badge is served from a shared cache (Redis, see CACHES and
+UNREAD_COUNT_COUNTERS in settings) instead of a COUNT over the user's
+notifications. Counters are adjusted when notifications are created or
+marked read, lazily rebuilt on a cache miss and periodically reconciled
+with the database by ``reconcile_unread_counts``. Without a shared cache
+every process would keep its own counters, so unread notifications are
+counted on the (recipient, read, created_at) index instead.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notification
+
+# Counters are rebuilt from the database after this many seconds at the latest
+UNREAD_COUNT_TIMEOUT = 3600 * 24
+
+
+def counters_enabled():
+    """Whether unread counts are kept in the (shared) cache."""
+    return getattr(settings, 'UNREAD_COUNT_COUNTERS', False)
+
+
+def unread_count_key(user_id):
+    return f'notifications_{user_id}_unread'
+
+
+def get_unread_count(user_id):
+    """
+    Return the user's number of unread notifications, counting them (and
+    caching the result) only when the counter is missing.
+    """
+    if not counters_enabled():
+        return Notification.objects.filter(recipient_id=user_id, read=False).count()
+    key = unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        # add() keeps a counter created concurrently by another process
+        cache.add(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_unread_counts(deltas):
+    """
+    Apply unread count deltas to cached counters.
+
+    Missing counters are left missing: they are rebuilt from the database on
+    the next read, which avoids creating counters from a partial delta.
+
+    Args:
+        deltas: Mapping of user id to the change in unread notifications
+    """
+    if not counters_enabled():
+        return
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        key = unread_count_key(user_id)
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+
+
+def reconcile_unread_counts(since=None):
+    """
+    Rewrite cached counters from the database.
+
+    Covers every user with unread notifications and every user whose
+    notifications changed since ``since`` (default: the last day), using one
+    grouped query on the (recipient, read, created_at) index.
+
+    Returns:
+        int: Number of counters written (none without counters)
+    """
+    if not counters_enabled():
+        return 0
+    since = since or timezone.now() - timedelta(days=1)
+    counts = dict(
+        Notification.objects.filter(read=False).values_list('recipient_id')
+        .annotate(count=Count('id')).order_by()
+    )
+    for user_id in Notification.objects.filter(updated_at__gte=since).values_list(
+        'recipient_id', flat=True
+    ).distinct():
+        counts.setdefault(user_id, 0)
+
+    cache.set_many(
+        {unread_count_key(user_id): count for user_id, count in counts.items()},
+        UNREAD_COUNT_TIMEOUT
+    )
+    return len(counts)
+
+
+def mark_notifications_read(user, before=None, ids=None):
+    """
+    Mark a user's notifications read, either up to a watermark or by id.
+
+    Args:
+        user: The recipient
+        before: Mark every unread notification created at or before this
+            time (default: now) when ``ids`` is not given
+        ids: Optional list of notification ids to mark instead
+
+    Returns:
+        int: Number of notifications marked read
+    """
+    unread = Notification.objects.filter(recipient=user, read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    else:
+        unread = unread.filter(created_at__lte=before or timezone.now())
+
+    updated = unread.update(read=True, updated_at=timezone.now())
+    adjust_unread_counts({user.pk: -updated})
+    return updated
@@ -1,9 +1,139 @@
+import asyncio
 import json
+import logging
+import time
+from collections import Counter
 from datetime import datetime
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .models import Notification
+from .unread import adjust_unread_counts
+
+logger = logging.getLogger(__name__)
+
+# Number of notifications written and pushed per batch
+NOTIFICATION_BATCH_SIZE = 500
+
+
+def user_group_name(user_id):
+    """
+    Channel layer group joined by a user's notification WebSocket
+    (see apps.notifications.consumers.NotificationConsumer).
+    """
+    return f'notifications_{user_id}'
+
+
+def _format_message(message, data=None):
+    # Include additional data in the message if provided
+    if data:
+        return f"{message}\n\nAdditional details: {data}"
+    return message
+
+
+async def _group_send_many(channel_layer, events):
+    await asyncio.gather(*(channel_layer.group_send(group, event) for group, event in events))
+
+
+def push_notifications(notifications):
+    """
+    Push a batch of notifications to their recipients' WebSocket groups.
+
+    All sends of the batch run concurrently on one event loop, so the batch
+    costs a single sync-to-async hop instead of one per recipient.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    timestamp = timezone.now().isoformat()
+    events = [
+        (user_group_name(notification.recipient_id), {
+            'type': 'send_notification',
+            'id': str(notification.id),
+            'message': notification.message,
+            'event_count': notification.event_count,
+            'timestamp': timestamp,
+        })
+        for notification in notifications
+    ]
+    try:
+        async_to_sync(_group_send_many)(channel_layer, events)
+    except Exception as e:
+        logger.warning(f"WebSocket notification error: {e}")
+
+
+def deliver_notifications(items, batch_size=NOTIFICATION_BATCH_SIZE, notification_type=''):
+    """
+    Store and push notifications with individual messages.
+
+    Each batch is written with one ``bulk_create`` and pushed to the
+    channel layer concurrently. Intended to run in Celery workers (see
+    ``apps.notifications.tasks.send_notifications_task`` for request code).
+
+    Args:
+        items: Iterable of (recipient user, message) pairs
+        batch_size: Notifications per batch
+        notification_type: Type stored on every notification
+
+    Returns:
+        dict: ``sent`` count and per-batch ``batches`` timings
+        (``size``, ``db_ms``, ``push_ms``)
+    """
+    report = {'sent': 0, 'batches': []}
+    batch = []
+
+    def flush():
+        started = time.perf_counter()
+        notifications = Notification.objects.bulk_create(batch)
+        adjust_unread_counts(Counter(notification.recipient_id for notification in notifications))
+        stored = time.perf_counter()
+        push_notifications(notifications)
+        pushed = time.perf_counter()
+
+        timings = {
+            'size': len(notifications),
+            'db_ms': round((stored - started) * 1000, 2),
+            'push_ms': round((pushed - stored) * 1000, 2),
+        }
+        report['sent'] += len(notifications)
+        report['batches'].append(timings)
+        logger.info(
+            f"Sent {timings['size']} notifications "
+            f"(db {timings['db_ms']} ms, push {timings['push_ms']} ms)"
+        )
+
+    for recipient, message in items:
+        batch.append(Notification(recipient=recipient, message=message, notification_type=notification_type))
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return report
+
+
+def send_notifications(recipients, message, data=None, notification_type='', batch_size=NOTIFICATION_BATCH_SIZE):
+    """
+    Send the same notification to many users.
+
+    Args:
+        recipients: Iterable of users; duplicates are notified once
+        message: The notification message
+        data: Additional data (included in the message)
+        notification_type: Type stored on the notifications
+        batch_size: Notifications per batch
+
+    Returns:
+        dict: Delivery report, see ``deliver_notifications``
+    """
+    full_message = _format_message(message, data)
+    unique = {recipient.pk: recipient for recipient in recipients if recipient is not None}
+    return deliver_notifications(
+        [(recipient, full_message) for recipient in unique.values()],
+        batch_size=batch_size,
+        notification_type=notification_type,
+    )
+
 
 def send_notification(recipient, message, **kwargs):
     """
@@ -13,7 +143,7 @@ def send_notification(recipient, message, **kwargs):
         recipient: The user to notify (User instance)
         message: The notification message
         **kwargs: Additional arguments (for backward compatibility)
-            - notification_type: Type of notification (ignored)
+            - notification_type: Type of notification (stored on it)
             - data: Additional data (included in message if needed)
             - send_email: Whether to send an email notification as well
     
@@ -21,31 +151,18 @@ def send_notification(recipient, message, **kwargs):
         Notification: The created notification object
     """
     send_email = kwargs.pop('send_email', False)
-    data = kwargs.pop('data', {})
-    
-    # Include additional data in the message if provided
-    full_message = message
-    if data:
-        full_message = f"{message}\n\nAdditional details: {data}"
+    full_message = _format_message(message, kwargs.pop('data', {}))
     
     # Create notification in database
     notification = Notification.objects.create(
         recipient=recipient,
-        message=full_message
+        message=full_message,
+        notification_type=kwargs.pop('notification_type', '')
     )
+    adjust_unread_counts({recipient.pk: 1})
     
     # Send WebSocket notification if channels is configured
-    try:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{recipient.id}", {
-                'type': 'send_notification',
-                'message': full_message,
-                'timestamp': timezone.now().isoformat()
-            }
-        )
-    except Exception as e:
-        print(f"WebSocket notification error: {e}")
+    push_notifications([notification])
     
     # Send email if requested
     if send_email:
@@ -1,11 +1,31 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import (
+    NotificationSerializer,
+    NotificationEventSerializer,
+    NotificationMarkReadSerializer
+)
+from .unread import get_unread_count, mark_notifications_read
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Newest-first inbox pages; cursors stay stable while new notifications arrive.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Notification.objects.none()
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
         # Handle Swagger schema generation
@@ -16,4 +36,43 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         if not self.request.user.is_authenticated:
             return Notification.objects.none()
             
-        return self.request.user.notifications.order_by('-created_at')
+        queryset = self.request.user.notifications.order_by('-created_at')
+        if self.action == 'list' and self.request.query_params.get('unread') in ('1', 'true', 'True'):
+            queryset = queryset.filter(read=False)
+        return queryset
+
+
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        """
+        Raw events merged into a (coalesced) notification.
+        """
+        notification = self.get_object()
+        return Response(NotificationEventSerializer(notification.events.all(), many=True).data)
+
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Number of unread notifications, served from the cached counter.
+        """
+        return Response({'unread': get_unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """
+        Mark notifications read: ``ids`` marks the listed notifications,
+        otherwise every notification created up to the ``before`` watermark
+        (default: now), e.g. the ``created_at`` of the newest one displayed.
+        """
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = mark_notifications_read(
+            request.user,
+            before=serializer.validated_data.get('before'),
+            ids=serializer.validated_data.get('ids'),
+        )
+        return Response(
+            {'updated': updated, 'unread': get_unread_count(request.user.pk)},
+            status=status.HTTP_200_OK
+        )
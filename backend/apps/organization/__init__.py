@@ -4,7 +4,8 @@ from .tasks import *  # noqa
 
 # Using lazy imports to prevent circular imports
 def __getattr__(name):
-    if name in {'get_user_organization_role', 'has_organization_permission', 'get_organization_members'}:
+    if name in {'get_user_organization_role', 'has_organization_permission', 'get_organization_members',
+                'get_member_directory'}:
         from . import utils
         return getattr(utils, name)
     raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -13,4 +14,5 @@ __all__ = [
     'get_user_organization_role',
     'has_organization_permission',
     'get_organization_members',
+    'get_member_directory',
 ]
\ No newline at end of file
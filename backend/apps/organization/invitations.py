@@ -0,0 +1,396 @@
+"""
+Bulk member invitations.
+
+An invitation list (CSV upload or JSON list of ``email``, ``role``,
+``first_name`` and ``last_name``) is stored as a MemberInvitationJob and
+processed by the ``process_member_invitations`` Celery task in batches:
+
+- the batch's emails are checked against existing users and memberships
+  with one query;
+- new users get generated passwords, hashed in a worker pool (hashing is
+  slow by design), and are written with ``bulk_create`` together with
+  their profiles and memberships; existing users only get a membership;
+- every invited user is emailed a link to set their password; the
+  generated passwords are never sent or kept;
+- invitation emails are handed to ``queue_emails``, which sends them in
+  batches over pooled SMTP connections.
+
+``bulk_create`` sends no signals, so the organization's quota counters
+are adjusted here. Progress is saved after every batch.
+"""
+import codecs
+import csv
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from apps.notifications.mailer import build_email, prerender_email, queue_emails
+from apps.users.models import User, UserProfile, username_base
+from .models import MemberInvitationJob, OrganizationMember, OrganizationRoleChoices
+from .quotas import MEMBERS, STORAGE, QuotaExceeded, adjust_usage, file_size, reserve_quota
+
+logger = logging.getLogger(__name__)
+
+# Invitations validated and written together
+BULK_INVITE_BATCH_SIZE = 250
+# Largest invitation list accepted in one request
+BULK_INVITE_MAX_ROWS = 5000
+# Rejected rows kept in a job report
+BULK_INVITE_MAX_ERRORS = 1000
+# Fewer passwords than this are hashed in the calling process
+PASSWORD_POOL_MIN_SIZE = 16
+
+INVITATION_FIELDS = ('email', 'role', 'first_name', 'last_name')
+
+
+def read_invitations(upload=None, entries=None):
+    """
+    Read an invitation list from a CSV upload (with a header row) or a list
+    of emails or ``{'email': ..., 'role': ...}`` objects.
+
+    Returns:
+        list: ``{'line': ..., 'email': ..., 'role': ..., 'first_name': ...,
+        'last_name': ...}`` dicts; values are not validated yet
+
+    Raises:
+        ValueError: If the list cannot be read or is too long
+    """
+    rows = []
+    if upload is not None:
+        reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+        for record in reader:
+            rows.append({'line': reader.line_num, **{
+                field: (record.get(field) or '').strip() for field in INVITATION_FIELDS
+            }})
+    else:
+        if not isinstance(entries, list):
+            raise ValueError("Expected a list of invitations")
+        for line, entry in enumerate(entries, start=1):
+            if isinstance(entry, str):
+                entry = {'email': entry}
+            if not isinstance(entry, dict):
+                raise ValueError(f"Invitation {line} must be an email or an object")
+            rows.append({'line': line, **{
+                field: str(entry.get(field) or '').strip() for field in INVITATION_FIELDS
+            }})
+    if not rows:
+        raise ValueError("The invitation list is empty")
+    if len(rows) > BULK_INVITE_MAX_ROWS:
+        raise ValueError(f"At most {BULK_INVITE_MAX_ROWS} people can be invited at once")
+    return rows
+
+
+def hash_passwords(passwords):
+    """
+    Hash passwords with the default hasher, in parallel for long lists.
+
+    Worker processes are used where the caller may start them; Celery's
+    prefork workers are daemonic and may not, so they use threads, which
+    hash in parallel too because PBKDF2 releases the GIL.
+    """
+    if len(passwords) < PASSWORD_POOL_MIN_SIZE:
+        return [make_password(password) for password in passwords]
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    if multiprocessing.current_process().daemon:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+    with executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+class MemberInviter:
+    """
+    Invite people to an organization in batches and collect a report.
+
+    Args:
+        organization: The organization
+        actor: User sending the invitations
+        batch_size: Invitations validated and written together
+    """
+
+    def __init__(self, organization, actor=None, batch_size=BULK_INVITE_BATCH_SIZE):
+        self.organization = organization
+        self.actor = actor
+        self.batch_size = batch_size
+        self.report = {'processed': 0, 'invited': 0, 'added': 0, 'failed': 0, 'errors': []}
+        self._seen_emails = set()
+        self._welcome = prerender_email('emails/welcome_invitation.html', {
+            'organization': organization,
+            'login_url': f'{settings.FRONTEND_URL}/login',
+        }, ('email', 'otp', 'reset_url'))
+
+    def run(self, rows, on_progress=None):
+        """
+        Invite every row of an invitation list, see ``read_invitations``.
+
+        Returns:
+            dict: ``processed``, ``invited`` (new users), ``added``
+            (existing users) and ``failed`` counts and the ``errors`` of
+            rejected rows (``{'line': ..., 'email': ..., 'error': ...}``)
+        """
+        for start in range(0, len(rows), self.batch_size):
+            self.invite_batch(rows[start:start + self.batch_size])
+            if on_progress:
+                on_progress(self.report)
+        return self.report
+
+    def _fail(self, row, error):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < BULK_INVITE_MAX_ERRORS:
+            self.report['errors'].append({'line': row['line'], 'email': row['email'], 'error': error})
+
+    def _validate(self, row):
+        # Emails are stored as typed but compared case-insensitively
+        email = User.objects.normalize_email(row['email'])
+        try:
+            validate_email(email)
+        except ValidationError:
+            return 'Enter a valid email address.'
+        if email.lower() in self._seen_emails:
+            return 'Duplicate email in the invitation list.'
+        role = (row['role'] or OrganizationRoleChoices.USER).replace('-', '_').lower()
+        if role not in OrganizationRoleChoices.values:
+            return f'"{row["role"]}" is not a valid role.'
+        self._seen_emails.add(email.lower())
+        row['email'], row['role'] = email, role
+        return None
+
+    def invite_batch(self, rows):
+        """Validate and write one batch of invitation rows."""
+        self.report['processed'] += len(rows)
+        valid = []
+        for row in rows:
+            error = self._validate(row)
+            if error:
+                self._fail(row, error)
+            else:
+                valid.append(row)
+        if not valid:
+            return
+
+        # Stored emails keep the case they were typed in, so compare them
+        # lowercased (served by the users_email_lower_idx index)
+        existing = {
+            user.email.lower(): user
+            for user in User.objects.annotate(
+                email_lower=Lower('email'),
+                is_member=Exists(OrganizationMember.objects.filter(
+                    organization=self.organization, user=OuterRef('pk')
+                )),
+            ).filter(email_lower__in={row['email'].lower() for row in valid})
+        }
+
+        new_rows, existing_rows = [], []
+        for row in valid:
+            user = existing.get(row['email'].lower())
+            if user is None:
+                new_rows.append(row)
+            elif user.is_member:
+                self._fail(row, 'Already a member of this organization.')
+            else:
+                existing_rows.append((row, user))
+        if not new_rows and not existing_rows:
+            return
+
+        # The organization stays locked until the batch is written, so
+        # concurrent invitations cannot take the same seats
+        with transaction.atomic():
+            try:
+                reserve_quota(self.organization, MEMBERS, len(new_rows) + len(existing_rows))
+            except QuotaExceeded as e:
+                for row in new_rows + [row for row, _ in existing_rows]:
+                    self._fail(row, str(e))
+                return
+
+            created = self._create_users(new_rows)
+            added = self._add_users(existing_rows)
+        queue_emails([*(self._welcome_email(*item) for item in created), *(self._added_email(*item) for item in added)])
+
+    def _create_users(self, rows):
+        """
+        Create users, profiles and memberships for new emails with one
+        ``bulk_create`` each.
+
+        Returns:
+            list: ``(row, user, otp)`` of the created users
+        """
+        if not rows:
+            return []
+        hashes = hash_passwords([User.objects.make_random_password(length=12) for _ in rows])
+        usernames = User.objects.allocate_usernames([username_base(row['email']) for row in rows])
+
+        now = timezone.now()
+        items = []
+        for row, hashed, username in zip(rows, hashes, usernames):
+            user = User(
+                username=username,
+                email=row['email'],
+                first_name=row['first_name'] or None,
+                last_name=row['last_name'] or None,
+                password=hashed,
+                is_active=True,
+            )
+            items.append((row, user, get_random_string(6, '0123456789')))
+
+        try:
+            with transaction.atomic():
+                self._write_new_users(items, now)
+        except IntegrityError:
+            # An email or username was taken concurrently: retry one by one
+            # to reject only the conflicting rows
+            logger.info("Bulk invitation batch conflicted, retrying row by row")
+            written = []
+            for item in items:
+                user = item[1]
+                try:
+                    with transaction.atomic():
+                        if User.objects.filter(username=user.username).exists():
+                            user.username = User.objects.allocate_username(username_base(user.email))
+                        self._write_new_users([item], now)
+                    written.append(item)
+                except IntegrityError:
+                    if User.objects.filter(email__iexact=user.email).exists():
+                        self._fail(item[0], 'A user with this email already exists.')
+                    else:
+                        self._fail(item[0], f'The username {user.username} was taken concurrently, please retry.')
+            items = written
+
+        self.report['invited'] += len(items)
+        adjust_usage(MEMBERS, {self.organization.pk: len(items)})
+        return items
+
+    def _write_new_users(self, items, now):
+        User.objects.bulk_create([user for _, user, _ in items])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, password_change_required=True, otp=otp, otp_created_at=now)
+            for _, user, otp in items
+        ])
+        OrganizationMember.objects.bulk_create([
+            OrganizationMember(user=user, organization=self.organization, role=row['role'], is_active=True)
+            for row, user, _ in items
+        ])
+
+    def _add_users(self, items):
+        """
+        Add existing users to the organization with one ``bulk_create``.
+
+        Returns:
+            list: ``(row, user)`` of the users added
+        """
+        if not items:
+            return []
+        members = [
+            OrganizationMember(user=user, organization=self.organization, role=row['role'], is_active=True)
+            for row, user in items
+        ]
+        try:
+            with transaction.atomic():
+                OrganizationMember.objects.bulk_create(members)
+        except IntegrityError:
+            # Added concurrently: retry one by one
+            written = []
+            for member, item in zip(members, items):
+                try:
+                    with transaction.atomic():
+                        OrganizationMember.objects.bulk_create([member])
+                    written.append(item)
+                except IntegrityError:
+                    self._fail(item[0], 'Already a member of this organization.')
+            items = written
+
+        self.report['added'] += len(items)
+        adjust_usage(MEMBERS, {self.organization.pk: len(items)})
+        adjust_usage(STORAGE, {
+            self.organization.pk: sum(file_size(user.profile_picture.name) for _, user in items if user.profile_picture)
+        })
+        return items
+
+    def _set_password_url(self, user):
+        token = default_token_generator.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        return f"{settings.FRONTEND_URL}/reset-password/?uid={uid}&token={token}"
+
+    def _welcome_email(self, row, user, otp):
+        # Email payloads travel through the broker: send a set-password
+        # link, never the generated password
+        reset_url = self._set_password_url(user)
+        html_message, _ = self._welcome({'email': user.email, 'otp': otp, 'reset_url': reset_url})
+        body = (
+            f"Welcome to {self.organization.name} on ProjectK!\n\n"
+            f"Your account has been created for {user.email}.\n"
+            f"Your one-time password for the first login is: {otp}\n\n"
+            f"Please use this link to set your password: {reset_url}\n\n"
+            f"Then log in at: {settings.FRONTEND_URL}/login"
+        )
+        return build_email(
+            f'Welcome to {self.organization.name} on ProjectK', body, user.email,
+            html_message=html_message, reply_to=settings.REPLY_TO_EMAIL,
+        )
+
+    def _added_email(self, row, user):
+        reset_url = self._set_password_url(user)
+        html_message = render_to_string('emails/organization_invitation.html', {
+            'user': user,
+            'organization': self.organization,
+            'role': row['role'],
+            'login_url': f'{settings.FRONTEND_URL}/login',
+            'reset_url': reset_url,
+        })
+        return build_email(
+            f"You've been added to {self.organization.name} on ProjectK",
+            f"You've been added to {self.organization.name}. Please use this link to set your password: {reset_url}",
+            user.email, html_message=html_message,
+        )
+
+
+def run_member_invitations(job_id):
+    """
+    Run a queued MemberInvitationJob, saving its progress after every batch.
+
+    Returns:
+        MemberInvitationJob: The finished job, or None if it was not queued
+        (already run by another worker)
+    """
+    if not MemberInvitationJob.objects.filter(id=job_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    ):
+        return None
+    job = MemberInvitationJob.objects.select_related('organization', 'created_by').get(id=job_id)
+
+    def save_progress(report):
+        MemberInvitationJob.objects.filter(id=job_id).update(
+            processed=report['processed'],
+            invited=report['invited'],
+            added=report['added'],
+            failed=report['failed'],
+            errors=report['errors'],
+        )
+
+    try:
+        MemberInviter(job.organization, actor=job.created_by).run(job.invitations, on_progress=save_progress)
+    except Exception as e:
+        logger.exception(f"Member invitation job {job_id} failed")
+        MemberInvitationJob.objects.filter(id=job_id).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+    else:
+        MemberInvitationJob.objects.filter(id=job_id).update(status='completed', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
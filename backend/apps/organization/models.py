@@ -170,4 +170,40 @@ class Organization(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
-# OrganizationMember model handles all organization roles now
\ No newline at end of file
+# OrganizationMember model handles all organization roles now
+
+class MemberInvitationJob(models.Model):
+    """
+    A list of people invited to an organization at once, processed by a
+    Celery job (see apps.organization.invitations).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='invitation_jobs')
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='invitation_jobs'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    invitations = models.JSONField(default=list, help_text="Rows to invite: line, email, role and names")
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    invited = models.PositiveIntegerField(default=0, help_text="New users created and added")
+    added = models.PositiveIntegerField(default=0, help_text="Existing users added")
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Rejected rows, up to the first 1000")
+    error = models.TextField(blank=True, default='', help_text="Error that stopped the job")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Invitations to {self.organization_id} ({self.status})"
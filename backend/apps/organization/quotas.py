@@ -0,0 +1,256 @@
+"""
+Organization quotas.
+
+``Organization.max_users`` limits an organization's active members and
+``max_storage`` (in GB) the bytes of its files: the organization's logo
+and the profile pictures of its active members (see STORAGE_FIELDS).
+
+Usage is kept in per-organization counters in a shared cache (Redis, see
+CACHES and QUOTA_USAGE_COUNTERS in settings), so reading usage takes one
+key instead of counting members or summing file sizes. Counters are
+adjusted by the receivers in apps.organization.signals once the changes
+commit, rebuilt from the database on a cache miss, and rewritten in bulk
+by ``reconcile_usage`` to correct drift from bulk writes that send no
+signals. Without a shared cache every process would keep its own
+counters, so usage is counted in the database instead.
+
+Counters are for reads and early rejections (``check_quota``); writes
+that add usage reserve it with ``reserve_quota``, which locks the
+organization row and counts in the database so that concurrent requests
+cannot both take the last seat.
+"""
+import uuid
+from collections import defaultdict
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Organization, OrganizationMember
+
+MEMBERS = 'members'
+STORAGE = 'storage'
+
+# Counters are rebuilt from the database after this many seconds at the latest
+ORGANIZATION_USAGE_TIMEOUT = 3600 * 24
+# Organizations reconciled per query
+RECONCILE_CHUNK_SIZE = 1000
+
+# Files counted against an organization's storage quota:
+# (model, file field path, path to the owning organization ID, filters)
+STORAGE_FIELDS = (
+    ('organization.Organization', 'logo', 'id', {}),
+    ('organization.OrganizationMember', 'user__profile_picture', 'organization_id', {'is_active': True}),
+)
+
+
+class QuotaExceeded(Exception):
+    """A change that would take an organization over one of its quotas."""
+
+    def __init__(self, organization, metric, limit, usage, requested):
+        self.organization = organization
+        self.metric = metric
+        self.limit = limit
+        self.usage = usage
+        self.requested = requested
+        if metric == MEMBERS:
+            message = f"{organization.name} has reached its limit of {limit} active members"
+        else:
+            message = f"{organization.name} has reached its storage limit of {organization.max_storage} GB"
+        super().__init__(message)
+
+
+def counters_enabled():
+    """Whether usage counters are kept in the (shared) cache."""
+    return getattr(settings, 'QUOTA_USAGE_COUNTERS', False)
+
+
+def usage_key(organization_id, metric):
+    return f'organization_{organization_id}_usage_{metric}'
+
+
+def file_size(name):
+    """Return the size of a stored file; missing files count as empty."""
+    if not name:
+        return 0
+    try:
+        return default_storage.size(name)
+    except (OSError, NotImplementedError):
+        return 0
+
+
+def count_members(organization_ids=None):
+    """
+    Count active members per organization with one grouped query.
+
+    Returns:
+        dict: Organization ID -> active members (organizations without
+        members are left out)
+    """
+    members = OrganizationMember.objects.filter(is_active=True)
+    if organization_ids is not None:
+        members = members.filter(organization_id__in=organization_ids)
+    return dict(members.values_list('organization_id').annotate(count=Count('id')).order_by())
+
+
+def measure_storage(organization_ids=None):
+    """
+    Sum the sizes of the files counted against each organization's quota,
+    with one query per entry of STORAGE_FIELDS; each file is measured once.
+
+    Returns:
+        dict: Organization ID -> bytes
+    """
+    usage = defaultdict(int)
+    sizes = {}
+    for label, field_path, organization_path, filters in STORAGE_FIELDS:
+        conditions = dict(filters)
+        if organization_ids is not None:
+            conditions[f'{organization_path}__in'] = organization_ids
+        rows = (
+            apps.get_model(label).objects.filter(**conditions)
+            .exclude(**{field_path: ''}).exclude(**{f'{field_path}__isnull': True})
+            .values_list(organization_path, field_path)
+        )
+        for organization_id, name in rows.iterator(chunk_size=2000):
+            if name not in sizes:
+                sizes[name] = file_size(name)
+            usage[organization_id] += sizes[name]
+    return dict(usage)
+
+
+USAGE_COUNTERS = {MEMBERS: count_members, STORAGE: measure_storage}
+
+
+def get_usage(organization_id, metric):
+    """
+    Return an organization's active members or storage bytes, computing
+    (and caching) the value only when the counter is missing.
+    """
+    organization_id = uuid.UUID(str(organization_id))
+    if not counters_enabled():
+        return USAGE_COUNTERS[metric]([organization_id]).get(organization_id, 0)
+    key = usage_key(organization_id, metric)
+    usage = cache.get(key)
+    if usage is None:
+        usage = USAGE_COUNTERS[metric]([organization_id]).get(organization_id, 0)
+        # add() keeps a counter created concurrently by another process
+        cache.add(key, usage, ORGANIZATION_USAGE_TIMEOUT)
+    return usage
+
+
+def adjust_usage(metric, deltas):
+    """
+    Apply usage deltas to cached counters when the current transaction
+    commits (immediately outside of one), so rolled back changes are not
+    counted and readers never see uncommitted usage.
+
+    Missing counters are left missing: they are rebuilt from the database on
+    the next read, which avoids creating counters from a partial delta.
+
+    Args:
+        metric: MEMBERS or STORAGE
+        deltas: Mapping of organization ID to the change in usage
+    """
+    if not counters_enabled():
+        return
+    deltas = {organization_id: delta for organization_id, delta in deltas.items() if delta and organization_id}
+    if deltas:
+        transaction.on_commit(lambda: _apply_usage(metric, deltas))
+
+
+def _apply_usage(metric, deltas):
+    for organization_id, delta in deltas.items():
+        key = usage_key(organization_id, metric)
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+
+
+def forget_usage(organization_id):
+    """Drop an organization's cached counters."""
+    cache.delete_many([usage_key(organization_id, metric) for metric in USAGE_COUNTERS])
+
+
+def quota_limit(organization, metric):
+    """Return an organization's limit for a metric, in members or bytes."""
+    if metric == MEMBERS:
+        return organization.max_users
+    return organization.max_storage * 1024 ** 3
+
+
+def check_quota(organization, metric, amount=1):
+    """
+    Check that an organization can take ``amount`` more members or bytes,
+    e.g. to reject a request early; the usage is not held (see
+    ``reserve_quota``).
+
+    Raises:
+        QuotaExceeded: If the usage would go over the organization's limit
+    """
+    if amount <= 0:
+        return
+    limit = quota_limit(organization, metric)
+    usage = get_usage(organization.pk, metric)
+    if usage + amount > limit:
+        raise QuotaExceeded(organization, metric, limit, usage, amount)
+
+
+def reserve_quota(organization, metric, amount=1):
+    """
+    Check that an organization can take ``amount`` more members or bytes
+    and hold the organization until the current transaction ends.
+
+    Must be called inside ``transaction.atomic()`` together with the writes
+    that add the usage: the organization row is locked and usage counted in
+    the database, so a concurrent reservation waits for those writes to
+    commit and counts them.
+
+    Raises:
+        QuotaExceeded: If the usage would go over the organization's limit
+    """
+    if amount <= 0:
+        return
+    list(Organization.objects.select_for_update().filter(pk=organization.pk).values_list('pk'))
+    limit = quota_limit(organization, metric)
+    usage = USAGE_COUNTERS[metric]([organization.pk]).get(organization.pk, 0)
+    if usage + amount > limit:
+        raise QuotaExceeded(organization, metric, limit, usage, amount)
+
+
+def reconcile_usage(organization_ids=None):
+    """
+    Rewrite the cached counters of the given organizations (default: all)
+    from the database, with one grouped query per metric and chunk of
+    RECONCILE_CHUNK_SIZE organizations.
+
+    Returns:
+        int: Number of organizations reconciled (none without counters)
+    """
+    if not counters_enabled():
+        return 0
+    if organization_ids is None:
+        organization_ids = Organization.objects.values_list('id', flat=True).order_by('id')
+    organization_ids = list(organization_ids)
+    for start in range(0, len(organization_ids), RECONCILE_CHUNK_SIZE):
+        chunk = organization_ids[start:start + RECONCILE_CHUNK_SIZE]
+        members = count_members(chunk)
+        storage = measure_storage(chunk)
+        values = {}
+        for organization_id in chunk:
+            values[usage_key(organization_id, MEMBERS)] = members.get(organization_id, 0)
+            values[usage_key(organization_id, STORAGE)] = storage.get(organization_id, 0)
+        cache.set_many(values, ORGANIZATION_USAGE_TIMEOUT)
+    return len(organization_ids)
+
+
+def organization_usage(organization):
+    """Return an organization's usage and limits, e.g. for an API response."""
+    return {
+        metric: {'used': get_usage(organization.pk, metric), 'limit': quota_limit(organization, metric)}
+        for metric in (MEMBERS, STORAGE)
+    }
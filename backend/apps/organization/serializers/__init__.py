@@ -1,7 +1,8 @@
 from .member import (
     OrganizationMemberSerializer,
     OrganizationMemberCreateSerializer,
-    OrganizationMemberUpdateSerializer
+    OrganizationMemberUpdateSerializer,
+    MemberInvitationJobSerializer
 )
 from .organization import (
     OrganizationSerializer,
@@ -21,6 +22,7 @@ __all__ = [
     'OrganizationMemberSerializer',
     'OrganizationMemberCreateSerializer',
     'OrganizationMemberUpdateSerializer',
+    'MemberInvitationJobSerializer',
     
     # Organization serializers
     'OrganizationSerializer',
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from apps.organization.models import OrganizationMember, OrganizationRoleChoices
+from apps.organization.models import MemberInvitationJob, OrganizationMember, OrganizationRoleChoices
 from apps.users.serializers import UserSerializer
 
 class OrganizationMemberSerializer(serializers.ModelSerializer):
@@ -57,3 +57,14 @@ class OrganizationMemberUpdateSerializer(serializers.ModelSerializer):
         if value not in dict(OrganizationRoleChoices.choices):
             raise serializers.ValidationError("Invalid role")
         return value
+
+
+class MemberInvitationJobSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a bulk member invitation"""
+    class Meta:
+        model = MemberInvitationJob
+        fields = [
+            'id', 'organization', 'status', 'total', 'processed', 'invited', 'added', 'failed',
+            'errors', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
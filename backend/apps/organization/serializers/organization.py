@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 from apps.organization.models import Organization, OrganizationMember, OrganizationSubscription
+from apps.organization.quotas import MEMBERS, STORAGE, QuotaExceeded, check_quota, file_size, get_usage
 from apps.users.serializers import UserSerializer
 from .subscription import OrganizationSubscriptionSerializer
 
@@ -21,6 +22,16 @@ class OrganizationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def validate_logo(self, value):
+        """Check that a new logo fits in the organization's storage quota."""
+        if value and self.instance is not None:
+            current = self.instance.logo.name if self.instance.logo else ''
+            try:
+                check_quota(self.instance, STORAGE, value.size - file_size(current))
+            except QuotaExceeded as e:
+                raise serializers.ValidationError(str(e))
+        return value
+
 class OrganizationDetailSerializer(OrganizationSerializer):
     """
     Extended serializer for Organization with additional details
@@ -34,7 +45,7 @@ class OrganizationDetailSerializer(OrganizationSerializer):
         ]
     
     def get_member_count(self, obj):
-        return obj.members.filter(is_active=True).count()
+        return get_usage(obj.pk, MEMBERS)
     
     def get_admin_count(self, obj):
         from apps.organization.models import OrganizationRoleChoices
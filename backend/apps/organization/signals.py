@@ -1,14 +1,147 @@
-from django.db.models.signals import post_save
+from collections import Counter
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
-from .models import OrganizationMember, OrganizationRoleChoices
+from .models import Organization, OrganizationMember, OrganizationRoleChoices
+from .quotas import MEMBERS, STORAGE, adjust_usage, file_size, forget_usage
 from .tasks import send_admin_assignment_email
+from apps.notifications.outbox import enqueue_task
+from apps.users.models import User
 
 @receiver(post_save, sender=OrganizationMember)
 def notify_admin_assignment(sender, instance, created, **kwargs):
     # Only notify when a user is assigned as an admin
     if created and instance.role == OrganizationRoleChoices.ADMIN and instance.organization:
         # Send email notification asynchronously
-        send_admin_assignment_email.delay(
+        enqueue_task(
+            send_admin_assignment_email,
             user_id=instance.user.id,
             org_name=instance.organization.name
         )
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def _loaded_file_name(instance, field):
+    """Name of the file a model instance was loaded with; None if deferred."""
+    if field not in instance.__dict__:
+        return None
+    return _file_name(instance.__dict__[field])
+
+
+def member_picture_size(member):
+    """Size of the profile picture a membership counts against its organization."""
+    if OrganizationMember._meta.get_field('user').is_cached(member):
+        name = _file_name(member.user.profile_picture)
+    else:
+        name = User.objects.filter(pk=member.user_id).values_list('profile_picture', flat=True).first()
+    return file_size(name)
+
+
+@receiver(post_init, sender=OrganizationMember)
+def remember_member_quota_state(sender, instance, **kwargs):
+    """
+    Keep the organization and active flag a membership was loaded with, so
+    a save can tell how it moves the quota counters without a query
+    """
+    if 'organization_id' in instance.__dict__ and 'is_active' in instance.__dict__:
+        instance._quota_state = (instance.organization_id, instance.is_active)
+    else:
+        instance._quota_state = None
+
+
+@receiver(pre_save, sender=OrganizationMember)
+def load_member_quota_state(sender, instance, **kwargs):
+    """
+    Read the stored state of memberships loaded with deferred fields
+    """
+    if instance._quota_state is None and not instance._state.adding:
+        instance._quota_state = OrganizationMember.objects.filter(pk=instance.pk).values_list(
+            'organization_id', 'is_active'
+        ).first()
+
+
+@receiver(post_save, sender=OrganizationMember)
+def track_member_usage(sender, instance, created, **kwargs):
+    """
+    Count (de)activated and moved memberships, and their members' profile
+    pictures, in the organizations' quota counters
+    """
+    before = None if created else instance._quota_state
+    after = (instance.organization_id, instance.is_active)
+    instance._quota_state = after
+    if before == after:
+        return
+
+    deltas = Counter()
+    if before and before[1]:
+        deltas[before[0]] -= 1
+    if after[1]:
+        deltas[after[0]] += 1
+    adjust_usage(MEMBERS, deltas)
+    if any(deltas.values()):
+        size = member_picture_size(instance)
+        adjust_usage(STORAGE, {organization_id: delta * size for organization_id, delta in deltas.items()})
+
+
+@receiver(post_delete, sender=OrganizationMember)
+def release_member_usage(sender, instance, **kwargs):
+    """
+    Take a deleted active membership out of its organization's counters
+    """
+    if instance.is_active:
+        adjust_usage(MEMBERS, {instance.organization_id: -1})
+        adjust_usage(STORAGE, {instance.organization_id: -member_picture_size(instance)})
+
+
+@receiver(post_init, sender=Organization)
+def remember_organization_logo(sender, instance, **kwargs):
+    instance._quota_logo = _loaded_file_name(instance, 'logo')
+
+
+@receiver(post_save, sender=Organization)
+def track_logo_usage(sender, instance, created, **kwargs):
+    """
+    Count a replaced or removed logo in the organization's storage counter
+    """
+    if instance._quota_logo is None:
+        return
+    logo = _file_name(instance.logo)
+    if logo != instance._quota_logo:
+        adjust_usage(STORAGE, {instance.pk: file_size(logo) - file_size(instance._quota_logo)})
+        instance._quota_logo = logo
+
+
+@receiver(post_delete, sender=Organization)
+def release_organization_usage(sender, instance, **kwargs):
+    """
+    Drop the quota counters of a deleted organization
+    """
+    forget_usage(instance.pk)
+
+
+@receiver(post_init, sender=User)
+def remember_profile_picture(sender, instance, **kwargs):
+    instance._quota_profile_picture = _loaded_file_name(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=User)
+def track_profile_picture_usage(sender, instance, created, **kwargs):
+    """
+    Count a changed profile picture in the storage counters of the
+    organizations the user is an active member of
+    """
+    if instance._quota_profile_picture is None:
+        return
+    picture = _file_name(instance.profile_picture)
+    if created or picture == instance._quota_profile_picture:
+        instance._quota_profile_picture = picture
+        return
+    delta = file_size(picture) - file_size(instance._quota_profile_picture)
+    instance._quota_profile_picture = picture
+    if delta:
+        organization_ids = OrganizationMember.objects.filter(user=instance, is_active=True).values_list(
+            'organization_id', flat=True
+        )
+        adjust_usage(STORAGE, {organization_id: delta for organization_id in organization_ids})
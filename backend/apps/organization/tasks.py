@@ -2,11 +2,12 @@ import logging
 import os
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from django.core.mail import send_mail, EmailMultiAlternatives
+from celery.exceptions import Retry
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.core.cache import cache
+from apps.notifications.mailer import build_email, send_email, seconds_until_next_window
 
 # Set up logger
 logger = get_task_logger(__name__)
@@ -22,19 +23,25 @@ def get_site_name():
         cache.set('site_name', site_name, 60)  # Cache for 1 minute
     return site_name
 
-@shared_task
-def send_admin_assignment_email(user_id, org_name):
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_admin_assignment_email(self, user_id, org_name):
     from apps.users.models import User
     try:
         user = User.objects.get(id=user_id)
-        send_mail(
-            subject='Admin Assignment Notification',
-            message=f"You have been assigned as an admin to {org_name}. Please check your dashboard.",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email]
-        )
     except User.DoesNotExist:
-        pass
+        return
+    try:
+        sent = send_email(build_email(
+            subject='Admin Assignment Notification',
+            body=f"You have been assigned as an admin to {org_name}. Please check your dashboard.",
+            to=user.email
+        ))
+    except Exception as e:
+        logger.error(f"Error sending admin assignment email to user {user_id}: {str(e)}")
+        raise self.retry(exc=e)
+    if not sent:
+        # Mail rate limit reached for this minute
+        raise self.retry(countdown=seconds_until_next_window())
 
 @shared_task(name='apps.organization.tasks.send_organization_created_email', bind=True, max_retries=3, default_retry_delay=60)
 def send_organization_created_email(self, org_id, context=None):
@@ -47,7 +54,6 @@ def send_organization_created_email(self, org_id, context=None):
     """
     from .models import Organization
     from django.conf import settings
-    import smtplib
     
     # Use the module-level logger
     logger = logging.getLogger(__name__)
@@ -119,44 +125,28 @@ def send_organization_created_email(self, org_id, context=None):
             Please log in to your dashboard to get started.
             """
         
-        # Get email settings
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com')
+        # Send over the worker's pooled SMTP connection
         to_email = organization.email
-        
-        # Create email
-        msg = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=from_email,
-            to=[to_email],
-            reply_to=[getattr(settings, 'SUPPORT_EMAIL', 'support@example.com')]
-        )
-        msg.attach_alternative(html_content, "text/html")
-        
-        # Test SMTP connection first
-        try:
-            with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=10) as server:
-                server.ehlo()
-                if settings.EMAIL_USE_TLS:
-                    server.starttls()
-                    logger.info("TLS connection established")
-                if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
-                    server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
-                    logger.info("SMTP Authentication successful")
-                logger.info("SMTP Connection successful")
-        except Exception as e:
-            logger.error(f"SMTP Connection failed: {str(e)}")
-            raise
-        
-        # Send email
         try:
-            msg.send(fail_silently=False)
-            logger.info(f"Successfully sent organization creation email to {to_email}")
-            return True
+            sent = send_email(build_email(
+                subject=subject,
+                body=text_content,
+                to=to_email,
+                html_message=html_content,
+                from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com'),
+                reply_to=getattr(settings, 'SUPPORT_EMAIL', 'support@example.com')
+            ))
         except Exception as e:
             logger.error(f"Error sending email to {to_email}: {str(e)}")
             raise self.retry(exc=e)
+        if not sent:
+            # Mail rate limit reached for this minute
+            raise self.retry(countdown=seconds_until_next_window())
+        logger.info(f"Successfully sent organization creation email to {to_email}")
+        return True
         
+    except Retry:
+        raise
     except Organization.DoesNotExist as e:
         error_msg = f"Organization with ID {org_id} does not exist: {str(e)}"
         logger.error(error_msg)
@@ -164,3 +154,27 @@ def send_organization_created_email(self, org_id, context=None):
     except Exception as e:
         logger.error(f"Unexpected error in send_organization_created_email: {str(e)}", exc_info=True)
         raise self.retry(exc=e)
+
+
+@shared_task
+def reconcile_organization_usage():
+    """
+    Rewrite the cached organization quota counters from the database.
+    """
+    from .quotas import reconcile_usage
+
+    reconciled = reconcile_usage()
+    return f"Reconciled quota usage of {reconciled} organizations"
+
+
+@shared_task
+def process_member_invitations(job_id):
+    """
+    Invite the people listed in a MemberInvitationJob.
+    """
+    from .invitations import run_member_invitations
+
+    job = run_member_invitations(job_id)
+    if job is None:
+        return f"Member invitation job {job_id} is not queued"
+    return f"Member invitation job {job_id} {job.status}: {job.invited} invited, {job.added} added, {job.failed} failed"
@@ -0,0 +1,214 @@
+"""
+Tests for bulk member invitations.
+"""
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.notifications.models import OutboxMessage
+from apps.organization.invitations import MemberInviter, hash_passwords, read_invitations
+from apps.organization.models import MemberInvitationJob, Organization, OrganizationMember, OrganizationRoleChoices
+from apps.organization.quotas import MEMBERS, get_usage
+from apps.organization.tasks import process_member_invitations
+from apps.users.models import UserProfile
+
+User = get_user_model()
+
+FAST_HASHER = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, PASSWORD_HASHERS=FAST_HASHER)
+class MemberInviterTests(TestCase):
+    """Test validating and writing invitation batches."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+        self.organization = Organization.objects.create(name='Invite Org', max_users=100)
+        self.existing = User.objects.create_user(email='existing@example.com')
+        member = User.objects.create_user(email='member@example.com')
+        OrganizationMember.objects.create(user=member, organization=self.organization)
+
+    def _rows(self, *entries):
+        return read_invitations(entries=list(entries))
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_batch_creates_users_and_memberships_in_bulk(self, queue_emails):
+        """New and existing users are written with a fixed number of queries."""
+        rows = self._rows(
+            *(f'new{index}@example.com' for index in range(20)),
+            {'email': 'Existing@example.com', 'role': 'project-manager'},
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            report = MemberInviter(self.organization).run(rows)
+
+        self.assertEqual((report['invited'], report['added'], report['failed']), (20, 1, 0))
+        self.assertLess(len(queries), 15)
+        self.assertEqual(OrganizationMember.objects.filter(organization=self.organization).count(), 22)
+        self.assertEqual(
+            OrganizationMember.objects.get(user=self.existing).role, OrganizationRoleChoices.PROJECT_MANAGER
+        )
+        profile = UserProfile.objects.get(user__email='new0@example.com')
+        self.assertTrue(profile.password_change_required)
+        self.assertEqual(len(profile.otp), 6)
+        self.assertEqual(len(queue_emails.call_args.args[0]), 21)
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 22)
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_new_users_are_sent_a_set_password_link(self, queue_emails):
+        """Welcome emails carry a set-password token instead of the generated password."""
+        with patch.object(type(User.objects), 'make_random_password', lambda manager, length: 'Generated-123'):
+            MemberInviter(self.organization).run(self._rows('fresh@example.com'))
+
+        payload = queue_emails.call_args.args[0][0]
+        user = User.objects.get(email='fresh@example.com')
+        token = payload['body'].split('token=')[1].split()[0]
+        self.assertTrue(default_token_generator.check_token(user, token))
+        self.assertIn('/reset-password/?uid=', payload['html_message'])
+        self.assertNotIn('Generated-123', f"{payload['body']}{payload['html_message']}")
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_invalid_and_duplicate_rows_are_reported(self, queue_emails):
+        """Rejected rows are listed with their line numbers."""
+        rows = self._rows('a@example.com', 'A@example.com', 'not-an-email', 'member@example.com',
+                          {'email': 'b@example.com', 'role': 'owner'})
+
+        report = MemberInviter(self.organization).run(rows)
+
+        self.assertEqual((report['invited'], report['failed']), (1, 4))
+        errors = {error['line']: error['error'] for error in report['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5])
+        self.assertIn('Already a member', errors[4])
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_existing_users_are_matched_case_insensitively(self, queue_emails):
+        """An invitation for an existing user in different case adds that user."""
+        john = User.objects.create_user(email='John.Smith@example.com')
+
+        report = MemberInviter(self.organization).run(self._rows('john.smith@EXAMPLE.com', 'New.Person@example.com'))
+
+        self.assertEqual((report['invited'], report['added']), (1, 1))
+        self.assertTrue(OrganizationMember.objects.filter(user=john, organization=self.organization).exists())
+        self.assertEqual(User.objects.filter(email__iexact='john.smith@example.com').count(), 1)
+        self.assertTrue(User.objects.filter(email='New.Person@example.com').exists())
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_batch_over_the_member_quota_is_rejected(self, queue_emails):
+        """No user is created for a batch that does not fit the quota."""
+        self.organization.max_users = 2
+        self.organization.save()
+
+        report = MemberInviter(self.organization).run(self._rows('x@example.com', 'y@example.com'))
+
+        self.assertEqual((report['invited'], report['failed']), (0, 2))
+        self.assertFalse(User.objects.filter(email='x@example.com').exists())
+        queue_emails.assert_not_called()
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_usernames_do_not_collide(self, queue_emails):
+        """Emails with the same local part get distinct usernames."""
+        MemberInviter(self.organization).run(self._rows('existing@other.com', 'existing@third.com'))
+
+        usernames = list(User.objects.filter(username__startswith='existing').values_list('username', flat=True))
+        self.assertEqual(len(usernames), 3)
+        self.assertEqual(len(set(usernames)), 3)
+
+    @patch('apps.organization.invitations.queue_emails')
+    def test_username_taken_concurrently_is_allocated_again(self, queue_emails):
+        """A username conflict is retried instead of being reported as a duplicate email."""
+        User.objects.create_user(username='taken', email='taken@example.com')
+
+        with patch.object(type(User.objects), 'allocate_usernames', lambda manager, bases: ['taken']):
+            report = MemberInviter(self.organization).run(self._rows('newbie@example.com'))
+
+        self.assertEqual((report['invited'], report['failed']), (1, 0))
+        self.assertEqual(User.objects.get(email='newbie@example.com').username, 'newbie')
+
+    def test_passwords_are_hashed_in_a_pool(self):
+        """Pooled hashing returns one usable hash per password, in order."""
+        from django.contrib.auth.hashers import check_password
+
+        passwords = [f'password-{index}' for index in range(40)]
+        with patch('apps.organization.invitations.multiprocessing.current_process') as current_process:
+            current_process.return_value.daemon = True
+            hashes = hash_passwords(passwords)
+
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords, hashes)))
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, PASSWORD_HASHERS=FAST_HASHER)
+class BulkInviteApiTests(APITestCase):
+    """Test the bulk invitation endpoints."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+        self.organization = Organization.objects.create(name='Bulk Org', max_users=10)
+        self.admin = User.objects.create_user(email='admin@example.com')
+        OrganizationMember.objects.create(
+            user=self.admin, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('organization:organization-bulk-invite', args=[self.organization.id])
+
+    def _run_queued_job(self):
+        message = OutboxMessage.objects.get(task_name=process_member_invitations.name)
+        process_member_invitations(*message.args)
+
+    @patch('apps.notifications.tasks.send_email_batch.delay')
+    def test_csv_upload_is_processed_by_a_job(self, send_email_batch):
+        """The upload is queued, invited by the job and its progress exposed."""
+        upload = SimpleUploadedFile(
+            'people.csv',
+            b'email,role,first_name,last_name\none@example.com,developer,One,Person\ntwo@example.com,,,\n',
+            content_type='text/csv'
+        )
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual((response.data['status'], response.data['total']), ('queued', 2))
+        self._run_queued_job()
+        send_email_batch.assert_called_once()
+
+        response = self.client.get(reverse(
+            'organization:organization-bulk-invite-status', args=[self.organization.id, response.data['id']]
+        ))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual((response.data['processed'], response.data['invited']), (2, 2))
+        self.assertEqual(User.objects.get(email='one@example.com').first_name, 'One')
+
+    def test_list_over_the_member_quota_is_rejected_upfront(self):
+        """A list that cannot fit is not queued."""
+        response = self.client.post(
+            self.url, {'invitations': [f'user{index}@example.com' for index in range(10)]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(MemberInvitationJob.objects.exists())
+
+    def test_admins_of_other_organizations_are_forbidden(self):
+        """Only the organization's own admins can invite in bulk."""
+        other = Organization.objects.create(name='Other Org')
+
+        response = self.client.post(
+            reverse('organization:organization-bulk-invite', args=[other.id]),
+            {'invitations': ['someone@example.com']}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,87 @@
+"""
+Tests for the role-grouped organization member directory.
+"""
+from django.urls import reverse
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+
+User = get_user_model()
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class MemberDirectoryTests(APITestCase):
+    """Test the member directory endpoint."""
+
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Directory Org')
+        self.superuser = User.objects.create_user(
+            email='root@example.com', is_superuser=True, is_staff=True
+        )
+        self.url = reverse(
+            'organization:organization-member-directory',
+            kwargs={'pk': str(self.organization.id)}
+        )
+
+    def _add_members(self, role, count, prefix):
+        for index in range(count):
+            user = User.objects.create_user(
+                email=f'{prefix}{index}@example.com',
+                first_name=prefix.title(),
+                last_name=str(index),
+            )
+            OrganizationMember.objects.create(user=user, organization=self.organization, role=role)
+
+    def test_groups_members_by_role_with_counts(self):
+        """Members are grouped by role and every role reports its count."""
+        self._add_members(OrganizationRoleChoices.DEVELOPER, 3, 'dev')
+        self._add_members(OrganizationRoleChoices.SUPPORT, 1, 'support')
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        roles = response.data['roles']
+        self.assertEqual(set(roles), set(OrganizationRoleChoices.values))
+        self.assertEqual(roles['developer']['count'], 3)
+        self.assertEqual(len(roles['developer']['results']), 3)
+        self.assertEqual(roles['support']['count'], 1)
+        self.assertEqual(roles['verifier']['count'], 0)
+        self.assertEqual(roles['verifier']['results'], [])
+
+    def test_paginates_each_role_independently(self):
+        """page/page_size slice every role group without affecting the counts."""
+        self._add_members(OrganizationRoleChoices.DEVELOPER, 5, 'dev')
+        self._add_members(OrganizationRoleChoices.SUPPORT, 2, 'support')
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.get(self.url, {'page': 2, 'page_size': 2})
+
+        roles = response.data['roles']
+        self.assertEqual(roles['developer']['count'], 5)
+        self.assertEqual(roles['developer']['num_pages'], 3)
+        self.assertEqual(len(roles['developer']['results']), 2)
+        self.assertEqual(roles['support']['results'], [])
+
+    def test_search_and_role_filter(self):
+        """Search narrows the counts and rows; role restricts the groups returned."""
+        self._add_members(OrganizationRoleChoices.DEVELOPER, 2, 'dev')
+        self._add_members(OrganizationRoleChoices.DEVELOPER, 2, 'ops')
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.get(self.url, {'role': 'developer', 'q': 'ops'})
+
+        self.assertEqual(list(response.data['roles']), ['developer'])
+        self.assertEqual(response.data['roles']['developer']['count'], 2)
+        emails = {row['email'] for row in response.data['roles']['developer']['results']}
+        self.assertEqual(emails, {'ops0@example.com', 'ops1@example.com'})
+
+    def test_invalid_role(self):
+        """An unknown role is rejected."""
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.get(self.url, {'role': 'owner'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,176 @@
+"""
+Tests for organization quotas and their cached usage counters.
+"""
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+from apps.organization.quotas import (
+    MEMBERS, STORAGE, QuotaExceeded, check_quota, get_usage, reconcile_usage, reserve_quota, usage_key,
+)
+from apps.organization.serializers import OrganizationSerializer
+
+User = get_user_model()
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, QUOTA_USAGE_COUNTERS=True)
+class OrganizationQuotaTests(TestCase):
+    """Test the usage counters and quota checks."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+
+        self.organization = Organization.objects.create(name='Quota Org', max_users=2)
+
+    def _member(self, email, **kwargs):
+        user = User.objects.create_user(email=email)
+        with self.captureOnCommitCallbacks(execute=True):
+            return OrganizationMember.objects.create(user=user, organization=self.organization, **kwargs)
+
+    def _save(self, instance):
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+
+    def test_member_counter_follows_memberships(self):
+        """Joins, deactivations and deletions adjust the cached counter."""
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 0)
+        first = self._member('first@example.com')
+        second = self._member('second@example.com')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_usage(self.organization.id, MEMBERS), 2)
+            with self.assertRaises(QuotaExceeded):
+                check_quota(self.organization, MEMBERS)
+
+        first.is_active = False
+        self._save(first)
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 0)
+
+    def test_storage_counter_follows_logo_and_profile_pictures(self):
+        """Logos and the pictures of active members count against storage."""
+        self.organization.logo = SimpleUploadedFile('logo.png', b'x' * 100)
+        self._save(self.organization)
+        member = self._member('pic@example.com')
+        self.assertEqual(get_usage(self.organization.id, STORAGE), 100)
+
+        member.user.profile_picture = SimpleUploadedFile('me.png', b'y' * 40)
+        self._save(member.user)
+        self.assertEqual(get_usage(self.organization.id, STORAGE), 140)
+
+        member.is_active = False
+        self._save(member)
+        self.assertEqual(get_usage(self.organization.id, STORAGE), 100)
+
+    def test_rolled_back_changes_are_not_counted(self):
+        """Counters only move once the change commits."""
+        self._member('kept@example.com')
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 1)
+
+        user = User.objects.create_user(email='undone@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                OrganizationMember.objects.create(user=user, organization=self.organization)
+                raise RuntimeError
+
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 1)
+
+    def test_reservations_count_in_the_database(self):
+        """A stale counter does not let a write take a seat that is gone."""
+        self._member('a@example.com')
+        self._member('b@example.com')
+        cache.set(usage_key(self.organization.id, MEMBERS), 0)
+
+        check_quota(self.organization, MEMBERS)
+        with self.assertRaises(QuotaExceeded), transaction.atomic():
+            reserve_quota(self.organization, MEMBERS)
+
+    @override_settings(QUOTA_USAGE_COUNTERS=False)
+    def test_usage_is_counted_without_a_shared_cache(self):
+        """Without counters usage is read from the database, not a per-process cache."""
+        self._member('a@example.com')
+        cache.set(usage_key(self.organization.id, MEMBERS), 5)
+
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 1)
+        self.assertEqual(reconcile_usage(), 0)
+
+    def test_reconcile_corrects_drift(self):
+        """Bulk writes send no signals; reconciling rewrites the counters."""
+        self._member('a@example.com')
+        self._member('b@example.com')
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 2)
+        OrganizationMember.objects.filter(organization=self.organization).update(is_active=False)
+
+        self.assertEqual(reconcile_usage(), 1)
+
+        self.assertEqual(get_usage(self.organization.id, MEMBERS), 0)
+
+    def test_logo_upload_is_checked_against_the_storage_quota(self):
+        """A logo larger than the remaining storage is rejected."""
+        self.organization.max_storage = 0
+        serializer = OrganizationSerializer(
+            self.organization, data={'logo': SimpleUploadedFile('logo.png', b'x' * 10)}, partial=True
+        )
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('logo', serializer.errors)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, QUOTA_USAGE_COUNTERS=True)
+class OrganizationQuotaApiTests(APITestCase):
+    """Test quota enforcement in the member endpoints."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+        self.organization = Organization.objects.create(name='Full Org', max_users=1)
+        self.admin = User.objects.create_user(email='admin@example.com')
+        OrganizationMember.objects.create(
+            user=self.admin, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_invite_is_rejected_when_the_organization_is_full(self):
+        """No user or membership is created over the member quota."""
+        response = self.client.post(
+            reverse('organization:organization-invite-member', args=[self.organization.id]),
+            {'email': 'new@example.com', 'role': 'developer'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limit of 1 active members', response.data['error'])
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+    def test_member_count_reads_the_counter(self):
+        """The member count endpoint does not count members."""
+        url = reverse('organization:organization-member-count', args=[self.organization.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual((response.data['member_count'], response.data['max_users']), (1, 1))
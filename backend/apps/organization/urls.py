@@ -49,6 +49,12 @@ urlpatterns = [
     path('organizations/<uuid:pk>/invite/', 
          OrganizationMemberViewSet.as_view({'post': 'invite_member'}),
          name='organization-invite-member'),
+    path('organizations/<uuid:pk>/invite/bulk/',
+         OrganizationMemberViewSet.as_view({'post': 'bulk_invite'}),
+         name='organization-bulk-invite'),
+    path('organizations/<uuid:pk>/invite/bulk/<uuid:job_id>/',
+         OrganizationMemberViewSet.as_view({'get': 'bulk_invite_status'}),
+         name='organization-bulk-invite-status'),
     path('organizations/<uuid:organization_id>/members/<uuid:pk>/', 
          OrganizationMemberViewSet.as_view({
              'get': 'retrieve',
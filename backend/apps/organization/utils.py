@@ -113,3 +113,89 @@ def get_organization_members(organization, role=None, is_active=True):
         
     OrganizationMember = get_organization_member_model()
     return OrganizationMember.objects.filter(**filters).select_related('user')
+
+def get_member_directory(organization, search=None, role=None, page=1, page_size=20):
+    """
+    Build a role-grouped, per-role paginated directory of active organization members.
+
+    Per-role counts come from a single conditional aggregate and the requested
+    page of every role is fetched in one query using a ROW_NUMBER() window
+    partitioned by role, so the cost does not grow with the number of roles
+    or the size of the organization.
+
+    Args:
+        organization: The organization object or ID
+        search: Optional text matched against username, email and names
+        role: Optional role to restrict the directory to
+        page: 1-based page number applied to every role group
+        page_size: Number of members returned per role group
+
+    Returns:
+        dict: Total count and a mapping of role -> {label, count, num_pages, results}
+    """
+    from django.db.models import Count, F, Q, Window
+    from django.db.models.functions import RowNumber
+
+    OrganizationMember = get_organization_member_model()
+    role_choices = get_organization_role_choices()
+
+    members = OrganizationMember.objects.filter(organization=organization, is_active=True)
+    if search:
+        members = members.filter(
+            Q(user__username__icontains=search) |
+            Q(user__email__icontains=search) |
+            Q(user__first_name__icontains=search) |
+            Q(user__last_name__icontains=search)
+        )
+
+    roles = [role] if role else list(role_choices.values)
+    if role:
+        members = members.filter(role=role)
+
+    counts = members.aggregate(**{
+        role_key: Count('id', filter=Q(role=role_key)) for role_key in roles
+    })
+
+    offset = (page - 1) * page_size
+    rows = members.select_related('user').only(
+        'id', 'role', 'created_at',
+        'user__id', 'user__username', 'user__email', 'user__first_name', 'user__last_name',
+    ).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('role')],
+            order_by=[F('created_at').desc(), F('id').asc()],
+        )
+    ).filter(
+        row_number__gt=offset,
+        row_number__lte=offset + page_size,
+    ).order_by('role', 'row_number')
+
+    grouped = {role_key: [] for role_key in roles}
+    for member in rows:
+        user = member.user
+        grouped[member.role].append({
+            'id': str(user.id),
+            'member_id': str(member.id),
+            'username': user.username,
+            'email': user.email,
+            'name': f"{user.first_name or ''} {user.last_name or ''}".strip() or user.email.split('@')[0],
+            'role': member.role,
+            'joined_date': member.created_at.strftime('%Y-%m-%d'),
+        })
+
+    labels = dict(role_choices.choices)
+    return {
+        'count': sum(counts.values()),
+        'page': page,
+        'page_size': page_size,
+        'roles': {
+            role_key: {
+                'label': str(labels[role_key]),
+                'count': counts[role_key],
+                'num_pages': -(-counts[role_key] // page_size),
+                'results': grouped[role_key],
+            }
+            for role_key in roles
+        },
+    }
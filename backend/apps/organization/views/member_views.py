@@ -1,3 +1,4 @@
+import csv
 import random
 import string
 import logging
@@ -31,13 +32,18 @@ from django.conf import settings
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
-from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+from apps.notifications.outbox import enqueue_task
+from apps.organization.invitations import read_invitations
+from apps.organization.models import MemberInvitationJob, Organization, OrganizationMember, OrganizationRoleChoices
 from apps.organization.serializers import (
     OrganizationMemberSerializer,
     OrganizationMemberCreateSerializer,
     OrganizationMemberUpdateSerializer,
+    MemberInvitationJobSerializer,
     DeveloperSerializer
 )
+from apps.organization.quotas import MEMBERS, QuotaExceeded, check_quota, get_usage, reserve_quota
+from apps.organization.tasks import process_member_invitations
 from apps.users.permissions import IsSuperAdmin, IsOrganizationAdmin
 
 def generate_random_password(length=12):
@@ -130,16 +136,12 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
             # Get the organization using the pk from the URL
             organization = get_object_or_404(Organization, id=pk)
             
-            # Count active members in the organization
-            count = OrganizationMember.objects.filter(
-                organization=organization,
-                is_active=True
-            ).count()
-            
+            # Active members are read from the organization's quota counter
             return Response({
                 'organization_id': str(organization.id),
                 'organization_name': organization.name,
-                'member_count': count
+                'member_count': get_usage(organization.id, MEMBERS),
+                'max_users': organization.max_users
             })
             
         except (ValueError, Organization.DoesNotExist):
@@ -271,13 +273,19 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Add existing user to organization
-                member = OrganizationMember.objects.create(
-                    user=user,
-                    organization=organization,
-                    role=role,
-                    is_active=True
-                )
+                with transaction.atomic():
+                    try:
+                        reserve_quota(organization, MEMBERS)
+                    except QuotaExceeded as e:
+                        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+                    # Add existing user to organization
+                    member = OrganizationMember.objects.create(
+                        user=user,
+                        organization=organization,
+                        role=role,
+                        is_active=True
+                    )
                 print(f"Added existing user to organization: {member.id}")
                 
                 # Generate token and UID for password reset
@@ -326,41 +334,47 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_201_CREATED
                 )
             
-            # Generate a random password for new users
-            password = User.objects.make_random_password(length=12)
-            username = email.split('@')[0]
-            
-            # Create user with a flag to change password on first login
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password,
-                is_active=True
-            )
-            
-            # Create user profile if it doesn't exist
-            from apps.users.models import UserProfile
-            profile, created = UserProfile.objects.get_or_create(user=user)
-            
-            # Generate OTP for the user
-            otp = profile.generate_otp()
-            
-            # Log the OTP for development (remove in production)
-            print(f"Generated OTP for {email}: {otp}")
-            print(f"Generated password for {email}: {password}")
-            
-            # Set password change required flag
-            profile.password_change_required = True
-            profile.save()
-            print(f"Successfully created user: {user.id} - {user.email}")
-            
-            # Add user to organization
-            member = OrganizationMember.objects.create(
-                user=user,
-                organization=organization,
-                role=role,
-                is_active=True
-            )
+            with transaction.atomic():
+                try:
+                    reserve_quota(organization, MEMBERS)
+                except QuotaExceeded as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+                # Generate a random password for new users
+                password = User.objects.make_random_password(length=12)
+                username = email.split('@')[0]
+
+                # Create user with a flag to change password on first login
+                user = User.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password,
+                    is_active=True
+                )
+
+                # Create user profile if it doesn't exist
+                from apps.users.models import UserProfile
+                profile, created = UserProfile.objects.get_or_create(user=user)
+
+                # Generate OTP for the user
+                otp = profile.generate_otp()
+
+                # Log the OTP for development (remove in production)
+                print(f"Generated OTP for {email}: {otp}")
+                print(f"Generated password for {email}: {password}")
+
+                # Set password change required flag
+                profile.password_change_required = True
+                profile.save()
+                print(f"Successfully created user: {user.id} - {user.email}")
+
+                # Add user to organization
+                member = OrganizationMember.objects.create(
+                    user=user,
+                    organization=organization,
+                    role=role,
+                    is_active=True
+                )
             
             # Send welcome email with credentials
             try:
@@ -452,7 +466,68 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
             }, 
             status=status.HTTP_201_CREATED
         )
-        
+
+    def _can_invite(self, request, organization):
+        """Superusers and the organization's active admins can invite members."""
+        return request.user.is_superuser or request.user.role == 'superadmin' or OrganizationMember.objects.filter(
+            user=request.user,
+            organization=organization,
+            role=OrganizationRoleChoices.ADMIN,
+            is_active=True
+        ).exists()
+
+    @action(detail=True, methods=['post'], url_path='invite/bulk',
+            permission_classes=[IsSuperAdmin | IsOrganizationAdmin])
+    def bulk_invite(self, request, pk=None):
+        """
+        Invite many people to the organization at once.
+
+        Send either a CSV file as ``file`` (header row: email, role,
+        first_name, last_name; only email is required) or a JSON list as
+        ``invitations`` (emails or objects with the same keys). The list is
+        processed by a background job whose progress is read from
+        invite/bulk/<job_id>/.
+        """
+        organization = get_object_or_404(Organization, id=pk)
+        if not self._can_invite(request, organization):
+            return Response(
+                {'error': 'Only organization admins can invite members'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            rows = read_invitations(upload=request.FILES.get('file'), entries=request.data.get('invitations'))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Reject lists that cannot fit at all before queueing them
+            check_quota(organization, MEMBERS, len({row['email'].lower() for row in rows}))
+        except QuotaExceeded as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = MemberInvitationJob.objects.create(
+            organization=organization,
+            created_by=request.user,
+            invitations=rows,
+            total=len(rows),
+        )
+        enqueue_task(process_member_invitations, str(job.id))
+        return Response(MemberInvitationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path=r'invite/bulk/(?P<job_id>[0-9a-f-]{36})',
+            permission_classes=[IsSuperAdmin | IsOrganizationAdmin])
+    def bulk_invite_status(self, request, pk=None, job_id=None):
+        """Get the progress of a bulk member invitation"""
+        organization = get_object_or_404(Organization, id=pk)
+        if not self._can_invite(request, organization):
+            return Response(
+                {'error': 'Only organization admins can invite members'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        job = MemberInvitationJob.objects.filter(organization=organization, id=job_id).first()
+        if job is None:
+            return Response({'error': 'Invitation job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(MemberInvitationJobSerializer(job).data)
+
     def get_object(self):
         """
         Override to handle both 'pk' and 'member_id' URL parameters.
@@ -543,7 +618,8 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'invite_member']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'invite_member',
+                           'bulk_invite', 'bulk_invite_status']:
             permission_classes = [IsSuperAdmin | IsOrganizationAdmin]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -581,8 +657,14 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError({
                 'user': 'This user is already a member of this organization.'
             })
-            
-        serializer.save(organization=organization)
+        with transaction.atomic():
+            if serializer.validated_data.get('is_active', True):
+                try:
+                    reserve_quota(organization, MEMBERS)
+                except QuotaExceeded as e:
+                    raise serializers.ValidationError({'organization': [str(e)]})
+
+            serializer.save(organization=organization)
         
     def update(self, request, *args, **kwargs):
         try:
@@ -592,7 +674,10 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
             data = {key: request.data.get(key) for key in ['role', 'is_active'] if key in request.data}
             serializer = self.get_serializer(instance, data=data, partial=True)
             serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
+            with transaction.atomic():
+                if serializer.validated_data.get('is_active') and not instance.is_active:
+                    reserve_quota(instance.organization, MEMBERS)
+                self.perform_update(serializer)
             
             # Only try to invalidate tokens if role changed and token blacklist is available
             if 'role' in request.data and request.data['role'] != old_role and OutstandingToken is not None:
@@ -634,6 +719,12 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
     def activate(self, request, pk=None):
         """Activate a deactivated organization member."""
         member = self.get_object()
-        member.is_active = True
-        member.save()
+        with transaction.atomic():
+            if not member.is_active:
+                try:
+                    reserve_quota(member.organization, MEMBERS)
+                except QuotaExceeded as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            member.is_active = True
+            member.save()
         return Response({'status': 'member activated'})
\ No newline at end of file
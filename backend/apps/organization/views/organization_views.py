@@ -20,6 +20,8 @@ from apps.organization.serializers import (
     OrganizationMemberCreateSerializer
 )
 from apps.organization.permissions import IsOrganizationAdmin
+from apps.organization.quotas import MEMBERS, QuotaExceeded, organization_usage, reserve_quota
+from apps.organization.utils import get_member_directory
 from apps.users.permissions import IsSuperAdmin
 
 
@@ -198,7 +200,53 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             
         serializer = OrganizationMemberSerializer(members, many=True)
         return Response(serializer.data)
-        
+
+    @action(detail=True, methods=['get'])
+    def usage(self, request, pk=None):
+        """
+        Get the organization's active members and storage bytes against its quotas.
+        """
+        return Response(organization_usage(self.get_object()))
+
+    @action(detail=True, methods=['get'], url_path='member-directory')
+    def member_directory(self, request, pk=None):
+        """
+        List active members grouped by role, with per-role counts and pagination.
+
+        Query params:
+            role: restrict the directory to a single role
+            q: match against username, email, first or last name
+               (``search`` is already consumed by the organization filters)
+            page: page number applied to each role group (default 1)
+            page_size: members per role group (default 20, max 100)
+        """
+        organization = self.get_object()
+
+        role = request.query_params.get('role') or None
+        if role and role not in OrganizationRoleChoices.values:
+            return Response(
+                {'role': [f'Invalid role. Must be one of: {", ".join(OrganizationRoleChoices.values)}']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+        except (TypeError, ValueError):
+            return Response(
+                {'detail': 'page and page_size must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        directory = get_member_directory(
+            organization,
+            search=request.query_params.get('q') or None,
+            role=role,
+            page=page,
+            page_size=page_size,
+        )
+        return Response(directory)
+
     @action(detail=True, methods=['post'])
     def add_member(self, request, org_id=None):
         """
@@ -218,9 +266,14 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                 {'detail': 'User is already a member of this organization.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Create the organization membership
-        serializer.save(organization=organization)
+        with transaction.atomic():
+            try:
+                reserve_quota(organization, MEMBERS)
+            except QuotaExceeded as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Create the organization membership
+            serializer.save(organization=organization)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'])
@@ -262,14 +315,19 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                 {'detail': 'You are already a member of this organization.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Create organization membership with default USER role
-        member = OrganizationMember.objects.create(
-            user=user,
-            organization=organization,
-            role=OrganizationRoleChoices.USER,
-            is_active=True
-        )
+        with transaction.atomic():
+            try:
+                reserve_quota(organization, MEMBERS)
+            except QuotaExceeded as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Create organization membership with default USER role
+            member = OrganizationMember.objects.create(
+                user=user,
+                organization=organization,
+                role=OrganizationRoleChoices.USER,
+                is_active=True
+            )
         
         serializer = OrganizationMemberSerializer(member)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
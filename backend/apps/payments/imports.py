@@ -0,0 +1,325 @@
+"""
+Bulk payment import from CSV or NDJSON files.
+
+Files are streamed line by line and handled in batches: rows are
+validated with PaymentImportRowSerializer, then clients, projects and
+organizations of the whole batch are resolved with one ``in_bulk``
+lookup each, and the valid payments are written with one ``bulk_create``
+inside a savepoint. The transition hooks (history, ledger, statistics)
+run once per batch. Invalid rows are reported with their line number and
+do not stop the import.
+
+Small uploads are imported in the request; larger ones are stored as a
+PaymentImport and run by the ``import_payments_file`` Celery task, which
+records progress after every batch.
+"""
+import codecs
+import csv
+import json
+import logging
+import uuid
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.clients.models import Client
+from apps.organization.models import Organization
+from apps.projects.models import Project
+from .models import Payment, PaymentImport, PaymentTransition
+from .serializers import PaymentImportRowSerializer
+from .transitions import run_transition_hooks, stamp_transition
+
+logger = logging.getLogger(__name__)
+
+# Rows validated and written together
+PAYMENT_IMPORT_BATCH_SIZE = 500
+# Per-row errors kept in an import report
+PAYMENT_IMPORT_MAX_ERRORS = 1000
+# Uploads up to this size are imported in the request, larger ones by a Celery job
+PAYMENT_IMPORT_SYNC_MAX_BYTES = 256 * 1024
+
+PAYMENT_IMPORT_NOTE = 'Imported'
+
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+def detect_format(filename):
+    """Return the import format of a file name's extension, or None."""
+    for extension, file_format in FORMAT_EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def read_rows(stream, file_format):
+    """
+    Stream the records of an import file.
+
+    Args:
+        stream: Binary file object, iterated line by line
+        file_format: 'csv' (with a header row) or 'ndjson'
+
+    Yields:
+        tuple: ``(line, record)``; ``record`` is a dict of the non-empty
+        fields, or a string describing why the line could not be parsed
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }
+        return
+
+    for line, text in enumerate(lines, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line, "Expected a JSON object."
+            continue
+        yield line, {key: value for key, value in record.items() if value not in (None, '')}
+
+
+def _error_messages(errors):
+    """Plain field -> messages dict of serializer errors."""
+    return {field: [str(message) for message in messages] for field, messages in errors.items()}
+
+
+class PaymentImporter:
+    """
+    Import payment records in batches and collect a report.
+
+    Args:
+        organization_id: Restrict clients, projects and organizations to
+            this organization (None for staff imports)
+        actor: User recorded in the payments' transition history
+        batch_size: Rows validated and written together
+    """
+
+    def __init__(self, organization_id=None, actor=None, batch_size=PAYMENT_IMPORT_BATCH_SIZE):
+        self.organization_id = uuid.UUID(str(organization_id)) if organization_id else None
+        self.actor = actor
+        self.batch_size = batch_size
+        self.report = {'processed': 0, 'imported': 0, 'failed': 0, 'errors': []}
+        # Projects and transaction IDs used by earlier rows of the file
+        self._seen_projects = set()
+        self._seen_transactions = set()
+
+    def run(self, rows, on_progress=None):
+        """
+        Import all rows.
+
+        Args:
+            rows: Iterable of ``(line, record)``, see ``read_rows``
+            on_progress: Called with the report after every batch
+
+        Returns:
+            dict: ``processed``, ``imported`` and ``failed`` row counts and
+            ``errors`` (``{'line': ..., 'errors': {field: [messages]}}``,
+            the first PAYMENT_IMPORT_MAX_ERRORS)
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                if on_progress:
+                    on_progress(self.report)
+        if batch:
+            self.import_batch(batch)
+            if on_progress:
+                on_progress(self.report)
+        return self.report
+
+    def _fail(self, line, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < PAYMENT_IMPORT_MAX_ERRORS:
+            self.report['errors'].append({'line': line, 'errors': errors})
+
+    def import_batch(self, rows):
+        """Validate and write one batch of ``(line, record)`` rows."""
+        self.report['processed'] += len(rows)
+
+        valid = []
+        for line, record in rows:
+            if isinstance(record, str):
+                self._fail(line, {'non_field_errors': [record]})
+                continue
+            serializer = PaymentImportRowSerializer(data=record)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self._fail(line, _error_messages(serializer.errors))
+        if not valid:
+            return
+
+        clients = Client.objects.all()
+        if self.organization_id:
+            clients = clients.filter(organization_id=self.organization_id)
+        client_map = clients.in_bulk({data['client'] for _, data in valid if data.get('client')})
+        projects = Project.objects.select_related('client')
+        if self.organization_id:
+            projects = projects.filter(client__organization_id=self.organization_id)
+        project_map = projects.in_bulk({data['project'] for _, data in valid if data.get('project')})
+        organization_map = Organization.objects.in_bulk(
+            {data['organization'] for _, data in valid if data.get('organization')}
+        )
+        taken_projects = set(
+            Payment.objects.filter(project_id__in=list(project_map)).values_list('project_id', flat=True)
+        )
+        transaction_ids = {data['transaction_id'] for _, data in valid if data.get('transaction_id')}
+        existing_transactions = set(
+            Payment.objects.filter(transaction_id__in=transaction_ids).values_list('transaction_id', flat=True)
+        )
+
+        now = timezone.now()
+        lines = []
+        payments = []
+        for line, data in valid:
+            errors = {}
+            client = client_map.get(data['client']) if data.get('client') else None
+            project = project_map.get(data['project']) if data.get('project') else None
+            organization = organization_map.get(data['organization']) if data.get('organization') else None
+
+            if data.get('client') and client is None:
+                errors['client'] = ['Client not found.']
+            if data.get('project'):
+                if project is None:
+                    errors['project'] = ['Project not found.']
+                elif client is not None and project.client_id != client.id:
+                    errors['project'] = ['Project does not belong to the client.']
+                elif client is None and project.client.organization_id != (
+                    organization.id if organization else self.organization_id
+                ):
+                    # Without a client the project must belong to the row's
+                    # organization, so rows cannot claim other tenants' projects
+                    errors['project'] = ['Project does not belong to the organization.']
+                elif project.id in taken_projects or project.id in self._seen_projects:
+                    errors['project'] = ['Project already has a payment.']
+            if data.get('organization') and (
+                organization is None
+                or (self.organization_id and organization.id != self.organization_id)
+            ):
+                errors['organization'] = ['Organization not found.']
+            transaction_id = data.get('transaction_id')
+            if transaction_id and (
+                transaction_id in existing_transactions or transaction_id in self._seen_transactions
+            ):
+                errors['transaction_id'] = ['A payment with this transaction ID already exists.']
+            if errors:
+                self._fail(line, errors)
+                continue
+
+            if project is not None:
+                self._seen_projects.add(project.id)
+            if transaction_id:
+                self._seen_transactions.add(transaction_id)
+            payment = Payment(
+                amount=data['amount'],
+                currency=data['currency'],
+                status=data['status'],
+                payment_method=data['payment_method'],
+                payment_type=data['payment_type'],
+                transaction_id=transaction_id,
+                client=client,
+                project=project,
+                # Project payments belong to their client's organization
+                organization_id=organization.id if organization else (client.organization_id if client else None),
+                notes=data.get('notes'),
+                completed_at=data.get('completed_at'),
+            )
+            stamp_transition(payment, now)
+            lines.append(line)
+            payments.append(payment)
+
+        self._write(lines, payments)
+
+    def _transitions(self, payments):
+        return [
+            PaymentTransition(
+                payment=payment, from_status=None, to_status=payment.status,
+                actor=self.actor, note=PAYMENT_IMPORT_NOTE,
+            )
+            for payment in payments
+        ]
+
+    def _write(self, lines, payments):
+        try:
+            with transaction.atomic():
+                Payment.objects.bulk_create(payments)
+                run_transition_hooks(self._transitions(payments))
+            self.report['imported'] += len(payments)
+            return
+        except IntegrityError:
+            # A row conflicts with a payment written concurrently: retry the
+            # batch row by row to report the conflicting rows only
+            logger.info("Payment import batch conflicted, retrying row by row")
+
+        for line, payment in zip(lines, payments):
+            try:
+                with transaction.atomic():
+                    payment._state.adding = True
+                    payment._transition_context = (self.actor, PAYMENT_IMPORT_NOTE)
+                    payment.save(force_insert=True)
+                self.report['imported'] += 1
+            except IntegrityError as e:
+                self._fail(line, {'non_field_errors': [f"Conflicts with an existing payment: {e}"]})
+
+
+def import_payments(stream, file_format, organization_id=None, actor=None,
+                    batch_size=PAYMENT_IMPORT_BATCH_SIZE, on_progress=None):
+    """
+    Import payments from a CSV or NDJSON file; see PaymentImporter.
+
+    Returns:
+        dict: The import report, see ``PaymentImporter.run``
+    """
+    importer = PaymentImporter(organization_id=organization_id, actor=actor, batch_size=batch_size)
+    return importer.run(read_rows(stream, file_format), on_progress=on_progress)
+
+
+def run_payment_import(import_id):
+    """
+    Run a queued PaymentImport, saving its progress after every batch.
+
+    Returns:
+        PaymentImport: The finished import, or None if it was not queued
+        (already run by another worker)
+    """
+    if not PaymentImport.objects.filter(id=import_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    ):
+        return None
+    job = PaymentImport.objects.select_related('created_by').get(id=import_id)
+
+    def save_progress(report):
+        PaymentImport.objects.filter(id=import_id).update(
+            rows_processed=report['processed'],
+            rows_imported=report['imported'],
+            rows_failed=report['failed'],
+            errors=report['errors'],
+        )
+
+    try:
+        with job.file.open('rb') as stream:
+            import_payments(
+                stream, job.format, organization_id=job.organization_id, actor=job.created_by,
+                on_progress=save_progress,
+            )
+    except Exception as e:
+        logger.exception(f"Payment import {import_id} failed")
+        PaymentImport.objects.filter(id=import_id).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+    else:
+        PaymentImport.objects.filter(id=import_id).update(status='completed', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
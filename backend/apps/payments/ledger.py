@@ -0,0 +1,292 @@
+"""
+Daily payments ledger.
+
+PaymentDailyLedger holds completed and refunded counts and amounts per
+day, organization, payment type and currency, so revenue series are read
+from a few rows per day instead of re-aggregating Payment rows joined
+through their clients.
+
+Every payment change is turned into ledger deltas (its ledger entries
+after the change minus those before it, see ``record_payment_change``)
+that are applied with single UPDATE statements. A payment belongs to its
+client's organization, or for subscription payments to the paying
+organization; payments with neither are not in the ledger.
+``rebuild_payment_ledger`` recomputes the ledger from payments.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Max, Min, Sum
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from django.utils import timezone
+
+from apps.clients.models import Client
+from .models import Payment, PaymentDailyLedger
+
+# Days rebuilt per transaction by rebuild_payment_ledger
+LEDGER_CHUNK_DAYS = 31
+
+REVENUE_INTERVALS = ('day', 'week', 'month', 'quarter', 'year')
+
+# Statuses of payments whose completion is booked in the ledger
+BOOKED_STATUSES = ('completed', 'refunded')
+
+LEDGER_FIELDS = ('completed_count', 'completed_amount', 'refunded_count', 'refunded_amount')
+
+
+def client_organization_id(payment, client_id):
+    """
+    Return the organization ID of a payment's (current or previous) client.
+
+    The client is read from the payment when it is loaded, otherwise with
+    one query whose result is kept on the payment; a deleted client has
+    no organization.
+    """
+    if client_id is None:
+        return None
+    if client_id == payment.client_id and Payment._meta.get_field('client').is_cached(payment):
+        return payment.client.organization_id if payment.client else None
+    known = payment.__dict__.setdefault('_client_organization_ids', {})
+    if client_id not in known:
+        known[client_id] = Client.objects.filter(pk=client_id).values_list(
+            'organization_id', flat=True
+        ).first()
+    return known[client_id]
+
+
+def ledger_entries(payment, previous=False):
+    """
+    Return a payment's contribution to the ledger.
+
+    Args:
+        payment: Payment instance with a field tracker
+        previous: Use the values the payment was loaded with instead of
+            its current values
+
+    Returns:
+        dict: ``[completed_count, completed_amount, refunded_count,
+        refunded_amount]`` per ``(organization_id, date, payment_type,
+        currency)``
+    """
+    if previous:
+        value = payment.tracker.previous
+        client_id = value('client')
+    else:
+        # The tracker reports foreign keys by ID, so read them by attname too
+        value = lambda field: getattr(payment, Payment._meta.get_field(field).attname)
+        client_id = payment.client_id
+    organization_id = client_organization_id(payment, client_id) or value('organization')
+
+    entries = {}
+    status = value('status')
+    if not organization_id or status not in BOOKED_STATUSES:
+        return entries
+    amount = Decimal(str(value('amount')))
+    payment_type, currency = value('payment_type'), value('currency')
+    completed_at, refunded_at = value('completed_at'), value('refunded_at')
+    if completed_at:
+        day = timezone.localdate(completed_at)
+        entries[(organization_id, day, payment_type, currency)] = [1, amount, 0, Decimal('0')]
+    if status == 'refunded' and refunded_at:
+        day = timezone.localdate(refunded_at)
+        entry = entries.setdefault(
+            (organization_id, day, payment_type, currency), [0, Decimal('0'), 0, Decimal('0')]
+        )
+        entry[2] += 1
+        entry[3] += amount
+    return entries
+
+
+def apply_ledger_deltas(deltas):
+    """
+    Add deltas to ledger rows, creating missing rows.
+
+    Args:
+        deltas: ``[completed_count, completed_amount, refunded_count,
+            refunded_amount]`` deltas per ``(organization_id, date,
+            payment_type, currency)``
+    """
+    for (organization_id, date, payment_type, currency), delta in deltas.items():
+        if not any(delta):
+            continue
+        row = dict(organization_id=organization_id, date=date, payment_type=payment_type, currency=currency)
+        changes = {field: F(field) + value for field, value in zip(LEDGER_FIELDS, delta)}
+        if PaymentDailyLedger.objects.filter(**row).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                PaymentDailyLedger.objects.create(**row, **dict(zip(LEDGER_FIELDS, delta)))
+        except IntegrityError:
+            # Created concurrently since the update
+            PaymentDailyLedger.objects.filter(**row).update(**changes)
+
+
+def record_payment_change(payment, created=False, deleted=False):
+    """
+    Move a saved or deleted payment's amounts in the ledger.
+
+    Args:
+        payment: The payment, from a post_save or post_delete signal
+        created: The payment was just created
+        deleted: The payment was just deleted
+    """
+    record_payment_changes([payment], created=created, deleted=deleted)
+
+
+def record_payment_changes(payments, created=False, deleted=False):
+    """
+    Move the amounts of many changed payments in the ledger, applying the
+    summed deltas once per ledger row.
+
+    Args:
+        payments: Payments saved (or deleted) since their tracker was reset
+        created: The payments were just created
+        deleted: The payments were just deleted
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0'), 0, Decimal('0')])
+    for payment in payments:
+        if not created and not deleted and not payment.tracker.changed():
+            continue
+        before = {} if created else ledger_entries(payment, previous=not deleted)
+        after = {} if deleted else ledger_entries(payment)
+        for sign, entries in ((1, after), (-1, before)):
+            for key, values in entries.items():
+                deltas[key] = [total + sign * value for total, value in zip(deltas[key], values)]
+    apply_ledger_deltas(deltas)
+
+
+def _ledger_payments():
+    return Payment.objects.annotate(
+        ledger_organization=Coalesce('client__organization', 'organization')
+    ).filter(ledger_organization__isnull=False)
+
+
+def ledger_date_bounds():
+    """
+    Return the first and last day with ledger activity, or ``(None, None)``.
+    """
+    bounds = Payment.objects.filter(status__in=BOOKED_STATUSES).aggregate(
+        first_completed=Min('completed_at'), last_completed=Max('completed_at'),
+        first_refunded=Min('refunded_at'), last_refunded=Max('refunded_at'),
+    )
+    first = [value for value in (bounds['first_completed'], bounds['first_refunded']) if value]
+    last = [value for value in (bounds['last_completed'], bounds['last_refunded']) if value]
+    if not first:
+        return None, None
+    return timezone.localdate(min(first)), timezone.localdate(max(last))
+
+
+def rebuild_ledger_chunk(start, end):
+    """
+    Rebuild the ledger rows of the days from ``start`` to ``end`` (inclusive)
+    with one grouped query for completions and one for refunds.
+
+    Returns:
+        int: Number of ledger rows written
+    """
+    booked = _ledger_payments().filter(status__in=BOOKED_STATUSES)
+    group = ('ledger_organization', 'day', 'payment_type', 'currency')
+    completions = (
+        booked.filter(completed_at__date__range=(start, end))
+        .annotate(day=TruncDate('completed_at'))
+        .values(*group).annotate(count=Count('id'), amount=Sum('amount')).order_by()
+    )
+    refunds = (
+        booked.filter(status='refunded', refunded_at__date__range=(start, end))
+        .annotate(day=TruncDate('refunded_at'))
+        .values(*group).annotate(count=Count('id'), amount=Sum('amount')).order_by()
+    )
+
+    rows = {}
+    for offset, aggregates in ((0, completions), (2, refunds)):
+        for row in aggregates:
+            key = tuple(row[field] for field in group)
+            if key not in rows:
+                rows[key] = PaymentDailyLedger(
+                    organization_id=key[0], date=key[1], payment_type=key[2], currency=key[3]
+                )
+            setattr(rows[key], LEDGER_FIELDS[offset], row['count'])
+            setattr(rows[key], LEDGER_FIELDS[offset + 1], row['amount'])
+
+    with transaction.atomic():
+        PaymentDailyLedger.objects.filter(date__range=(start, end)).delete()
+        PaymentDailyLedger.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def rebuild_payment_ledger(start=None, end=None, chunk_days=LEDGER_CHUNK_DAYS):
+    """
+    Rebuild the ledger from payments, ``chunk_days`` days per transaction.
+
+    Rebuilding is idempotent; payment changes committed while a chunk is
+    rebuilt may be missed by it, so run it again after a busy period.
+
+    Args:
+        start: First day to rebuild (default: first day with activity)
+        end: Last day to rebuild (default: last day with activity)
+        chunk_days: Days rebuilt per transaction
+
+    Yields:
+        tuple: ``(chunk_start, chunk_end, rows_written)`` per chunk
+    """
+    if start is None or end is None:
+        first, last = ledger_date_bounds()
+        start, end = start or first, end or last
+    if start is None or end is None:
+        return
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        yield chunk_start, chunk_end, rebuild_ledger_chunk(chunk_start, chunk_end)
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+def revenue_series(interval, start=None, end=None, organization_id=None, payment_type=None, currency=None):
+    """
+    Read revenue per period, organization, payment type and currency from
+    the ledger in one query.
+
+    Args:
+        interval: Period length, one of REVENUE_INTERVALS
+        start: First day to include
+        end: Last day to include
+        organization_id: Only this organization's revenue
+        payment_type: Only this payment type
+        currency: Only this currency
+
+    Returns:
+        list: One dict per period and dimension, ordered by period, with
+        completed and refunded counts and amounts and the ``net_amount``
+    """
+    ledger = PaymentDailyLedger.objects.all()
+    if organization_id:
+        ledger = ledger.filter(organization_id=organization_id)
+    if start:
+        ledger = ledger.filter(date__gte=start)
+    if end:
+        ledger = ledger.filter(date__lte=end)
+    if payment_type:
+        ledger = ledger.filter(payment_type=payment_type)
+    if currency:
+        ledger = ledger.filter(currency=currency)
+
+    period = F('date') if interval == 'day' else Trunc('date', interval, output_field=DateField())
+    rows = (
+        ledger.annotate(period=period)
+        .values('period', 'organization', 'payment_type', 'currency')
+        .annotate(**{f'total_{field}': Sum(field) for field in LEDGER_FIELDS})
+        .order_by('period', 'organization', 'payment_type', 'currency')
+    )
+    series = []
+    for row in rows:
+        entry = {
+            'period': row['period'].isoformat(),
+            'organization': str(row['organization']),
+            'payment_type': row['payment_type'],
+            'currency': row['currency'],
+        }
+        entry.update({field: row[f'total_{field}'] for field in LEDGER_FIELDS})
+        entry['net_amount'] = entry['completed_amount'] - entry['refunded_amount']
+        series.append(entry)
+    return series
@@ -0,0 +1,42 @@
+"""
+Management command to build the daily payments ledger from payments.
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.payments.ledger import LEDGER_CHUNK_DAYS, rebuild_payment_ledger
+
+class Command(BaseCommand):
+    help = 'Rebuild PaymentDailyLedger from completed and refunded payments, in chunks of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day to rebuild, YYYY-MM-DD (default: first completion or refund)'
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            help='Last day to rebuild, YYYY-MM-DD (default: last completion or refund)'
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=LEDGER_CHUNK_DAYS,
+            help=f'Number of days rebuilt per transaction (default: {LEDGER_CHUNK_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('--start must not be after --end')
+
+        chunks = rows = 0
+        for chunk_start, chunk_end, written in rebuild_payment_ledger(
+            options['start'], options['end'], options['chunk_days']
+        ):
+            chunks += 1
+            rows += written
+            self.stdout.write(f"{chunk_start} to {chunk_end}: {written} ledger row(s)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} ledger row(s) in {chunks} chunk(s)"))
@@ -0,0 +1,59 @@
+"""
+Management command to import payments from a CSV or NDJSON file.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.payments.imports import PAYMENT_IMPORT_BATCH_SIZE, detect_format, import_payments
+
+class Command(BaseCommand):
+    help = 'Import payments from a CSV (with header row) or NDJSON file, validating and writing in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=['csv', 'ndjson'],
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--organization',
+            help='Only accept clients and organizations of this organization ID'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PAYMENT_IMPORT_BATCH_SIZE,
+            help=f'Number of rows validated and written together (default: {PAYMENT_IMPORT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or detect_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot tell the file format from its name; pass --format')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        def progress(report):
+            self.stdout.write(
+                f"{report['processed']} row(s) processed, {report['imported']} imported, {report['failed']} failed"
+            )
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_payments(
+                    stream, file_format, organization_id=options['organization'],
+                    batch_size=options['batch_size'], on_progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        for error in report['errors']:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_messages)}" for field, field_messages in error['errors'].items()
+            )
+            self.stderr.write(f"Line {error['line']}: {messages}")
+        if report['failed'] > len(report['errors']):
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more failed row(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['processed']} payment(s)"
+        ))
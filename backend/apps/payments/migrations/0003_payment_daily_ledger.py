@@ -0,0 +1,50 @@
+# Generated by Django 5.0.7 on 2026-10-18 23:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_refunded_at(apps, schema_editor):
+    # Refunds made before refunded_at existed are dated by their last update
+    Payment = apps.get_model('payments', 'Payment')
+    Payment.objects.filter(status='refunded', refunded_at__isnull=True).update(refunded_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_seed_subscription_plans'),
+        ('payments', '0002_payment_organization_payment_payment_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_refunded_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='PaymentDailyLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_type', models.CharField(choices=[('project', 'Project Payment'), ('subscription', 'Subscription Payment')], max_length=20)),
+                ('currency', models.CharField(max_length=3)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_count', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_ledger', to='organization.organization')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='payment_ledger_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentdailyledger',
+            constraint=models.UniqueConstraint(fields=('organization', 'date', 'payment_type', 'currency'), name='payment_ledger_unique_day'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.7 on 2026-10-18 23:28
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_seed_subscription_plans'),
+        ('payments', '0005_payment_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='bank_statements/')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('lines_processed', models.PositiveIntegerField(default=0)),
+                ('lines_matched', models.PositiveIntegerField(default=0)),
+                ('lines_ambiguous', models.PositiveIntegerField(default=0)),
+                ('lines_unmatched', models.PositiveIntegerField(default=0)),
+                ('lines_invalid', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Unreadable lines, up to the first 1000')),
+                ('error', models.TextField(blank=True, default='', help_text='Error that stopped the run')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reconciliation_runs', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(blank=True, help_text='Organization whose payments are matched; empty for staff runs', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_runs', to='organization.organization')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line', models.PositiveIntegerField(help_text='Line number in the statement file')),
+                ('date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(max_length=3)),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('reference', models.CharField(blank=True, default='', max_length=255)),
+                ('description', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('matched', 'Matched'), ('ambiguous', 'Needs review'), ('unmatched', 'Unmatched'), ('resolved', 'Resolved'), ('dismissed', 'Dismissed')], max_length=20)),
+                ('candidates', models.JSONField(blank=True, default=list, help_text='IDs of payments the line may belong to')),
+                ('reason', models.CharField(blank=True, default='', max_length=255)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_lines', to='payments.payment')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payments.reconciliationrun')),
+            ],
+            options={
+                'ordering': ['line'],
+                'indexes': [models.Index(fields=['run', 'status'], name='statement_line_run_status_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 import uuid
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from model_utils import FieldTracker
 from apps.clients.models import Client
 from apps.organization.models import OrganizationMember, Organization, OrganizationSubscription
 from apps.projects.models import Project
@@ -117,6 +119,14 @@ class Payment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     verified_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    refunded_at = models.DateTimeField(null=True, blank=True)
+
+    # Status transitions (apps.payments.transitions) and the fields whose
+    # changes move the payment in the revenue ledger
+    tracker = FieldTracker(fields=[
+        'status', 'verified', 'amount', 'currency', 'payment_type', 'client', 'organization',
+        'completed_at', 'refunded_at',
+    ])
 
     def __str__(self):
         if self.payment_type == 'subscription' and self.organization:
@@ -133,10 +143,208 @@ class Payment(models.Model):
             models.Index(fields=['verified']),
         ]
 
-    def save(self, *args, **kwargs):
-        # Update timestamps based on status changes
-        if self.verified and not self.verified_at:
-            self.verified_at = timezone.now()
-        if self.status == 'completed' and not self.completed_at:
-            self.completed_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+class PaymentDailyLedger(models.Model):
+    """
+    Daily revenue rollup per organization, payment type and currency.
+
+    Completions are booked on the payment's ``completed_at`` day and
+    refunds on its ``refunded_at`` day. Rows are kept up to date by
+    apps.payments.ledger on every payment change and can be rebuilt with
+    the ``backfill_payment_ledger`` command.
+    """
+    date = models.DateField()
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='payment_ledger'
+    )
+    payment_type = models.CharField(max_length=20, choices=Payment.PAYMENT_TYPES)
+    currency = models.CharField(max_length=3)
+    completed_count = models.IntegerField(default=0)
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.payment_type} {self.currency}: {self.completed_amount - self.refunded_amount}"
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            # Also serves per-organization date range queries
+            models.UniqueConstraint(
+                fields=['organization', 'date', 'payment_type', 'currency'],
+                name='payment_ledger_unique_day'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='payment_ledger_date_idx'),
+        ]
+
+
+class PaymentTransition(models.Model):
+    """
+    Status history of a payment, one row per transition made through
+    apps.payments.transitions; ``from_status`` is empty for creation.
+    """
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='transitions')
+    from_status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES, blank=True, null=True)
+    to_status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payment_transitions',
+        help_text="User who made the transition, if not made by the system"
+    )
+    note = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.payment_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['payment', 'created_at'], name='payment_transition_idx'),
+        ]
+
+class PaymentImport(models.Model):
+    """
+    A CSV/NDJSON payment import run as a Celery job, with its progress and
+    per-row errors (see apps.payments.imports).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to='payment_imports/')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='payment_imports',
+        help_text="Organization the rows are restricted to; empty for staff imports"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payment_imports'
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Per-row errors, up to the first 1000")
+    error = models.TextField(blank=True, default='', help_text="Error that stopped the import")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Payment import {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class ReconciliationRun(models.Model):
+    """
+    A bank statement matched against pending payments by a Celery job
+    (see apps.payments.reconciliation).
+    """
+    STATUS_CHOICES = PaymentImport.STATUS_CHOICES
+    FORMAT_CHOICES = PaymentImport.FORMAT_CHOICES
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to='bank_statements/')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reconciliation_runs',
+        help_text="Organization whose payments are matched; empty for staff runs"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reconciliation_runs'
+    )
+    lines_processed = models.PositiveIntegerField(default=0)
+    lines_matched = models.PositiveIntegerField(default=0)
+    lines_ambiguous = models.PositiveIntegerField(default=0)
+    lines_unmatched = models.PositiveIntegerField(default=0)
+    lines_invalid = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Unreadable lines, up to the first 1000")
+    error = models.TextField(blank=True, default='', help_text="Error that stopped the run")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Reconciliation {self.id} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class StatementLine(models.Model):
+    """
+    A bank statement line of a reconciliation run and its outcome.
+    Ambiguous lines wait for a verifier to resolve them.
+    """
+    STATUS_CHOICES = [
+        ('matched', 'Matched'),
+        ('ambiguous', 'Needs review'),
+        ('unmatched', 'Unmatched'),
+        ('resolved', 'Resolved'),
+        ('dismissed', 'Dismissed'),
+    ]
+
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='lines')
+    line = models.PositiveIntegerField(help_text="Line number in the statement file")
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    reference = models.CharField(max_length=255, blank=True, default='')
+    description = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='statement_lines'
+    )
+    candidates = models.JSONField(default=list, blank=True, help_text="IDs of payments the line may belong to")
+    reason = models.CharField(max_length=255, blank=True, default='')
+
+    def __str__(self):
+        return f"Line {self.line}: {self.amount} {self.currency} ({self.status})"
+
+    class Meta:
+        ordering = ['line']
+        indexes = [
+            models.Index(fields=['run', 'status'], name='statement_line_run_status_idx'),
+        ]
@@ -0,0 +1,429 @@
+"""
+Bank statement reconciliation.
+
+A statement (CSV or NDJSON, one line per credit: ``date``, ``amount``,
+``currency``, optional ``transaction_id``, ``reference`` and
+``description``) is matched against the pending, unverified payments in
+scope. The payments are loaded once and indexed in memory by
+PaymentMatcher, so every statement line is matched with a few dict
+lookups and a binary search instead of queries:
+
+1. by transaction ID;
+2. by amount and currency, paid within RECONCILIATION_DATE_WINDOW_DAYS
+   of the statement date;
+3. narrowed down by the line's reference, when it names the client (by
+   name, email or ID).
+
+A line with exactly one candidate payment is a confident match: the
+payment is verified and completed. Lines with several candidates (or a
+transaction ID whose amount differs) are queued for review as ambiguous
+StatementLine rows; lines without candidates are kept as unmatched.
+Lines are handled in batches: the confident payments of a batch are
+moved with one ``bulk_transition_payments`` and the batch's lines are
+written with one ``bulk_create``.
+"""
+import logging
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.clients.models import Client
+from apps.organization.models import OrganizationMember
+from .imports import PAYMENT_IMPORT_MAX_ERRORS, read_rows
+from .models import Payment, ReconciliationRun, StatementLine
+from .transitions import bulk_transition_payments, transition_payment
+
+logger = logging.getLogger(__name__)
+
+# Statement lines matched and written together
+RECONCILIATION_BATCH_SIZE = 1000
+# Days a statement date may differ from the payment's creation date
+RECONCILIATION_DATE_WINDOW_DAYS = 3
+# Candidate payments kept on an ambiguous line
+MAX_REVIEW_CANDIDATES = 10
+
+# Payments a statement line can settle
+RECONCILABLE_STATUSES = ('pending', 'processing')
+
+RECONCILIATION_NOTE = 'Reconciled with bank statement'
+
+
+class StatementLineMismatch(Exception):
+    """A statement line resolved to a payment of another amount or currency."""
+
+    def __init__(self, line, payment):
+        self.line = line
+        self.payment = payment
+        super().__init__(
+            f"The line is for {line.amount} {line.currency} but the payment is for "
+            f"{payment.amount} {payment.currency}"
+        )
+
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_reference(value):
+    """Reduce a client reference to lowercase letters and digits."""
+    return _NON_ALPHANUMERIC.sub('', str(value).casefold())
+
+
+def parse_statement_line(record):
+    """
+    Validate a statement record from ``read_rows``.
+
+    Returns:
+        tuple: ``(line_data, errors)``; ``errors`` maps fields to messages
+        and is empty when the record is valid
+    """
+    errors = {}
+    data = {
+        'transaction_id': str(record['transaction_id'])[:100] if record.get('transaction_id') else None,
+        'reference': str(record.get('reference', ''))[:255],
+        'description': str(record.get('description', '')),
+        'currency': str(record.get('currency', 'USD')).upper(),
+    }
+    try:
+        data['date'] = date.fromisoformat(str(record['date'])[:10])
+    except KeyError:
+        errors['date'] = ['This field is required.']
+    except ValueError:
+        errors['date'] = ['Enter a date as YYYY-MM-DD.']
+    try:
+        data['amount'] = Decimal(str(record['amount'])).quantize(Decimal('0.01'))
+        if not data['amount'].is_finite() or data['amount'] <= 0:
+            errors['amount'] = ['Only incoming amounts can be matched to payments.']
+    except KeyError:
+        errors['amount'] = ['This field is required.']
+    except InvalidOperation:
+        errors['amount'] = ['A valid number is required.']
+    if len(data['currency']) != 3:
+        errors['currency'] = ['Enter a 3-letter currency code.']
+    return data, errors
+
+
+class PaymentMatcher:
+    """
+    In-memory indexes of reconcilable payments.
+
+    Payments are added with ``add_payment`` and clients with ``add_client``;
+    ``match`` then claims at most one payment per statement line, so a
+    payment is never matched twice in a run.
+
+    Args:
+        window_days: Days a statement date may differ from a payment's date
+    """
+
+    def __init__(self, window_days=RECONCILIATION_DATE_WINDOW_DAYS):
+        self.window_days = window_days
+        self.by_transaction = defaultdict(list)
+        # (amount, currency) -> [(date ordinal, payment ID)], sorted by finalize()
+        self.by_amount = defaultdict(list)
+        # Normalized reference -> client ID, or None if it names several clients
+        self.by_reference = {}
+        self.amount_of = {}
+        self.client_of = {}
+        self.claimed = set()
+
+    def add_payment(self, payment_id, transaction_id, amount, currency, day, client_id):
+        """Index one payment; ``day`` is the date it was made."""
+        key = (amount, currency)
+        if transaction_id:
+            self.by_transaction[transaction_id].append(payment_id)
+        self.by_amount[key].append((day.toordinal(), payment_id))
+        self.amount_of[payment_id] = key
+        self.client_of[payment_id] = client_id
+
+    def add_client(self, client_id, *references):
+        """Index the references (name, email, ID) a statement may name a client by."""
+        for reference in references:
+            key = normalize_reference(reference) if reference else ''
+            if key:
+                known = self.by_reference.setdefault(key, client_id)
+                if known != client_id:
+                    self.by_reference[key] = None
+
+    def finalize(self):
+        """Sort the amount index; call once all payments are added."""
+        for entries in self.by_amount.values():
+            entries.sort(key=lambda entry: entry[0])
+
+    def _claim(self, payment_id, reason):
+        self.claimed.add(payment_id)
+        return 'matched', payment_id, [payment_id], reason
+
+    def _in_window(self, amount, currency, day):
+        entries = self.by_amount.get((amount, currency))
+        if not entries:
+            return []
+        ordinal = day.toordinal()
+        index = bisect_left(entries, ordinal - self.window_days, key=lambda entry: entry[0])
+        candidates = []
+        while index < len(entries) and entries[index][0] <= ordinal + self.window_days:
+            if entries[index][1] not in self.claimed:
+                candidates.append(entries[index][1])
+            index += 1
+        return candidates
+
+    def match(self, amount, currency, day, transaction_id=None, reference=''):
+        """
+        Match one statement line.
+
+        Returns:
+            tuple: ``(status, payment_id, candidates, reason)``; ``status``
+            is 'matched' (``payment_id`` is claimed), 'ambiguous' or
+            'unmatched'
+        """
+        if transaction_id:
+            candidates = [
+                payment_id for payment_id in self.by_transaction.get(transaction_id, ())
+                if payment_id not in self.claimed
+            ]
+            if len(candidates) == 1:
+                if self.amount_of[candidates[0]] == (amount, currency):
+                    return self._claim(candidates[0], 'Transaction ID')
+                return 'ambiguous', None, candidates, 'Transaction ID matches, amount differs'
+            if candidates:
+                return 'ambiguous', None, candidates, 'Transaction ID matches several payments'
+
+        candidates = self._in_window(amount, currency, day)
+        client_id = self.by_reference.get(normalize_reference(reference)) if reference else None
+        if client_id is not None:
+            own = [payment_id for payment_id in candidates if self.client_of[payment_id] == client_id]
+            if len(own) == 1:
+                return self._claim(own[0], 'Amount, date and client reference')
+            if own:
+                return 'ambiguous', None, own, "Several of the client's payments match"
+            if candidates:
+                return 'ambiguous', None, candidates, "Amount and date match another client's payment"
+            return 'unmatched', None, [], ''
+
+        if len(candidates) == 1:
+            return self._claim(candidates[0], 'Amount and date')
+        if candidates:
+            return 'ambiguous', None, candidates, 'Several payments match amount and date'
+        return 'unmatched', None, [], ''
+
+
+def reconcilable_payments(organization_id=None):
+    """Return the pending, unverified payments of an organization (or all)."""
+    payments = Payment.objects.filter(status__in=RECONCILABLE_STATUSES, verified=False)
+    if organization_id:
+        payments = payments.annotate(
+            owner_organization=Coalesce('client__organization', 'organization')
+        ).filter(owner_organization=organization_id)
+    return payments
+
+
+def build_matcher(organization_id=None, window_days=RECONCILIATION_DATE_WINDOW_DAYS):
+    """
+    Load the reconcilable payments and their clients into a PaymentMatcher
+    with two queries.
+    """
+    matcher = PaymentMatcher(window_days=window_days)
+    payments = reconcilable_payments(organization_id)
+    rows = payments.values_list(
+        'id', 'transaction_id', 'amount', 'currency', 'created_at', 'client_id'
+    ).order_by()
+    for payment_id, transaction_id, amount, currency, created_at, client_id in rows.iterator(chunk_size=5000):
+        matcher.add_payment(
+            payment_id, transaction_id, amount, currency, timezone.localdate(created_at), client_id
+        )
+    clients = Client.objects.filter(id__in=payments.filter(client__isnull=False).values('client_id'))
+    for client_id, name, email in clients.values_list('id', 'name', 'email').iterator(chunk_size=5000):
+        matcher.add_client(client_id, name, email, client_id.hex)
+    matcher.finalize()
+    return matcher
+
+
+class StatementReconciler:
+    """
+    Match statement lines in batches, verify the confident matches and
+    record every line.
+
+    Args:
+        run: The ReconciliationRun the lines belong to
+        matcher: PaymentMatcher with the run's payments
+        batch_size: Lines matched and written together
+    """
+
+    def __init__(self, run, matcher, batch_size=RECONCILIATION_BATCH_SIZE):
+        self.run = run
+        self.matcher = matcher
+        self.batch_size = batch_size
+        self.verifier = OrganizationMember.objects.filter(user_id=run.created_by_id).first()
+        self.report = {
+            'processed': 0, 'matched': 0, 'ambiguous': 0, 'unmatched': 0, 'invalid': 0, 'errors': [],
+        }
+
+    def run_lines(self, rows, on_progress=None):
+        """
+        Reconcile all ``(line, record)`` rows, see ``read_rows``.
+
+        Returns:
+            dict: ``processed``, ``matched``, ``ambiguous``, ``unmatched``
+            and ``invalid`` line counts and the ``errors`` of invalid lines
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.reconcile_batch(batch)
+                batch = []
+                if on_progress:
+                    on_progress(self.report)
+        if batch:
+            self.reconcile_batch(batch)
+            if on_progress:
+                on_progress(self.report)
+        return self.report
+
+    def _fail(self, line, errors):
+        self.report['invalid'] += 1
+        if len(self.report['errors']) < PAYMENT_IMPORT_MAX_ERRORS:
+            self.report['errors'].append({'line': line, 'errors': errors})
+
+    def reconcile_batch(self, rows):
+        """Match, verify and record one batch of ``(line, record)`` rows."""
+        self.report['processed'] += len(rows)
+        lines = []
+        for line, record in rows:
+            if isinstance(record, str):
+                self._fail(line, {'non_field_errors': [record]})
+                continue
+            data, errors = parse_statement_line(record)
+            if errors:
+                self._fail(line, errors)
+                continue
+            status, payment_id, candidates, reason = self.matcher.match(
+                data['amount'], data['currency'], data['date'],
+                transaction_id=data['transaction_id'], reference=data['reference'],
+            )
+            lines.append(StatementLine(
+                run=self.run, line=line, status=status, payment_id=payment_id,
+                candidates=[str(candidate) for candidate in candidates[:MAX_REVIEW_CANDIDATES]],
+                reason=reason, **data,
+            ))
+
+        with transaction.atomic():
+            self._verify([item for item in lines if item.status == 'matched'])
+            StatementLine.objects.bulk_create(lines)
+        for item in lines:
+            self.report[item.status] += 1
+
+    def _verify(self, matched):
+        """Complete and verify the matched payments; send stale matches to review."""
+        if not matched:
+            return
+        payments = list(
+            Payment.objects.select_related('client')
+            .select_for_update(of=('self',))
+            .filter(id__in=[item.payment_id for item in matched], status__in=RECONCILABLE_STATUSES, verified=False)
+        )
+        bulk_transition_payments(
+            payments, 'completed', actor=self.run.created_by,
+            note=f"{RECONCILIATION_NOTE} {self.run.id}",
+            verified=True, verified_by=self.verifier,
+        )
+        verified = {payment.id for payment in payments}
+        for item in matched:
+            if item.payment_id not in verified:
+                # Completed, cancelled or verified since the payments were loaded
+                item.status, item.payment_id = 'ambiguous', None
+                item.reason = 'Payment changed before it could be verified'
+
+
+def reconcile_statement(run, stream, window_days=RECONCILIATION_DATE_WINDOW_DAYS,
+                        batch_size=RECONCILIATION_BATCH_SIZE, on_progress=None):
+    """
+    Reconcile a statement file against the run's payments; see
+    StatementReconciler.
+
+    Returns:
+        dict: The reconciliation report, see ``StatementReconciler.run_lines``
+    """
+    matcher = build_matcher(run.organization_id, window_days=window_days)
+    reconciler = StatementReconciler(run, matcher, batch_size=batch_size)
+    return reconciler.run_lines(read_rows(stream, run.format), on_progress=on_progress)
+
+
+def run_reconciliation(run_id):
+    """
+    Run a queued ReconciliationRun, saving its progress after every batch.
+
+    Returns:
+        ReconciliationRun: The finished run, or None if it was not queued
+        (already run by another worker)
+    """
+    if not ReconciliationRun.objects.filter(id=run_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    ):
+        return None
+    run = ReconciliationRun.objects.select_related('created_by').get(id=run_id)
+
+    def save_progress(report):
+        ReconciliationRun.objects.filter(id=run_id).update(
+            lines_processed=report['processed'],
+            lines_matched=report['matched'],
+            lines_ambiguous=report['ambiguous'],
+            lines_unmatched=report['unmatched'],
+            lines_invalid=report['invalid'],
+            errors=report['errors'],
+        )
+
+    try:
+        with run.file.open('rb') as stream:
+            reconcile_statement(run, stream, on_progress=save_progress)
+    except Exception as e:
+        logger.exception(f"Reconciliation {run_id} failed")
+        ReconciliationRun.objects.filter(id=run_id).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+    else:
+        ReconciliationRun.objects.filter(id=run_id).update(status='completed', finished_at=timezone.now())
+    run.refresh_from_db()
+    return run
+
+
+def resolve_statement_line(line, payment=None, actor=None, allow_mismatch=False):
+    """
+    Settle a statement line queued for review.
+
+    Args:
+        line: An ambiguous or unmatched StatementLine
+        payment: The payment the line pays, verified and completed here;
+            None dismisses the line
+        actor: User resolving the line
+        allow_mismatch: Accept a payment whose amount or currency differs
+            from the line's
+
+    Returns:
+        StatementLine: The updated line
+
+    Raises:
+        StatementLineMismatch: If the payment's amount or currency differs
+            from the line's and ``allow_mismatch`` is not set
+        InvalidPaymentTransition: If the payment cannot be completed
+    """
+    if payment is not None and not allow_mismatch and (
+        payment.amount != line.amount or payment.currency.upper() != line.currency.upper()
+    ):
+        raise StatementLineMismatch(line, payment)
+    with transaction.atomic():
+        if payment is not None:
+            transition_payment(
+                payment, 'completed', actor=actor,
+                note=f"{RECONCILIATION_NOTE} {line.run_id}, line {line.line}",
+                verified=True,
+                verified_by=OrganizationMember.objects.filter(user=actor).first() if actor else None,
+            )
+            line.status, line.payment = 'resolved', payment
+        else:
+            line.status = 'dismissed'
+        line.save(update_fields=['status', 'payment'])
+    return line
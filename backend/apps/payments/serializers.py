@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Payment
+from decimal import Decimal
+from .models import Payment, PaymentImport, PaymentTransition, ReconciliationRun, StatementLine
+from .ledger import REVENUE_INTERVALS
+from .stats import STATS_GROUPINGS
 from apps.clients.serializers import ClientSerializer
 from apps.projects.serializers import ProjectSerializer
 
@@ -105,4 +108,126 @@ class SubscriptionPaymentCreateSerializer(serializers.ModelSerializer):
         if not data.get('organization'):
             raise serializers.ValidationError("Organization is required for subscription payments")
         
-        return data
\ No newline at end of file
+        return data
+class PaymentStatsQuerySerializer(serializers.Serializer):
+    """Query parameters of the payment statistics endpoint"""
+    group_by = serializers.CharField(required=False, allow_blank=True)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate_group_by(self, value):
+        # Comma separated, e.g. ?group_by=currency,month
+        groupings = [grouping.strip() for grouping in value.split(',') if grouping.strip()]
+        unknown = [grouping for grouping in groupings if grouping not in STATS_GROUPINGS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown grouping {', '.join(unknown)}; use {', '.join(STATS_GROUPINGS)}"
+            )
+        return list(dict.fromkeys(groupings))
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("start_date must not be after end_date")
+        return data
+
+
+class PaymentRevenueQuerySerializer(serializers.Serializer):
+    """Query parameters of the revenue time series endpoint"""
+    interval = serializers.ChoiceField(choices=REVENUE_INTERVALS, default='month')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    organization = serializers.UUIDField(required=False)
+    payment_type = serializers.ChoiceField(choices=Payment.PAYMENT_TYPES, required=False)
+    currency = serializers.CharField(max_length=3, required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("start_date must not be after end_date")
+        return data
+
+
+class PaymentTransitionSerializer(serializers.ModelSerializer):
+    """Serializer for the status history of a payment"""
+    actor_email = serializers.EmailField(source='actor.email', read_only=True, allow_null=True)
+
+    class Meta:
+        model = PaymentTransition
+        fields = ['id', 'from_status', 'to_status', 'actor', 'actor_email', 'note', 'created_at']
+        read_only_fields = fields
+
+
+class PaymentImportRowSerializer(serializers.Serializer):
+    """
+    One row of a payment import file; relations are accepted as IDs and
+    resolved per batch by apps.payments.imports
+    """
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    currency = serializers.CharField(max_length=3, default='USD')
+    # Imports record payments that were already made or are awaiting verification
+    status = serializers.ChoiceField(choices=['pending', 'completed'], default='completed')
+    payment_method = serializers.ChoiceField(choices=Payment.PAYMENT_METHODS, default='bank_transfer')
+    payment_type = serializers.ChoiceField(choices=Payment.PAYMENT_TYPES, default='project')
+    transaction_id = serializers.CharField(max_length=100, required=False)
+    client = serializers.UUIDField(required=False)
+    project = serializers.UUIDField(required=False)
+    organization = serializers.UUIDField(required=False)
+    completed_at = serializers.DateTimeField(required=False)
+    notes = serializers.CharField(required=False)
+
+    def validate_currency(self, value):
+        return value.upper()
+
+    def validate(self, data):
+        if data['payment_type'] == 'project' and not data.get('client'):
+            raise serializers.ValidationError({'client': ["Client is required for project payments"]})
+        if data['payment_type'] == 'subscription' and not data.get('organization'):
+            raise serializers.ValidationError(
+                {'organization': ["Organization is required for subscription payments"]}
+            )
+        return data
+
+
+class PaymentImportSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a payment import job"""
+    class Meta:
+        model = PaymentImport
+        fields = [
+            'id', 'format', 'status', 'rows_processed', 'rows_imported', 'rows_failed',
+            'errors', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class ReconciliationRunSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a bank statement reconciliation"""
+    class Meta:
+        model = ReconciliationRun
+        fields = [
+            'id', 'format', 'status', 'lines_processed', 'lines_matched', 'lines_ambiguous',
+            'lines_unmatched', 'lines_invalid', 'errors', 'error', 'created_at', 'started_at',
+            'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class StatementLineSerializer(serializers.ModelSerializer):
+    """Serializer for a reconciled bank statement line"""
+    class Meta:
+        model = StatementLine
+        fields = [
+            'id', 'line', 'date', 'amount', 'currency', 'transaction_id', 'reference',
+            'description', 'status', 'payment', 'candidates', 'reason'
+        ]
+        read_only_fields = fields
+
+
+class StatementLineResolveSerializer(serializers.Serializer):
+    """Serializer for resolving a statement line queued for review"""
+    payment = serializers.UUIDField(
+        required=False, allow_null=True,
+        help_text="Payment the line pays; leave empty to dismiss the line"
+    )
+    allow_mismatch = serializers.BooleanField(
+        required=False, default=False,
+        help_text="Accept a payment whose amount or currency differs from the line's"
+    )
@@ -1,32 +1,152 @@
 # apps/payments/signals.py
-from django.db.models.signals import post_save, pre_save
+from collections import defaultdict
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Payment
-from .tasks import process_payment_async, send_payment_reminder
+from .models import Payment, PaymentTransition
+from .tasks import PAYMENT_NOTIFICATION_ROLES, process_payment_async
 from django.db import transaction
+from apps.notifications.outbox import enqueue_task
+from apps.notifications.tasks import send_notifications_task
+from apps.organization.models import OrganizationMember
+from .imports import PAYMENT_IMPORT_NOTE
+from .ledger import client_organization_id, record_payment_change, record_payment_changes
+from .stats import invalidate_payment_stats
+from .transitions import pending_transition, prepare_transition, run_transition_hooks, transition_hook
 
-@receiver(post_save, sender=Payment)
-def handle_payment_notifications(sender, instance, created, **kwargs):
+def payment_organization_ids(payment):
+    """
+    Return the organizations whose statistics a payment change affects.
+    """
+    organization_ids = {client_organization_id(payment, payment.client_id), payment.organization_id}
+    if not payment._state.adding and payment.tracker.has_changed('client'):
+        organization_ids.add(client_organization_id(payment, payment.tracker.previous('client')))
+    organization_ids.discard(None)
+    return organization_ids
+
+
+def invalidate_stats(payments):
     """
-    Handle payment notifications via Celery tasks
+    Drop cached payment statistics of the payments' organizations once
+    the change is committed, so a reader cannot cache the old figures
+    under the new version.
     """
-    if created and instance.client:
-        # Process payment asynchronously
-        process_payment_async.delay(instance.id)
-        
-        # Note: Payment reminders can be scheduled if needed
-        # For now, we skip this as Payment model doesn't have due_date field
+    organization_ids = set()
+    for payment in payments:
+        organization_ids |= payment_organization_ids(payment)
+    transaction.on_commit(lambda: invalidate_payment_stats(organization_ids))
+
 
 @receiver(pre_save, sender=Payment)
-def log_payment_status_change(sender, instance, **kwargs):
-    """
-    Log payment status changes
-    """
-    if instance.pk:  # Only for updates
-        try:
-            old_instance = Payment.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                # Log status change or trigger additional actions
-                pass
-        except Payment.DoesNotExist:
-            pass
\ No newline at end of file
+def check_payment_transition(sender, instance, **kwargs):
+    """
+    Reject disallowed status changes and stamp transition timestamps; the
+    previous status comes from the field tracker, not the database
+    """
+    prepare_transition(instance)
+
+
+@receiver(post_save, sender=Payment)
+def handle_payment_saved(sender, instance, created, **kwargs):
+    """
+    Run the transition hooks for a status change; other changes only move
+    the payment in the ledger and statistics
+    """
+    transition = pending_transition(instance, created=created)
+    if transition is not None:
+        run_transition_hooks([transition])
+    else:
+        record_payment_change(instance)
+        invalidate_stats([instance])
+
+
+@transition_hook()
+def record_transition_history(transitions):
+    """
+    Write the status history of the transitioned payments
+    """
+    PaymentTransition.objects.bulk_create(transitions)
+
+
+@transition_hook()
+def update_payment_ledger(transitions):
+    """
+    Book completions and refunds in the daily payments ledger
+    """
+    record_payment_changes(
+        [item.payment for item in transitions if item.from_status is None], created=True
+    )
+    record_payment_changes([item.payment for item in transitions if item.from_status is not None])
+
+
+@transition_hook()
+def invalidate_payment_stats_on_transition(transitions):
+    """
+    Refresh the statistics of the transitioned payments' organizations
+    """
+    invalidate_stats(item.payment for item in transitions)
+
+
+@transition_hook(source=None, target='pending')
+def process_new_payment(transitions):
+    """
+    Process new client payments asynchronously; imported payments keep the
+    status they were imported with (pending ones await verification, e.g.
+    by bank statement reconciliation)
+    """
+    for item in transitions:
+        if item.from_status is None and item.payment.client_id and item.note != PAYMENT_IMPORT_NOTE:
+            enqueue_task(process_payment_async, str(item.payment.id))
+
+
+@transition_hook(target=('completed', 'failed', 'refunded'))
+def notify_payment_outcome(transitions):
+    """
+    Notify the organization's admins and salespeople of completed, failed
+    and refunded payments: one notification per payment, or one summary
+    per organization and status for bulk transitions
+    """
+    by_organization = defaultdict(lambda: defaultdict(list))
+    for item in transitions:
+        if item.from_status is None:
+            # Payments created in their final state (e.g. imports) are not news
+            continue
+        payment = item.payment
+        organization_id = client_organization_id(payment, payment.client_id) or payment.organization_id
+        if organization_id:
+            by_organization[organization_id][item.to_status].append(payment)
+    if not by_organization:
+        return
+
+    recipients = defaultdict(list)
+    for organization_id, user_id in OrganizationMember.objects.filter(
+        organization_id__in=list(by_organization), role__in=PAYMENT_NOTIFICATION_ROLES
+    ).values_list('organization_id', 'user_id'):
+        recipients[organization_id].append(str(user_id))
+
+    for organization_id, by_status in by_organization.items():
+        if not recipients[organization_id]:
+            continue
+        for status, payments in by_status.items():
+            if len(payments) == 1:
+                message = f"Payment of {payments[0].amount} {payments[0].currency} {status}."
+            else:
+                message = f"{len(payments)} payments {status}."
+            enqueue_task(send_notifications_task, recipients[organization_id], message)
+
+
+@receiver(pre_delete, sender=Payment)
+def remember_payment_organization(sender, instance, **kwargs):
+    """
+    Look up the client's organization while the client still exists: it
+    may be deleted in the same cascade before post_delete runs.
+    """
+    client_organization_id(instance, instance.client_id)
+
+
+@receiver(post_delete, sender=Payment)
+def handle_payment_deleted(sender, instance, **kwargs):
+    """
+    Take a deleted payment's amounts out of the ledger and statistics
+    """
+    record_payment_change(instance, deleted=True)
+    invalidate_stats([instance])
@@ -0,0 +1,153 @@
+"""
+Payment statistics.
+
+All counts and sums of a payment queryset are computed in a single
+conditional-aggregation query, optionally grouped by currency,
+organization and/or month. Results are cached per organization scope
+under a version that is replaced whenever one of its payments is saved
+or deleted (see apps.payments.signals), so stale figures are never
+served after a write.
+"""
+import time
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Payment
+
+# Upper bound on the lifetime of cached statistics, in seconds
+PAYMENT_STATS_CACHE_TIMEOUT = 300
+
+# Scope of staff statistics, which cover every payment
+ALL_PAYMENTS_SCOPE = 'all'
+
+# Grouping dimensions accepted by ``compute_payment_stats``. Project
+# payments belong to their client's organization, subscription payments
+# to the paying organization.
+STATS_GROUPINGS = {
+    'currency': F('currency'),
+    'organization': Coalesce('client__organization', 'organization'),
+    'month': TruncMonth('created_at'),
+}
+
+
+def _stats_aggregates():
+    """Aggregates of the statistics, by output name."""
+    aggregates = {'total_payments': Count('id')}
+    for status, _ in Payment.STATUS_CHOICES:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    aggregates['verified'] = Count('id', filter=Q(verified=True))
+    aggregates['unverified'] = Count('id', filter=Q(verified=False))
+    aggregates['total_amount'] = Coalesce(
+        Sum('amount', filter=Q(status='completed')),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    return aggregates
+
+
+def _group_value(grouping, value):
+    if value is None:
+        return None
+    if grouping == 'month':
+        return value.strftime('%Y-%m')
+    if grouping == 'organization':
+        return str(value)
+    return value
+
+
+def compute_payment_stats(queryset, group_by=(), start=None, end=None):
+    """
+    Compute payment statistics in one query.
+
+    Args:
+        queryset: Payments to compute statistics for
+        group_by: Names from STATS_GROUPINGS to break the statistics down by
+        start: First day (``date``) of payments to include, by creation date
+        end: Last day (``date``) of payments to include, by creation date
+
+    Returns:
+        dict: Count of payments in total, per status and per verification
+        state, and the completed ``total_amount``. With ``group_by`` the
+        totals are returned under ``totals`` and one such dict per group,
+        keyed also by the grouping values, under ``groups``.
+    """
+    if start:
+        queryset = queryset.filter(created_at__date__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__date__lte=end)
+
+    # Aggregates are aliased so they cannot clash with model fields such as ``verified``
+    aggregates = {f'stat_{name}': aggregate for name, aggregate in _stats_aggregates().items()}
+
+    if not group_by:
+        row = queryset.aggregate(**aggregates)
+        return {name[len('stat_'):]: value for name, value in row.items()}
+
+    group_fields = {f'group_{grouping}': STATS_GROUPINGS[grouping] for grouping in group_by}
+    rows = (
+        queryset.order_by()
+        .annotate(**group_fields)
+        .values(*group_fields)
+        .annotate(**aggregates)
+        .order_by(*group_fields)
+    )
+
+    groups = []
+    totals = {name[len('stat_'):]: 0 for name in aggregates}
+    totals['total_amount'] = Decimal('0')
+    for row in rows:
+        group = {grouping: _group_value(grouping, row[f'group_{grouping}']) for grouping in group_by}
+        for name in aggregates:
+            group[name[len('stat_'):]] = row[name]
+            totals[name[len('stat_'):]] += row[name]
+        groups.append(group)
+    return {'totals': totals, 'groups': groups}
+
+
+def _version_key(scope):
+    return f'payments:stats_version:{scope}'
+
+
+def _stats_version(scope):
+    # A missing version (first use or eviction) starts from a fresh timestamp
+    # so entries cached under an earlier version are never matched again
+    return cache.get_or_set(_version_key(scope), time.time_ns, None)
+
+
+def invalidate_payment_stats(organization_ids):
+    """
+    Drop the cached statistics of the given organizations and of staff.
+
+    Args:
+        organization_ids: IDs of organizations whose payments changed;
+            None entries are ignored
+    """
+    scopes = {str(organization_id) for organization_id in organization_ids if organization_id}
+    scopes.add(ALL_PAYMENTS_SCOPE)
+    version = time.time_ns()
+    cache.set_many({_version_key(scope): version for scope in scopes}, None)
+
+
+def get_payment_stats(queryset, scope, group_by=(), start=None, end=None):
+    """
+    Return ``compute_payment_stats`` of a queryset, cached per scope.
+
+    Args:
+        queryset: Payments visible in the scope
+        scope: Organization ID of the queryset, or ALL_PAYMENTS_SCOPE for
+            the unfiltered queryset
+        group_by: See ``compute_payment_stats``
+        start: See ``compute_payment_stats``
+        end: See ``compute_payment_stats``
+    """
+    cache_key = 'payments:stats:{}:{}:{}:{}:{}'.format(
+        scope, _stats_version(scope), ','.join(group_by),
+        start.isoformat() if start else '', end.isoformat() if end else '',
+    )
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute_payment_stats(queryset, group_by, start, end)
+        cache.set(cache_key, result, PAYMENT_STATS_CACHE_TIMEOUT)
+    return result
@@ -1,11 +1,22 @@
+from collections import defaultdict
+from datetime import timedelta
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from .models import Payment
-from apps.notifications.utils import send_notification
+from apps.notifications.utils import deliver_notifications
+from apps.organization.models import OrganizationMember, OrganizationRoleChoices
+from .transitions import can_transition, transition_payment
 
 logger = get_task_logger(__name__)
 
+# Members told about their organization's payments
+PAYMENT_NOTIFICATION_ROLES = (OrganizationRoleChoices.ADMIN, OrganizationRoleChoices.SALESPERSON)
+# Pending payments older than this get a reminder to their organization
+PAYMENT_REMINDER_AFTER_DAYS = 3
+
+
 @shared_task(bind=True, max_retries=3)
 def process_payment_async(self, payment_id):
     """
@@ -13,22 +24,21 @@ def process_payment_async(self, payment_id):
     """
     try:
         payment = Payment.objects.get(id=payment_id)
-        # Simulate payment processing
-        payment.status = 'completed'
-        payment.paid_at = timezone.now()
-        payment.save()
-        
-        # Send payment confirmation
-        if payment.client and payment.client.user:
-            send_notification(
-                recipient=payment.client.user,
-                message=f"Payment of ${payment.amount} has been processed successfully.",
-                notification_type="payment_processed"
-            )
-            
+        if not can_transition(payment.status, 'completed'):
+            # Already processed, or cancelled in the meantime
+            logger.info(f"Payment {payment_id} is {payment.status}, not processing")
+            return f"Payment {payment_id} skipped"
+
+        # Simulate payment processing; the completion hooks stamp
+        # completed_at, book the ledger and notify the organization
+        transition_payment(payment, 'completed', note='Processed automatically')
+
         logger.info(f"Payment {payment_id} processed successfully")
         return f"Payment {payment_id} processed"
-        
+
+    except Payment.DoesNotExist:
+        logger.warning(f"Payment {payment_id} no longer exists")
+        return f"Payment {payment_id} not found"
     except Exception as e:
         logger.error(f"Error processing payment {payment_id}: {str(e)}")
         raise self.retry(exc=e, countdown=60)  # Retry after 60 seconds
@@ -36,26 +46,67 @@ def process_payment_async(self, payment_id):
 @shared_task
 def send_payment_reminder():
     """
-    Send payment reminders for upcoming or overdue payments
+    Remind organization admins and salespeople of payments pending for
+    more than PAYMENT_REMINDER_AFTER_DAYS days
     """
     try:
-        # Find payments due in the next 3 days
-        reminder_date = timezone.now() + timezone.timedelta(days=3)
-        upcoming_payments = Payment.objects.filter(
-            due_date__lte=reminder_date,
-            status='pending'
+        cutoff = timezone.now() - timedelta(days=PAYMENT_REMINDER_AFTER_DAYS)
+        overdue = defaultdict(list)
+        for organization_id, amount, currency, created_at in (
+            Payment.objects.filter(status='pending', created_at__lte=cutoff)
+            .annotate(owner=Coalesce('client__organization', 'organization'))
+            .filter(owner__isnull=False)
+            .values_list('owner', 'amount', 'currency', 'created_at')
+            .iterator()
+        ):
+            overdue[organization_id].append(
+                f"{amount} {currency} pending since {created_at.strftime('%Y-%m-%d')}"
+            )
+
+        members = OrganizationMember.objects.filter(
+            organization_id__in=list(overdue), role__in=PAYMENT_NOTIFICATION_ROLES
+        ).select_related('user')
+        report = deliver_notifications(
+            (
+                member.user,
+                f"Reminder: {len(overdue[member.organization_id])} payment(s) awaiting completion: "
+                + "; ".join(overdue[member.organization_id][:10])
+            )
+            for member in members.iterator()
         )
-        
-        for payment in upcoming_payments:
-            if payment.client and payment.client.user:
-                send_notification(
-                    recipient=payment.client.user,
-                    message=f"Reminder: Payment of ${payment.amount} is due on {payment.due_date.strftime('%Y-%m-%d')}",
-                    notification_type="payment_reminder"
-                )
-                
-        return f"Sent {upcoming_payments.count()} payment reminders"
-        
+
+        return f"Sent {report['sent']} payment reminders"
+
     except Exception as e:
         logger.error(f"Error sending payment reminders: {str(e)}")
         raise
+
+
+@shared_task
+def import_payments_file(import_id):
+    """
+    Run a queued payment import; see apps.payments.imports
+    """
+    from .imports import run_payment_import
+
+    job = run_payment_import(import_id)
+    if job is None:
+        return f"Payment import {import_id} was not queued"
+    return f"Payment import {import_id} {job.status}: {job.rows_imported} imported, {job.rows_failed} failed"
+
+
+@shared_task
+def reconcile_bank_statement(run_id):
+    """
+    Match a queued bank statement against pending payments; see
+    apps.payments.reconciliation
+    """
+    from .reconciliation import run_reconciliation
+
+    run = run_reconciliation(run_id)
+    if run is None:
+        return f"Reconciliation {run_id} was not queued"
+    return (
+        f"Reconciliation {run_id} {run.status}: {run.lines_matched} matched, "
+        f"{run.lines_ambiguous} to review, {run.lines_unmatched} unmatched"
+    )
@@ -1,3 +1,864 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.clients.models import Client
+from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+from apps.notifications.models import OutboxMessage
+from apps.payments.imports import import_payments, run_payment_import
+from apps.payments.models import (
+    Payment, PaymentDailyLedger, PaymentImport, PaymentTransition, ReconciliationRun, StatementLine,
+)
+from apps.payments.reconciliation import (
+    PaymentMatcher, StatementReconciler, build_matcher, reconcile_statement, run_reconciliation,
+)
+from apps.projects.models import Project
+from apps.payments.stats import compute_payment_stats
+from apps.payments.tasks import process_payment_async
+from apps.payments.transitions import InvalidPaymentTransition, bulk_transition_payments, transition_payment
+
+User = get_user_model()
+
+
+def create_payment(client, amount, status='completed', currency='USD', verified=False, created_at=None):
+    return Payment.objects.create(
+        client=client, amount=Decimal(amount), status=status, currency=currency, verified=verified,
+        created_at=created_at or datetime(2026, 9, 15, 12, tzinfo=dt_timezone.utc),
+    )
+
+
+class PaymentStatsTests(TestCase):
+    """Test the single-query payment statistics."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Stats Org')
+        self.other_organization = Organization.objects.create(name='Other Org')
+        self.client_obj = Client.objects.create(name='Stats Client', organization=self.organization)
+        other_client = Client.objects.create(name='Other Client', organization=self.other_organization)
+
+        create_payment(self.client_obj, '100.00', verified=True)
+        create_payment(self.client_obj, '50.50', currency='EUR', verified=True,
+                       created_at=datetime(2026, 10, 2, tzinfo=dt_timezone.utc))
+        create_payment(self.client_obj, '20.00', status='pending')
+        create_payment(self.client_obj, '5.00', status='failed')
+        create_payment(other_client, '999.00',
+                       created_at=datetime(2026, 10, 3, tzinfo=dt_timezone.utc))
+
+    def test_counts_and_sums_in_one_query(self):
+        """All statistics come from a single aggregate query."""
+        with self.assertNumQueries(1):
+            stats = compute_payment_stats(Payment.objects.filter(client__organization=self.organization))
+
+        self.assertEqual(stats['total_payments'], 4)
+        self.assertEqual((stats['pending'], stats['completed'], stats['failed']), (1, 2, 1))
+        self.assertEqual((stats['verified'], stats['unverified']), (2, 2))
+        self.assertEqual(stats['total_amount'], Decimal('150.50'))
+
+    def test_grouped_by_currency_and_month(self):
+        """Grouped statistics are computed in one query and add up to the totals."""
+        with self.assertNumQueries(1):
+            stats = compute_payment_stats(Payment.objects.all(), group_by=['currency', 'month'])
+
+        groups = {(group['currency'], group['month']): group for group in stats['groups']}
+        self.assertEqual(set(groups), {('EUR', '2026-10'), ('USD', '2026-09'), ('USD', '2026-10')})
+        self.assertEqual(groups[('USD', '2026-09')]['total_payments'], 3)
+        self.assertEqual(groups[('USD', '2026-10')]['total_amount'], Decimal('999.00'))
+        self.assertEqual(stats['totals']['total_payments'], 5)
+        self.assertEqual(stats['totals']['total_amount'], Decimal('1149.50'))
+
+    def test_grouped_by_organization(self):
+        """Payments are grouped by their client's organization."""
+        stats = compute_payment_stats(Payment.objects.all(), group_by=['organization'])
+
+        by_organization = {group['organization']: group['total_payments'] for group in stats['groups']}
+        self.assertEqual(by_organization, {str(self.organization.id): 4, str(self.other_organization.id): 1})
+
+    def test_date_range(self):
+        """Only payments created within the range are counted."""
+        stats = compute_payment_stats(
+            Payment.objects.all(),
+            start=datetime(2026, 10, 1).date(), end=datetime(2026, 10, 2).date()
+        )
+
+        self.assertEqual(stats['total_payments'], 1)
+        self.assertEqual(stats['total_amount'], Decimal('50.50'))
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class PaymentStatsApiTests(APITestCase):
+    """Test the cached payment statistics endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.url = reverse('payments:payment-stats')
+        self.organization = Organization.objects.create(name='Stats Org')
+        self.client_obj = Client.objects.create(name='Stats Client', organization=self.organization)
+        other_client = Client.objects.create(
+            name='Other Client', organization=Organization.objects.create(name='Other Org')
+        )
+        self.user = User.objects.create_user(email='member@example.com')
+        OrganizationMember.objects.create(
+            user=self.user, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.payment = create_payment(self.client_obj, '100.00')
+        create_payment(other_client, '999.00')
+        self.client.force_authenticate(self.user)
+
+    def test_members_see_their_organization_and_results_are_cached(self):
+        """A repeated request is served from the cache without payment queries."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_payments'], 1)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('100.00'))
+
+        # Authentication and the membership lookup only
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['total_payments'], 1)
+
+    def test_payment_save_invalidates_cached_stats(self):
+        """Saving a payment of the organization refreshes its statistics."""
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.status = 'refunded'
+            self.payment.save()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data['completed'], 0)
+        self.assertEqual(response.data['refunded'], 1)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('0'))
+
+    def test_group_by_and_date_range_parameters(self):
+        """group_by and the date range are passed through to the statistics."""
+        response = self.client.get(self.url, {'group_by': 'currency', 'start_date': '2026-09-01'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([group['currency'] for group in response.data['groups']], ['USD'])
+
+        response = self.client.get(self.url, {'start_date': '2026-10-01'})
+        self.assertEqual(response.data['total_payments'], 0)
+
+    def test_invalid_parameters(self):
+        """Unknown groupings and inverted ranges are rejected."""
+        response = self.client.get(self.url, {'group_by': 'client'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'start_date': '2026-10-02', 'end_date': '2026-10-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_users_without_membership_get_empty_stats(self):
+        """Users outside any organization see zeros."""
+        self.client.force_authenticate(User.objects.create_user(email='outsider@example.com'))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_payments'], 0)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('0'))
+
+
+def ledger_rows():
+    return {
+        (row.date, row.payment_type, row.currency): (
+            row.completed_count, row.completed_amount, row.refunded_count, row.refunded_amount
+        )
+        for row in PaymentDailyLedger.objects.all()
+    }
+
+
+class PaymentLedgerTests(TestCase):
+    """Test maintenance and rebuilding of the daily payments ledger."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Ledger Org')
+        self.client_obj = Client.objects.create(name='Ledger Client', organization=self.organization)
+        self.day = datetime(2026, 9, 15, 12, tzinfo=dt_timezone.utc)
+
+    def _complete(self, amount, currency='USD'):
+        payment = create_payment(self.client_obj, amount, status='pending', currency=currency)
+        payment.status = 'completed'
+        payment.completed_at = self.day
+        payment.save()
+        return payment
+
+    def test_completion_and_refund_are_booked(self):
+        """Completions and refunds are booked on their own days."""
+        first = self._complete('100.00')
+        self._complete('40.00')
+        self._complete('10.00', currency='EUR')
+        self.assertEqual(ledger_rows(), {
+            (date(2026, 9, 15), 'project', 'USD'): (2, Decimal('140.00'), 0, Decimal('0')),
+            (date(2026, 9, 15), 'project', 'EUR'): (1, Decimal('10.00'), 0, Decimal('0')),
+        })
+
+        first.status = 'refunded'
+        first.refunded_at = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+        first.save()
+        rows = ledger_rows()
+        self.assertEqual(rows[(date(2026, 9, 15), 'project', 'USD')], (2, Decimal('140.00'), 0, Decimal('0')))
+        self.assertEqual(rows[(date(2026, 10, 1), 'project', 'USD')], (0, Decimal('0'), 1, Decimal('100.00')))
+
+    def test_reversed_and_deleted_payments_leave_the_ledger(self):
+        """Leaving the completed state or deleting a payment takes its amount out."""
+        payment = self._complete('100.00')
+        other = self._complete('40.00')
+
+        payment.status = 'failed'
+        payment.save()
+        other.delete()
+
+        self.assertEqual(ledger_rows(), {(date(2026, 9, 15), 'project', 'USD'): (0, Decimal('0'), 0, Decimal('0'))})
+
+    def test_unrelated_changes_do_not_touch_the_ledger(self):
+        """Saving a payment without ledger changes runs no ledger query."""
+        payment = self._complete('100.00')
+        payment.notes = 'Checked'
+
+        # The previous status comes from the field tracker: only the update runs
+        with self.assertNumQueries(1):
+            payment.save()
+
+    def test_backfill_matches_maintained_ledger(self):
+        """Rebuilding in chunks gives the same rows as live maintenance."""
+        self._complete('100.00')
+        refunded = self._complete('25.00')
+        refunded.status = 'refunded'
+        refunded.refunded_at = datetime(2026, 10, 20, tzinfo=dt_timezone.utc)
+        refunded.save()
+        Payment.objects.create(
+            organization=self.organization, amount=Decimal('9.99'), status='completed',
+            payment_type='subscription', completed_at=datetime(2026, 10, 2, tzinfo=dt_timezone.utc)
+        )
+        maintained = ledger_rows()
+        PaymentDailyLedger.objects.all().delete()
+
+        out = StringIO()
+        call_command('backfill_payment_ledger', '--chunk-days', '7', stdout=out)
+
+        self.assertEqual(ledger_rows(), maintained)
+        self.assertIn('Rebuilt 3 ledger row(s) in 6 chunk(s)', out.getvalue())
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class PaymentRevenueApiTests(APITestCase):
+    """Test the revenue time series endpoint."""
+
+    def setUp(self):
+        self.url = reverse('payments:payment-revenue')
+        self.organization = Organization.objects.create(name='Revenue Org')
+        self.other_organization = Organization.objects.create(name='Other Org')
+        for organization, day, amount in (
+            (self.organization, date(2025, 1, 5), '10.00'),
+            (self.organization, date(2025, 1, 20), '15.00'),
+            (self.organization, date(2026, 3, 1), '20.00'),
+            (self.other_organization, date(2025, 1, 5), '99.00'),
+        ):
+            PaymentDailyLedger.objects.create(
+                organization=organization, date=day, payment_type='project', currency='USD',
+                completed_count=1, completed_amount=Decimal(amount),
+            )
+        PaymentDailyLedger.objects.create(
+            organization=self.organization, date=date(2025, 1, 25), payment_type='project', currency='USD',
+            refunded_count=1, refunded_amount=Decimal('5.00'),
+        )
+        self.user = User.objects.create_user(email='finance@example.com')
+        OrganizationMember.objects.create(
+            user=self.user, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+
+    def test_monthly_revenue_of_members_organization(self):
+        """Members get their organization's series from one ledger query."""
+        self.client.force_authenticate(self.user)
+
+        # Membership lookup and the ledger query
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'interval': 'month'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([row['period'] for row in results], ['2025-01-01', '2026-03-01'])
+        self.assertEqual(results[0]['completed_count'], 2)
+        self.assertEqual(results[0]['completed_amount'], Decimal('25.00'))
+        self.assertEqual(results[0]['net_amount'], Decimal('20.00'))
+
+    def test_staff_filters_and_yearly_interval(self):
+        """Staff see every organization unless they filter by one."""
+        self.client.force_authenticate(User.objects.create_user(email='staff@example.com', is_staff=True))
+
+        response = self.client.get(self.url, {'interval': 'year', 'end_date': '2025-12-31'})
+        self.assertEqual(
+            {row['organization']: row['net_amount'] for row in response.data['results']},
+            {str(self.organization.id): Decimal('20.00'), str(self.other_organization.id): Decimal('99.00')}
+        )
+
+        response = self.client.get(self.url, {'interval': 'day', 'organization': str(self.other_organization.id)})
+        self.assertEqual([row['period'] for row in response.data['results']], ['2025-01-05'])
+
+    def test_invalid_interval_and_non_members(self):
+        """Unknown intervals are rejected and non-members are forbidden."""
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url, {'interval': 'hour'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(User.objects.create_user(email='outsider@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PaymentTransitionTests(TestCase):
+    """Test the payment state machine and its hooks."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Transition Org')
+        self.client_obj = Client.objects.create(name='Transition Client', organization=self.organization)
+        self.admin = User.objects.create_user(email='admin@example.com')
+        OrganizationMember.objects.create(
+            user=self.admin, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+
+    def test_transition_is_detected_without_reading_the_payment(self):
+        """The previous status comes from the tracker and the history is written."""
+        payment = create_payment(self.client_obj, '80.00', status='pending')
+
+        with CaptureQueriesContext(connection) as queries:
+            transition_payment(payment, 'completed', actor=self.admin, note='Paid by wire')
+
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and 'FROM "payments_payment"' in q['sql']])
+        self.assertIsNotNone(payment.completed_at)
+        history = list(payment.transitions.values_list('from_status', 'to_status', 'actor', 'note'))
+        self.assertEqual(history, [(None, 'pending', None, ''), ('pending', 'completed', self.admin.id, 'Paid by wire')])
+        self.assertEqual(PaymentDailyLedger.objects.get().completed_amount, Decimal('80.00'))
+
+    def test_disallowed_transitions_are_rejected(self):
+        """Refunded payments cannot be completed again, by save() or by helper."""
+        payment = create_payment(self.client_obj, '80.00')
+        transition_payment(payment, 'refunded')
+
+        with self.assertRaises(InvalidPaymentTransition):
+            transition_payment(payment, 'completed')
+        payment.status = 'pending'
+        with self.assertRaises(InvalidPaymentTransition):
+            payment.save()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'refunded')
+
+    def test_bulk_transition_runs_hooks_once(self):
+        """A bulk transition writes payments and history in one statement each."""
+        for amount in ('10.00', '20.00', '30.00'):
+            create_payment(self.client_obj, amount, status='pending')
+        OutboxMessage.objects.all().delete()
+        payments = list(Payment.objects.filter(status='pending'))
+
+        with CaptureQueriesContext(connection) as queries:
+            transitions = bulk_transition_payments(payments, 'completed', actor=self.admin)
+
+        sql = [q['sql'] for q in queries]
+        self.assertEqual(len(transitions), 3)
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "payments_payment"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "payments_paymenttransition"')]), 1)
+        self.assertEqual(Payment.objects.filter(status='completed', completed_at__isnull=False).count(), 3)
+        self.assertEqual(PaymentDailyLedger.objects.get().completed_amount, Decimal('60.00'))
+        # One summary notification for the organization
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.args, [[str(self.admin.id)], '3 payments completed.'])
+
+    def test_bulk_transition_checks_every_payment_first(self):
+        """One disallowed transition leaves the whole batch untouched."""
+        create_payment(self.client_obj, '10.00', status='pending')
+        create_payment(self.client_obj, '20.00', status='cancelled')
+
+        with self.assertRaises(InvalidPaymentTransition):
+            bulk_transition_payments(Payment.objects.all(), 'completed')
+
+        self.assertFalse(Payment.objects.filter(status='completed').exists())
+
+    def test_process_payment_async(self):
+        """Processing completes pending payments and skips cancelled ones."""
+        payment = create_payment(self.client_obj, '80.00', status='pending')
+        cancelled = create_payment(self.client_obj, '5.00', status='pending')
+        transition_payment(cancelled, 'cancelled')
+
+        process_payment_async(payment.id)
+        process_payment_async(cancelled.id)
+
+        payment.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual((payment.status, cancelled.status), ('completed', 'cancelled'))
+        self.assertIsNotNone(payment.completed_at)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class PaymentTransitionApiTests(APITestCase):
+    """Test status changes made through the payments API."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        organization = Organization.objects.create(name='Api Org')
+        client = Client.objects.create(name='Api Client', organization=organization)
+        self.user = User.objects.create_user(email='verifier@example.com', is_staff=True)
+        OrganizationMember.objects.create(
+            user=self.user, organization=organization, role=OrganizationRoleChoices.VERIFIER
+        )
+        self.payment = create_payment(client, '80.00', status='pending')
+        self.client.force_authenticate(self.user)
+
+    def test_verify_records_transition(self):
+        """Verifying completes the payment and shows up in its history."""
+        response = self.client.post(
+            reverse('payments:payment-verify', args=[self.payment.id]), {'verified': True, 'notes': 'OK'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('payments:payment-transitions', args=[self.payment.id]))
+
+        self.assertEqual(
+            [(row['from_status'], row['to_status']) for row in response.data],
+            [(None, 'pending'), ('pending', 'completed')]
+        )
+        self.assertEqual(response.data[1]['actor_email'], 'verifier@example.com')
+
+    def test_invalid_status_update_is_rejected(self):
+        """Updating to a disallowed status returns 400."""
+        transition_payment(self.payment, 'cancelled')
+
+        response = self.client.patch(
+            reverse('payments:payment-detail', args=[self.payment.id]), {'status': 'completed'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+
+def csv_file(rows, header='amount,currency,client,project,transaction_id,completed_at'):
+    return ('\n'.join([header] + rows) + '\n').encode()
+
+
+class PaymentImportTests(TestCase):
+    """Test the batched payment import."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Import Org')
+        self.client_obj = Client.objects.create(name='Import Client', organization=self.organization)
+        other_client = Client.objects.create(
+            name='Foreign Client', organization=Organization.objects.create(name='Foreign Org')
+        )
+        self.foreign_client_id = other_client.id
+        self.project = Project.objects.create(
+            title='Import Project', description='', cost=100, client=self.client_obj
+        )
+
+    def test_csv_import_reports_row_errors(self):
+        """Valid rows are written and each invalid row is reported by line."""
+        Payment.objects.create(client=self.client_obj, amount=Decimal('1.00'), transaction_id='TX-OLD')
+        data = csv_file([
+            f'100.00,usd,{self.client_obj.id},{self.project.id},TX-1,2026-09-15T10:00:00Z',
+            f'50.00,EUR,{self.client_obj.id},,TX-2,',
+            f'abc,USD,{self.client_obj.id},,TX-3,',
+            f'10.00,USD,{self.foreign_client_id},,TX-4,',
+            f'10.00,USD,{self.client_obj.id},{self.project.id},TX-5,',
+            f'10.00,USD,{self.client_obj.id},,TX-OLD,',
+        ])
+
+        report = import_payments(BytesIO(data), 'csv', organization_id=str(self.organization.id))
+
+        self.assertEqual((report['processed'], report['imported'], report['failed']), (6, 2, 4))
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5, 6, 7])
+        self.assertIn('amount', report['errors'][0]['errors'])
+        self.assertEqual(report['errors'][1]['errors'], {'client': ['Client not found.']})
+        self.assertEqual(report['errors'][2]['errors'], {'project': ['Project already has a payment.']})
+        self.assertIn('transaction_id', report['errors'][3]['errors'])
+
+        payment = Payment.objects.get(transaction_id='TX-1')
+        self.assertEqual((payment.currency, payment.status, payment.organization_id), ('USD', 'completed', self.organization.id))
+        self.assertEqual(payment.completed_at, datetime(2026, 9, 15, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(list(payment.transitions.values_list('from_status', 'to_status', 'note')), [(None, 'completed', 'Imported')])
+        self.assertEqual(
+            PaymentDailyLedger.objects.get(date=date(2026, 9, 15), currency='USD').completed_amount, Decimal('100.00')
+        )
+
+    def test_projects_of_other_organizations_are_rejected(self):
+        """Rows cannot attach payments to another organization's projects."""
+        foreign_project = Project.objects.create(
+            title='Foreign Project', description='', cost=100, client_id=self.foreign_client_id
+        )
+        lines = [
+            json.dumps({'amount': '10.00', 'organization': str(self.organization.id),
+                        'project': str(foreign_project.id), 'payment_type': 'subscription'}),
+            json.dumps({'amount': '10.00', 'organization': str(self.organization.id),
+                        'project': str(self.project.id), 'payment_type': 'subscription'}),
+        ]
+
+        report = import_payments(
+            BytesIO('\n'.join(lines).encode()), 'ndjson', organization_id=str(self.organization.id)
+        )
+
+        self.assertEqual((report['imported'], report['failed']), (1, 1))
+        self.assertEqual(report['errors'][0]['errors'], {'project': ['Project not found.']})
+        self.assertFalse(Payment.objects.filter(project=foreign_project).exists())
+        self.assertEqual(Payment.objects.get().project_id, self.project.id)
+
+        # Staff imports find the project but still need the row to own it
+        report = import_payments(BytesIO(lines[0].encode()), 'ndjson')
+        self.assertEqual(report['errors'][0]['errors'], {'project': ['Project does not belong to the organization.']})
+
+    def test_relations_are_resolved_once_per_batch(self):
+        """Clients are looked up with one query per batch, rows written with one insert."""
+        data = csv_file([f'{index}.00,USD,{self.client_obj.id},,TX-{index},' for index in range(1, 41)])
+
+        with CaptureQueriesContext(connection) as queries:
+            report = import_payments(BytesIO(data), 'csv', batch_size=20)
+
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(report['imported'], 40)
+        self.assertEqual(len([q for q in sql if q.startswith('SELECT') and 'FROM "clients_client"' in q]), 2)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "payments_payment"')]), 2)
+
+    def test_ndjson_import(self):
+        """NDJSON lines are imported; malformed lines are reported."""
+        lines = [
+            json.dumps({'amount': '12.50', 'client': str(self.client_obj.id), 'status': 'pending'}),
+            '{not json',
+            '',
+            json.dumps(['a list']),
+        ]
+        report = import_payments(BytesIO('\n'.join(lines).encode()), 'ndjson')
+
+        self.assertEqual((report['imported'], report['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 4])
+        self.assertEqual(Payment.objects.get().status, 'pending')
+
+    def test_pending_imports_are_not_processed(self):
+        """Imported pending payments await verification instead of being auto-completed."""
+        lines = [
+            json.dumps({'amount': '12.50', 'client': str(self.client_obj.id), 'status': 'pending',
+                        'transaction_id': f'TX-PENDING-{index}'})
+            for index in range(3)
+        ]
+
+        report = import_payments(BytesIO('\n'.join(lines).encode()), 'ndjson')
+
+        self.assertEqual(report['imported'], 3)
+        self.assertFalse(OutboxMessage.objects.filter(task_name=process_payment_async.name).exists())
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'pending'})
+
+    def test_management_command(self):
+        """The command streams a file from disk and prints the report."""
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write(csv_file([f'5.00,USD,{self.client_obj.id},,TX-CMD,', 'bad,USD,,,,']))
+            handle.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_payments', handle.name, stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 of 2 payment(s)', out.getvalue())
+        self.assertIn('Line 3:', err.getvalue())
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class PaymentImportApiTests(APITestCase):
+    """Test the payment import endpoint and import jobs."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.url = reverse('payments:payment-import-payments')
+        self.organization = Organization.objects.create(name='Import Org')
+        self.client_obj = Client.objects.create(name='Import Client', organization=self.organization)
+        self.user = User.objects.create_user(email='importer@example.com')
+        OrganizationMember.objects.create(
+            user=self.user, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, name='payments.csv'):
+        data = csv_file([f'{index}.00,USD,{self.client_obj.id},,TX-{index},' for index in range(1, 4)])
+        return SimpleUploadedFile(name, data, content_type='text/csv')
+
+    def test_small_files_are_imported_in_the_request(self):
+        """The report is returned directly."""
+        response = self.client.post(self.url, {'file': self._upload()}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(PaymentTransition.objects.filter(actor=self.user).count(), 3)
+
+    def test_large_files_run_as_a_job(self):
+        """Large files are queued and their progress can be polled."""
+        OutboxMessage.objects.all().delete()
+        with patch('apps.payments.views.PAYMENT_IMPORT_SYNC_MAX_BYTES', 0):
+            response = self.client.post(self.url, {'file': self._upload()}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'apps.payments.tasks.import_payments_file')
+
+        run_payment_import(*message.args)
+        self.assertIsNone(run_payment_import(*message.args))
+
+        response = self.client.get(reverse('payments:payment-import-status', args=[response.data['id']]))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual((response.data['rows_processed'], response.data['rows_imported']), (3, 3))
+        self.assertEqual(Payment.objects.count(), 3)
+
+    def test_unknown_format_is_rejected(self):
+        """Files that are neither CSV nor NDJSON are rejected."""
+        response = self.client.post(self.url, {'file': self._upload('payments.xlsx')}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def statement_file(rows, header='date,amount,currency,transaction_id,reference'):
+    return ('\n'.join([header] + rows) + '\n').encode()
+
+
+class ReconciliationTests(TestCase):
+    """Test matching bank statements against pending payments."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Reconcile Org')
+        self.acme = Client.objects.create(name='Acme Corp.', email='billing@acme.test', organization=self.organization)
+        self.beta = Client.objects.create(name='Beta Ltd', organization=self.organization)
+        self.user = User.objects.create_user(email='verifier@example.com')
+        self.member = OrganizationMember.objects.create(
+            user=self.user, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.run = ReconciliationRun.objects.create(
+            format='csv', organization=self.organization, created_by=self.user
+        )
+
+    def _payment(self, client, amount, transaction_id=None):
+        payment = create_payment(client, amount, status='pending')
+        if transaction_id:
+            Payment.objects.filter(id=payment.id).update(transaction_id=transaction_id)
+        return payment
+
+    def test_lines_are_matched_verified_or_queued(self):
+        """Unique matches are verified; ambiguous and unmatched lines are kept for review."""
+        by_transaction = self._payment(self.acme, '100.00', transaction_id='TX-A')
+        by_amount = self._payment(self.acme, '250.00')
+        by_reference = self._payment(self.acme, '75.00')
+        other_client = self._payment(self.beta, '75.00')
+        twins = [self._payment(self.acme, '40.00'), self._payment(self.acme, '40.00')]
+        data = statement_file([
+            '2026-09-16,100.00,USD,TX-A,',
+            '2026-09-17,250.00,usd,,',
+            '2026-09-15,75.00,USD,,ACME CORP',
+            '2026-09-15,40.00,USD,,billing@acme.test',
+            '2026-09-30,250.00,USD,,',
+            'yesterday,10.00,USD,,',
+            '2026-09-15,-5.00,USD,,',
+        ])
+
+        report = reconcile_statement(self.run, BytesIO(data))
+
+        self.assertEqual(
+            [report[key] for key in ('processed', 'matched', 'ambiguous', 'unmatched', 'invalid')],
+            [7, 3, 1, 1, 2],
+        )
+        self.assertEqual([error['line'] for error in report['errors']], [7, 8])
+        for payment in (by_transaction, by_amount, by_reference):
+            payment.refresh_from_db()
+            self.assertEqual((payment.status, payment.verified, payment.verified_by), ('completed', True, self.member))
+            self.assertIn(str(self.run.id), payment.transitions.get(to_status='completed').note)
+        other_client.refresh_from_db()
+        self.assertEqual(other_client.status, 'pending')
+
+        lines = {line.line: line for line in StatementLine.objects.filter(run=self.run)}
+        self.assertEqual(lines[2].payment_id, by_transaction.id)
+        self.assertEqual(lines[4].payment_id, by_reference.id)
+        self.assertEqual(lines[5].status, 'ambiguous')
+        self.assertEqual(set(lines[5].candidates), {str(payment.id) for payment in twins})
+        self.assertEqual(lines[6].status, 'unmatched')
+
+    def test_transaction_id_with_other_amount_is_ambiguous(self):
+        """A transaction ID match is only trusted when the amount agrees."""
+        payment = self._payment(self.acme, '100.00', transaction_id='TX-A')
+
+        report = reconcile_statement(self.run, BytesIO(statement_file(['2026-09-15,90.00,USD,TX-A,'])))
+
+        self.assertEqual(report['ambiguous'], 1)
+        self.assertEqual(StatementLine.objects.get().candidates, [str(payment.id)])
+
+    def test_payments_changed_during_the_run_go_to_review(self):
+        """A match whose payment was settled meanwhile is not verified."""
+        payment = self._payment(self.acme, '100.00')
+        matcher = build_matcher(self.organization.id)
+        Payment.objects.filter(id=payment.id).update(status='cancelled')
+
+        reconciler = StatementReconciler(self.run, matcher)
+        reconciler.reconcile_batch([(2, {'date': '2026-09-15', 'amount': '100.00'})])
+
+        line = StatementLine.objects.get()
+        self.assertEqual((line.status, line.payment_id), ('ambiguous', None))
+        self.assertEqual(reconciler.report['ambiguous'], 1)
+
+    def test_batches_are_written_in_bulk(self):
+        """Payments are loaded once; each batch is one update and one insert."""
+        for index in range(1, 41):
+            self._payment(self.acme, f'{index}.00')
+        data = statement_file([f'2026-09-15,{index}.00,USD,,' for index in range(1, 41)])
+
+        with CaptureQueriesContext(connection) as queries:
+            report = reconcile_statement(self.run, BytesIO(data), batch_size=20)
+
+        sql = [query['sql'] for query in queries]
+        self.assertEqual(report['matched'], 40)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "payments_statementline"')]), 2)
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "payments_payment"')]), 2)
+        self.assertEqual(Payment.objects.filter(status='completed', verified=True).count(), 40)
+
+    def _amount_index_reads(self, per_amount, amounts=500):
+        """Match one line per payment and return the amount index entries read per line."""
+        class CountingList(list):
+            reads = 0
+
+            def __getitem__(self, index):
+                CountingList.reads += 1
+                return super().__getitem__(index)
+
+        matcher = PaymentMatcher()
+        # Payments of the same amount are a week apart so the date window tells them apart
+        days = [date(2026, 1, 1) + timedelta(days=7 * (index // amounts)) for index in range(per_amount * amounts)]
+        for index, day in enumerate(days):
+            matcher.add_payment(index, None, Decimal(index % amounts), 'USD', day, index % 300)
+        for client_id in range(300):
+            matcher.add_client(client_id, f'Client {client_id}')
+        matcher.finalize()
+        matcher.by_amount = {key: CountingList(entries) for key, entries in matcher.by_amount.items()}
+
+        outcomes = [
+            matcher.match(Decimal(index % amounts), 'USD', day + timedelta(days=1), reference=f'CLIENT {index % 300}')[0]
+            for index, day in enumerate(days)
+        ]
+        self.assertEqual(outcomes.count('matched'), len(days))
+        return CountingList.reads / len(days)
+
+    def test_matcher_reads_grow_logarithmically(self):
+        """Matching bisects the amount index instead of scanning the payments of an amount."""
+        few = self._amount_index_reads(per_amount=10)
+        many = self._amount_index_reads(per_amount=100)
+
+        # Ten times the payments per amount costs a few more bisection steps, not ten times the reads
+        self.assertLess(many, few + 5)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class ReconciliationApiTests(APITestCase):
+    """Test the reconciliation endpoints and review queue."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.organization = Organization.objects.create(name='Reconcile Org')
+        self.client_obj = Client.objects.create(name='Acme', organization=self.organization)
+        self.user = User.objects.create_user(email='reconciler@example.com')
+        OrganizationMember.objects.create(
+            user=self.user, organization=self.organization, role=OrganizationRoleChoices.ADMIN
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_statement_is_reconciled_by_a_job_and_reviewed(self):
+        """The upload is queued; ambiguous lines are listed and resolved."""
+        twins = [create_payment(self.client_obj, '40.00', status='pending') for _ in range(2)]
+        OutboxMessage.objects.all().delete()
+        upload = SimpleUploadedFile('statement.csv', statement_file(['2026-09-15,40.00,USD,,', '2026-09-16,40.00,USD,,']))
+
+        response = self.client.post(reverse('payments:payment-reconcile'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'apps.payments.tasks.reconcile_bank_statement')
+        run_reconciliation(*message.args)
+        self.assertIsNone(run_reconciliation(*message.args))
+
+        run_id = response.data['id']
+        response = self.client.get(reverse('payments:payment-reconciliation-status', args=[run_id]))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual((response.data['lines_processed'], response.data['lines_ambiguous']), (2, 2))
+
+        response = self.client.get(reverse('payments:payment-reconciliation-review', args=[run_id]))
+        self.assertEqual(response.data['count'], 2)
+        first, second = response.data['results']
+
+        resolve = reverse('payments:payment-resolve-line', args=[first['id']])
+        other_amount = create_payment(self.client_obj, '45.00', status='pending')
+        response = self.client.post(resolve, {'payment': str(other_amount.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('45.00', response.data['error'])
+        response = self.client.post(resolve, {'payment': str(twins[0].id)}, format='json')
+        self.assertEqual(response.data['status'], 'resolved')
+        twins[0].refresh_from_db()
+        self.assertTrue(twins[0].verified)
+        self.assertEqual(self.client.post(resolve, {}, format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.post(
+            reverse('payments:payment-resolve-line', args=[second['id']]), {'payment': str(twins[0].id)}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('payments:payment-resolve-line', args=[second['id']]), {}, format='json')
+        self.assertEqual(response.data['status'], 'dismissed')
+
+    def test_other_organizations_runs_are_hidden(self):
+        """Members only see their organization's reconciliations."""
+        run = ReconciliationRun.objects.create(
+            format='csv', organization=Organization.objects.create(name='Other Org')
+        )
+
+        response = self.client.get(reverse('payments:payment-reconciliation-status', args=[run.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-# Create your tests here.
@@ -0,0 +1,216 @@
+"""
+Payment state machine.
+
+Status changes are checked against ALLOWED_TRANSITIONS and detected with
+the payment's FieldTracker, so no query is needed to know the previous
+status. Before a transition is written its timestamps are stamped; after
+it is written the registered transition hooks run once, with every
+transition of the write:
+
+- ``Payment.save()`` (including ``transition_payment``) makes at most
+  one transition, from the pre_save/post_save receivers in
+  apps.payments.signals; creating a payment is a transition from None.
+- ``bulk_transition_payments`` writes a batch with one ``bulk_update``
+  and runs the hooks once for the whole batch.
+
+Hooks are registered with ``transition_hook`` and receive a list of
+unsaved PaymentTransition rows (``payment``, ``from_status``,
+``to_status``, ``actor``, ``note``); the history hook writes them with
+one ``bulk_create``.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, PaymentTransition
+
+# Statuses a payment may move to from each status
+ALLOWED_TRANSITIONS = {
+    'pending': {'processing', 'completed', 'failed', 'cancelled'},
+    'processing': {'completed', 'failed', 'cancelled'},
+    # A completed payment can still be rejected on verification
+    'completed': {'refunded', 'failed'},
+    'failed': {'pending', 'processing', 'completed'},
+    'refunded': set(),
+    'cancelled': set(),
+}
+
+_hooks = []
+
+
+class InvalidPaymentTransition(ValueError):
+    """A status change that is not in ALLOWED_TRANSITIONS."""
+
+    def __init__(self, from_status, to_status):
+        self.from_status = from_status
+        self.to_status = to_status
+        super().__init__(f"Payment cannot move from {from_status} to {to_status}")
+
+
+def can_transition(from_status, to_status):
+    """Return whether a payment may move between two statuses."""
+    return to_status in ALLOWED_TRANSITIONS.get(from_status, ())
+
+
+def check_transition(from_status, to_status):
+    """Raise InvalidPaymentTransition unless the status change is allowed."""
+    if from_status != to_status and not can_transition(from_status, to_status):
+        raise InvalidPaymentTransition(from_status, to_status)
+
+
+def transition_hook(source=None, target=None):
+    """
+    Register a function to run after payment transitions are written.
+
+    Args:
+        source: Status or statuses transitions must come from (None for
+            any, including creations, whose ``from_status`` is None)
+        target: Status or statuses transitions must go to (None for any)
+
+    The function receives the matching PaymentTransition rows of one
+    write, in order; it runs inside the writing transaction.
+
+    Example::
+
+        @transition_hook(target='completed')
+        def notify_completed(transitions):
+            ...
+    """
+    sources = {source} if isinstance(source, str) else set(source) if source else None
+    targets = {target} if isinstance(target, str) else set(target) if target else None
+
+    def register(func):
+        _hooks.append((sources, targets, func))
+        return func
+    return register
+
+
+def stamp_transition(payment, now=None):
+    """
+    Set the timestamps of a payment's pending changes: ``completed_at``
+    and ``refunded_at`` on entering those statuses, ``verified_at`` when
+    it is verified.
+    """
+    now = now or timezone.now()
+    if payment.status == 'completed' and not payment.completed_at:
+        payment.completed_at = now
+    if payment.status == 'refunded' and not payment.refunded_at:
+        payment.refunded_at = now
+    if payment.verified and not payment.verified_at:
+        payment.verified_at = now
+
+
+def prepare_transition(payment):
+    """
+    Check and stamp a payment about to be saved; see the pre_save receiver
+    in apps.payments.signals.
+    """
+    if not payment._state.adding and payment.tracker.has_changed('status'):
+        check_transition(payment.tracker.previous('status'), payment.status)
+    stamp_transition(payment)
+
+
+def pending_transition(payment, created=False):
+    """
+    Return the PaymentTransition for a just saved payment, or None if its
+    status did not change.
+    """
+    if not created and not payment.tracker.has_changed('status'):
+        return None
+    actor, note = payment.__dict__.pop('_transition_context', (None, ''))
+    return PaymentTransition(
+        payment=payment,
+        from_status=None if created else payment.tracker.previous('status'),
+        to_status=payment.status,
+        actor=actor,
+        note=note,
+    )
+
+
+def run_transition_hooks(transitions):
+    """
+    Run every registered hook with the transitions it matches.
+    """
+    for sources, targets, func in _hooks:
+        matching = [
+            item for item in transitions
+            if (sources is None or item.from_status in sources)
+            and (targets is None or item.to_status in targets)
+        ]
+        if matching:
+            func(matching)
+
+
+def transition_payment(payment, status, actor=None, note='', **changes):
+    """
+    Move a payment to a new status and save it.
+
+    Args:
+        payment: The payment
+        status: Target status
+        actor: User making the transition, recorded in the history
+        note: Note recorded in the history
+        **changes: Other fields to set in the same save
+
+    Returns:
+        Payment: The saved payment
+
+    Raises:
+        InvalidPaymentTransition: If the transition is not allowed
+    """
+    if not payment._state.adding:
+        check_transition(payment.tracker.previous('status'), status)
+    payment.status = status
+    for field, value in changes.items():
+        setattr(payment, field, value)
+    payment._transition_context = (actor, note)
+    payment.save()
+    return payment
+
+
+def bulk_transition_payments(payments, status, actor=None, note='', **changes):
+    """
+    Move many payments to a status with one ``bulk_update`` and one run
+    of the transition hooks.
+
+    No post_save signals are sent; the hooks keep the history, ledger,
+    statistics and notifications up to date instead. Payments already in
+    ``status`` are left out.
+
+    Args:
+        payments: Payments loaded with their tracker (e.g. from a queryset)
+        status: Target status
+        actor: User making the transitions, recorded in the history
+        note: Note recorded in the history
+        **changes: Other fields to set on every payment
+
+    Returns:
+        list: The PaymentTransition rows written
+
+    Raises:
+        InvalidPaymentTransition: If any payment may not move to ``status``;
+            nothing is written then
+    """
+    payments = [payment for payment in payments if payment.status != status]
+    for payment in payments:
+        check_transition(payment.status, status)
+
+    now = timezone.now()
+    transitions = []
+    for payment in payments:
+        transitions.append(PaymentTransition(
+            payment=payment, from_status=payment.status, to_status=status, actor=actor, note=note,
+            created_at=now,
+        ))
+        payment.status = status
+        for field, value in changes.items():
+            setattr(payment, field, value)
+        stamp_transition(payment, now)
+        payment.updated_at = now
+
+    fields = ['status', 'completed_at', 'refunded_at', 'verified_at', 'updated_at', *changes]
+    with transaction.atomic():
+        Payment.objects.bulk_update(payments, fields, batch_size=500)
+        run_transition_hooks(transitions)
+    for payment in payments:
+        payment.tracker.set_saved_fields()
+    return transitions
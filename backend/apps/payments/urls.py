@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import PaymentViewSet
+from .views import PaymentRevenueView, PaymentViewSet
 from django.urls import path, include
 
 # Define the application namespace
@@ -9,5 +9,6 @@ router = DefaultRouter()
 router.register(r'payments', PaymentViewSet)
 
 urlpatterns = [
+    path('revenue/', PaymentRevenueView.as_view(), name='payment-revenue'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
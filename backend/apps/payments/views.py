@@ -1,10 +1,13 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q
 from django.utils import timezone
 
-from .models import Payment
+from .models import Payment, PaymentImport, ReconciliationRun, StatementLine
 from .serializers import (
     PaymentSerializer, 
     PaymentListSerializer, 
@@ -12,11 +15,36 @@ from .serializers import (
     PaymentCreateSerializer,
     PaymentVerifySerializer,
     SubscriptionPaymentSerializer,
-    SubscriptionPaymentCreateSerializer
+    SubscriptionPaymentCreateSerializer,
+    PaymentStatsQuerySerializer,
+    PaymentRevenueQuerySerializer,
+    PaymentTransitionSerializer,
+    PaymentImportSerializer,
+    ReconciliationRunSerializer,
+    StatementLineSerializer,
+    StatementLineResolveSerializer
 )
+from .imports import PAYMENT_IMPORT_SYNC_MAX_BYTES, detect_format, import_payments
+from .ledger import revenue_series
+from .reconciliation import StatementLineMismatch, reconcilable_payments, resolve_statement_line
+from .tasks import import_payments_file, reconcile_bank_statement
+from apps.notifications.outbox import enqueue_task
+from .transitions import InvalidPaymentTransition, transition_payment
+from .stats import ALL_PAYMENTS_SCOPE, compute_payment_stats, get_payment_stats
 from apps.users.permissions import IsAdmin, IsOrganizationMember
 from apps.organization.models import OrganizationMember, OrganizationRoleChoices
 
+
+def payment_scope(user):
+    """
+    Return whose payments a user may aggregate: ALL_PAYMENTS_SCOPE for
+    staff, the ID of the user's organization for members, else None.
+    """
+    if user.is_staff or user.is_superuser:
+        return ALL_PAYMENTS_SCOPE
+    return OrganizationMember.objects.filter(user=user).values_list('organization_id', flat=True).first()
+
+
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
@@ -83,6 +111,12 @@ class PaymentViewSet(viewsets.ModelViewSet):
         
         serializer.save(organization=organization, processed_by=processed_by)
     
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except InvalidPaymentTransition as e:
+            raise ValidationError({'status': [str(e)]})
+
     def get_serializer_class(self):
         """Return appropriate serializer class based on action"""
         if self.action == 'list':
@@ -114,21 +148,22 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Update payment
-            payment.verified = verified
-            payment.verified_by = verifier
-            payment.verified_at = timezone.now()
-            
-            if verified:
-                payment.status = 'completed'
-                payment.completed_at = timezone.now()
-            else:
-                payment.status = 'failed'
-            
+            # Move the payment through the state machine, which stamps
+            # completed_at and records the transition in its history
             if notes:
                 payment.notes = f"{payment.notes}\n\nVerification notes: {notes}" if payment.notes else f"Verification notes: {notes}"
-            
-            payment.save()
+            try:
+                transition_payment(
+                    payment,
+                    'completed' if verified else 'failed',
+                    actor=request.user,
+                    note=notes,
+                    verified=verified,
+                    verified_by=verifier,
+                    verified_at=timezone.now(),
+                )
+            except InvalidPaymentTransition as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response(
                 PaymentDetailSerializer(payment).data,
@@ -137,6 +172,15 @@ class PaymentViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get'], url_path='transitions')
+    def transitions(self, request, pk=None):
+        """Get the status history of a payment"""
+        payment = self.get_object()
+        serializer = PaymentTransitionSerializer(
+            payment.transitions.select_related('actor'), many=True
+        )
+        return Response(serializer.data)
+
     @action(detail=False, methods=['get'], url_path='pending')
     def pending(self, request):
         """Get all pending payments"""
@@ -146,21 +190,193 @@ class PaymentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
-        """Get payment statistics"""
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total_payments': queryset.count(),
-            'pending': queryset.filter(status='pending').count(),
-            'completed': queryset.filter(status='completed').count(),
-            'failed': queryset.filter(status='failed').count(),
-            'verified': queryset.filter(verified=True).count(),
-            'unverified': queryset.filter(verified=False).count(),
-            'total_amount': sum(p.amount for p in queryset.filter(status='completed')),
-        }
-        
-        return Response(stats)
+        """
+        Get payment statistics
+
+        Query parameters:
+        - group_by: comma separated currency, organization and/or month
+        - start_date, end_date: creation date range (YYYY-MM-DD, inclusive)
+        """
+        query = PaymentStatsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+        group_by = params.get('group_by') or []
+        start, end = params.get('start_date'), params.get('end_date')
+
+        scope = payment_scope(request.user)
+        if scope is None:
+            # No membership: nothing to count, and nothing worth caching
+            return Response(compute_payment_stats(Payment.objects.none(), group_by, start, end))
+
+        queryset = Payment.objects.all()
+        if scope != ALL_PAYMENTS_SCOPE:
+            queryset = queryset.filter(client__organization_id=scope)
+        return Response(get_payment_stats(queryset, str(scope), group_by, start, end))
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_payments(self, request):
+        """
+        Import payments from a CSV or NDJSON file
+
+        Form fields:
+        - file: the file; CSV needs a header row with the payment fields
+        - file_format: csv or ndjson (default: from the file extension)
+
+        Small files are imported right away and the import report is
+        returned; larger ones are imported by a background job whose
+        progress is read from imports/<id>/.
+        """
+        scope = payment_scope(request.user)
+        if scope is None:
+            return Response(
+                {'error': 'Only organization members can import payments'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in dict(PaymentImport.FORMAT_CHOICES):
+            return Response(
+                {'error': 'Unknown file format; use csv or ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        organization_id = None if scope == ALL_PAYMENTS_SCOPE else scope
+
+        if upload.size <= PAYMENT_IMPORT_SYNC_MAX_BYTES:
+            report = import_payments(upload, file_format, organization_id=organization_id, actor=request.user)
+            return Response(report, status=status.HTTP_200_OK)
+
+        job = PaymentImport.objects.create(
+            file=upload, format=file_format, organization_id=organization_id, created_by=request.user
+        )
+        enqueue_task(import_payments_file, str(job.id))
+        return Response(PaymentImportSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'imports/(?P<import_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def import_status(self, request, import_id=None):
+        """Get the progress of a payment import job"""
+        jobs = PaymentImport.objects.all()
+        if not (request.user.is_staff or request.user.is_superuser):
+            jobs = jobs.filter(created_by=request.user)
+        job = jobs.filter(id=import_id).first()
+        if job is None:
+            return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PaymentImportSerializer(job).data)
+
+    def _reconciliation_runs(self, request):
+        runs = ReconciliationRun.objects.all()
+        scope = payment_scope(request.user)
+        if scope is None:
+            return runs.none()
+        if scope != ALL_PAYMENTS_SCOPE:
+            runs = runs.filter(organization_id=scope)
+        return runs
+
+    @action(detail=False, methods=['post'], url_path='reconcile', parser_classes=[MultiPartParser, FormParser])
+    def reconcile(self, request):
+        """
+        Reconcile a bank statement against pending payments
+
+        Form fields:
+        - file: the statement; one line per credit with date, amount,
+          currency and optional transaction_id, reference (client name,
+          email or ID) and description
+        - file_format: csv or ndjson (default: from the file extension)
+
+        The statement is matched by a background job whose progress is read
+        from reconciliations/<id>/; ambiguous lines are listed for review
+        at reconciliations/<id>/review/.
+        """
+        scope = payment_scope(request.user)
+        if scope is None:
+            return Response(
+                {'error': 'Only organization members can reconcile payments'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in dict(ReconciliationRun.FORMAT_CHOICES):
+            return Response(
+                {'error': 'Unknown file format; use csv or ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        run = ReconciliationRun.objects.create(
+            file=upload,
+            format=file_format,
+            organization_id=None if scope == ALL_PAYMENTS_SCOPE else scope,
+            created_by=request.user,
+        )
+        enqueue_task(reconcile_bank_statement, str(run.id))
+        return Response(ReconciliationRunSerializer(run).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'reconciliations/(?P<run_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def reconciliation_status(self, request, run_id=None):
+        """Get the progress of a bank statement reconciliation"""
+        run = self._reconciliation_runs(request).filter(id=run_id).first()
+        if run is None:
+            return Response({'error': 'Reconciliation not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ReconciliationRunSerializer(run).data)
+
+    @action(detail=False, methods=['get'], url_path=r'reconciliations/(?P<run_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/review')
+    def reconciliation_review(self, request, run_id=None):
+        """
+        List the statement lines of a reconciliation queued for review
+
+        Query parameters:
+        - status: ambiguous (default), unmatched, matched, resolved or dismissed
+        """
+        run = self._reconciliation_runs(request).filter(id=run_id).first()
+        if run is None:
+            return Response({'error': 'Reconciliation not found'}, status=status.HTTP_404_NOT_FOUND)
+        line_status = request.query_params.get('status', 'ambiguous')
+        if line_status not in dict(StatementLine.STATUS_CHOICES):
+            return Response({'error': 'Unknown line status'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = run.lines.filter(status=line_status)
+        page = self.paginate_queryset(lines)
+        if page is not None:
+            return self.get_paginated_response(StatementLineSerializer(page, many=True).data)
+        return Response(StatementLineSerializer(lines, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path=r'reconciliations/lines/(?P<line_id>[0-9]+)/resolve')
+    def resolve_line(self, request, line_id=None):
+        """
+        Resolve a statement line queued for review: verify and complete the
+        payment it pays, or dismiss it when no payment is given
+        """
+        line = StatementLine.objects.select_related('run').filter(
+            id=line_id,
+            run__in=self._reconciliation_runs(request),
+            status__in=('ambiguous', 'unmatched'),
+        ).first()
+        if line is None:
+            return Response({'error': 'Statement line not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = StatementLineResolveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        payment = None
+        payment_id = serializer.validated_data.get('payment')
+        if payment_id:
+            payment = reconcilable_payments(line.run.organization_id).filter(id=payment_id).first()
+            if payment is None:
+                return Response(
+                    {'error': 'Payment not found or already verified'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        try:
+            resolve_statement_line(
+                line, payment, actor=request.user, allow_mismatch=serializer.validated_data['allow_mismatch']
+            )
+        except (StatementLineMismatch, InvalidPaymentTransition) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(StatementLineSerializer(line).data)
+
     @action(detail=False, methods=['get'], url_path='subscriptions')
     def subscription_payments(self, request):
         """Get all subscription payments"""
@@ -181,3 +397,40 @@ class PaymentViewSet(viewsets.ModelViewSet):
             )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class PaymentRevenueView(APIView):
+    """
+    Revenue time series from the daily payments ledger
+
+    Query parameters:
+    - interval: day, week, month (default), quarter or year
+    - start_date, end_date: date range (YYYY-MM-DD, inclusive)
+    - organization: organization ID (staff only; members always get their own)
+    - payment_type, currency: optional filters
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = PaymentRevenueQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        scope = payment_scope(request.user)
+        if scope is None:
+            return Response(
+                {'error': 'Only organization members can view revenue'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        organization_id = params.get('organization') if scope == ALL_PAYMENTS_SCOPE else scope
+
+        series = revenue_series(
+            params['interval'],
+            start=params.get('start_date'),
+            end=params.get('end_date'),
+            organization_id=organization_id,
+            payment_type=params.get('payment_type'),
+            currency=params.get('currency'),
+        )
+        return Response({'interval': params['interval'], 'results': series})
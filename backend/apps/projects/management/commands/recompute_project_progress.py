@@ -0,0 +1,29 @@
+"""
+Management command to repair denormalized project task counters and progress.
+"""
+from django.core.management.base import BaseCommand
+from apps.projects.utils import recompute_task_counters
+
+class Command(BaseCommand):
+    help = 'Recompute Project.task_count, completed_task_count and progress from tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            action='append',
+            dest='project_ids',
+            help='Only recompute the given project ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of projects recomputed per query batch (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        changed = recompute_task_counters(
+            project_ids=options['project_ids'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f"Repaired counters on {changed} project(s)"))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:36
+
+from django.db import migrations, models
+
+
+def backfill_task_counters(apps, schema_editor):
+    """Populate the new task counters from existing tasks."""
+    from django.db.models import Count, Q
+
+    Project = apps.get_model('projects', 'Project')
+    Task = apps.get_model('tasks', 'Task')
+
+    counts = Task.objects.values('project_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+    ).order_by()
+
+    projects = []
+    for row in counts:
+        projects.append(Project(
+            pk=row['project_id'],
+            task_count=row['total'],
+            completed_task_count=row['completed'],
+            progress=row['completed'] * 100 // row['total'] if row['total'] else 0,
+        ))
+    Project.objects.bulk_update(
+        projects, ['task_count', 'completed_task_count', 'progress'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_project_team_members_alter_project_salesperson'),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='completed_task_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of completed tasks in this project'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Percentage of completed tasks (0-100)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of tasks in this project'),
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:42
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Reminder offsets before the deadline (7d, 24h, overdue) as of this migration
+REMINDER_OFFSETS = (datetime.timedelta(days=7), datetime.timedelta(hours=24), datetime.timedelta(0))
+
+
+def first_reminder(due_at, now):
+    """The latest reminder already due, else the first one."""
+    stage = 0
+    for index, offset in enumerate(REMINDER_OFFSETS):
+        if due_at - offset <= now:
+            stage = index
+    return stage, due_at - REMINDER_OFFSETS[stage]
+
+
+def schedule_existing_reminders(apps, schema_editor):
+    """Schedule reminders for open projects that already have a deadline."""
+    Project = apps.get_model('projects', 'Project')
+    now = timezone.now()
+    projects = []
+    for project in Project.objects.filter(
+        deadline__isnull=False, status__in=('planning', 'in_progress')
+    ).only('id', 'deadline').iterator(chunk_size=1000):
+        deadline_at = timezone.make_aware(
+            datetime.datetime.combine(project.deadline, datetime.time.min)
+        ) + datetime.timedelta(days=1)
+        project.reminder_stage, project.next_reminder_at = first_reminder(deadline_at, now)
+        projects.append(project)
+    Project.objects.bulk_update(projects, ['reminder_stage', 'next_reminder_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_initial'),
+        ('organization', '0007_seed_subscription_plans'),
+        ('projects', '0003_project_task_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='reminder_stage',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('next_reminder_at__isnull', False)), fields=['next_reminder_at'], name='project_reminder_due_idx'),
+        ),
+        migrations.RunPython(schedule_existing_reminders, migrations.RunPython.noop),
+    ]
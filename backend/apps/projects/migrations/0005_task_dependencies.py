@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_deadline_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='schedule_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def recount_completed_tasks(apps, schema_editor):
+    """Recount completed tasks now that approved tasks count as completed."""
+    from django.db.models import Count, Q
+
+    Project = apps.get_model('projects', 'Project')
+    Task = apps.get_model('tasks', 'Task')
+
+    # Only projects holding approved tasks have drifted
+    project_ids = Task.objects.filter(status='approved').values('project_id').distinct()
+    counts = Task.objects.filter(project_id__in=project_ids).values('project_id').order_by().annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status__in=('completed', 'approved'))),
+    )
+    projects = []
+    for row in counts:
+        projects.append(Project(
+            pk=row['project_id'],
+            task_count=row['total'],
+            completed_task_count=row['completed'],
+            progress=row['completed'] * 100 // row['total'] if row['total'] else 0,
+        ))
+    Project.objects.bulk_update(
+        projects, ['task_count', 'completed_task_count', 'progress'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_task_dependencies'),
+        ('tasks', '0006_workload_due_windows_at_read_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_completed_tasks, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+import datetime
 import uuid
 from django.db import models
 from django.utils import timezone
@@ -84,10 +85,28 @@ class Project(models.Model):
         related_name='team_projects',  # Changed from default
         blank=True
     )
-    tracker = FieldTracker(fields=['status'])
+    # Denormalized task counters, kept in sync by apps.tasks.signals
+    task_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of tasks in this project"
+    )
+    completed_task_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of completed tasks in this project"
+    )
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Percentage of completed tasks (0-100)"
+    )
+    # Bumped whenever the task graph changes; keys the cached critical path
+    schedule_version = models.PositiveIntegerField(default=0, editable=False)
+    tracker = FieldTracker(fields=['status', 'deadline'])
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Deadline reminder schedule, see apps.notifications.reminders
+    next_reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_stage = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.title} ({self.client.name})"
@@ -98,18 +117,26 @@ class Project(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
             models.Index(fields=['is_verified']),
+            models.Index(
+                fields=['next_reminder_at'],
+                name='project_reminder_due_idx',
+                condition=models.Q(next_reminder_at__isnull=False)
+            ),
         ]
         
+    @property
+    def deadline_at(self):
+        """The deadline as an aware datetime (end of the deadline day)."""
+        if not self.deadline:
+            return None
+        return timezone.make_aware(
+            datetime.datetime.combine(self.deadline, datetime.time.min)
+        ) + datetime.timedelta(days=1)
+
     @property
     def total_tasks(self):
-        return self.tasks.count()
+        return self.task_count
         
     @property
     def completed_tasks(self):
-        return self.tasks.filter(status='completed').count()
-        
-    @property
-    def progress(self):
-        if self.total_tasks == 0:
-            return 0
-        return int((self.completed_tasks / self.total_tasks) * 100)
\ No newline at end of file
+        return self.completed_task_count
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Project  # Only import Project from current app
 from apps.tasks.models import Task
@@ -16,6 +17,18 @@ class ClientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         ref_name = 'projects.Client'  # Unique ref_name to avoid conflicts
 
+def _member_summary(member):
+    """Compact representation of an OrganizationMember (expects user to be loaded)."""
+    if member is None:
+        return None
+    return {
+        'id': member.id,
+        'name': str(member.user.get_full_name() or member.user.username),
+        'email': member.user.email,
+        'role': member.get_role_display()
+    }
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     """
     Serializer for Project model with primary key relationships.
@@ -42,28 +55,20 @@ class ProjectSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'status', 'cost', 'discount',
             'start_date', 'deadline', 'client', 'salesperson', 'project_manager',
             'project_manager_id', 'verifier', 'is_verified', 'created_at', 
-            'updated_at', 'completed_at', 'organization', 'team_members'
+            'updated_at', 'completed_at', 'organization', 'team_members',
+            'task_count', 'completed_task_count', 'progress'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'updated_at', 'completed_at', 'is_verified',
+            'task_count', 'completed_task_count', 'progress'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'completed_at', 'is_verified']
         depth = 1
 
     def get_team_members(self, obj):
-        return [{
-            'id': member.id,
-            'name': str(member.user.get_full_name() or member.user.username),
-            'email': member.user.email,
-            'role': member.get_role_display()
-        } for member in obj.team_members.all()]
+        return [_member_summary(member) for member in obj.team_members.all()]
 
     def get_project_manager(self, obj):
-        if obj.project_manager:
-            return {
-                'id': obj.project_manager.id,
-                'name': str(obj.project_manager.user.get_full_name() or obj.project_manager.user.username),
-                'email': obj.project_manager.user.email,
-                'role': obj.project_manager.get_role_display()
-            }
-        return None
+        return _member_summary(obj.project_manager)
         
     def create(self, validated_data):
         """
@@ -94,22 +99,68 @@ class ProjectSerializer(serializers.ModelSerializer):
             
         return data
     
-    def to_representation(self, instance):
-        """
-        Custom representation to include project manager and team members details.
-        """
-        representation = super().to_representation(instance)
-        
-        # Add project manager details if exists
-        if instance.project_manager:
-            representation['project_manager'] = {
-                'id': instance.project_manager.id,
-                'name': str(instance.project_manager.user.get_full_name() or instance.project_manager.user.username),
-                'email': instance.project_manager.user.email,
-                'role': instance.project_manager.get_role_display()
-            }
-            
-        return representation
+
+class ProjectListSerializer(serializers.ModelSerializer):
+    """
+    Read-only, list-optimized Project serializer.
+
+    Every relation it renders is covered by ``setup_eager_loading`` so a page
+    of projects costs a constant number of queries regardless of its size.
+    """
+    client = serializers.SerializerMethodField()
+    salesperson = serializers.SerializerMethodField()
+    project_manager = serializers.SerializerMethodField()
+    project_manager_id = serializers.UUIDField(read_only=True)
+    verifier = serializers.SerializerMethodField()
+    organization = serializers.UUIDField(source='client.organization_id', read_only=True)
+    team_members = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Project
+        fields = [
+            'id', 'title', 'description', 'status', 'cost', 'discount',
+            'start_date', 'deadline', 'client', 'salesperson', 'project_manager',
+            'project_manager_id', 'verifier', 'is_verified', 'created_at',
+            'updated_at', 'completed_at', 'organization', 'team_members',
+            'task_count', 'completed_task_count', 'progress'
+        ]
+        read_only_fields = fields
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Apply the select/prefetch plan required by this serializer."""
+        return queryset.select_related(
+            'client',
+            'project_manager__user',
+            'salesperson__user',
+            'verifier__user',
+        ).prefetch_related(
+            Prefetch(
+                'team_members',
+                queryset=OrganizationMember.objects.select_related('user')
+            )
+        )
+
+    def get_client(self, obj):
+        return {
+            'id': obj.client.id,
+            'name': obj.client.name,
+            'organization_id': obj.client.organization_id
+        }
+
+    def get_salesperson(self, obj):
+        return _member_summary(obj.salesperson)
+
+    def get_project_manager(self, obj):
+        return _member_summary(obj.project_manager)
+
+    def get_verifier(self, obj):
+        return _member_summary(obj.verifier)
+
+    def get_team_members(self, obj):
+        return [_member_summary(member) for member in obj.team_members.all()]
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """
     Serializer for Task model with primary key relationships.
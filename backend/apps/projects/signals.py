@@ -2,7 +2,10 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from .models import Project
-from .tasks import update_project_progress, check_project_deadlines, generate_project_report
+from .tasks import update_project_progress, generate_project_report
+from apps.notifications.outbox import enqueue_task
+from apps.notifications.reminders import PROJECT_REMINDER_OFFSETS, save_rescheduled_reminder, schedule_reminder
+from .utils import ACTIVE_PROJECT_STATUSES
 
 @receiver(post_save, sender=Project)
 def handle_project_updates(sender, instance, created, **kwargs):
@@ -11,19 +14,37 @@ def handle_project_updates(sender, instance, created, **kwargs):
     """
     if created:
         # For new projects, schedule a progress update
-        update_project_progress.delay(instance.id)
-        
-        # Schedule deadline check for new projects
-        if instance.deadline:
-            check_project_deadlines.delay()
+        enqueue_task(update_project_progress, instance.id)
     else:
         # For updates, check if important fields changed
         if instance.tracker.has_changed('status'):
-            update_project_progress.delay(instance.id)
+            enqueue_task(update_project_progress, instance.id)
             
             # If project is marked as completed, generate a report
             if instance.status == 'completed':
-                generate_project_report.delay(instance.id)
+                enqueue_task(generate_project_report, instance.id)
+
+@receiver(pre_save, sender=Project)
+def schedule_project_deadline_reminder(sender, instance, **kwargs):
+    """
+    Maintain the project's next_reminder_at when its deadline or status changes.
+    The reminders themselves are sent by the check_project_deadlines beat job.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'deadline', 'status'} & set(update_fields):
+        return
+    was_active = instance.tracker.previous('status') in ACTIVE_PROJECT_STATUSES
+    is_active = instance.status in ACTIVE_PROJECT_STATUSES
+    if instance._state.adding or instance.tracker.has_changed('deadline') or was_active != is_active:
+        schedule_reminder(instance, instance.deadline_at, PROJECT_REMINDER_OFFSETS, is_active)
+        instance._reminder_rescheduled = True
+
+@receiver(post_save, sender=Project)
+def save_project_deadline_reminder(sender, instance, update_fields=None, **kwargs):
+    """
+    Write a schedule changed by a save whose update_fields omitted it.
+    """
+    save_rescheduled_reminder(instance, update_fields)
 
 @receiver(post_delete, sender=Project)
 def cleanup_after_project_deletion(sender, instance, **kwargs):
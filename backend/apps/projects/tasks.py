@@ -1,43 +1,29 @@
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from django.utils import timezone
+from django.db.models import Prefetch
 from .models import Project
-from apps.notifications.utils import send_notification
+from apps.notifications.debounce import debounced_task
+from apps.notifications.utils import deliver_notifications
+from apps.notifications.reminders import PROJECT_REMINDER_OFFSETS, dispatch_due_reminders
+from apps.organization.models import OrganizationMember
 from apps.tasks.models import Task
+from .utils import ACTIVE_PROJECT_STATUSES, recompute_task_counters
 
 logger = get_task_logger(__name__)
 
-@shared_task(bind=True, max_retries=3)
+@debounced_task(key=lambda project_id: str(project_id), bind=True, max_retries=3)
 def update_project_progress(self, project_id):
     """
-    Update project progress based on tasks completion
+    Recompute a project's denormalized task counters and progress.
+    Debounced per project: bursts of enqueues result in one run.
     """
     try:
-        project = Project.objects.get(id=project_id)
-        
-        # Calculate progress based on tasks
-        total_tasks = Task.objects.filter(project=project).count()
-        if total_tasks == 0:
-            return "No tasks found for project"
-            
-        completed_tasks = Task.objects.filter(
-            project=project,
-            status__in=['completed', 'approved']
-        ).count()
-        
-        new_progress = int((completed_tasks / total_tasks) * 100)
-        
-        # Only update if progress changed
-        if project.progress != new_progress:
-            project.progress = new_progress
-            project.save()
-            
-            # Log progress update
-            logger.info(f"Project {project_id} progress updated to {new_progress}% (status: {project.status})")
+        if recompute_task_counters([project_id]):
+            project = Project.objects.only('progress', 'status').get(id=project_id)
+            logger.info(f"Project {project_id} progress updated to {project.progress}% (status: {project.status})")
+            return f"Updated project {project_id} progress to {project.progress}%"
             
-            logger.info(f"Updated project {project_id} progress to {new_progress}%")
-            
-        return f"Updated project {project_id} progress to {new_progress}%"
+        return f"Project {project_id} progress already up to date"
         
     except Exception as e:
         logger.error(f"Error updating project progress {project_id}: {str(e)}")
@@ -57,39 +43,47 @@ def generate_project_report(project_id):
         logger.error(f"Error generating project report {project_id}: {str(e)}")
         raise
 
+PROJECT_REMINDER_MESSAGES = {
+    '7d': "Project '{title}' is approaching its deadline on {deadline}",
+    '24h': "Project '{title}' is due tomorrow ({deadline})",
+    'overdue': "Project '{title}' has passed its deadline of {deadline}",
+}
+
+def _send_project_reminders(reminders):
+    items = []
+    for project, stage in reminders:
+        message = PROJECT_REMINDER_MESSAGES[stage].format(
+            title=project.title, deadline=project.deadline.strftime('%Y-%m-%d')
+        )
+        # Notify the project manager and the team members
+        recipients = {}
+        if project.project_manager and project.project_manager.user:
+            recipients[project.project_manager.user_id] = project.project_manager.user
+        for member in project.team_members.all():
+            if member.user:
+                recipients.setdefault(member.user_id, member.user)
+        items.extend((user, message) for user in recipients.values())
+    deliver_notifications(items)
+
 @shared_task
 def check_project_deadlines():
     """
-    Check for upcoming project deadlines and notify stakeholders
+    Send project deadline reminders (7d, 24h, overdue) that are due.
+    Only projects whose next_reminder_at has passed are read, each reminder
+    is sent once; schedules are maintained by apps.projects.signals.
     """
     try:
-        warning_date = timezone.now() + timezone.timedelta(days=7)  # 7 days before deadline
-        upcoming_projects = Project.objects.filter(
-            end_date__lte=warning_date,
-            end_date__gte=timezone.now(),
-            status__in=['planning', 'in_progress']
+        sent = dispatch_due_reminders(
+            Project.objects.filter(status__in=ACTIVE_PROJECT_STATUSES).select_related(
+                'project_manager__user'
+            ).prefetch_related(
+                Prefetch('team_members', queryset=OrganizationMember.objects.select_related('user'))
+            ),
+            lambda project: project.deadline_at,
+            PROJECT_REMINDER_OFFSETS,
+            _send_project_reminders
         )
-        
-        for project in upcoming_projects:
-            # Notify project manager
-            if project.manager and project.manager.user:
-                send_notification(
-                    recipient=project.manager.user,
-                    message=f"Project '{project.title}' is approaching its deadline on {project.end_date.strftime('%Y-%m-%d')}",
-                    notification_type="project_deadline_approaching"
-                )
-                
-            # Notify team members
-            team_members = project.team_members.all()
-            for member in team_members:
-                if member.user:
-                    send_notification(
-                        recipient=member.user,
-                        message=f"Project '{project.title}' deadline is approaching on {project.end_date.strftime('%Y-%m-%d')}",
-                        notification_type="project_deadline_reminder"
-                    )
-        
-        return f"Checked deadlines for {upcoming_projects.count()} projects"
+        return f"Sent {sent} project deadline reminders"
         
     except Exception as e:
         logger.error(f"Error checking project deadlines: {str(e)}")
@@ -1,3 +1,342 @@
-from django.test import TestCase
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from apps.clients.models import Client
+from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+from apps.projects.models import Project
+from apps.tasks.models import Task
+
+User = get_user_model()
+
+
+class ProjectTaskCounterTests(TestCase):
+    """Test the denormalized task counters and progress on Project."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        organization = Organization.objects.create(name='Counter Org')
+        self.client_obj = Client.objects.create(name='Counter Client', organization=organization)
+        self.project = Project.objects.create(
+            title='Counter Project', description='', cost=100, client=self.client_obj
+        )
+
+    def _create_task(self, project=None, status='pending'):
+        return Task.objects.create(title='Task', project=project or self.project, status=status)
+
+    def _assert_counters(self, project, total, completed, progress):
+        project.refresh_from_db()
+        self.assertEqual(
+            (project.task_count, project.completed_task_count, project.progress),
+            (total, completed, progress)
+        )
+
+    def test_create_and_complete_tasks(self):
+        """Creating and completing tasks updates counts and progress."""
+        first = self._create_task()
+        self._create_task()
+        self._create_task()
+        self._create_task(status='completed')
+        self._assert_counters(self.project, 4, 1, 25)
+
+        first.status = 'completed'
+        first.save()
+        self._assert_counters(self.project, 4, 2, 50)
+
+        first.status = 'blocked'
+        first.save()
+        self._assert_counters(self.project, 4, 1, 25)
+
+    def test_approved_tasks_count_as_completed(self):
+        """Approved tasks count towards progress like completed ones."""
+        task = self._create_task(status='approved')
+        self._create_task()
+        self._assert_counters(self.project, 2, 1, 50)
+
+        task.status = 'in_progress'
+        task.save()
+        self._assert_counters(self.project, 2, 0, 0)
+
+    def test_delete_task(self):
+        """Deleting tasks decrements the counters down to zero progress."""
+        task = self._create_task(status='completed')
+        self._assert_counters(self.project, 1, 1, 100)
+
+        task.delete()
+        self._assert_counters(self.project, 0, 0, 0)
+
+    def test_move_task_between_projects(self):
+        """Moving a task transfers its counts to the new project."""
+        other = Project.objects.create(
+            title='Other Project', description='', cost=100, client=self.client_obj
+        )
+        task = self._create_task(status='completed')
+
+        task.project = other
+        task.save()
+
+        self._assert_counters(self.project, 0, 0, 0)
+        self._assert_counters(other, 1, 1, 100)
+
+    def test_counter_properties_do_not_query(self):
+        """total_tasks/completed_tasks/progress are served from the columns."""
+        self._create_task(status='completed')
+        self._create_task()
+        project = Project.objects.get(pk=self.project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(project.total_tasks, 2)
+            self.assertEqual(project.completed_tasks, 1)
+            self.assertEqual(project.progress, 50)
+
+    def test_repair_command_recomputes_drift(self):
+        """recompute_project_progress fixes counters changed behind the signals' back."""
+        self._create_task()
+        Task.objects.filter(project=self.project).update(status='completed')
+        self._assert_counters(self.project, 1, 0, 0)
+
+        call_command('recompute_project_progress', stdout=StringIO())
+
+        self._assert_counters(self.project, 1, 1, 100)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class ProjectListQueryCountTests(APITestCase):
+    """Pin the number of queries issued by the project list endpoint."""
+
+    # COUNT for pagination, the page of projects with its joins, team members prefetch
+    EXPECTED_QUERIES = 3
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='List Org')
+        self.client_obj = Client.objects.create(name='List Client', organization=self.organization)
+        self.superuser = User.objects.create_user(
+            email='root@example.com', is_superuser=True, is_staff=True
+        )
+        self.members = {
+            role: OrganizationMember.objects.create(
+                user=User.objects.create_user(email=f'{role}@example.com'),
+                organization=self.organization,
+                role=role
+            )
+            for role in (
+                OrganizationRoleChoices.PROJECT_MANAGER,
+                OrganizationRoleChoices.SALESPERSON,
+                OrganizationRoleChoices.VERIFIER,
+                OrganizationRoleChoices.DEVELOPER,
+            )
+        }
+        self.url = reverse('projects:project-list')
+
+    def _create_projects(self, count):
+        for index in range(count):
+            project = Project.objects.create(
+                title=f'Project {index}',
+                description='',
+                cost=100,
+                client=self.client_obj,
+                project_manager=self.members[OrganizationRoleChoices.PROJECT_MANAGER],
+                salesperson=self.members[OrganizationRoleChoices.SALESPERSON],
+                verifier=self.members[OrganizationRoleChoices.VERIFIER],
+            )
+            project.team_members.add(
+                self.members[OrganizationRoleChoices.DEVELOPER],
+                self.members[OrganizationRoleChoices.PROJECT_MANAGER],
+            )
+
+    def test_query_count_is_constant_for_any_page_size(self):
+        """Listing 1 or 20 projects issues the same number of queries."""
+        self.client.force_authenticate(user=self.superuser)
+
+        self._create_projects(1)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+        self._create_projects(19)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 20)
+
+        project = response.data['results'][0]
+        self.assertEqual(project['client']['name'], 'List Client')
+        self.assertEqual(project['verifier']['email'], 'verifier@example.com')
+        self.assertEqual(len(project['team_members']), 2)
+        self.assertEqual(project['project_manager_id'], str(self.members[OrganizationRoleChoices.PROJECT_MANAGER].id))
+        self.assertEqual(project['organization'], str(self.organization.id))
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class ProjectBoardApiTests(APITestCase):
+    """Test the kanban board endpoint and drag-and-drop moves."""
+
+    # Project lookup, grouped column counts, windowed first pages
+    EXPECTED_QUERIES = 3
+
+    def setUp(self):
+        for target in (
+            'apps.notifications.outbox.wake_outbox_relay',
+        ):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        organization = self.organization = Organization.objects.create(name='Board Org')
+        client = Client.objects.create(name='Board Client', organization=organization)
+        self.project = Project.objects.create(title='Board Project', description='', cost=100, client=client)
+        self.developer = OrganizationMember.objects.create(
+            user=User.objects.create_user(email='dev@example.com'),
+            organization=organization,
+            role=OrganizationRoleChoices.DEVELOPER
+        )
+        self.pending = [
+            Task.objects.create(
+                title=f'Pending {index}', project=self.project, developer=self.developer,
+                board_position=float(index)
+            )
+            for index in range(5)
+        ]
+        Task.objects.create(title='Done', project=self.project, status='completed')
+        self.client.force_authenticate(
+            user=User.objects.create_user(email='root@example.com', is_superuser=True, is_staff=True)
+        )
+        self.url = reverse('projects:project-board', args=[self.project.pk])
+        self.move_url = reverse('projects:project-board-move', args=[self.project.pk])
+
+    def _column(self, data, column_status):
+        return next(column for column in data['columns'] if column['status'] == column_status)
+
+    def _titles(self, results):
+        return [card['title'] for card in results]
+
+    def test_board_columns_and_keyset_pagination(self):
+        """Counts and first pages come from constant queries; cursors page through a column."""
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([column['status'] for column in response.data['columns']],
+                         ['pending', 'in_progress', 'completed', 'blocked'])
+
+        pending = self._column(response.data, 'pending')
+        self.assertEqual(pending['count'], 5)
+        self.assertEqual(self._titles(pending['results']), ['Pending 0', 'Pending 1'])
+        self.assertEqual(pending['results'][0]['developer_name'], self.developer.user.get_full_name())
+        self.assertIsNone(self._column(response.data, 'completed')['next_cursor'])
+
+        titles, cursor = [], pending['next_cursor']
+        while cursor:
+            response = self.client.get(self.url, {'status': 'pending', 'cursor': cursor, 'page_size': 2})
+            titles += self._titles(response.data['results'])
+            cursor = response.data['next_cursor']
+        self.assertEqual(titles, ['Pending 2', 'Pending 3', 'Pending 4'])
+
+    def test_move_updates_only_the_moved_task(self):
+        """Dropping a card between two others leaves their positions untouched."""
+        moved = self.pending[4]
+        response = self.client.post(self.move_url, {
+            'task': str(moved.id), 'status': 'pending',
+            'after': str(self.pending[0].id), 'before': str(self.pending[1].id),
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['board_position'], 0.5)
+        self.assertEqual(
+            list(Task.objects.filter(pk__in=[t.pk for t in self.pending[:4]])
+                 .order_by('board_position').values_list('board_position', flat=True)),
+            [0.0, 1.0, 2.0, 3.0]
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(
+            self._titles(self._column(response.data, 'pending')['results']),
+            ['Pending 0', 'Pending 4', 'Pending 1', 'Pending 2', 'Pending 3']
+        )
+
+    def test_move_with_one_neighbour_lands_next_to_it(self):
+        """A single neighbour is paired with the card next to it, even when they are close."""
+        for index, task in enumerate(self.pending):
+            Task.objects.filter(pk=task.pk).update(board_position=1000.0 + index / 10)
+
+        moves = (
+            (self.pending[4], {'after': str(self.pending[1].id)}),
+            (self.pending[0], {'before': str(self.pending[3].id)}),
+        )
+        for moved, neighbour in moves:
+            response = self.client.post(
+                self.move_url, {'task': str(moved.id), 'status': 'pending', **neighbour}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            self._titles(self._column(response.data, 'pending')['results']),
+            ['Pending 1', 'Pending 4', 'Pending 2', 'Pending 0', 'Pending 3']
+        )
+
+    def test_move_to_another_column_changes_status(self):
+        """Moving to the completed column completes the task and updates counters."""
+        response = self.client.post(self.move_url, {
+            'task': str(self.pending[0].id), 'status': 'completed',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        task = Task.objects.get(pk=self.pending[0].pk)
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNotNone(task.completed_at)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.completed_task_count, 2)
+
+    def test_move_rejects_neighbour_from_other_column(self):
+        """Neighbours must already be in the target column."""
+        response = self.client.post(self.move_url, {
+            'task': str(self.pending[0].id), 'status': 'blocked', 'after': str(self.pending[1].id),
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_managers_and_the_assignee_can_move_a_task(self):
+        """Other organization members cannot move cards they are not assigned to."""
+        other = OrganizationMember.objects.create(
+            user=User.objects.create_user(email='other@example.com'),
+            organization=self.organization,
+            role=OrganizationRoleChoices.DEVELOPER
+        )
+        move = {'task': str(self.pending[0].id), 'status': 'in_progress'}
+
+        self.client.force_authenticate(user=other.user)
+        response = self.client.post(self.move_url, move, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Task.objects.get(pk=self.pending[0].pk).status, 'pending')
+
+        self.client.force_authenticate(user=self.developer.user)
+        response = self.client.post(self.move_url, move, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Task.objects.get(pk=self.pending[0].pk).status, 'in_progress')
+
+    def test_exhausted_gap_rebalances_column(self):
+        """When float precision runs out the column is respaced and the move still lands."""
+        Task.objects.filter(pk=self.pending[1].pk).update(board_position=float.fromhex('0x1.0000000000001p+0'))
+        Task.objects.filter(pk=self.pending[0].pk).update(board_position=1.0)
+
+        response = self.client.post(self.move_url, {
+            'task': str(self.pending[4].id), 'status': 'pending',
+            'after': str(self.pending[0].id), 'before': str(self.pending[1].id),
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            self._titles(self._column(response.data, 'pending')['results'])[:3],
+            ['Pending 0', 'Pending 4', 'Pending 1']
+        )
@@ -0,0 +1,122 @@
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThan
+
+from .models import Project
+
+# Project statuses that still receive deadline reminders
+ACTIVE_PROJECT_STATUSES = ('planning', 'in_progress')
+
+# Task statuses counted as done when computing project progress. 'approved'
+# is not offered by Task.STATUS_CHOICES but older data and integrations use it.
+COMPLETED_TASK_STATUSES = ('completed', 'approved')
+
+
+def _progress_expression(total, completed):
+    """
+    SQL expression computing the integer completion percentage from the
+    given total/completed expressions, guarding against division by zero.
+    """
+    return Case(
+        When(GreaterThan(total, 0), then=completed * 100 / total),
+        default=Value(0),
+    )
+
+
+def adjust_task_counters(project_id, total_delta=0, completed_delta=0):
+    """
+    Atomically apply task count deltas to a project and recompute its progress.
+
+    Uses a single UPDATE with F() expressions so concurrent task writes never
+    lose increments and no row has to be read first.
+
+    Args:
+        project_id: The project's primary key
+        total_delta: Change in the number of tasks
+        completed_delta: Change in the number of completed tasks
+
+    Returns:
+        int: Number of project rows updated (0 or 1)
+    """
+    if not total_delta and not completed_delta:
+        return 0
+
+    new_total = Greatest(F('task_count') + total_delta, Value(0))
+    new_completed = Greatest(F('completed_task_count') + completed_delta, Value(0))
+
+    return Project.objects.filter(pk=project_id).update(
+        task_count=new_total,
+        completed_task_count=new_completed,
+        progress=_progress_expression(new_total, new_completed),
+    )
+
+
+def bump_schedule_version(project_ids):
+    """
+    Mark the task graph of the given projects as changed, invalidating
+    their cached critical paths.
+    """
+    return Project.objects.filter(pk__in=list(project_ids)).update(
+        schedule_version=F('schedule_version') + 1
+    )
+
+
+def recompute_task_counters(project_ids=None, batch_size=500):
+    """
+    Recompute task counters and progress from the tasks table.
+
+    Counts come from one grouped aggregate per batch of projects and the
+    results are written back with bulk_update, so drift from raw SQL or
+    queryset.update() calls can be repaired cheaply.
+
+    Args:
+        project_ids: Optional iterable of project IDs (default: all projects)
+        batch_size: Number of projects processed per batch
+
+    Returns:
+        int: Number of projects whose counters changed
+    """
+    from apps.tasks.models import Task
+
+    projects = Project.objects.only('id', 'task_count', 'completed_task_count', 'progress').order_by('pk')
+    if project_ids is not None:
+        projects = projects.filter(pk__in=list(project_ids))
+
+    changed = 0
+    batch = []
+    for project in projects.iterator(chunk_size=batch_size):
+        batch.append(project)
+        if len(batch) >= batch_size:
+            changed += _recompute_batch(Task, batch)
+            batch = []
+    if batch:
+        changed += _recompute_batch(Task, batch)
+    return changed
+
+
+def _recompute_batch(Task, projects):
+    counts = {
+        row['project_id']: row
+        for row in Task.objects.filter(
+            project_id__in=[project.pk for project in projects]
+        ).values('project_id').annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status__in=COMPLETED_TASK_STATUSES)),
+        ).order_by()
+    }
+
+    dirty = []
+    for project in projects:
+        row = counts.get(project.pk, {'total': 0, 'completed': 0})
+        progress = row['completed'] * 100 // row['total'] if row['total'] else 0
+        if (project.task_count, project.completed_task_count, project.progress) != (
+            row['total'], row['completed'], progress
+        ):
+            project.task_count = row['total']
+            project.completed_task_count = row['completed']
+            project.progress = progress
+            dirty.append(project)
+
+    if dirty:
+        Project.objects.bulk_update(dirty, ['task_count', 'completed_task_count', 'progress'])
+    return len(dirty)
@@ -6,10 +6,20 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.shortcuts import get_object_or_404
 
 from .models import Project
-from .serializers import ProjectSerializer
+from .serializers import ProjectSerializer, ProjectListSerializer
 from apps.clients.models import Client
 from apps.organization.models import OrganizationMember, OrganizationRoleChoices
 from apps.users.permissions import IsAdmin, IsOrganizationMember
+from apps.tasks.models import Task
+from apps.tasks.dependencies import get_critical_path
+from apps.tasks.serializers import TaskBoardSerializer, TaskBoardMoveSerializer
+from apps.tasks.views import get_manageable_projects
+from apps.tasks.utils import (
+    BOARD_PAGE_SIZE,
+    get_task_board,
+    get_task_board_column,
+    move_task_on_board
+)
 
 from rest_framework import permissions
 
@@ -86,12 +96,20 @@ class ProjectViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ProjectListSerializer
+        return self.serializer_class
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
         if self.action in ['list', 'retrieve', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated()]
+        elif self.action in ['board', 'board_move', 'critical_path']:
+            # Access is limited to the projects returned by get_queryset
+            return [IsAuthenticated()]
         elif self.action in ['create', 'add_team_member']:
             # For these actions, we'll do custom permission checking inside the method
             return [IsAuthenticated()]
@@ -104,6 +122,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = ProjectListSerializer.setup_eager_loading(queryset)
         
         # If user is admin, return all projects when no organization filter is applied
         if user.is_staff or user.is_superuser:
@@ -211,6 +231,94 @@ class ProjectViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(project)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def board(self, request, pk=None):
+        """
+        Kanban board of the project's tasks, one column per task status.
+
+        Without parameters every column is returned with its total count and
+        first page of cards. ``?status=<status>&cursor=<next_cursor>`` returns
+        the next page of a single column. ``page_size`` (max 100) applies to both.
+        """
+        project = self.get_object()
+        try:
+            page_size = min(int(request.query_params.get('page_size', BOARD_PAGE_SIZE)), 100)
+        except ValueError:
+            page_size = BOARD_PAGE_SIZE
+        page_size = max(page_size, 1)
+
+        column_status = request.query_params.get('status')
+        if column_status:
+            if column_status not in dict(Task.STATUS_CHOICES):
+                return Response(
+                    {"error": f"Unknown task status '{column_status}'"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                tasks, next_cursor = get_task_board_column(
+                    project.tasks.all(), column_status, request.query_params.get('cursor'), page_size
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'status': column_status,
+                'results': TaskBoardSerializer(tasks, many=True).data,
+                'next_cursor': next_cursor,
+            })
+
+        columns = get_task_board(project.tasks.all(), page_size)
+        return Response({
+            'project': project.id,
+            'columns': [
+                {
+                    'status': column['status'],
+                    'label': column['label'],
+                    'count': column['count'],
+                    'results': TaskBoardSerializer(column['tasks'], many=True).data,
+                    'next_cursor': column['next_cursor'],
+                }
+                for column in columns
+            ],
+        })
+
+    @action(detail=True, methods=['post'], url_path='board/move')
+    def board_move(self, request, pk=None):
+        """
+        Move a card on the board: ``task`` goes to the ``status`` column
+        between the cards ``after`` (above) and ``before`` (below). Only the
+        moved task is written.
+
+        Like other task updates, moves are limited to the project's managers
+        (and organization admins) and the task's assignee.
+        """
+        project = self.get_object()
+        serializer = TaskBoardMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        task = get_object_or_404(project.tasks.select_related('developer'), pk=data['task'])
+        is_assignee = task.developer is not None and task.developer.user_id == request.user.id
+        if not is_assignee and not get_manageable_projects(request.user).filter(pk=project.pk).exists():
+            return Response(
+                {"error": "Only the project manager or the task's assignee can move this task"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            task = move_task_on_board(task, data['status'], data.get('after'), data.get('before'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TaskBoardSerializer(task).data)
+
+    @action(detail=True, methods=['get'], url_path='critical-path')
+    def critical_path(self, request, pk=None):
+        """
+        Earliest/latest start, finish and slack (in hours from the project
+        start) of every task, derived from task dependencies and estimated
+        hours. Results are cached per project schedule version.
+        """
+        project = self.get_object()
+        return Response({'project': project.id, **get_critical_path(project)})
+
     @action(detail=True, methods=['post'], url_path='team-members')
     def add_team_member(self, request, pk=None):
         """
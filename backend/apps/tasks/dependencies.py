@@ -0,0 +1,236 @@
+"""
+Task dependency graph.
+
+The dependencies of a project form a DAG. Tasks taking part in a
+dependency carry a ``dependency_order``: a topological order of the
+project's tasks that is maintained incrementally when an edge is added
+(Pearce & Kelly), so an insert only inspects the tasks ordered between
+its two endpoints instead of re-sorting the whole graph. The same order
+lets the critical path be computed with one forward and one backward pass.
+"""
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from .models import Task, TaskDependency
+from apps.projects.models import Project
+from apps.projects.utils import bump_schedule_version
+
+# How long a computed critical path is kept; entries are keyed by
+# Project.schedule_version so stale results are never served
+CRITICAL_PATH_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def add_task_dependency(predecessor, successor):
+    """
+    Record that ``successor`` depends on ``predecessor``.
+
+    The project row is locked while the graph changes. If the new edge
+    contradicts the current topological order, only the tasks ordered
+    between its endpoints are searched for a cycle and reordered.
+
+    Args:
+        predecessor: Task that has to be finished first
+        successor: Task that depends on it
+
+    Returns:
+        TaskDependency: The created dependency
+
+    Raises:
+        ValueError: If the tasks are in different projects, the dependency
+            already exists or it would create a cycle
+    """
+    if predecessor.pk == successor.pk:
+        raise ValueError('A task cannot depend on itself.')
+    if predecessor.project_id != successor.project_id:
+        raise ValueError('Dependent tasks must belong to the same project.')
+    project_id = predecessor.project_id
+
+    with transaction.atomic():
+        list(Project.objects.select_for_update().filter(pk=project_id).values_list('pk'))
+
+        if TaskDependency.objects.filter(predecessor=predecessor, successor=successor).exists():
+            raise ValueError('This dependency already exists.')
+
+        orders = dict(
+            Task.objects.filter(pk__in=[predecessor.pk, successor.pk]).values_list('id', 'dependency_order')
+        )
+        unordered = [pk for pk in (predecessor.pk, successor.pk) if orders[pk] is None]
+        if unordered:
+            # Tasks joining the graph are appended to the order, predecessor first
+            last = Task.objects.filter(project_id=project_id).aggregate(
+                last=Max('dependency_order')
+            )['last'] or 0
+            for pk in unordered:
+                last += 1
+                orders[pk] = last
+                Task.objects.filter(pk=pk).update(dependency_order=last)
+
+        if orders[successor.pk] < orders[predecessor.pk]:
+            _reorder(project_id, predecessor.pk, successor.pk,
+                     orders[successor.pk], orders[predecessor.pk])
+
+        dependency = TaskDependency.objects.create(predecessor=predecessor, successor=successor)
+        bump_schedule_version([project_id])
+
+    return dependency
+
+
+def remove_task_dependency(dependency):
+    """
+    Delete a dependency. The topological order stays valid, so only the
+    project's schedule version changes.
+    """
+    with transaction.atomic():
+        project_id = dependency.successor.project_id
+        dependency.delete()
+        bump_schedule_version([project_id])
+
+
+def detach_task_dependencies(task, project_id):
+    """
+    Remove a task from the dependency graph of ``project_id``, e.g. when it
+    moves to another project: its dependencies are deleted and its order
+    cleared. Removing a task keeps the order of the others valid.
+    """
+    with transaction.atomic():
+        list(Project.objects.select_for_update().filter(pk=project_id).values_list('pk'))
+        TaskDependency.objects.filter(Q(predecessor=task) | Q(successor=task)).delete()
+        Task.objects.filter(pk=task.pk).update(dependency_order=None)
+        task.dependency_order = None
+        bump_schedule_version([project_id])
+
+
+def _reorder(project_id, predecessor_id, successor_id, lower, upper):
+    """
+    Restore a topological order after inserting predecessor -> successor
+    where ``order(successor) = lower < upper = order(predecessor)``.
+
+    Only tasks with an order in [lower, upper] can be affected: the tasks
+    reachable from the successor are moved after the tasks reaching the
+    predecessor, reusing the same order values.
+
+    Raises:
+        ValueError: If the predecessor is reachable from the successor
+    """
+    window = dict(
+        Task.objects.filter(
+            project_id=project_id, dependency_order__range=(lower, upper)
+        ).values_list('id', 'dependency_order')
+    )
+    successors = defaultdict(list)
+    predecessors = defaultdict(list)
+    for pred_id, succ_id in TaskDependency.objects.filter(
+        predecessor__project_id=project_id,
+        predecessor__dependency_order__range=(lower, upper),
+        successor__dependency_order__range=(lower, upper),
+    ).values_list('predecessor_id', 'successor_id'):
+        successors[pred_id].append(succ_id)
+        predecessors[succ_id].append(pred_id)
+
+    forward = _reachable(successor_id, successors, stop=predecessor_id)
+    if forward is None:
+        raise ValueError('This dependency would create a cycle.')
+    backward = _reachable(predecessor_id, predecessors)
+
+    moved = sorted(backward, key=window.get) + sorted(forward, key=window.get)
+    slots = sorted(window[pk] for pk in moved)
+    changed = [
+        Task(pk=pk, dependency_order=order)
+        for pk, order in zip(moved, slots)
+        if window[pk] != order
+    ]
+    Task.objects.bulk_update(changed, ['dependency_order'])
+
+
+def _reachable(start, edges, stop=None):
+    """
+    Depth-first search from ``start``; returns the visited set, or None if
+    ``stop`` is reached.
+    """
+    seen = {start}
+    stack = [start]
+    while stack:
+        for nxt in edges[stack.pop()]:
+            if nxt == stop:
+                return None
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def compute_critical_path(project):
+    """
+    Compute earliest/latest start and slack for every task of a project.
+
+    Tasks are read in topological order (``dependency_order``; tasks outside
+    the graph first) into flat arrays, so the forward and backward passes are
+    O(V + E). Durations are the tasks' ``estimated_hours`` and times are
+    hours from the project start.
+
+    Returns:
+        dict: ``duration`` of the project, the ``critical_path`` task ids in
+        order and per-task scheduling data under ``tasks``
+    """
+    rows = list(
+        Task.objects.filter(project=project).order_by(
+            F('dependency_order').asc(nulls_first=True), 'id'
+        ).values_list('id', 'title', 'estimated_hours')
+    )
+    index = {row[0]: position for position, row in enumerate(rows)}
+    duration = [row[2] for row in rows]
+    predecessors = [[] for _ in rows]
+    successors = [[] for _ in rows]
+    for pred_id, succ_id in TaskDependency.objects.filter(
+        successor__project=project
+    ).values_list('predecessor_id', 'successor_id'):
+        predecessors[index[succ_id]].append(index[pred_id])
+        successors[index[pred_id]].append(index[succ_id])
+
+    earliest_start = [0] * len(rows)
+    for node in range(len(rows)):
+        for pred in predecessors[node]:
+            earliest_start[node] = max(earliest_start[node], earliest_start[pred] + duration[pred])
+
+    total = max((start + length for start, length in zip(earliest_start, duration)), default=0)
+    latest_finish = [total] * len(rows)
+    for node in reversed(range(len(rows))):
+        for succ in successors[node]:
+            latest_finish[node] = min(latest_finish[node], latest_finish[succ] - duration[succ])
+
+    tasks = []
+    for node, (pk, title, hours) in enumerate(rows):
+        latest_start = latest_finish[node] - hours
+        tasks.append({
+            'id': str(pk),
+            'title': title,
+            'duration': hours,
+            'earliest_start': earliest_start[node],
+            'earliest_finish': earliest_start[node] + hours,
+            'latest_start': latest_start,
+            'latest_finish': latest_finish[node],
+            'slack': latest_start - earliest_start[node],
+            'critical': latest_start == earliest_start[node],
+        })
+
+    return {
+        'duration': total,
+        'critical_path': [task['id'] for task in tasks if task['critical']],
+        'tasks': tasks,
+    }
+
+
+def get_critical_path(project):
+    """
+    Return the project's critical path, computed at most once per
+    ``schedule_version``.
+    """
+    cache_key = f'tasks:critical_path:{project.pk}:{project.schedule_version}'
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute_critical_path(project)
+        result['version'] = project.schedule_version
+        cache.set(cache_key, result, CRITICAL_PATH_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:42
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Reminder offsets before the due date (24h, 1h, overdue) as of this migration
+REMINDER_OFFSETS = (datetime.timedelta(hours=24), datetime.timedelta(hours=1), datetime.timedelta(0))
+
+
+def first_reminder(due_at, now):
+    """The latest reminder already due, else the first one."""
+    stage = 0
+    for index, offset in enumerate(REMINDER_OFFSETS):
+        if due_at - offset <= now:
+            stage = index
+    return stage, due_at - REMINDER_OFFSETS[stage]
+
+
+def schedule_existing_reminders(apps, schema_editor):
+    """Schedule reminders for open tasks that already have a due date."""
+    Task = apps.get_model('tasks', 'Task')
+    now = timezone.now()
+    tasks = []
+    for task in Task.objects.filter(
+        due_date__isnull=False, status__in=('pending', 'in_progress')
+    ).only('id', 'due_date').iterator(chunk_size=1000):
+        task.reminder_stage, task.next_reminder_at = first_reminder(task.due_date, now)
+        tasks.append(task)
+    Task.objects.bulk_update(tasks, ['reminder_stage', 'next_reminder_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_seed_subscription_plans'),
+        ('projects', '0004_deadline_reminders'),
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reminder_stage',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('next_reminder_at__isnull', False)), fields=['next_reminder_at'], name='task_reminder_due_idx'),
+        ),
+        migrations.RunPython(schedule_existing_reminders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:44
+
+import apps.tasks.models
+from django.db import migrations, models
+
+
+def order_existing_tasks(apps, schema_editor):
+    """Order existing tasks within their board columns by creation time."""
+    Task = apps.get_model('tasks', 'Task')
+    tasks = []
+    for task in Task.objects.only('id', 'created_at').iterator(chunk_size=1000):
+        task.board_position = task.created_at.timestamp()
+        tasks.append(task)
+    Task.objects.bulk_update(tasks, ['board_position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_seed_subscription_plans'),
+        ('projects', '0004_deadline_reminders'),
+        ('tasks', '0002_deadline_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='board_position',
+            field=models.FloatField(default=apps.tasks.models.default_board_position, help_text='Fractional ordering key of the task within its board column'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status', 'board_position'], name='task_board_position_idx'),
+        ),
+        migrations.RunPython(order_existing_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:48
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_board_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='dependency_order',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='estimated_hours',
+            field=models.PositiveIntegerField(default=1, help_text='Estimated effort in hours, used for critical path scheduling'),
+        ),
+        migrations.CreateModel(
+            name='TaskDependency',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('predecessor', models.ForeignKey(help_text='Task that has to be finished first', on_delete=django.db.models.deletion.CASCADE, related_name='successor_links', to='tasks.task')),
+                ('successor', models.ForeignKey(help_text='Task that depends on the predecessor', on_delete=django.db.models.deletion.CASCADE, related_name='predecessor_links', to='tasks.task')),
+            ],
+            options={
+                'verbose_name': 'Task dependency',
+                'verbose_name_plural': 'Task dependencies',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskdependency',
+            constraint=models.UniqueConstraint(fields=('predecessor', 'successor'), name='unique_task_dependency'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdependency',
+            constraint=models.CheckConstraint(check=models.Q(('predecessor', models.F('successor')), _negated=True), name='task_dependency_not_self'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.7 on 2026-10-18 22:50
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+# Workload definitions as of this migration (see apps.tasks.workload)
+OPEN_TASK_STATUSES = ('pending', 'in_progress', 'blocked')
+PRIORITY_FIELDS = {
+    'low': 'low_priority',
+    'medium': 'medium_priority',
+    'high': 'high_priority',
+    'critical': 'critical_priority',
+}
+DUE_SOON = datetime.timedelta(days=7)
+
+
+def build_workload(apps, schema_editor):
+    """Build the initial workload counters from the open tasks."""
+    Task = apps.get_model('tasks', 'Task')
+    DeveloperWorkload = apps.get_model('tasks', 'DeveloperWorkload')
+    now = timezone.now()
+    aggregates = {
+        'open_tasks': Count('id'),
+        'overdue': Count('id', filter=Q(due_date__lt=now)),
+        'due_this_week': Count('id', filter=Q(due_date__gte=now, due_date__lt=now + DUE_SOON)),
+        'due_later': Count('id', filter=Q(due_date__gte=now + DUE_SOON)),
+        'no_due_date': Count('id', filter=Q(due_date__isnull=True)),
+    }
+    for priority, field in PRIORITY_FIELDS.items():
+        aggregates[field] = Count('id', filter=Q(priority=priority))
+
+    rows = Task.objects.filter(
+        developer__isnull=False, status__in=OPEN_TASK_STATUSES
+    ).values('developer_id').annotate(**aggregates).order_by()
+    DeveloperWorkload.objects.bulk_create(
+        [
+            DeveloperWorkload(member_id=row.pop('developer_id'), **row)
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0007_seed_subscription_plans'),
+        ('tasks', '0004_task_dependencies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeveloperWorkload',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to='organization.organizationmember')),
+                ('open_tasks', models.PositiveIntegerField(default=0)),
+                ('low_priority', models.PositiveIntegerField(default=0)),
+                ('medium_priority', models.PositiveIntegerField(default=0)),
+                ('high_priority', models.PositiveIntegerField(default=0)),
+                ('critical_priority', models.PositiveIntegerField(default=0)),
+                ('overdue', models.PositiveIntegerField(default=0)),
+                ('due_this_week', models.PositiveIntegerField(default=0)),
+                ('due_later', models.PositiveIntegerField(default=0)),
+                ('no_due_date', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Developer workload',
+                'verbose_name_plural': 'Developer workloads',
+            },
+        ),
+        migrations.RunPython(build_workload, migrations.RunPython.noop),
+    ]
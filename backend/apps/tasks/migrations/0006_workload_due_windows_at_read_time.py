@@ -0,0 +1,31 @@
+# Generated by Django 5.0.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0008_member_invitation_job'),
+        ('projects', '0005_task_dependencies'),
+        ('tasks', '0005_developer_workload'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='developerworkload',
+            name='due_later',
+        ),
+        migrations.RemoveField(
+            model_name='developerworkload',
+            name='due_this_week',
+        ),
+        migrations.RemoveField(
+            model_name='developerworkload',
+            name='overdue',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['developer', 'status', 'due_date'], name='task_developer_due_idx'),
+        ),
+    ]
@@ -5,6 +5,15 @@ from model_utils import FieldTracker
 from apps.organization.models import OrganizationMember
 from apps.projects.models import Project
 
+
+def default_board_position():
+    """
+    New tasks are appended to the bottom of their board column; the creation
+    timestamp is increasing, so no query for the column's current maximum is needed.
+    """
+    return timezone.now().timestamp()
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -53,12 +62,37 @@ class Task(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    estimated_hours = models.PositiveIntegerField(
+        default=1,
+        help_text="Estimated effort in hours, used for critical path scheduling"
+    )
+    # Position in the project's dependency topological order (None until the
+    # task takes part in a dependency), see apps.tasks.dependencies
+    dependency_order = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    board_position = models.FloatField(
+        default=default_board_position,
+        help_text="Fractional ordering key of the task within its board column"
+    )
+    # Deadline reminder schedule, see apps.notifications.reminders
+    next_reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_stage = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
+
+    def save(self, *args, **kwargs):
+        # dependency_order is only written by apps.tasks.dependencies under
+        # the project lock: a full save of a stale instance must not write
+        # an old order back, so it is left out unless update_fields names it
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'dependency_order'
+            ]
+        super().save(*args, **kwargs)
         
     # Track changes to these fields
-    tracker = FieldTracker(fields=['status', 'due_date', 'developer'])
+    tracker = FieldTracker(fields=['status', 'priority', 'due_date', 'developer', 'project', 'estimated_hours'])
     
     class Meta:
         ordering = ['-created_at']
@@ -68,4 +102,75 @@ class Task(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['priority']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['project', 'status', 'board_position'], name='task_board_position_idx'),
+            models.Index(fields=['developer', 'status', 'due_date'], name='task_developer_due_idx'),
+            models.Index(
+                fields=['next_reminder_at'],
+                name='task_reminder_due_idx',
+                condition=models.Q(next_reminder_at__isnull=False)
+            ),
         ]
+
+
+class TaskDependency(models.Model):
+    """
+    A finish-to-start dependency: ``successor`` cannot start before
+    ``predecessor`` is finished. Both tasks belong to the same project and
+    the dependencies of a project always form a DAG.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    predecessor = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='successor_links',
+        help_text="Task that has to be finished first"
+    )
+    successor = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='predecessor_links',
+        help_text="Task that depends on the predecessor"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.predecessor_id} -> {self.successor_id}"
+
+    class Meta:
+        verbose_name = 'Task dependency'
+        verbose_name_plural = 'Task dependencies'
+        constraints = [
+            models.UniqueConstraint(fields=['predecessor', 'successor'], name='unique_task_dependency'),
+            models.CheckConstraint(
+                check=~models.Q(predecessor=models.F('successor')),
+                name='task_dependency_not_self'
+            ),
+        ]
+
+
+class DeveloperWorkload(models.Model):
+    """
+    Open task counters of an organization member, by priority and without
+    a due date. Maintained incrementally by apps.tasks.workload from task
+    changes; due windows slide with time and are computed when read.
+    """
+    member = models.OneToOneField(
+        OrganizationMember,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='workload'
+    )
+    open_tasks = models.PositiveIntegerField(default=0)
+    low_priority = models.PositiveIntegerField(default=0)
+    medium_priority = models.PositiveIntegerField(default=0)
+    high_priority = models.PositiveIntegerField(default=0)
+    critical_priority = models.PositiveIntegerField(default=0)
+    no_due_date = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.member_id}: {self.open_tasks} open tasks"
+
+    class Meta:
+        verbose_name = 'Developer workload'
+        verbose_name_plural = 'Developer workloads'
@@ -1,6 +1,7 @@
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Task
+from .models import Task, TaskDependency, DeveloperWorkload
+from .workload import DUE_WINDOWS, PRIORITY_FIELDS, due_windows, workload_score
 from apps.organization.serializers import DeveloperSerializer
 from apps.projects.serializers import ProjectSerializer
 
@@ -16,7 +17,7 @@ class TaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'status', 'priority',
             'developer', 'developer_details', 'project', 'project_details',
-            'due_date', 'created_at', 'updated_at', 'completed_at'
+            'due_date', 'estimated_hours', 'created_at', 'updated_at', 'completed_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'completed_at']
         extra_kwargs = {
@@ -64,4 +65,118 @@ class TaskListSerializer(serializers.ModelSerializer):
             'id', 'title', 'status', 'priority', 'due_date',
             'developer_name', 'project_title'
         ]
-        read_only_fields = fields
\ No newline at end of file
+        read_only_fields = fields
+
+
+class TaskDependencySerializer(serializers.ModelSerializer):
+    """
+    Serializer for finish-to-start task dependencies.
+    Creation goes through ``apps.tasks.dependencies.add_task_dependency``.
+    """
+    class Meta:
+        model = TaskDependency
+        fields = ['id', 'predecessor', 'successor', 'created_at']
+        read_only_fields = ['id', 'created_at']
+        # Duplicates are reported by add_task_dependency
+        validators = []
+
+    def create(self, validated_data):
+        from .dependencies import add_task_dependency
+
+        try:
+            return add_task_dependency(validated_data['predecessor'], validated_data['successor'])
+        except ValueError as e:
+            raise serializers.ValidationError({'non_field_errors': [str(e)]})
+
+
+class DeveloperWorkloadSerializer(serializers.Serializer):
+    """
+    Workload of an organization member; expects ``user`` and ``workload``
+    to be selected with the member, and the members' ``due_windows`` in the
+    context when serializing many.
+    """
+    member_id = serializers.UUIDField(source='id')
+    name = serializers.SerializerMethodField()
+    email = serializers.EmailField(source='user.email')
+    organization = serializers.UUIDField(source='organization_id')
+    open_tasks = serializers.SerializerMethodField()
+    by_priority = serializers.SerializerMethodField()
+    by_due_date = serializers.SerializerMethodField()
+    load = serializers.SerializerMethodField()
+
+    def _workload(self, member):
+        return getattr(member, 'workload', None) or DeveloperWorkload(member_id=member.id)
+
+    def get_name(self, member):
+        return member.user.get_full_name() or member.user.email
+
+    def get_open_tasks(self, member):
+        return self._workload(member).open_tasks
+
+    def get_by_priority(self, member):
+        workload = self._workload(member)
+        return {priority: getattr(workload, field) for priority, field in PRIORITY_FIELDS.items()}
+
+    def get_by_due_date(self, member):
+        windows = self.context.get('due_windows')
+        if windows is None:
+            windows = due_windows([member.id])
+        return {
+            **{window: windows.get(member.id, {}).get(window, 0) for window in DUE_WINDOWS},
+            'no_due_date': self._workload(member).no_due_date,
+        }
+
+    def get_load(self, member):
+        return workload_score(getattr(member, 'workload', None))
+
+
+class TaskBoardSerializer(TaskListSerializer):
+    """
+    Card on the project task board; expects ``developer__user`` to be selected.
+    """
+    class Meta(TaskListSerializer.Meta):
+        fields = [
+            'id', 'title', 'status', 'priority', 'due_date',
+            'developer', 'developer_name', 'board_position'
+        ]
+        read_only_fields = fields
+
+
+class TaskBoardMoveSerializer(serializers.Serializer):
+    """
+    Drag-and-drop move of a card: the target column and its new neighbours.
+    """
+    task = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+    after = serializers.UUIDField(required=False, allow_null=True)
+    before = serializers.UUIDField(required=False, allow_null=True)
+
+
+class TaskBulkCreateSerializer(serializers.Serializer):
+    """
+    One item of a bulk task creation request.
+
+    Relations are accepted as raw IDs and resolved for the whole batch at
+    once by ``apps.tasks.utils.bulk_create_tasks``.
+    """
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    project = serializers.UUIDField()
+    developer = serializers.UUIDField(required=False, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    estimated_hours = serializers.IntegerField(required=False, min_value=0)
+
+
+class TaskBulkUpdateSerializer(serializers.Serializer):
+    """
+    One item of a bulk task update request; only the submitted fields change.
+    """
+    id = serializers.UUIDField()
+    title = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    developer = serializers.UUIDField(required=False, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
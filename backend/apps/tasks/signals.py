@@ -1,14 +1,105 @@
 # apps/tasks/signals.py
 import logging
-from datetime import timedelta
-from django.utils import timezone
-from django.db.models.signals import post_save, pre_save
+from collections import Counter
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from .models import Task
 from . import tasks  # Import Celery tasks
+from .dependencies import detach_task_dependencies
+from apps.projects.utils import COMPLETED_TASK_STATUSES, adjust_task_counters, bump_schedule_version
+from apps.notifications.outbox import enqueue_task
+from apps.notifications.reminders import TASK_REMINDER_OFFSETS, save_rescheduled_reminder, schedule_reminder
+from .utils import ACTIVE_TASK_STATUSES
+from .workload import add_load_change, apply_workload_deltas, task_load
 
 logger = logging.getLogger(__name__)
 
+@receiver(post_save, sender=Task)
+def update_project_task_counters(sender, instance, created, **kwargs):
+    """
+    Keep Project.task_count / completed_task_count / progress in sync
+    using the task's FieldTracker, without counting the project's tasks.
+    """
+    is_completed = instance.status in COMPLETED_TASK_STATUSES
+
+    if created:
+        adjust_task_counters(instance.project_id, 1, int(is_completed))
+        return
+
+    was_completed = instance.tracker.previous('status') in COMPLETED_TASK_STATUSES
+    if instance.tracker.has_changed('project'):
+        previous_project_id = instance.tracker.previous('project')
+        if previous_project_id:
+            adjust_task_counters(previous_project_id, -1, -int(was_completed))
+        adjust_task_counters(instance.project_id, 1, int(is_completed))
+    elif instance.tracker.has_changed('status') and was_completed != is_completed:
+        adjust_task_counters(instance.project_id, 0, 1 if is_completed else -1)
+
+@receiver(post_delete, sender=Task)
+def release_project_task_counters(sender, instance, **kwargs):
+    """
+    Decrement the owning project's counters when a task is deleted.
+    """
+    adjust_task_counters(
+        instance.project_id, -1, -int(instance.status in COMPLETED_TASK_STATUSES)
+    )
+
+@receiver(post_save, sender=Task)
+def update_developer_workload(sender, instance, created, **kwargs):
+    """
+    Move the task's contribution between DeveloperWorkload counters when its
+    developer, status, priority or due date changes.
+    """
+    tracker = instance.tracker
+    if not created and not any(
+        tracker.has_changed(field) for field in ('developer', 'status', 'priority', 'due_date')
+    ):
+        return
+
+    old = None if created else task_load(
+        tracker.previous('developer'), tracker.previous('status'),
+        tracker.previous('priority'), tracker.previous('due_date')
+    )
+    new = task_load(instance.developer_id, instance.status, instance.priority, instance.due_date)
+    deltas = Counter()
+    add_load_change(deltas, old, new)
+    apply_workload_deltas(deltas)
+
+@receiver(post_delete, sender=Task)
+def release_developer_workload(sender, instance, **kwargs):
+    """
+    Remove a deleted task from its developer's workload.
+    """
+    load = task_load(instance.developer_id, instance.status, instance.priority, instance.due_date)
+    if load is not None:
+        apply_workload_deltas({load: -1})
+
+@receiver(post_save, sender=Task)
+def invalidate_project_schedule(sender, instance, created, **kwargs):
+    """
+    Bump the project's schedule version when a change affects its critical path.
+    """
+    if created or instance.tracker.has_changed('estimated_hours'):
+        bump_schedule_version([instance.project_id])
+    elif instance.tracker.has_changed('project'):
+        bump_schedule_version([instance.project_id, instance.tracker.previous('project')])
+
+@receiver(post_save, sender=Task)
+def detach_moved_task_dependencies(sender, instance, created, **kwargs):
+    """
+    Drop the dependencies of a task moved to another project: dependencies
+    never span projects.
+    """
+    if not created and instance.tracker.has_changed('project'):
+        detach_task_dependencies(instance, instance.tracker.previous('project'))
+
+@receiver(post_delete, sender=Task)
+def invalidate_project_schedule_on_delete(sender, instance, **kwargs):
+    """
+    Bump the project's schedule version when one of its tasks is deleted.
+    """
+    bump_schedule_version([instance.project_id])
+
 @receiver(post_save, sender=Task)
 def handle_task_updates(sender, instance, created, **kwargs):
     """
@@ -21,12 +112,13 @@ def handle_task_updates(sender, instance, created, **kwargs):
         
         if created:
             logger.info(f"New task created: {instance.id}, queueing assignment notification")
-            tasks.notify_task_assigned.delay(str(instance.id))
+            enqueue_task(tasks.notify_task_assigned, str(instance.id))
         elif hasattr(instance, 'tracker') and instance.tracker.has_changed('status'):
             # Queue status update notification
             old_status = instance.tracker.previous('status')
             logger.info(f"Task {instance.id} status changed from {old_status} to {instance.status}")
-            tasks.notify_task_status_update.delay(
+            enqueue_task(
+                tasks.notify_task_status_update,
                 str(instance.id),
                 old_status,
                 instance.status
@@ -36,38 +128,23 @@ def handle_task_updates(sender, instance, created, **kwargs):
                    exc_info=True)
 
 @receiver(pre_save, sender=Task)
-def check_deadline(sender, instance, **kwargs):
+def schedule_deadline_reminder(sender, instance, **kwargs):
     """
-    Check for approaching deadlines and notify
-    Note: This is a lightweight check. The main deadline checking is done
-    by the scheduled Celery task check_task_deadlines()
+    Maintain the task's next_reminder_at when its due date or activity changes.
+    The reminders themselves are sent by the check_task_deadlines beat job.
     """
-    try:
-        if not instance.developer or not hasattr(instance.developer, 'user'):
-            return  # Skip if no developer assigned
-        
-        if not hasattr(instance, 'tracker'):
-            logger.debug("FieldTracker not available for Task model")
-            return
-            
-        due_date = getattr(instance, 'due_date', None)
-        if not due_date:
-            return
-            
-        is_deadline_approaching = (
-            due_date < timezone.now() + timedelta(days=1) and
-            instance.status in ['pending', 'in_progress'] and
-            (not instance.tracker.previous('due_date') or 
-             instance.tracker.previous('due_date') != due_date)
-        )
-        
-        if is_deadline_approaching:
-            logger.info(f"Task {instance.id} deadline is approaching: {due_date}")
-            tasks.notify_task_status_update.delay(
-                str(instance.id),
-                "",
-                f"deadline_approaching:{due_date.isoformat()}"
-            )
-    except Exception as e:
-        logger.error(f"Error in check_deadline for task {getattr(instance, 'id', 'unknown')}: {str(e)}", 
-                   exc_info=True)
\ No newline at end of file
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'due_date', 'status'} & set(update_fields):
+        return
+    was_active = instance.tracker.previous('status') in ACTIVE_TASK_STATUSES
+    is_active = instance.status in ACTIVE_TASK_STATUSES
+    if instance._state.adding or instance.tracker.has_changed('due_date') or was_active != is_active:
+        schedule_reminder(instance, instance.due_date, TASK_REMINDER_OFFSETS, is_active)
+        instance._reminder_rescheduled = True
+
+@receiver(post_save, sender=Task)
+def save_task_deadline_reminder(sender, instance, update_fields=None, **kwargs):
+    """
+    Write a schedule changed by a save whose update_fields omitted it.
+    """
+    save_rescheduled_reminder(instance, update_fields)
@@ -4,7 +4,10 @@ from celery.utils.log import get_task_logger
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from .models import Task
-from apps.notifications.utils import send_notification
+from apps.notifications.utils import send_notifications
+from apps.notifications.coalescing import PendingNotification, notify_coalesced
+from apps.notifications.reminders import TASK_REMINDER_OFFSETS, dispatch_due_reminders
+from .utils import ACTIVE_TASK_STATUSES
 
 logger = get_task_logger(__name__)
 User = get_user_model()
@@ -17,9 +20,9 @@ def notify_task_assigned(self, task_id):
     try:
         task = Task.objects.get(id=task_id)
         if task.developer and task.developer.user:
-            send_notification(
-                recipient=task.developer.user,
-                message=f"New task assigned: {task.title}",
+            send_notifications(
+                [task.developer.user],
+                f"New task assigned: {task.title}",
                 notification_type="task_assigned"
             )
             logger.info(f"Notification sent for task assignment: {task_id}")
@@ -36,47 +39,119 @@ def notify_task_status_update(task_id, old_status, new_status):
     Send notification when task status is updated
     """
     try:
-        task = Task.objects.get(id=task_id)
+        task = Task.objects.select_related('developer__user', 'project').get(id=task_id)
         if task.developer and task.developer.user:
-            send_notification(
+            # Bursts of updates in one project are merged into one notification
+            notify_coalesced([PendingNotification(
                 recipient=task.developer.user,
                 message=f"Task status updated from {old_status} to {new_status}: {task.title}",
-                notification_type="task_status_update"
-            )
+                notification_type="task_status_update",
+                target=f"project:{task.project_id}",
+                label=task.project.title,
+                data={'task_id': str(task.id), 'old_status': old_status, 'new_status': new_status},
+            )])
             logger.info(f"Status update notification sent for task: {task_id}")
     except Task.DoesNotExist:
         logger.error(f"Task {task_id} not found for status update notification")
     except Exception as e:
         logger.error(f"Error in notify_task_status_update: {e}")
 
+@shared_task
+def notify_bulk_task_changes(member_id, assigned_task_ids, status_changes):
+    """
+    Send one grouped notification to a developer for a bulk task operation
+
+    Args:
+        member_id: OrganizationMember ID of the developer
+        assigned_task_ids: IDs of tasks newly assigned to the developer
+        status_changes: [task_id, old_status, new_status] triples
+    """
+    from apps.organization.models import OrganizationMember
+
+    try:
+        member = OrganizationMember.objects.select_related('user').get(id=member_id)
+    except OrganizationMember.DoesNotExist:
+        logger.error(f"Organization member {member_id} not found for bulk task notification")
+        return
+
+    titles = dict(Task.objects.filter(
+        id__in=list(assigned_task_ids) + [change[0] for change in status_changes]
+    ).values_list('id', 'title'))
+    titles = {str(task_id): title for task_id, title in titles.items()}
+
+    lines = []
+    if assigned_task_ids:
+        lines.append(f"{len(assigned_task_ids)} task(s) assigned to you:")
+        lines.extend(f"- {titles.get(task_id, task_id)}" for task_id in assigned_task_ids)
+    if status_changes:
+        lines.append(f"{len(status_changes)} task(s) changed status:")
+        lines.extend(
+            f"- {titles.get(task_id, task_id)}: {old_status} -> {new_status}"
+            for task_id, old_status, new_status in status_changes
+        )
+    if not lines:
+        return
+
+    send_notifications(
+        [member.user],
+        "\n".join(lines),
+        notification_type="task_bulk_update"
+    )
+    logger.info(f"Bulk task notification sent to member {member_id}")
+
+TASK_REMINDER_MESSAGES = {
+    '24h': "Task '{title}' is due soon! (Due: {due})",
+    '1h': "Task '{title}' is due within the hour! (Due: {due})",
+    'overdue': "Task '{title}' is overdue! (Was due: {due})",
+}
+
+def _send_task_reminders(reminders):
+    notify_coalesced([
+        PendingNotification(
+            recipient=task.developer.user,
+            message=TASK_REMINDER_MESSAGES[stage].format(
+                title=task.title, due=task.due_date.strftime('%Y-%m-%d %H:%M')
+            ),
+            notification_type="task_overdue" if stage == 'overdue' else "deadline_approaching",
+            target=f"project:{task.project_id}",
+            label=task.project.title,
+            data={'task_id': str(task.id), 'stage': stage},
+        )
+        for task, stage in reminders
+        if task.developer and task.developer.user
+    ])
+
 @shared_task
 def check_task_deadlines():
     """
-    Check for tasks with approaching deadlines and send notifications
-    This task should be scheduled to run daily
+    Send task deadline reminders (24h, 1h, overdue) that are due.
+    Only tasks whose next_reminder_at has passed are read, each reminder
+    is sent once; schedules are maintained by apps.tasks.signals.
     """
     try:
-        soon = timezone.now() + timezone.timedelta(hours=24)
-        tasks = Task.objects.filter(
-            due_date__lte=soon,
-            due_date__gt=timezone.now(),
-            status__in=['pending', 'in_progress']
+        sent = dispatch_due_reminders(
+            Task.objects.filter(status__in=ACTIVE_TASK_STATUSES).select_related('developer__user', 'project'),
+            lambda task: task.due_date,
+            TASK_REMINDER_OFFSETS,
+            _send_task_reminders
         )
-        
-        for task in tasks:
-            if task.developer and task.developer.user:
-                send_notification(
-                    recipient=task.developer.user,
-                    message=f"Task '{task.title}' is due soon! (Due: {task.due_date.strftime('%Y-%m-%d %H:%M')})",
-                    notification_type="deadline_approaching"
-                )
-                logger.info(f"Deadline notification sent for task: {task.id}")
-        
-        return f"Checked {tasks.count()} tasks for deadlines"
+        logger.info(f"Sent {sent} task deadline reminders")
+        return f"Sent {sent} task deadline reminders"
     except Exception as e:
         logger.error(f"Error in check_task_deadlines: {e}")
         raise
 
+@shared_task
+def refresh_developer_workload():
+    """
+    Rebuild DeveloperWorkload counters from the tasks table, repairing any
+    drift.
+    """
+    from .workload import recompute_workload
+
+    updated = recompute_workload()
+    return f"Refreshed workload for {updated} members"
+
 @shared_task
 def test_task_signals():
     """
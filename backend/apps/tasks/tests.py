@@ -1,3 +1,529 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from apps.clients.models import Client
+from apps.organization.models import Organization, OrganizationMember, OrganizationRoleChoices
+from apps.projects.models import Project
+from apps.tasks.models import DeveloperWorkload, Task, TaskDependency
+from apps.tasks.workload import due_windows, recompute_workload
+from apps.tasks.dependencies import add_task_dependency, get_critical_path
+from apps.tasks.tasks import check_task_deadlines
+from apps.notifications.models import Notification
+from apps.notifications.reminders import TASK_REMINDER_OFFSETS, dispatch_due_reminders
+
+User = get_user_model()
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class TaskBulkApiTests(APITestCase):
+    """Test the bulk task create/update endpoint."""
+
+    def setUp(self):
+        for target in (
+            'apps.notifications.outbox.wake_outbox_relay',
+        ):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        bulk_patcher = patch('apps.tasks.tasks.notify_bulk_task_changes.delay')
+        self.mock_bulk_notify = bulk_patcher.start()
+        self.addCleanup(bulk_patcher.stop)
+
+        organization = Organization.objects.create(name='Bulk Org')
+        client = Client.objects.create(name='Bulk Client', organization=organization)
+        self.project = Project.objects.create(title='Bulk Project', description='', cost=100, client=client)
+        self.developers = [
+            OrganizationMember.objects.create(
+                user=User.objects.create_user(email=f'dev{index}@example.com'),
+                organization=organization,
+                role=OrganizationRoleChoices.DEVELOPER
+            )
+            for index in range(2)
+        ]
+        self.superuser = User.objects.create_user(
+            email='root@example.com', is_superuser=True, is_staff=True
+        )
+        self.url = reverse('tasks:task-bulk')
+        self.client.force_authenticate(user=self.superuser)
+
+    def test_bulk_create(self):
+        """Tasks are created together, counters updated, one notification per developer."""
+        payload = [
+            {'title': f'Task {index}', 'project': str(self.project.id),
+             'developer': str(self.developers[index % 2].id)}
+            for index in range(6)
+        ] + [{'title': 'Done', 'project': str(self.project.id), 'status': 'completed'}]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 7)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.completed_task_count), (7, 1))
+        self.assertEqual(self.mock_bulk_notify.call_count, 2)
+
+    def test_bulk_create_rejects_whole_batch(self):
+        """A single invalid item fails the request and writes nothing."""
+        payload = [
+            {'title': 'Valid', 'project': str(self.project.id)},
+            {'title': 'Invalid', 'project': str(self.project.id),
+             'developer': '00000000-0000-0000-0000-000000000000'},
+        ]
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('developer', response.data['errors'][1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_update_assign_and_transition(self):
+        """Assignments and status changes are applied and grouped per developer."""
+        tasks = [Task.objects.create(title=f'Task {index}', project=self.project) for index in range(3)]
+        payload = [
+            {'id': str(tasks[0].id), 'status': 'completed'},
+            {'id': str(tasks[1].id), 'developer': str(self.developers[0].id)},
+            {'id': str(tasks[2].id), 'developer': str(self.developers[0].id), 'priority': 'high'},
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tasks[0].refresh_from_db()
+        tasks[2].refresh_from_db()
+        self.assertEqual(tasks[0].status, 'completed')
+        self.assertIsNotNone(tasks[0].completed_at)
+        self.assertEqual((tasks[2].developer_id, tasks[2].priority), (self.developers[0].id, 'high'))
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.completed_task_count), (3, 1))
+        self.mock_bulk_notify.assert_called_once_with(
+            str(self.developers[0].id), [str(tasks[1].id), str(tasks[2].id)], []
+        )
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class TaskDeadlineReminderTests(TestCase):
+    """Test the next_reminder_at based deadline reminder scheduler."""
+
+    def setUp(self):
+        for target in (
+            'apps.notifications.outbox.wake_outbox_relay',
+        ):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        organization = Organization.objects.create(name='Reminder Org')
+        client = Client.objects.create(name='Reminder Client', organization=organization)
+        self.project = Project.objects.create(title='Reminder Project', description='', cost=100, client=client)
+        self.developer = OrganizationMember.objects.create(
+            user=User.objects.create_user(email='dev@example.com'),
+            organization=organization,
+            role=OrganizationRoleChoices.DEVELOPER
+        )
+        self.due = timezone.now() + timedelta(hours=30)
+
+    def _dispatch(self, now):
+        sent = []
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch_due_reminders(
+                Task.objects.all(),
+                lambda task: task.due_date,
+                TASK_REMINDER_OFFSETS,
+                lambda reminders: sent.extend(stage for task, stage in reminders),
+                now=now
+            )
+        return sent
+
+    def test_reminders_are_sent_once_per_offset(self):
+        """Each offset fires exactly once, at or after its scheduled time."""
+        task = Task.objects.create(
+            title='Due', project=self.project, developer=self.developer, due_date=self.due
+        )
+        self.assertEqual(task.next_reminder_at, self.due - timedelta(hours=24))
+
+        self.assertEqual(self._dispatch(self.due - timedelta(hours=25)), [])
+        self.assertEqual(self._dispatch(self.due - timedelta(hours=23)), ['24h'])
+        self.assertEqual(self._dispatch(self.due - timedelta(hours=23)), [])
+        self.assertEqual(self._dispatch(self.due - timedelta(minutes=30)), ['1h'])
+        self.assertEqual(self._dispatch(self.due + timedelta(minutes=1)), ['overdue'])
+        self.assertEqual(self._dispatch(self.due + timedelta(days=1)), [])
+
+        task.refresh_from_db()
+        self.assertIsNone(task.next_reminder_at)
+
+    def test_late_schedule_skips_stale_reminders(self):
+        """A task created inside the 1h window only gets the 1h reminder."""
+        due = timezone.now() + timedelta(minutes=30)
+        Task.objects.create(title='Soon', project=self.project, developer=self.developer, due_date=due)
+
+        self.assertEqual(self._dispatch(timezone.now()), ['1h'])
+
+    def test_completing_or_rescheduling_updates_the_schedule(self):
+        """Completed tasks stop reminding; moving the due date restarts the schedule."""
+        task = Task.objects.create(title='Due', project=self.project, due_date=self.due)
+
+        task.status = 'completed'
+        task.save()
+        self.assertIsNone(task.next_reminder_at)
+
+        task.status = 'in_progress'
+        task.due_date = self.due + timedelta(days=2)
+        task.save()
+        self.assertEqual(task.reminder_stage, 0)
+        self.assertEqual(task.next_reminder_at, task.due_date - timedelta(hours=24))
+
+    def test_saves_with_update_fields_keep_the_schedule(self):
+        """The schedule is written even when update_fields does not list it."""
+        task = Task.objects.create(title='Due', project=self.project, due_date=self.due)
+
+        task.due_date = self.due + timedelta(days=2)
+        task.save(update_fields=['due_date'])
+        task.refresh_from_db()
+        self.assertEqual(task.next_reminder_at, self.due + timedelta(days=2) - timedelta(hours=24))
+
+        task.status = 'completed'
+        task.save(update_fields=['status'])
+        task.refresh_from_db()
+        self.assertIsNone(task.next_reminder_at)
+
+    @patch('apps.tasks.tasks.notify_coalesced')
+    def test_beat_job_skips_inactive_tasks(self, mock_notify_coalesced):
+        """Rows closed without signals (e.g. by update()) are not reminded."""
+        task = Task.objects.create(
+            title='Soon', project=self.project, developer=self.developer,
+            due_date=timezone.now() + timedelta(hours=2)
+        )
+        Task.objects.filter(pk=task.pk).update(status='completed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            check_task_deadlines()
+
+        mock_notify_coalesced.assert_not_called()
+
+    def test_overdue_reminders_are_not_merged_with_approaching_ones(self):
+        """Overdue tasks get their own coalesced notification and wording."""
+        now = timezone.now()
+        for index, due in enumerate((now + timedelta(minutes=30), now + timedelta(minutes=40),
+                                     now - timedelta(minutes=5), now - timedelta(minutes=10))):
+            Task.objects.create(title=f'Task {index}', project=self.project, developer=self.developer, due_date=due)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            check_task_deadlines()
+
+        messages = dict(Notification.objects.filter(recipient=self.developer.user).values_list(
+            'notification_type', 'message'
+        ))
+        self.assertEqual(messages, {
+            'deadline_approaching': "2 task deadlines approaching in Reminder Project",
+            'task_overdue': "2 tasks overdue in Reminder Project",
+        })
+
+    @patch('apps.tasks.tasks.notify_coalesced')
+    def test_beat_job_notifies_developer(self, mock_notify_coalesced):
+        """check_task_deadlines notifies the assigned developer for due reminders."""
+        Task.objects.create(
+            title='Soon', project=self.project, developer=self.developer,
+            due_date=timezone.now() + timedelta(hours=2)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            check_task_deadlines()
+
+        mock_notify_coalesced.assert_called_once()
+        [event] = mock_notify_coalesced.call_args.args[0]
+        self.assertEqual(event.recipient, self.developer.user)
+        self.assertEqual(event.target, f'project:{self.project.id}')
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class TaskDependencyTests(APITestCase):
+    """Test dependency cycle detection and the critical path endpoint."""
+
+    def setUp(self):
+        for target in (
+            'apps.notifications.outbox.wake_outbox_relay',
+        ):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        organization = Organization.objects.create(name='Graph Org')
+        client = Client.objects.create(name='Graph Client', organization=organization)
+        self.project = Project.objects.create(title='Graph Project', description='', cost=100, client=client)
+        self.client.force_authenticate(
+            user=User.objects.create_user(email='root@example.com', is_superuser=True, is_staff=True)
+        )
+
+    def _tasks(self, *hours):
+        return [
+            Task.objects.create(title=f'T{index}', project=self.project, estimated_hours=value)
+            for index, value in enumerate(hours)
+        ]
+
+    def test_cycles_are_rejected(self):
+        """Edges against the current order are accepted unless they close a cycle."""
+        a, b, c, d = self._tasks(1, 1, 1, 1)
+        add_task_dependency(c, d)
+        add_task_dependency(b, c)
+        add_task_dependency(a, b)
+
+        with self.assertRaisesMessage(ValueError, 'cycle'):
+            add_task_dependency(d, a)
+        with self.assertRaisesMessage(ValueError, 'already exists'):
+            add_task_dependency(a, b)
+
+        orders = dict(Task.objects.values_list('id', 'dependency_order'))
+        self.assertLess(orders[a.pk], orders[b.pk])
+        self.assertLess(orders[b.pk], orders[c.pk])
+        self.assertLess(orders[c.pk], orders[d.pk])
+
+    def test_incremental_order_matches_full_reachability(self):
+        """Random inserts agree with a naive reachability check and keep a valid order."""
+        tasks = self._tasks(*([1] * 25))
+        rng = random.Random(7)
+        edges = set()
+
+        def reaches(source, target):
+            stack, seen = [source], {source}
+            while stack:
+                node = stack.pop()
+                if node == target:
+                    return True
+                for pred, succ in edges:
+                    if pred == node and succ not in seen:
+                        seen.add(succ)
+                        stack.append(succ)
+            return False
+
+        for _ in range(80):
+            pred, succ = rng.sample(tasks, 2)
+            if (pred.pk, succ.pk) in edges:
+                continue
+            if reaches(succ.pk, pred.pk):
+                with self.assertRaises(ValueError):
+                    add_task_dependency(pred, succ)
+            else:
+                add_task_dependency(pred, succ)
+                edges.add((pred.pk, succ.pk))
+
+        orders = dict(Task.objects.values_list('id', 'dependency_order'))
+        for pred, succ in edges:
+            self.assertLess(orders[pred], orders[succ])
+
+    def test_critical_path_endpoint_is_cached_per_version(self):
+        """Slack and the critical chain are computed once per schedule version."""
+        design, build, docs, release = self._tasks(2, 5, 1, 1)
+        for pred, succ in ((design, build), (design, docs), (build, release), (docs, release)):
+            response = self.client.post(
+                reverse('tasks:task-dependency-list'),
+                {'predecessor': str(pred.id), 'successor': str(succ.id)},
+                format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        url = reverse('projects:project-critical-path', args=[self.project.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['duration'], 8)
+        self.assertEqual(response.data['critical_path'], [str(design.id), str(build.id), str(release.id)])
+        docs_row = next(row for row in response.data['tasks'] if row['id'] == str(docs.id))
+        self.assertEqual((docs_row['earliest_start'], docs_row['latest_start'], docs_row['slack']), (2, 6, 4))
+
+        self.project.refresh_from_db()
+        with self.assertNumQueries(0):
+            get_critical_path(self.project)
+
+        docs.estimated_hours = 10
+        docs.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['duration'], 13)
+        self.assertIn(str(docs.id), response.data['critical_path'])
+
+    def test_saving_a_stale_task_keeps_its_dependency_order(self):
+        """Full saves do not write back an order changed by a reorder."""
+        first, second = self._tasks(1, 1)
+        add_task_dependency(second, first)
+        stale = Task.objects.get(pk=first.pk)
+        add_task_dependency(Task.objects.create(title='T2', project=self.project), second)
+        self.assertNotEqual(Task.objects.get(pk=first.pk).dependency_order, stale.dependency_order)
+
+        stale.title = 'Renamed'
+        stale.save()
+
+        orders = dict(Task.objects.values_list('id', 'dependency_order'))
+        self.assertLess(orders[second.pk], orders[first.pk])
+        self.assertEqual(Task.objects.get(pk=first.pk).title, 'Renamed')
+
+    def test_moved_task_leaves_the_dependency_graph(self):
+        """Moving a task to another project drops its dependencies."""
+        first, second, third = self._tasks(1, 2, 3)
+        add_task_dependency(first, second)
+        add_task_dependency(second, third)
+        other = Project.objects.create(
+            title='Other Project', description='', cost=100, client=self.project.client
+        )
+
+        second.project = other
+        second.save()
+
+        self.assertFalse(TaskDependency.objects.filter(predecessor=second).exists())
+        self.assertFalse(TaskDependency.objects.filter(successor=second).exists())
+        second.refresh_from_db()
+        self.assertIsNone(second.dependency_order)
+        response = self.client.get(reverse('projects:project-critical-path', args=[other.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['duration'], 2)
+        self.project.refresh_from_db()
+        self.assertEqual(get_critical_path(self.project)['duration'], 3)
+
+    def test_cycle_rejected_by_api(self):
+        """The API reports cycles as validation errors."""
+        first, second = self._tasks(1, 1)
+        TaskDependency.objects.create(predecessor=first, successor=second)
+        Task.objects.filter(pk=first.pk).update(dependency_order=1)
+        Task.objects.filter(pk=second.pk).update(dependency_order=2)
+
+        response = self.client.post(
+            reverse('tasks:task-dependency-list'),
+            {'predecessor': str(second.id), 'successor': str(first.id)},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TaskDependency.objects.count(), 1)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class DeveloperWorkloadTests(APITestCase):
+    """Test the workload counters and the workload/suggest-assignee endpoints."""
+
+    def setUp(self):
+        for target in (
+            'apps.notifications.outbox.wake_outbox_relay',
+        ):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.organization = Organization.objects.create(name='Load Org')
+        client = Client.objects.create(name='Load Client', organization=self.organization)
+        self.project = Project.objects.create(title='Load Project', description='', cost=100, client=client)
+        self.developers = [
+            OrganizationMember.objects.create(
+                user=User.objects.create_user(email=f'dev{index}@example.com'),
+                organization=self.organization,
+                role=OrganizationRoleChoices.DEVELOPER
+            )
+            for index in range(3)
+        ]
+        self.client.force_authenticate(
+            user=User.objects.create_user(email='root@example.com', is_superuser=True, is_staff=True)
+        )
+
+    def _counters(self, member, now=None):
+        workload = DeveloperWorkload.objects.get(member=member)
+        windows = due_windows([workload.member_id], now).get(workload.member_id, {})
+        return {
+            **{field: getattr(workload, field) for field in (
+                'open_tasks', 'high_priority', 'medium_priority', 'no_due_date'
+            )},
+            'overdue': windows.get('overdue', 0),
+            'due_this_week': windows.get('due_this_week', 0),
+        }
+
+    def test_counters_follow_task_changes(self):
+        """Assigning, reprioritising, completing and deleting tasks adjust the counters."""
+        first, second = self.developers[:2]
+        task = Task.objects.create(
+            title='Work', project=self.project, developer=first, priority='high',
+            due_date=timezone.now() + timedelta(days=2)
+        )
+        Task.objects.create(title='Backlog', project=self.project, developer=first)
+        self.assertEqual(self._counters(first), {
+            'open_tasks': 2, 'high_priority': 1, 'medium_priority': 1,
+            'overdue': 0, 'due_this_week': 1, 'no_due_date': 1,
+        })
+
+        task.developer = second
+        task.priority = 'medium'
+        task.save()
+        self.assertEqual(self._counters(first)['open_tasks'], 1)
+        self.assertEqual(self._counters(first)['high_priority'], 0)
+        self.assertEqual(self._counters(second)['medium_priority'], 1)
+
+        task.status = 'completed'
+        task.save()
+        self.assertEqual(self._counters(second)['open_tasks'], 0)
+
+        Task.objects.filter(developer=first).delete()
+        self.assertEqual(self._counters(first)['open_tasks'], 0)
+
+    def test_due_windows_slide_with_time(self):
+        """A task counted as due later is overdue once its date passes, and leaves no drift when closed."""
+        developer = self.developers[0]
+        task = Task.objects.create(
+            title='Later', project=self.project, developer=developer,
+            due_date=timezone.now() + timedelta(days=10)
+        )
+        self.assertEqual(self._counters(developer)['overdue'], 0)
+
+        later = timezone.now() + timedelta(days=11)
+        self.assertEqual(self._counters(developer, later)['overdue'], 1)
+        task.status = 'completed'
+        task.save()
+
+        self.assertEqual(self._counters(developer, later), {
+            'open_tasks': 0, 'high_priority': 0, 'medium_priority': 0,
+            'no_due_date': 0, 'overdue': 0, 'due_this_week': 0,
+        })
+
+    def test_recompute_matches_incremental_counters(self):
+        """The periodic rebuild agrees with the signal-maintained rows."""
+        for index, priority in enumerate(('low', 'high', 'critical', 'medium')):
+            Task.objects.create(
+                title=f'Task {index}', project=self.project,
+                developer=self.developers[index % 2], priority=priority,
+                due_date=timezone.now() + timedelta(days=index * 5)
+            )
+        before = {row.member_id: self._counters(row.member_id) for row in DeveloperWorkload.objects.all()}
+
+        DeveloperWorkload.objects.update(open_tasks=99)
+        recompute_workload()
+
+        after = {row.member_id: self._counters(row.member_id) for row in DeveloperWorkload.objects.all()}
+        self.assertEqual(before, after)
+
+    def test_workload_endpoint_and_suggestion(self):
+        """The endpoint reads counters and one due-window query, and suggests the least-loaded developer."""
+        busy, light, idle = self.developers
+        Task.objects.create(title='Critical', project=self.project, developer=busy, priority='critical')
+        Task.objects.create(title='Low', project=self.project, developer=light, priority='low')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('workload:workload-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['member_id'], str(busy.id))
+        self.assertEqual(response.data['results'][0]['by_priority']['critical'], 1)
+
+        response = self.client.get(
+            reverse('workload:workload-suggest-assignee'), {'project': str(self.project.id)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['member_id'], str(idle.id))
+
+        self.project.team_members.add(busy, light)
+        response = self.client.get(
+            reverse('workload:workload-suggest-assignee'), {'project': str(self.project.id)}
+        )
+        self.assertEqual(response.data['member_id'], str(light.id))
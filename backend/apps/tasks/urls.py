@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet
+from .views import TaskViewSet, TaskDependencyViewSet
 
 # Define the application namespace
 app_name = 'tasks'
@@ -8,8 +8,14 @@ app_name = 'tasks'
 # Create a router for ViewSets
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
+router.register(r'dependencies', TaskDependencyViewSet, basename='task-dependency')
 
 urlpatterns = [
+    # Bulk create (POST) / update (PATCH) endpoint at /api/v1/tasks/bulk/
+    path('bulk/',
+         TaskViewSet.as_view({'post': 'bulk', 'patch': 'bulk'}),
+         name='task-bulk'),
+
     # Include all ViewSet URLs
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,459 @@
+import base64
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Task
+from .workload import add_load_change, apply_workload_deltas, task_load
+from apps.organization.models import OrganizationMember
+from apps.projects.utils import COMPLETED_TASK_STATUSES, adjust_task_counters, bump_schedule_version
+from apps.notifications.reminders import TASK_REMINDER_OFFSETS, schedule_reminder
+
+# Fields a bulk update may change on an existing task
+BULK_UPDATE_FIELDS = ('title', 'description', 'status', 'priority', 'developer', 'due_date')
+
+# Task statuses that still receive deadline reminders
+ACTIVE_TASK_STATUSES = ('pending', 'in_progress')
+
+# Default number of cards returned per board column
+BOARD_PAGE_SIZE = 20
+
+# Board ordering: fractional position, ties broken by primary key
+BOARD_ORDERING = ('board_position', 'id')
+
+
+class BulkTaskError(Exception):
+    """
+    Raised when one or more items of a bulk request fail validation.
+
+    ``errors`` is aligned with the submitted items: an empty dict for
+    valid items and a field -> messages mapping for invalid ones.
+    """
+    def __init__(self, errors):
+        super().__init__('Bulk task validation failed')
+        self.errors = errors
+
+
+def _resolve_developers(items):
+    developer_ids = {item['developer'] for item in items if item.get('developer')}
+    return OrganizationMember.objects.select_related('user').in_bulk(developer_ids)
+
+
+def _check_developer(developer, project, errors):
+    if developer is None:
+        errors['developer'] = ['Developer not found.']
+    elif developer.organization_id != project.client.organization_id:
+        errors['developer'] = ['The developer must belong to the same organization as the project.']
+
+
+def _dispatch_notifications(assigned, status_changes):
+    """
+    Queue one grouped notification per developer once the transaction commits.
+    """
+    from .tasks import notify_bulk_task_changes
+
+    for member_id in set(assigned) | set(status_changes):
+        transaction.on_commit(
+            lambda member_id=member_id: notify_bulk_task_changes.delay(
+                str(member_id),
+                assigned.get(member_id, []),
+                status_changes.get(member_id, [])
+            )
+        )
+
+
+def bulk_create_tasks(items, projects):
+    """
+    Validate and create many tasks in one transaction.
+
+    Projects and developers are resolved with one ``in_bulk`` query each,
+    rows are written with a single ``bulk_create``, project counters are
+    adjusted once per affected project and each developer receives a single
+    grouped assignment notification.
+
+    Args:
+        items: Validated item dicts (see TaskBulkCreateSerializer)
+        projects: Project queryset the caller may create tasks in
+
+    Returns:
+        list: The created Task instances
+
+    Raises:
+        BulkTaskError: If any item references an unknown project or developer
+    """
+    project_map = projects.select_related('client').in_bulk({item['project'] for item in items})
+    developer_map = _resolve_developers(items)
+
+    errors = []
+    tasks = []
+    for item in items:
+        item_errors = {}
+        project = project_map.get(item['project'])
+        developer = None
+        if project is None:
+            item_errors['project'] = ['Project not found.']
+        elif item.get('developer'):
+            developer = developer_map.get(item['developer'])
+            _check_developer(developer, project, item_errors)
+        errors.append(item_errors)
+
+        if not item_errors:
+            status = item.get('status', 'pending')
+            tasks.append(Task(
+                title=item['title'],
+                description=item.get('description'),
+                status=status,
+                priority=item.get('priority', 'medium'),
+                developer=developer,
+                project=project,
+                due_date=item.get('due_date'),
+                estimated_hours=item.get('estimated_hours', 1),
+                completed_at=timezone.now() if status in COMPLETED_TASK_STATUSES else None,
+            ))
+            schedule_reminder(
+                tasks[-1], tasks[-1].due_date, TASK_REMINDER_OFFSETS, status in ACTIVE_TASK_STATUSES
+            )
+
+    if any(errors):
+        raise BulkTaskError(errors)
+
+    deltas = defaultdict(lambda: [0, 0])
+    assigned = defaultdict(list)
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        for task in tasks:
+            deltas[task.project_id][0] += 1
+            deltas[task.project_id][1] += int(task.status in COMPLETED_TASK_STATUSES)
+            if task.developer_id:
+                assigned[task.developer_id].append(str(task.id))
+        for project_id, (total_delta, completed_delta) in deltas.items():
+            adjust_task_counters(project_id, total_delta, completed_delta)
+        bump_schedule_version(deltas)
+        apply_workload_deltas(Counter(
+            load for load in (
+                task_load(task.developer_id, task.status, task.priority, task.due_date)
+                for task in tasks
+            ) if load is not None
+        ))
+        _dispatch_notifications(assigned, {})
+
+    return tasks
+
+
+def bulk_update_tasks(items, tasks):
+    """
+    Validate and apply partial updates (fields, assignment, status) to many tasks.
+
+    The tasks' rows are locked for the update, tasks and developers are
+    resolved with one ``in_bulk`` query each, rows are written with a single
+    ``bulk_update`` limited to the changed fields, completed task counters
+    are adjusted once per affected project and each developer receives one
+    grouped notification for new assignments and status changes.
+
+    Args:
+        items: Validated item dicts, each with an ``id`` (see TaskBulkUpdateSerializer)
+        tasks: Task queryset the caller may update
+
+    Returns:
+        list: The updated Task instances, in request order
+
+    Raises:
+        BulkTaskError: If any item references an unknown task or developer
+    """
+    with transaction.atomic():
+        # Lock the rows in a stable order before reading them, so concurrent
+        # edits (board moves, dependency reorders) are not overwritten with
+        # stale copies
+        task_ids = {item['id'] for item in items}
+        list(Task.objects.select_for_update().filter(pk__in=task_ids).order_by('pk').values_list('pk', flat=True))
+        task_map = tasks.select_related('project__client', 'developer__user').in_bulk(task_ids)
+        developer_map = _resolve_developers(items)
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            task = task_map.get(item['id'])
+            if task is None:
+                item_errors['id'] = ['Task not found.']
+            elif item.get('developer'):
+                _check_developer(developer_map.get(item['developer']), task.project, item_errors)
+            errors.append(item_errors)
+
+        if any(errors):
+            raise BulkTaskError(errors)
+
+        now = timezone.now()
+        changed_fields = {'updated_at'}
+        completed_deltas = defaultdict(int)
+        workload_deltas = Counter()
+        assigned = defaultdict(list)
+        status_changes = defaultdict(list)
+        updated = {}
+
+        for item in items:
+            task = task_map[item['id']]
+            old_status = task.status
+            old_developer_id = task.developer_id
+            old_due_date = task.due_date
+            old_load = task_load(old_developer_id, old_status, task.priority, old_due_date)
+
+            for field in BULK_UPDATE_FIELDS:
+                if field not in item:
+                    continue
+                if field == 'developer':
+                    task.developer = developer_map.get(item['developer']) if item['developer'] else None
+                else:
+                    setattr(task, field, item[field])
+                changed_fields.add(field)
+
+            if task.status != old_status:
+                was_completed = old_status in COMPLETED_TASK_STATUSES
+                is_completed = task.status in COMPLETED_TASK_STATUSES
+                if was_completed != is_completed:
+                    completed_deltas[task.project_id] += 1 if is_completed else -1
+                    task.completed_at = now if is_completed else None
+                    changed_fields.add('completed_at')
+                if task.developer_id and task.developer_id == old_developer_id:
+                    status_changes[task.developer_id].append([str(task.id), old_status, task.status])
+
+            if task.developer_id and task.developer_id != old_developer_id:
+                assigned[task.developer_id].append(str(task.id))
+
+            is_active = task.status in ACTIVE_TASK_STATUSES
+            if task.due_date != old_due_date or (old_status in ACTIVE_TASK_STATUSES) != is_active:
+                schedule_reminder(task, task.due_date, TASK_REMINDER_OFFSETS, is_active)
+                changed_fields.update(('next_reminder_at', 'reminder_stage'))
+
+            add_load_change(
+                workload_deltas, old_load,
+                task_load(task.developer_id, task.status, task.priority, task.due_date)
+            )
+            task.updated_at = now
+            updated[task.pk] = task
+
+        Task.objects.bulk_update(updated.values(), sorted(changed_fields))
+        for project_id, completed_delta in completed_deltas.items():
+            adjust_task_counters(project_id, 0, completed_delta)
+        apply_workload_deltas(workload_deltas)
+        _dispatch_notifications(assigned, status_changes)
+
+        return list(updated.values())
+
+
+def encode_board_cursor(task):
+    """
+    Encode the keyset cursor pointing after ``task`` in its board column.
+    """
+    raw = f'{task.board_position!r}|{task.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_board_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_board_cursor``.
+
+    Returns:
+        tuple: (board_position, task id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        position, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return float(position), pk
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _board_page(column_tasks, page_size):
+    """
+    Split the ``page_size + 1`` rows fetched for a column into the page and
+    the cursor of the next page (None on the last page).
+    """
+    has_next = len(column_tasks) > page_size
+    column_tasks = column_tasks[:page_size]
+    return column_tasks, encode_board_cursor(column_tasks[-1]) if has_next else None
+
+
+def get_task_board(tasks, page_size=BOARD_PAGE_SIZE):
+    """
+    Build a kanban board with one column per task status.
+
+    Column counts come from a single grouped query and the first page of
+    every column from a single ROW_NUMBER() window query partitioned by
+    status, so the board costs two queries however many columns it has.
+
+    Args:
+        tasks: Queryset of the tasks on the board (usually one project's tasks)
+        page_size: Number of cards returned per column
+
+    Returns:
+        list: One dict per status with ``status``, ``label``, ``count``,
+        ``tasks`` (Task instances) and ``next_cursor``
+    """
+    counts = dict(tasks.order_by().values_list('status').annotate(count=Count('id')))
+
+    rows = tasks.select_related('developer__user').annotate(
+        board_row=Window(
+            RowNumber(),
+            partition_by=[F('status')],
+            order_by=[F(field).asc() for field in BOARD_ORDERING],
+        )
+    ).filter(board_row__lte=page_size + 1).order_by('status', *BOARD_ORDERING)
+
+    grouped = defaultdict(list)
+    for task in rows:
+        grouped[task.status].append(task)
+
+    columns = []
+    for value, label in Task.STATUS_CHOICES:
+        column_tasks, next_cursor = _board_page(grouped[value], page_size)
+        columns.append({
+            'status': value,
+            'label': label,
+            'count': counts.get(value, 0),
+            'tasks': column_tasks,
+            'next_cursor': next_cursor,
+        })
+    return columns
+
+
+def get_task_board_column(tasks, status, cursor=None, page_size=BOARD_PAGE_SIZE):
+    """
+    Fetch one page of a board column using keyset pagination.
+
+    Args:
+        tasks: Queryset of the tasks on the board
+        status: The column's task status
+        cursor: Cursor returned with the previous page, or None for the first page
+        page_size: Number of cards returned
+
+    Returns:
+        tuple: (list of Task instances, next cursor or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    column = tasks.filter(status=status).select_related('developer__user')
+    if cursor:
+        position, pk = decode_board_cursor(cursor)
+        column = column.filter(
+            Q(board_position__gt=position) | Q(board_position=position, id__gt=pk)
+        )
+    return _board_page(list(column.order_by(*BOARD_ORDERING)[:page_size + 1]), page_size)
+
+
+def _position_between(lower, upper):
+    """
+    Return a position strictly between two neighbours (either may be None for
+    a column edge), or None when floating point precision leaves no room.
+    """
+    if lower is None and upper is None:
+        return 0.0
+    if lower is None:
+        return upper - 1.0
+    if upper is None:
+        return lower + 1.0
+    position = (lower + upper) / 2
+    return position if lower < position < upper else None
+
+
+def rebalance_board_column(project_id, status):
+    """
+    Respace the positions of a board column to whole numbers.
+
+    Only needed when repeated moves into the same gap exhaust float
+    precision; the relative order of the cards is preserved.
+
+    Returns:
+        dict: Mapping of task id to its new position
+    """
+    # Only the keys are read; instances are built for bulk_update (the
+    # FieldTracker on Task does not support deferred fields)
+    column = [
+        Task(pk=pk, board_position=float(index))
+        for index, pk in enumerate(
+            Task.objects.filter(project_id=project_id, status=status)
+            .order_by(*BOARD_ORDERING).values_list('id', flat=True)
+        )
+    ]
+    Task.objects.bulk_update(column, ['board_position'])
+    return {task.pk: task.board_position for task in column}
+
+
+def move_task_on_board(task, status, after=None, before=None):
+    """
+    Move a task to a board column, between two neighbouring cards.
+
+    Only the moved task's row is written: its new fractional position is the
+    midpoint of its neighbours' positions, so the rest of the column keeps
+    its keys. Changing column also changes the task's status (and fires the
+    usual task signals). The target column's rows are locked for the move,
+    so concurrent moves into the same column cannot pick the same position
+    or interleave with a rebalance.
+
+    Args:
+        task: The Task being moved
+        status: Status of the target column
+        after: ID of the card that ends up directly above the task, if any
+        before: ID of the card that ends up directly below the task, if any;
+            when only one neighbour is given the other is the card next to it
+
+    Returns:
+        Task: The updated task
+
+    Raises:
+        ValueError: If a neighbour is not in the target column or the
+            neighbours are out of order
+    """
+    with transaction.atomic():
+        # Lock the target column and the moved task, in a stable order
+        list(
+            Task.objects.select_for_update()
+            .filter(Q(project_id=task.project_id, status=status) | Q(pk=task.pk))
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        column = Task.objects.filter(project_id=task.project_id, status=status).exclude(pk=task.pk)
+        neighbour_ids = [pk for pk in (after, before) if pk]
+        positions = dict(column.filter(pk__in=neighbour_ids).values_list('id', 'board_position'))
+        positions = {str(pk): position for pk, position in positions.items()}
+        missing = [str(pk) for pk in neighbour_ids if str(pk) not in positions]
+        if missing:
+            raise ValueError(f"Tasks not found in the '{status}' column: {', '.join(missing)}")
+
+        lower = positions.get(str(after)) if after else None
+        upper = positions.get(str(before)) if before else None
+        if lower is None and upper is None:
+            lower = column.aggregate(last=Max('board_position'))['last']
+        elif upper is None:
+            # Land between 'after' and the card currently below it
+            below = column.filter(
+                Q(board_position__gt=lower) | Q(board_position=lower, id__gt=after)
+            ).order_by(*BOARD_ORDERING).values_list('id', 'board_position').first()
+            if below:
+                before, upper = below
+        elif lower is None:
+            above = column.filter(
+                Q(board_position__lt=upper) | Q(board_position=upper, id__lt=before)
+            ).order_by('-board_position', '-id').values_list('id', 'board_position').first()
+            if above:
+                after, lower = above
+        elif lower >= upper:
+            raise ValueError("'after' must be above 'before' in the column")
+
+        position = _position_between(lower, upper)
+        if position is None:
+            positions = {str(pk): value for pk, value in rebalance_board_column(task.project_id, status).items()}
+            position = _position_between(positions[str(after)], positions[str(before)])
+
+        if task.status != status:
+            if status in COMPLETED_TASK_STATUSES:
+                task.completed_at = timezone.now()
+            elif task.status in COMPLETED_TASK_STATUSES:
+                task.completed_at = None
+            task.status = status
+        task.board_position = position
+        task.save()
+        return task
@@ -1,12 +1,43 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from django.db.models import Q
 
-from .models import Task
-from .serializers import TaskSerializer, TaskListSerializer
-from apps.users.permissions import IsAdmin, IsOrganizationMember
-from apps.organization.models import OrganizationRoleChoices
+from .models import Task, TaskDependency
+from .serializers import (
+    TaskSerializer,
+    TaskListSerializer,
+    TaskBulkCreateSerializer,
+    TaskBulkUpdateSerializer,
+    TaskDependencySerializer,
+    DeveloperWorkloadSerializer
+)
+from .workload import due_windows, eligible_developers, suggest_assignee
+from .dependencies import remove_task_dependency
+from .utils import BulkTaskError, bulk_create_tasks, bulk_update_tasks
+from apps.users.permissions import IsAdmin, IsOrganizationMember, IsOrganizationAdmin, IsProjectManager
+from apps.organization.models import OrganizationMember, OrganizationRoleChoices
+from apps.projects.models import Project
+
+# Maximum number of tasks accepted by a single bulk request
+BULK_MAX_ITEMS = 500
+
+
+def get_manageable_projects(user):
+    """
+    Projects whose tasks the user may manage: all projects for superusers,
+    otherwise projects of organizations they administer and projects they manage.
+    """
+    if user.is_staff or user.is_superuser:
+        return Project.objects.all()
+    return Project.objects.filter(
+        Q(client__organization__members__user=user,
+          client__organization__members__role=OrganizationRoleChoices.ADMIN,
+          client__organization__members__is_active=True) |
+        Q(project_manager__user=user)
+    ).distinct()
+
 
 class TaskViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -34,6 +65,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.select_related('developer__user', 'project')
         
         # If user is admin, return all tasks
         if user.is_staff or user.is_superuser:
@@ -49,7 +82,7 @@ class TaskViewSet(viewsets.ModelViewSet):
                 
             # If user is a developer, return their assigned tasks
             if member.role == OrganizationRoleChoices.DEVELOPER:
-                return queryset.filter(assigned_to=member)
+                return queryset.filter(developer=member)
                 
         except OrganizationMember.DoesNotExist:
             pass
@@ -61,6 +94,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
+        if self.action == 'bulk':
+            return [(IsOrganizationAdmin | IsProjectManager)()]
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [
                 IsAdmin | 
@@ -145,6 +180,53 @@ class TaskViewSet(viewsets.ModelViewSet):
             status=status.HTTP_403_FORBIDDEN
         )
     
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create (POST) or update/assign/transition (PATCH) many tasks at once.
+
+        The body is a list of task objects (or ``{"tasks": [...]}``). The whole
+        batch is validated before anything is written; on failure ``errors``
+        lists one entry per submitted item.
+        """
+        items = request.data.get('tasks') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Expected a non-empty list of tasks'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'A bulk request may contain at most {BULK_MAX_ITEMS} tasks'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        creating = request.method == 'POST'
+        item_serializer_class = TaskBulkCreateSerializer if creating else TaskBulkUpdateSerializer
+        serializer = item_serializer_class(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        projects = get_manageable_projects(request.user)
+        try:
+            if creating:
+                tasks = bulk_create_tasks(serializer.validated_data, projects)
+            else:
+                tasks = bulk_update_tasks(
+                    serializer.validated_data,
+                    Task.objects.filter(project__in=projects)
+                )
+        except BulkTaskError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                'count': len(tasks),
+                'results': TaskListSerializer(tasks, many=True).data
+            },
+            status=status.HTTP_201_CREATED if creating else status.HTTP_200_OK
+        )
+
     @action(detail=False, methods=['get'])
     def my_tasks(self, request):
         """
@@ -159,3 +241,103 @@ class TaskViewSet(viewsets.ModelViewSet):
         tasks = Task.objects.filter(developer=request.user.developer)
         serializer = self.get_serializer(tasks, many=True)
         return Response(serializer.data)
+
+
+class TaskDependencyViewSet(viewsets.ModelViewSet):
+    """
+    Create, list and delete finish-to-start dependencies between tasks of
+    projects the user manages. Filter a project's dependencies with ``?project=<id>``.
+    """
+    serializer_class = TaskDependencySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = TaskDependency.objects.filter(
+            successor__project__in=get_manageable_projects(self.request.user)
+        ).order_by('created_at')
+        project_id = self.request.query_params.get('project')
+        if project_id:
+            queryset = queryset.filter(successor__project_id=project_id)
+        return queryset
+
+    def perform_create(self, serializer):
+        successor = serializer.validated_data['successor']
+        if not get_manageable_projects(self.request.user).filter(pk=successor.project_id).exists():
+            raise PermissionDenied('You cannot manage tasks of this project.')
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        remove_task_dependency(instance)
+
+
+class WorkloadViewSet(viewsets.ViewSet):
+    """
+    Open task load of developers, served from the DeveloperWorkload counters
+    and one grouped query for due windows.
+
+    Organization admins and project managers see the developers of their
+    organizations (``?organization=<id>`` narrows to one); superusers see all.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _organization_ids(self, request):
+        user = request.user
+        organization_id = request.query_params.get('organization')
+        if user.is_staff or user.is_superuser:
+            return [organization_id] if organization_id else None
+        memberships = OrganizationMember.objects.filter(
+            user=user,
+            is_active=True,
+            role__in=[OrganizationRoleChoices.ADMIN, OrganizationRoleChoices.PROJECT_MANAGER],
+        )
+        if organization_id:
+            memberships = memberships.filter(organization_id=organization_id)
+        return list(memberships.values_list('organization_id', flat=True))
+
+    def list(self, request):
+        """
+        Workload of every active developer, most loaded first.
+        """
+        organization_ids = self._organization_ids(request)
+        members = OrganizationMember.objects.filter(
+            role=OrganizationRoleChoices.DEVELOPER, is_active=True
+        ).select_related('user', 'workload')
+        if organization_ids is not None:
+            members = members.filter(organization_id__in=organization_ids)
+        members = list(members)
+
+        data = sorted(
+            DeveloperWorkloadSerializer(
+                members, many=True, context={'due_windows': due_windows(member.id for member in members)}
+            ).data,
+            key=lambda row: (-row['load'], -row['open_tasks'])
+        )
+        return Response({'count': len(data), 'results': data})
+
+    @action(detail=False, methods=['get'], url_path='suggest-assignee')
+    def suggest_assignee(self, request):
+        """
+        Suggest the least-loaded developer for ``?project=<id>`` (preferring
+        its team) or ``?organization=<id>``.
+        """
+        project = None
+        project_id = request.query_params.get('project')
+        if project_id:
+            project = get_manageable_projects(request.user).select_related('client').filter(pk=project_id).first()
+            if project is None:
+                return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+            organization_id = project.client.organization_id
+        else:
+            organization_ids = self._organization_ids(request)
+            if not request.query_params.get('organization') or not organization_ids:
+                return Response(
+                    {'error': 'project or organization is required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            organization_id = organization_ids[0]
+
+        member = suggest_assignee(eligible_developers(organization_id, project))
+        if member is None:
+            return Response({'error': 'No eligible developer'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DeveloperWorkloadSerializer(member).data)
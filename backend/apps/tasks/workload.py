@@ -0,0 +1,229 @@
+"""
+Developer workload counters.
+
+Every organization member assigned to open tasks has a DeveloperWorkload
+row counting those tasks by priority and how many have no due date. Task
+saves and deletes (and the bulk endpoints) apply +1/-1 deltas with atomic
+UPDATEs, so reading an organization's workload or picking the least-loaded
+developer never counts tasks by priority. ``recompute_workload``
+periodically rebuilds all rows from one grouped query to repair drift.
+
+Due windows (overdue, due this week, due later) slide with time, so a
+task's window when it was counted may not be its window when it is
+uncounted. They are not kept in counters but computed at read time by
+``due_windows``, with one grouped query over the task_developer_due_idx
+index.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import DeveloperWorkload, Task
+from apps.organization.models import OrganizationMember, OrganizationRoleChoices
+
+# Task statuses counted as open work
+OPEN_TASK_STATUSES = ('pending', 'in_progress', 'blocked')
+
+# Counter column per task priority
+PRIORITY_FIELDS = {
+    'low': 'low_priority',
+    'medium': 'medium_priority',
+    'high': 'high_priority',
+    'critical': 'critical_priority',
+}
+
+# Weight of an open task of each priority when comparing developers' load
+PRIORITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+# Tasks due within this window count as due this week
+DUE_SOON = timedelta(days=7)
+
+# Counters kept in DeveloperWorkload; all independent of the current time
+WORKLOAD_FIELDS = ('open_tasks', *PRIORITY_FIELDS.values(), 'no_due_date')
+
+# Due windows computed at read time by due_windows()
+DUE_WINDOWS = ('overdue', 'due_this_week', 'due_later')
+
+
+def task_load(developer_id, status, priority, due_date):
+    """
+    The (member id, priority, has no due date) a task contributes to, or
+    None if it does not count towards anyone's workload.
+    """
+    if not developer_id or status not in OPEN_TASK_STATUSES:
+        return None
+    return developer_id, priority, due_date is None
+
+
+def add_load_change(deltas, old, new):
+    """
+    Record the move of one task from load ``old`` to ``new`` (either may be None).
+    """
+    if old == new:
+        return
+    if old is not None:
+        deltas[old] -= 1
+    if new is not None:
+        deltas[new] += 1
+
+
+def apply_workload_deltas(deltas):
+    """
+    Apply task load deltas with one UPDATE per affected member.
+
+    Args:
+        deltas: Mapping of (member id, priority, has no due date) to a
+            count delta
+    """
+    per_member = defaultdict(Counter)
+    for (member_id, priority, no_due_date), delta in deltas.items():
+        if not delta:
+            continue
+        per_member[member_id]['open_tasks'] += delta
+        per_member[member_id][PRIORITY_FIELDS.get(priority, 'medium_priority')] += delta
+        if no_due_date:
+            per_member[member_id]['no_due_date'] += delta
+
+    for member_id, changes in per_member.items():
+        changes = {field: delta for field, delta in changes.items() if delta}
+        if not changes:
+            continue
+        updates = {field: Greatest(F(field) + delta, 0) for field, delta in changes.items()}
+        if DeveloperWorkload.objects.filter(member_id=member_id).update(**updates):
+            continue
+        try:
+            with transaction.atomic():
+                DeveloperWorkload.objects.create(
+                    member_id=member_id,
+                    **{field: max(delta, 0) for field, delta in changes.items()}
+                )
+        except IntegrityError:
+            # Created concurrently; apply the deltas to that row
+            DeveloperWorkload.objects.filter(member_id=member_id).update(**updates)
+
+
+def recompute_workload(member_ids=None):
+    """
+    Rebuild workload rows from the tasks table with one grouped query,
+    repairing any drift.
+
+    Args:
+        member_ids: Optional iterable of member IDs (default: all members
+            with a workload row or open tasks)
+
+    Returns:
+        int: Number of workload rows written
+    """
+    tasks = Task.objects.filter(developer__isnull=False, status__in=OPEN_TASK_STATUSES)
+    rows = DeveloperWorkload.objects.all()
+    if member_ids is not None:
+        member_ids = list(member_ids)
+        tasks = tasks.filter(developer_id__in=member_ids)
+        rows = rows.filter(member_id__in=member_ids)
+
+    aggregates = {
+        'open_tasks': Count('id'),
+        'no_due_date': Count('id', filter=Q(due_date__isnull=True)),
+    }
+    for priority, field in PRIORITY_FIELDS.items():
+        aggregates[field] = Count('id', filter=Q(priority=priority))
+
+    workloads = {
+        member_id: DeveloperWorkload(member_id=member_id)
+        for member_id in rows.values_list('member_id', flat=True)
+    }
+    for row in tasks.values('developer_id').annotate(**aggregates).order_by():
+        workloads[row['developer_id']] = DeveloperWorkload(
+            member_id=row['developer_id'],
+            **{field: row[field] for field in WORKLOAD_FIELDS}
+        )
+
+    DeveloperWorkload.objects.bulk_create(
+        workloads.values(),
+        update_conflicts=True,
+        unique_fields=['member'],
+        update_fields=[*WORKLOAD_FIELDS, 'updated_at'],
+        batch_size=500,
+    )
+    return len(workloads)
+
+
+def due_windows(member_ids, now=None):
+    """
+    Count members' open tasks per due window with one grouped query.
+
+    Returns:
+        dict: Member ID -> {'overdue': ..., 'due_this_week': ...,
+        'due_later': ...}; members without dated open tasks are left out
+    """
+    now = now or timezone.now()
+    rows = Task.objects.filter(
+        developer_id__in=list(member_ids),
+        status__in=OPEN_TASK_STATUSES,
+        due_date__isnull=False,
+    ).values('developer_id').annotate(
+        overdue=Count('id', filter=Q(due_date__lt=now)),
+        due_this_week=Count('id', filter=Q(due_date__gte=now, due_date__lt=now + DUE_SOON)),
+        due_later=Count('id', filter=Q(due_date__gte=now + DUE_SOON)),
+    ).order_by()
+    return {row['developer_id']: {window: row[window] for window in DUE_WINDOWS} for row in rows}
+
+
+def workload_score(workload):
+    """
+    Priority-weighted number of open tasks (0 without a workload row).
+    """
+    if workload is None:
+        return 0
+    return sum(
+        getattr(workload, field) * PRIORITY_WEIGHTS[priority]
+        for priority, field in PRIORITY_FIELDS.items()
+    )
+
+
+def eligible_developers(organization_id, project=None):
+    """
+    Active developers of an organization with their workload rows joined;
+    limited to the project's team when it has developers on it.
+    """
+    members = OrganizationMember.objects.filter(
+        organization_id=organization_id,
+        role=OrganizationRoleChoices.DEVELOPER,
+        is_active=True,
+    ).select_related('user', 'workload')
+    if project is not None:
+        team = members.filter(team_projects=project)
+        if team.exists():
+            return team
+    return members
+
+
+def suggest_assignee(members):
+    """
+    Pick the least-loaded member in a single pass.
+
+    Members are compared by priority-weighted open tasks, then overdue
+    tasks, then tasks due this week.
+
+    Args:
+        members: Iterable of OrganizationMember with ``workload`` selected
+
+    Returns:
+        OrganizationMember or None: The suggested assignee
+    """
+    members = list(members)
+    windows = due_windows(member.id for member in members)
+    best, best_key = None, None
+    for member in members:
+        member_windows = windows.get(member.id, {})
+        key = (
+            workload_score(getattr(member, 'workload', None)),
+            member_windows.get('overdue', 0),
+            member_windows.get('due_this_week', 0),
+        )
+        if best_key is None or key < best_key:
+            best, best_key = member, key
+    return best
@@ -0,0 +1,13 @@
+"""URL configuration for the developer workload endpoints (/api/v1/workload/)."""
+from django.urls import path
+
+from .views import WorkloadViewSet
+
+app_name = 'workload'
+
+urlpatterns = [
+    path('', WorkloadViewSet.as_view({'get': 'list'}), name='workload-list'),
+    path('suggest-assignee/',
+         WorkloadViewSet.as_view({'get': 'suggest_assignee'}),
+         name='workload-suggest-assignee'),
+]
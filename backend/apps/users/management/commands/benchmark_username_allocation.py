@@ -0,0 +1,60 @@
+"""
+Management command timing signups against many colliding usernames.
+
+The seeded users and the signups are written in a transaction that is
+rolled back, so the command can run against a development database.
+"""
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Time username allocation for signups whose username base is already taken many times'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collisions',
+            type=int,
+            default=10000,
+            help='Number of existing users sharing the username base (default: 10000)'
+        )
+        parser.add_argument(
+            '--signups',
+            type=int,
+            default=200,
+            help='Number of signups to time (default: 200)'
+        )
+        parser.add_argument(
+            '--base',
+            default='benchmark',
+            help='Username base shared by the seeded users and the signups (default: benchmark)'
+        )
+
+    def handle(self, *args, **options):
+        base, collisions, signups = options['base'], options['collisions'], options['signups']
+
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=base if index == 0 else f'{base}{index}', email=f'{base}@seed{index}.example.com')
+                for index in range(collisions)
+            ], batch_size=1000)
+
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for index in range(signups):
+                    User.objects.create_user(email=f'{base}@signup{index}.example.com')
+            elapsed = time.perf_counter() - started
+            allocations = len([query for query in queries if 'MAX(' in query['sql']])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{signups} signups against {collisions} colliding usernames: "
+            f"{elapsed * 1000 / signups:.2f}ms per signup, "
+            f"{allocations / signups:.1f} allocation queries per signup"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_userprofile_otp_userprofile_otp_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_notifications',
+            field=models.BooleanField(default=True, help_text='Receive digest and reminder emails'),
+        ),
+    ]
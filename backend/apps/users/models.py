@@ -1,45 +1,133 @@
+import re
 import uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Max, Q, Value
+from django.db.models.functions import Cast, Lower, NullIf, Substr
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
 from django.utils.translation import gettext_lazy as _
 
+# Attempts at saving a user under a generated username taken concurrently
+USERNAME_ALLOCATION_ATTEMPTS = 5
+# Longest numeric suffix considered when allocating usernames (fits a bigint)
+USERNAME_SUFFIX_MAX_DIGITS = 18
+# Username bases whose usage is read by one query when allocating in bulk
+USERNAME_USAGE_CHUNK_SIZE = 200
+
+
+def username_base(email):
+    """Return the username base for an email: its cleaned local part."""
+    return re.sub(r'[^a-zA-Z0-9_]', '', email.split('@')[0]) or 'user'
+
+
 class RoleChoices(models.TextChoices):
     USER = 'user', 'User'  # Default role for all users
     SUPERADMIN = 'superadmin', 'Superadmin'  # Only for system-wide superusers
 
 class UserManager(BaseUserManager):
+    def allocate_username(self, base):
+        """
+        Return the first free username of the form ``base`` or ``base<n>``.
+
+        One query finds whether ``base`` is taken and the highest numeric
+        suffix in use, however many users share the base; the result is
+        ``base<highest + 1>``. Concurrent signups may be handed the same
+        username, so callers save with ``save_with_username`` to retry on
+        the unique constraint.
+        """
+        stem, base_taken, highest = self._username_usage([base])[base]
+        if not base_taken:
+            return base
+        return f"{stem}{highest + 1}"
+
+    def allocate_usernames(self, bases):
+        """
+        Return distinct free usernames for a batch of bases, in order.
+
+        The usage of every distinct base is read with one aggregate query
+        (per USERNAME_USAGE_CHUNK_SIZE bases); users sharing a base get the
+        following suffixes. The usernames are not reserved in the database:
+        concurrent writers may take one before the batch is inserted.
+        """
+        usage = {}
+        for start in range(0, len(distinct := list(dict.fromkeys(bases))), USERNAME_USAGE_CHUNK_SIZE):
+            usage.update(self._username_usage(distinct[start:start + USERNAME_USAGE_CHUNK_SIZE]))
+
+        next_suffix = {}
+        usernames = []
+        assigned = set()
+        for base in bases:
+            stem, base_taken, highest = usage[base]
+            if base not in next_suffix:
+                next_suffix[base] = highest + 1
+                if not base_taken and base not in assigned:
+                    usernames.append(base)
+                    assigned.add(base)
+                    continue
+            suffix = next_suffix[base]
+            while f"{stem}{suffix}" in assigned:
+                suffix += 1
+            usernames.append(f"{stem}{suffix}")
+            assigned.add(f"{stem}{suffix}")
+            next_suffix[base] = suffix + 1
+        return usernames
+
+    def _username_usage(self, bases):
+        """
+        Return ``{base: (stem, base taken, highest numeric suffix in use
+        or 0)}`` for username bases, with one aggregate query.
+        """
+        max_length = self.model._meta.get_field('username').max_length
+        # Suffixes are appended to a stem short enough to take any of them
+        stems = {base: base[:max_length - USERNAME_SUFFIX_MAX_DIGITS] for base in bases}
+        # The prefix filters let the database scan only usernames sharing
+        # a stem (the username index supports LIKE 'stem%')
+        candidates = Q()
+        aggregates = {}
+        for index, (base, stem) in enumerate(stems.items()):
+            suffixed = Q(username__regex=rf'^{re.escape(stem)}[0-9]{{1,{USERNAME_SUFFIX_MAX_DIGITS}}}$')
+            candidates |= Q(username__startswith=stem) & (Q(username=base) | suffixed)
+            aggregates[f'base_taken_{index}'] = Count('pk', filter=Q(username=base))
+            aggregates[f'highest_{index}'] = Max(Cast(
+                NullIf(Substr('username', len(stem) + 1, USERNAME_SUFFIX_MAX_DIGITS), Value('')),
+                models.BigIntegerField()
+            ), filter=suffixed & ~Q(username=base))
+        usage = self.filter(candidates).aggregate(**aggregates)
+        return {
+            base: (stem, bool(usage[f'base_taken_{index}']), usage[f'highest_{index}'] or 0)
+            for index, (base, stem) in enumerate(stems.items())
+        }
+
+    def save_with_username(self, user, base, **kwargs):
+        """
+        Save a new user under the first free username for ``base``,
+        allocating another one if it is taken before the insert commits.
+        """
+        for attempt in range(USERNAME_ALLOCATION_ATTEMPTS):
+            user.username = self.allocate_username(base)
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    user.save(**kwargs)
+                return user
+            except IntegrityError:
+                # Only a username taken concurrently is worth another attempt
+                if attempt == USERNAME_ALLOCATION_ATTEMPTS - 1 or not self.filter(username=user.username).exists():
+                    raise
+        return user
+
     def _create_user(self, username, email, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email must be set')
             
         email = self.normalize_email(email)
         
-        # Auto-generate username if not provided
-        if not username:
-            # Use the part before @ in the email as the base for username
-            base_username = email.split('@')[0]
-            # Clean the username to ensure it's valid
-            import re
-            base_username = re.sub(r'[^a-zA-Z0-9_]', '', base_username)
-            # If the username is empty after cleaning, use a default
-            if not base_username:
-                base_username = 'user'
-            username = base_username
-            
-        # Ensure username is unique
-        counter = 1
-        original_username = username
-        while self.model.objects.filter(username=username).exists():
-            username = f"{original_username}{counter}"
-            counter += 1
-            
         user = self.model(username=username, email=email, **extra_fields)
         if password:
             user.set_password(password)
-        user.save(using=self._db)
-        return user
+        # Auto-generate the username from the part before @ in the email if
+        # not provided, and suffix it with a number if it is taken
+        return self.save_with_username(user, username or username_base(email), using=self._db)
         
     def create_user(self, username=None, email=None, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', False)
@@ -97,6 +185,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
+    email_notifications = models.BooleanField(default=True, help_text='Receive digest and reminder emails')
     date_joined = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     last_login = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -156,6 +245,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         db_table = 'users'
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Case-insensitive email lookups, e.g. bulk invitations
+            models.Index(Lower('email'), name='users_email_lower_idx'),
+        ]
 
 
 import datetime
@@ -94,16 +94,10 @@ class UserSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         
         # Generate username from email if not provided
+        username_base = None
         if 'username' not in validated_data or not validated_data.get('username'):
             # Use the part before @ in the email as the base for username
-            email_base = validated_data['email'].split('@')[0]
-            validated_data['username'] = email_base
-            
-            # Ensure username is unique
-            counter = 1
-            while User.objects.filter(username=validated_data['username']).exists():
-                validated_data['username'] = f"{email_base}{counter}"
-                counter += 1
+            username_base = validated_data['email'].split('@')[0]
         
         user = User(**validated_data)
         
@@ -123,6 +117,9 @@ class UserSerializer(serializers.ModelSerializer):
         if request:
             user._request = request
         
+        if username_base:
+            # Save under the first free username, suffixed with a number if taken
+            return User.objects.save_with_username(user, username_base)
         user.save()
         return user
     
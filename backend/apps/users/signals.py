@@ -4,12 +4,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from .models import User
 from .tasks import send_welcome_email_task
+from apps.notifications.outbox import enqueue_task
 
 @receiver(post_save, sender=User)
 def send_welcome_email_on_creation(sender, instance, created, **kwargs):
     """
     Signal receiver to send welcome email when a new user is created.
-    Includes password in the email if the user was created by an admin/superuser.
+    Includes a link to set a password if the user was created by an admin/superuser.
     """
     if not created or not getattr(settings, 'SEND_WELCOME_EMAIL', False):
         return
@@ -31,8 +32,9 @@ def send_welcome_email_on_creation(sender, instance, created, **kwargs):
         # If no request context, check if this is a superuser creation
         is_admin_request = instance.is_superuser or instance.is_staff
     
-    # If this is an admin request and we have a password, include it in the email
+    # If an admin set the password, send a link to choose a new one. The
+    # password itself must not be queued: outbox rows outlive the email
     if is_admin_request and raw_password:
-        send_welcome_email_task.delay(instance.id, password=raw_password)
+        enqueue_task(send_welcome_email_task, str(instance.id), set_password=True)
     else:
-        send_welcome_email_task.delay(instance.id)
+        enqueue_task(send_welcome_email_task, str(instance.id))
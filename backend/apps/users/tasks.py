@@ -1,24 +1,30 @@
 from celery import shared_task
-from django.core.mail import send_mail, send_mass_mail, EmailMultiAlternatives
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 import logging
+from apps.notifications.mailer import (
+    build_email, prerender_email, queue_emails, send_email, seconds_until_next_window
+)
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, max_retries=3)
-def send_welcome_email_task(self, user_id, password=None, **kwargs):
+def send_welcome_email_task(self, user_id, set_password=False, **kwargs):
     """
     Send a welcome email to a newly registered user.
     
     Args:
         user_id: ID of the user to send the welcome email to
-        password: The user's plain text password to include in the welcome email
+        set_password: Include a link to set a new password, for users whose
+            password was chosen by an admin
     """
     try:
         # Check if welcome emails are suppressed
@@ -28,16 +34,14 @@ def send_welcome_email_task(self, user_id, password=None, **kwargs):
             
         user = User.objects.get(id=user_id)
         
-        # If password is not provided but we have one in kwargs, use it
-        if password is None and 'password' in kwargs:
-            password = kwargs['password']
-            
-        # If we still don't have a password, check if the user has a password set
-        if password is None and hasattr(user, 'password'):
-            # We can't get the plain text password back, so we'll just indicate that one was set
-            has_password = bool(user.password)
-        else:
-            has_password = password is not None
+        # Messages queued before passwords were kept out of the outbox carry
+        # the password itself; only the fact that an admin set it is used
+        set_password = set_password or 'password' in kwargs
+        set_password_url = None
+        if set_password:
+            token = default_token_generator.make_token(user)
+            uid = urlsafe_base64_encode(force_bytes(user.pk))
+            set_password_url = f"{settings.FRONTEND_URL}/reset-password/?uid={uid}&token={token}"
         
         # Render email content
         subject = 'Welcome to BMS Platform ! - Your Account Details'
@@ -45,28 +49,22 @@ def send_welcome_email_task(self, user_id, password=None, **kwargs):
         # Render HTML email template
         html_message = render_to_string('emails/welcome_email.html', {
             'user': user,
-            'password': password,  # Include password in the template context
+            'set_password_url': set_password_url,
             'login_url': f"{settings.FRONTEND_URL}/login" if hasattr(settings, 'FRONTEND_URL') else '#',
             'support_email': getattr(settings, 'DEFAULT_FROM_EMAIL', 'support@example.com'),
-            'has_password': has_password,  # Flag to check if password is provided
         })
         
         # Create plain text version
         text_message = strip_tags(html_message)
         
-        # Send the email
-        email = EmailMultiAlternatives(
+        # Send the email over the worker's pooled SMTP connection
+        sent = send_email(build_email(
             subject=subject,
             body=text_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
-            reply_to=[getattr(settings, 'REPLY_TO_EMAIL', settings.DEFAULT_FROM_EMAIL)]
-        )
-        email.attach_alternative(html_message, "text/html")
-        email.send(fail_silently=False)
-        
-        logger.info(f"Welcome email sent to {user.email}")
-        return True
+            to=user.email,
+            html_message=html_message,
+            reply_to=getattr(settings, 'REPLY_TO_EMAIL', settings.DEFAULT_FROM_EMAIL)
+        ))
     except User.DoesNotExist:
         logger.error(f"User with id {user_id} does not exist")
         return False
@@ -74,22 +72,53 @@ def send_welcome_email_task(self, user_id, password=None, **kwargs):
         logger.error(f"Error sending welcome email to user {user_id}: {str(e)}")
         # Retry the task with exponential backoff
         raise self.retry(exc=e, countdown=60 * 5)  # Retry after 5 minutes
+    
+    if not sent:
+        # Mail rate limit reached for this minute
+        raise self.retry(countdown=seconds_until_next_window())
+    logger.info(f"Welcome email sent to {user.email}")
+    return True
 
-@shared_task
-def send_async_email(subject, message, to_email, html_message=None):
+@shared_task(bind=True, max_retries=3)
+def send_async_email(self, subject, message, to_email, html_message=None):
     """Send a single email asynchronously."""
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[to_email],
-        html_message=html_message,
-        fail_silently=False,
+    if not send_email(build_email(subject, message, to_email, html_message=html_message)):
+        raise self.retry(countdown=seconds_until_next_window())
+
+# Users read per database round trip when streaming digest recipients
+DIGEST_CHUNK_SIZE = 2000
+
+def _digest_context(**context):
+    """Context shared by every recipient of a digest email."""
+    context.update({
+        'site_name': getattr(settings, 'SITE_NAME', 'PROJECT-K'),
+        'login_url': f"{settings.FRONTEND_URL}/login" if hasattr(settings, 'FRONTEND_URL') else '#',
+    })
+    return context
+
+def _digest_messages(users, subject, template_name, context):
+    """
+    Yield one email per user, rendering the template once for all of them.
+    
+    Args:
+        users: User queryset, streamed in chunks of DIGEST_CHUNK_SIZE
+        subject: Subject line
+        template_name: HTML template taking ``recipient_name`` and ``recipient_email``
+        context: Context shared by all recipients
+    """
+    render = prerender_email(template_name, context, ('recipient_name', 'recipient_email'))
+    rows = users.values_list('email', 'username', 'first_name', 'last_name').iterator(
+        chunk_size=DIGEST_CHUNK_SIZE
     )
+    for email, username, first_name, last_name in rows:
+        # Same as User.get_full_name
+        name = f"{first_name} {last_name}" if first_name and last_name else username
+        html_message, plain_message = render({'recipient_name': name, 'recipient_email': email})
+        yield build_email(subject, plain_message, email, html_message=html_message)
 
 @shared_task
 def send_daily_digest():
-    """Send daily digest to all active users."""
+    """Send daily digest to all active users, in batches of EMAIL_BATCH_SIZE."""
     users = User.objects.filter(is_active=True, email_notifications=True)
     
     # Get new signups in the last 24 hours
@@ -97,29 +126,13 @@ def send_daily_digest():
         date_joined__gte=timezone.now() - timedelta(days=1)
     ).count()
     
-    subject = "Your Daily Digest"
-    
-    for user in users:
-        context = {
-            'user': user,
-            'new_users': new_users,
-            'date': timezone.now().strftime('%Y-%m-%d'),
-        }
-        
-        # Render HTML email
-        html_message = render_to_string('emails/daily_digest.html', context)
-        plain_message = strip_tags(html_message)
-        
-        send_async_email.delay(
-            subject=subject,
-            message=plain_message,
-            to_email=user.email,
-            html_message=html_message
-        )
+    context = _digest_context(new_users=new_users, date=timezone.now().strftime('%Y-%m-%d'))
+    batches = queue_emails(_digest_messages(users, "Your Daily Digest", 'emails/daily_digest.html', context))
+    return f"Queued daily digest in {batches} batches"
 
 @shared_task
 def send_weekly_summary():
-    """Send weekly summary to all active users."""
+    """Send weekly summary to all active users, in batches of EMAIL_BATCH_SIZE."""
     users = User.objects.filter(is_active=True, email_notifications=True)
     
     # Get stats for the past week
@@ -128,25 +141,13 @@ def send_weekly_summary():
         date_joined__gte=week_ago
     ).count()
     
-    subject = "Your Weekly Summary"
-    
-    for user in users:
-        context = {
-            'user': user,
-            'new_users': new_users_week,
-            'start_date': week_ago.strftime('%Y-%m-%d'),
-            'end_date': timezone.now().strftime('%Y-%m-%d'),
-        }
-        
-        html_message = render_to_string('emails/weekly_summary.html', context)
-        plain_message = strip_tags(html_message)
-        
-        send_async_email.delay(
-            subject=subject,
-            message=plain_message,
-            to_email=user.email,
-            html_message=html_message
-        )
+    context = _digest_context(
+        new_users=new_users_week,
+        start_date=week_ago.strftime('%Y-%m-%d'),
+        end_date=timezone.now().strftime('%Y-%m-%d'),
+    )
+    batches = queue_emails(_digest_messages(users, "Your Weekly Summary", 'emails/weekly_summary.html', context))
+    return f"Queued weekly summary in {batches} batches"
 
 @shared_task
 def check_inactive_users():
@@ -158,16 +159,9 @@ def check_inactive_users():
         email_notifications=True
     )
     
-    for user in inactive_users:
-        subject = "We Miss You! Come Back to Our Platform"
-        context = {'user': user}
-        
-        html_message = render_to_string('emails/inactive_reminder.html', context)
-        plain_message = strip_tags(html_message)
-        
-        send_async_email.delay(
-            subject=subject,
-            message=plain_message,
-            to_email=user.email,
-            html_message=html_message
-        )
+    queue_emails(_digest_messages(
+        inactive_users,
+        "We Miss You! Come Back to Our Platform",
+        'emails/inactive_reminder.html',
+        _digest_context()
+    ))
@@ -0,0 +1,70 @@
+"""
+Tests for the digest email jobs.
+"""
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from apps.notifications.mailer import prerender_email
+from apps.users.tasks import send_daily_digest
+
+User = get_user_model()
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, DEFAULT_FROM_EMAIL='noreply@example.com')
+class DigestEmailTests(TestCase):
+    """Test the render-once digest pipeline."""
+
+    context = {
+        'site_name': 'PROJECT-K',
+        'login_url': 'http://localhost:3000/login',
+        'new_users': 12,
+        'date': '2026-10-18',
+    }
+
+    def test_prerendered_email_matches_full_render(self):
+        """Filling in a pre-rendered template gives the same email as rendering it."""
+        render = prerender_email('emails/daily_digest.html', self.context, ('recipient_name', 'recipient_email'))
+        values = {'recipient_name': 'Ada <Lovelace>', 'recipient_email': 'ada@example.com'}
+
+        html_message, plain_message = render(values)
+
+        expected = render_to_string('emails/daily_digest.html', {**self.context, **values})
+        self.assertEqual(html_message, expected)
+        self.assertIn('Ada &lt;Lovelace&gt;', html_message)
+        self.assertIn('Hello Ada <Lovelace>,', plain_message)
+        self.assertNotIn('<p>', plain_message)
+
+    @patch('apps.users.tasks.queue_emails')
+    def test_digest_template_is_rendered_once(self, queue_emails):
+        """The template is rendered once however many users receive the digest."""
+        User.objects.bulk_create([
+            User(username=f'user{index}', email=f'user{index}@example.com') for index in range(20)
+        ])
+        queued = []
+        queue_emails.side_effect = lambda messages: queued.extend(messages) or 1
+
+        with patch('apps.notifications.mailer.render_to_string', wraps=render_to_string) as render:
+            send_daily_digest()
+
+        self.assertEqual(len(queued), 20)
+        render.assert_called_once()
+
+    @patch('apps.users.tasks.queue_emails')
+    def test_daily_digest_streams_opted_in_users(self, queue_emails):
+        """The daily digest queues one message per opted-in active user."""
+        User.objects.create_user(email='first@example.com', username='first', first_name='First', last_name='User')
+        User.objects.create_user(email='second@example.com', username='second')
+        User.objects.create_user(email='optout@example.com', username='optout', email_notifications=False)
+        User.objects.create_user(email='inactive@example.com', username='inactive', is_active=False)
+        queued = []
+        queue_emails.side_effect = lambda messages: queued.extend(messages) or 1
+
+        send_daily_digest()
+
+        self.assertEqual(sorted(message['to'][0] for message in queued), ['first@example.com', 'second@example.com'])
+        first = next(message for message in queued if message['to'] == ['first@example.com'])
+        self.assertEqual(first['subject'], 'Your Daily Digest')
+        self.assertIn('Hello First User,', first['body'])
+        self.assertIn('first@example.com', first['html_message'])
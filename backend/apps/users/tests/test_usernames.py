@@ -0,0 +1,109 @@
+"""
+Tests for username allocation.
+"""
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.users.serializers import UserSerializer
+
+User = get_user_model()
+
+
+@override_settings(SEND_WELCOME_EMAIL=False, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsernameAllocationTests(TestCase):
+    """Test allocating unique usernames from email addresses."""
+
+    def setUp(self):
+        patcher = patch('apps.notifications.outbox.wake_outbox_relay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_colliding_usernames_get_the_next_suffix(self):
+        """The suffix follows the highest one in use, not the first gap."""
+        self.assertEqual(User.objects.create_user(email='john@a.com').username, 'john')
+        self.assertEqual(User.objects.create_user(email='john@b.com').username, 'john1')
+        User.objects.create_user(username='john9', email='john9@c.com')
+        User.objects.create_user(username='johnny', email='johnny@c.com')
+
+        self.assertEqual(User.objects.create_user(email='john@d.com').username, 'john10')
+        self.assertEqual(User.objects.allocate_username('johnny'), 'johnny1')
+        self.assertEqual(User.objects.allocate_username('jo.hn'), 'jo.hn')
+
+    def test_batch_allocation_takes_one_query(self):
+        """A batch gets distinct usernames with one aggregate query."""
+        User.objects.create_user(email='john@a.com')
+        User.objects.create_user(username='john9', email='john9@a.com')
+
+        with self.assertNumQueries(1):
+            usernames = User.objects.allocate_usernames(['john', 'jane', 'john', 'jane', 'john1'])
+
+        self.assertEqual(usernames, ['john10', 'jane', 'john11', 'jane1', 'john1'])
+
+    def test_allocation_takes_one_query(self):
+        """Allocating does not probe candidate usernames one by one."""
+        User.objects.bulk_create([
+            User(username='info' if index == 0 else f'info{index}', email=f'info{index}@example.com')
+            for index in range(50)
+        ])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(User.objects.allocate_username('info'), 'info50')
+
+    def test_username_taken_concurrently_is_retried(self):
+        """A username taken before the insert commits is allocated again."""
+        User.objects.create_user(email='race@a.com')
+        allocate = User.objects.allocate_username
+        # The first allocation misses the user created concurrently
+        answers = iter(['race', 'race1'])
+        with patch.object(type(User.objects), 'allocate_username', lambda manager, base: next(answers)):
+            user = User.objects.create_user(email='race@b.com')
+
+        self.assertEqual(user.username, 'race1')
+        self.assertEqual(allocate('race'), 'race2')
+
+    def test_duplicate_email_is_not_retried(self):
+        """Other constraint violations are raised."""
+        User.objects.create_user(email='same@example.com')
+
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(email='same@example.com')
+
+    def test_serializer_allocates_from_the_email(self):
+        """Users created through the API get the same allocation."""
+        User.objects.create_user(email='api@a.com')
+        serializer = UserSerializer(data={'email': 'api@b.com', 'password': 'Secret123!'})
+        serializer.is_valid(raise_exception=True)
+
+        self.assertEqual(serializer.save().username, 'api1')
+
+    def test_colliding_signups_take_one_allocation_query_each(self):
+        """Signups against colliding usernames take one allocation query each."""
+        collisions = 100
+        User.objects.bulk_create([
+            User(username='admin' if index == 0 else f'admin{index}', email=f'admin@seed{index}.com')
+            for index in range(collisions)
+        ])
+        signups = 10
+
+        with CaptureQueriesContext(connection) as queries:
+            for index in range(signups):
+                User.objects.create_user(email=f'admin@host{index}.com')
+
+        allocations = [query for query in queries if 'MAX(' in query['sql']]
+        self.assertEqual(len(allocations), signups)
+        self.assertTrue(User.objects.filter(username=f'admin{collisions + signups - 1}').exists())
+
+    def test_benchmark_command(self):
+        """The benchmark command reports its timings and leaves no users behind."""
+        out = StringIO()
+
+        call_command('benchmark_username_allocation', collisions=20, signups=5, stdout=out)
+
+        self.assertIn('5 signups against 20 colliding usernames', out.getvalue())
+        self.assertIn('1.0 allocation queries per signup', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='benchmark').exists())
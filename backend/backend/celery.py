@@ -28,8 +28,74 @@ app.autodiscover_tasks(packages=[
     'apps.support',
     'apps.notifications',
     'apps.dashboard',
+    'system_monitor',
 ])
 
+# Task routing
+# ============
+# Each class of work has its own queue and worker pool, so a digest fan-out
+# or a report never delays real-time notifications. Within a queue, lower
+# priority numbers run first (Redis transport).
+from kombu import Queue
+
+TASK_QUEUES = ('realtime', 'transactional', 'bulk_email', 'reports', 'maintenance')
+
+app.conf.task_queues = tuple(Queue(name) for name in TASK_QUEUES)
+app.conf.task_default_queue = 'transactional'
+app.conf.task_default_priority = 5
+app.conf.broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+
+app.conf.task_routes = {
+    # Real-time: WebSocket pushes and in-app notifications
+    'apps.messaging.tasks.send_message_notification': {'queue': 'realtime', 'priority': 0},
+    'apps.messaging.tasks.mark_conversation_messages_as_read': {'queue': 'realtime'},
+    'apps.notifications.tasks.create_notification': {'queue': 'realtime'},
+    'apps.notifications.tasks.send_notifications_task': {'queue': 'realtime'},
+    'apps.notifications.tasks.relay_outbox_messages': {'queue': 'realtime', 'priority': 0},
+    'apps.tasks.tasks.notify_task_assigned': {'queue': 'realtime'},
+    'apps.tasks.tasks.notify_task_status_update': {'queue': 'realtime'},
+    'apps.tasks.tasks.notify_bulk_task_changes': {'queue': 'realtime'},
+    'apps.support.tasks.notify_ticket_assigned': {'queue': 'realtime'},
+    'apps.clients.tasks.notify_salesperson_async': {'queue': 'realtime'},
+    'system_monitor.tasks.sample_queue_depths': {'queue': 'realtime'},
+
+    # Transactional: work a single user is waiting for
+    'apps.payments.tasks.process_payment_async': {'queue': 'transactional', 'priority': 1},
+    'apps.users.tasks.send_welcome_email_task': {'queue': 'transactional', 'priority': 3},
+    'apps.users.tasks.send_async_email': {'queue': 'transactional'},
+    'apps.organization.tasks.send_admin_assignment_email': {'queue': 'transactional'},
+    'apps.organization.tasks.send_organization_created_email': {'queue': 'transactional', 'priority': 3},
+    'apps.projects.tasks.update_project_progress': {'queue': 'transactional'},
+
+    # Bulk email: digest fan-outs and their batches
+    'apps.notifications.tasks.send_email_batch': {'queue': 'bulk_email'},
+    'apps.users.tasks.send_daily_digest': {'queue': 'bulk_email'},
+    'apps.users.tasks.send_weekly_summary': {'queue': 'bulk_email'},
+    'apps.users.tasks.check_inactive_users': {'queue': 'bulk_email'},
+
+    # Reports and bulk imports
+    'apps.messaging.tasks.generate_message_report': {'queue': 'reports'},
+    'apps.projects.tasks.generate_project_report': {'queue': 'reports'},
+    'apps.payments.tasks.import_payments_file': {'queue': 'reports'},
+    'apps.payments.tasks.reconcile_bank_statement': {'queue': 'reports'},
+    'apps.organization.tasks.process_member_invitations': {'queue': 'reports'},
+
+    # Maintenance: periodic scans and counter repairs
+    'apps.tasks.tasks.check_task_deadlines': {'queue': 'maintenance', 'priority': 3},
+    'apps.projects.tasks.check_project_deadlines': {'queue': 'maintenance', 'priority': 3},
+    'apps.tasks.tasks.refresh_developer_workload': {'queue': 'maintenance'},
+    'apps.tasks.tasks.test_task_signals': {'queue': 'maintenance'},
+    'apps.notifications.tasks.reconcile_unread_notification_counts': {'queue': 'maintenance'},
+    'apps.organization.tasks.reconcile_organization_usage': {'queue': 'maintenance'},
+    'apps.support.tasks.escalate_overdue_tickets': {'queue': 'maintenance'},
+    'apps.support.tasks.auto_close_resolved_tickets': {'queue': 'maintenance'},
+    'apps.payments.tasks.send_payment_reminder': {'queue': 'maintenance'},
+}
+
 # Configure periodic tasks
 from celery.schedules import crontab
 
@@ -52,10 +118,46 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=10, minute=0),  # 10:00 AM daily
     },
     
-    # Check for tasks with approaching deadlines every hour
+    # Send due task deadline reminders (reads only rows whose reminder is due)
     'check-task-deadlines': {
         'task': 'apps.tasks.tasks.check_task_deadlines',
-        'schedule': 3600.0,  # Every hour
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    
+    # Send due project deadline reminders
+    'check-project-deadlines': {
+        'task': 'apps.projects.tasks.check_project_deadlines',
+        'schedule': 900.0,  # Every 15 minutes
+    },
+    
+    # Rebuild developer workload counters to repair drift
+    'refresh-developer-workload': {
+        'task': 'apps.tasks.tasks.refresh_developer_workload',
+        'schedule': crontab(minute=0),  # Hourly
+    },
+    
+    # Correct drift in the cached unread notification counters
+    'reconcile-unread-notification-counts': {
+        'task': 'apps.notifications.tasks.reconcile_unread_notification_counts',
+        'schedule': 900.0,  # Every 15 minutes
+    },
+    
+    # Correct drift in the cached organization quota counters
+    'reconcile-organization-usage': {
+        'task': 'apps.organization.tasks.reconcile_organization_usage',
+        'schedule': crontab(minute=30),  # Hourly
+    },
+    
+    # Publish outbox messages left behind by missed wake-ups or broker outages
+    'relay-outbox-messages': {
+        'task': 'apps.notifications.tasks.relay_outbox_messages',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    
+    # Sample Celery queue depths for the task metrics endpoint
+    'sample-queue-depths': {
+        'task': 'system_monitor.tasks.sample_queue_depths',
+        'schedule': 15.0,  # Every 15 seconds
     },
     
     # Send daily task reminders at 9:00 AM every weekday
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
     'apps.activity_logs',
     'apps.messaging',
     'chat',
+    'system_monitor',
 ]
 
 # Channels and ASGI configuration
@@ -300,6 +301,17 @@ FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 # Timeout in seconds for blocking operations like the connection attempt
 EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '10'))
 
+# Outgoing mail is sent in batches of this many messages over one SMTP connection
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '50'))
+# Maximum messages handed to the SMTP server per minute, across workers (0 disables the limit)
+EMAIL_RATE_LIMIT_PER_MINUTE = int(os.getenv('EMAIL_RATE_LIMIT_PER_MINUTE', '600'))
+# Seconds a worker keeps an idle SMTP connection open for reuse
+EMAIL_CONNECTION_MAX_IDLE = int(os.getenv('EMAIL_CONNECTION_MAX_IDLE', '60'))
+
+# In-app notifications of the same type and target sent to a user within
+# this many seconds are merged into one notification (0 disables merging)
+NOTIFICATION_COALESCE_WINDOW = int(os.getenv('NOTIFICATION_COALESCE_WINDOW', '300'))
+
 
 # CORS and CSRF Configuration
 # ============================
@@ -375,6 +387,25 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache (unread counters, quota usage, cached critical paths, ...).
+# Set REDIS_CACHE_URL (e.g. redis://127.0.0.1:6379/1) in production so every
+# process sees the same values. Without it Django's per-process memory cache
+# is used, the counters below are switched off (values are counted in the
+# database instead) and a warning is logged outside DEBUG.
+SHARED_CACHE = bool(os.getenv('REDIS_CACHE_URL'))
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+
+# Keep unread notification counts (apps.notifications.unread) and organization
+# quota usage (apps.organization.quotas) in cache counters
+UNREAD_COUNT_COUNTERS = SHARED_CACHE
+QUOTA_USAGE_COUNTERS = SHARED_CACHE
+
 # For Swagger UI
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -151,6 +151,7 @@ urlpatterns = [
     path('api/v1/clients/', include('apps.clients.urls')),
     path('api/v1/projects/', include('apps.projects.urls')),
     path('api/v1/tasks/', include('apps.tasks.urls')),
+    path('api/v1/workload/', include('apps.tasks.workload_urls')),  # Developer workload endpoints
     path('api/v1/support/', include('apps.support.urls')),
     path('api/v1/notifications/', include('apps.notifications.urls')),
     path('api/v1/payments/', include('apps.payments.urls')),  # Payment endpoints
@@ -158,6 +159,7 @@ urlpatterns = [
     path('api/v1/reports/', include('apps.reports.urls')),  # Reports endpoints
     path('api/v1/activity-logs/', include('apps.activity_logs.urls')),  # Activity logs endpoints
     path('api/v1/messaging/', include('apps.messaging.urls')),  # Messaging endpoints
+    path('api/v1/system/', include('system_monitor.urls')),  # Task metrics
     
     # Catch-all OPTIONS handler - must come after all other API routes
     re_path(r'^api/v1/.*$', cors_options_view),  # Catch-all for OPTIONS
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SystemMonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'system_monitor'
+
+    def ready(self):
+        import system_monitor.signals
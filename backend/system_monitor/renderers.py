@@ -0,0 +1,64 @@
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
+from rest_framework.renderers import BaseRenderer
+
+# Histogram metrics: (Prometheus name, help, divisor converting to the base unit)
+PROMETHEUS_HISTOGRAMS = {
+    'wait_ms': ('celery_task_wait_seconds', 'Time between publishing a task and its start', 1000),
+    'runtime_ms': ('celery_task_runtime_seconds', 'Task run time', 1000),
+    'payload_bytes': ('celery_task_payload_bytes', 'Serialized task arguments size', 1),
+}
+PROMETHEUS_COUNTERS = {
+    'retries': ('celery_task_retries', 'Task runs that were retries'),
+    'failures': ('celery_task_failures', 'Task runs that raised an exception'),
+    'debounce_suppressed': ('celery_task_debounce_suppressed', 'Enqueues dropped by debouncing'),
+}
+
+
+class _SnapshotCollector:
+    def __init__(self, data):
+        self.data = data
+
+    def collect(self):
+        tasks = self.data.get('tasks', {})
+        for metric, (name, documentation, divisor) in PROMETHEUS_HISTOGRAMS.items():
+            family = HistogramMetricFamily(name, documentation, labels=['task'])
+            for task_name, metrics in tasks.items():
+                if metric not in metrics:
+                    continue
+                histogram = metrics[metric]
+                family.add_metric(
+                    [task_name],
+                    buckets=[
+                        (bound if bound == '+Inf' else str(bound / divisor), count)
+                        for bound, count in histogram['buckets']
+                    ],
+                    sum_value=histogram['sum'] / divisor,
+                )
+            yield family
+        for metric, (name, documentation) in PROMETHEUS_COUNTERS.items():
+            family = CounterMetricFamily(name, documentation, labels=['task'])
+            for task_name, metrics in tasks.items():
+                if metric in metrics:
+                    family.add_metric([task_name], metrics[metric])
+            yield family
+        depths = GaugeMetricFamily('celery_queue_depth', 'Messages waiting in the queue', labels=['queue'])
+        for queue, depth in ((self.data.get('queues') or {}).get('queues') or {}).items():
+            depths.add_metric([queue], depth)
+        yield depths
+
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Render task metrics (see system_monitor.views.TaskMetricsView) in the
+    Prometheus text exposition format.
+    """
+    media_type = CONTENT_TYPE_LATEST.split(';')[0]
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if 'tasks' not in data:
+            # Error responses
+            return str(data.get('detail', data)).encode()
+        return generate_latest(_SnapshotCollector(data))
@@ -0,0 +1,68 @@
+"""
+Celery signal hooks feeding system_monitor.task_metrics.
+"""
+import time
+from datetime import datetime
+from celery.signals import (
+    before_task_publish, task_failure, task_postrun, task_prerun, task_received, worker_process_shutdown,
+    worker_shutdown,
+)
+
+from .task_metrics import flush_metrics, increment, observe
+
+# Start times of the tasks running in this process, by task id
+_started = {}
+
+
+@before_task_publish.connect
+def record_task_published(sender=None, headers=None, **kwargs):
+    """
+    Stamp the message with its publish time.
+    """
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@task_received.connect
+def record_task_received(request=None, **kwargs):
+    """
+    Record the payload size of a message taken by a worker, from its
+    serialized body.
+    """
+    if isinstance(request.body, (bytes, str)):
+        observe('payload_bytes', request.task_name, len(request.body))
+
+
+@task_prerun.connect
+def record_task_started(task_id=None, task=None, **kwargs):
+    """
+    Record how long the task waited in the broker, and retried runs.
+    """
+    _started[task_id] = time.monotonic()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at:
+        ready_at = published_at
+        if task.request.eta:
+            # Scheduled tasks only count as waiting from their ETA on
+            ready_at = max(published_at, datetime.fromisoformat(task.request.eta).timestamp())
+        observe('wait_ms', task.name, max(0, (time.time() - ready_at) * 1000))
+    if task.request.retries:
+        increment('retries', task.name)
+
+
+@task_postrun.connect
+def record_task_finished(task_id=None, task=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        observe('runtime_ms', task.name, (time.monotonic() - started) * 1000)
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    increment('failures', sender.name)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_metrics_on_shutdown(**kwargs):
+    flush_metrics()
@@ -0,0 +1,186 @@
+"""
+Celery task metrics.
+
+Worker and web processes record per-task histograms (broker wait,
+runtime, payload size) and counters (retries, failures) in a local
+buffer, which a background thread adds to shared counters in the cache
+(Redis in production) every TASK_METRICS_FLUSH_INTERVAL seconds; reads
+flush the reading process's buffer first. The hooks live in
+system_monitor.signals; queue depths are sampled by the
+system_monitor.tasks.sample_queue_depths beat job.
+"""
+import logging
+import os
+import redis
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+
+# Histogram bucket upper bounds; values above the last bound go to +Inf
+HISTOGRAM_BUCKETS = {
+    'wait_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000),
+    'runtime_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000),
+    'payload_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+}
+COUNTERS = ('retries', 'failures')
+
+# Seconds between flushes of a process's buffered observations
+TASK_METRICS_FLUSH_INTERVAL = 10
+
+QUEUE_DEPTHS_KEY = 'task_metrics:queue_depths'
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()
+# Process the flush thread runs in (threads do not survive a fork)
+_flusher_pid = None
+
+
+def metric_key(metric, task_name, part):
+    return f'task_metrics:{metric}:{task_name}:{part}'
+
+
+def observe(metric, task_name, value):
+    """
+    Record one observation of a histogram metric for a task.
+
+    Args:
+        metric: Name from HISTOGRAM_BUCKETS
+        task_name: Celery task name
+        value: Observed value, in the metric's unit
+    """
+    bucket = bisect_left(HISTOGRAM_BUCKETS[metric], value)
+    with _lock:
+        _pending[metric_key(metric, task_name, bucket)] += 1
+        _pending[metric_key(metric, task_name, 'count')] += 1
+        _pending[metric_key(metric, task_name, 'sum')] += int(value)
+    _start_flusher()
+
+
+def increment(metric, task_name):
+    """Add one to a counter metric (see COUNTERS) of a task."""
+    with _lock:
+        _pending[metric_key(metric, task_name, 'count')] += 1
+    _start_flusher()
+
+
+def _start_flusher():
+    """Start this process's flush thread on its first observation."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='task-metrics-flush', daemon=True).start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(TASK_METRICS_FLUSH_INTERVAL)
+        try:
+            flush_metrics()
+        except Exception:
+            logger.exception("Could not flush task metrics")
+
+
+def flush_metrics():
+    """
+    Add this process's buffered observations to the shared counters.
+    """
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for key, delta in pending.items():
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # First observation: create the counter (add() keeps a concurrent one)
+            cache.add(key, 0, None)
+            cache.incr(key, delta)
+
+
+def get_task_metrics(task_names):
+    """
+    Read the shared metrics of the given tasks.
+
+    Returns:
+        dict: Per task name, a dict of histograms (``buckets`` as
+        cumulative (upper bound, count) pairs ending with ``'+Inf'``,
+        ``count``, ``sum``) and
+        counters; tasks without observations are left out
+    """
+    flush_metrics()
+    keys = []
+    for task_name in task_names:
+        for metric, bounds in HISTOGRAM_BUCKETS.items():
+            keys.extend(metric_key(metric, task_name, part) for part in range(len(bounds) + 1))
+            keys.extend(metric_key(metric, task_name, part) for part in ('count', 'sum'))
+        keys.extend(metric_key(metric, task_name, 'count') for metric in COUNTERS)
+    values = cache.get_many(keys)
+
+    metrics = {}
+    for task_name in task_names:
+        task_metrics = {}
+        for metric, bounds in HISTOGRAM_BUCKETS.items():
+            count = values.get(metric_key(metric, task_name, 'count'), 0)
+            if not count:
+                continue
+            buckets = []
+            cumulative = 0
+            for index, bound in enumerate(bounds + ('+Inf',)):
+                cumulative += values.get(metric_key(metric, task_name, index), 0)
+                buckets.append((bound, cumulative))
+            task_metrics[metric] = {
+                'buckets': buckets,
+                'count': count,
+                'sum': values.get(metric_key(metric, task_name, 'sum'), 0),
+            }
+        for metric in COUNTERS:
+            count = values.get(metric_key(metric, task_name, 'count'), 0)
+            if count:
+                task_metrics[metric] = count
+        if task_metrics:
+            metrics[task_name] = task_metrics
+    return metrics
+
+
+def get_queue_depths():
+    """
+    Return the last queue depth sample, ``{'sampled_at': ..., 'queues': {name: depth}}``,
+    or None before the first sample.
+    """
+    return cache.get(QUEUE_DEPTHS_KEY)
+
+
+def read_queue_depths(queues, transport_options=None, broker_url=None):
+    """
+    Count the messages waiting in Redis broker queues.
+
+    With priorities enabled the Redis transport keeps one list per
+    priority step (``<queue><sep><step>``, the bare name for step 0);
+    all of a queue's lists are read in one pipeline round trip.
+
+    Args:
+        queues: Queue names
+        transport_options: Celery ``broker_transport_options``
+        broker_url: Redis broker URL, defaults to CELERY_BROKER_URL
+
+    Returns:
+        dict: Number of waiting messages per queue
+    """
+    transport_options = transport_options or {}
+    steps = transport_options.get('priority_steps', [0])
+    sep = transport_options.get('sep', ':')
+    client = redis.Redis.from_url(broker_url or settings.CELERY_BROKER_URL)
+    pipeline = client.pipeline(transaction=False)
+    for queue in queues:
+        for step in steps:
+            pipeline.llen(f'{queue}{sep}{step}' if step else queue)
+    lengths = iter(pipeline.execute())
+    return {queue: sum(next(lengths) for _ in steps) for queue in queues}
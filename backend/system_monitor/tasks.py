@@ -0,0 +1,18 @@
+from celery import current_app, shared_task
+from django.core.cache import cache
+from django.utils import timezone
+
+from .task_metrics import QUEUE_DEPTHS_KEY, read_queue_depths
+
+
+@shared_task
+def sample_queue_depths():
+    """
+    Store the number of messages waiting in each Celery queue for the
+    task metrics endpoint.
+    """
+    from backend.celery import TASK_QUEUES
+
+    depths = read_queue_depths(TASK_QUEUES, current_app.conf.broker_transport_options)
+    cache.set(QUEUE_DEPTHS_KEY, {'sampled_at': timezone.now().isoformat(), 'queues': depths}, None)
+    return f"Sampled {len(depths)} queues, {sum(depths.values())} waiting messages"
@@ -1,3 +1,143 @@
-from django.test import TestCase
+from unittest import mock
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from system_monitor.signals import (
+    record_task_failure, record_task_finished, record_task_published, record_task_received, record_task_started
+)
+from system_monitor.task_metrics import (
+    QUEUE_DEPTHS_KEY, flush_metrics, get_task_metrics, observe, read_queue_depths
+)
+
+User = get_user_model()
+
+TASK_NAME = 'apps.notifications.tasks.create_notification'
+
+
+def run_task_hooks(wait=0.2, retries=0, failed=False):
+    """Drive the Celery signal hooks through one publish and run of TASK_NAME."""
+    task = current_app.tasks[TASK_NAME]
+    headers = {}
+    record_task_published(sender=TASK_NAME, body=(['user-1', 'Hello'], {}, {}), headers=headers)
+    record_task_received(request=mock.Mock(task_name=TASK_NAME, body=b'[["user-1", "Hello"], {}, {}]'))
+    task.push_request(published_at=headers['published_at'] - wait, eta=None, retries=retries)
+    try:
+        record_task_started(task_id='task-1', task=task)
+        if failed:
+            record_task_failure(sender=task)
+        record_task_finished(task_id='task-1', task=task)
+    finally:
+        task.pop_request()
+    flush_metrics()
+
+
+class TaskMetricsTests(TestCase):
+    """Test recording of Celery task metrics from the signal hooks."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hooks_record_wait_runtime_payload_and_counters(self):
+        """One publish and run produce one observation per histogram."""
+        run_task_hooks(wait=0.2, retries=1, failed=True)
+
+        metrics = get_task_metrics([TASK_NAME])[TASK_NAME]
+        self.assertEqual(metrics['wait_ms']['count'], 1)
+        self.assertGreaterEqual(metrics['wait_ms']['sum'], 200)
+        # 200ms falls in the 250ms bucket
+        self.assertEqual(dict(metrics['wait_ms']['buckets'])[100], 0)
+        self.assertEqual(dict(metrics['wait_ms']['buckets'])[250], 1)
+        self.assertEqual(metrics['runtime_ms']['count'], 1)
+        self.assertEqual(metrics['payload_bytes']['buckets'][0], (256, 1))
+        self.assertEqual(metrics['retries'], 1)
+        self.assertEqual(metrics['failures'], 1)
+
+    def test_observations_accumulate_across_flushes(self):
+        """Flushes add to the shared counters instead of replacing them."""
+        run_task_hooks()
+        run_task_hooks()
+
+        metrics = get_task_metrics([TASK_NAME, 'apps.tasks.tasks.check_task_deadlines'])
+        self.assertEqual(list(metrics), [TASK_NAME])
+        self.assertEqual(metrics[TASK_NAME]['runtime_ms']['count'], 2)
+        self.assertEqual(metrics[TASK_NAME]['wait_ms']['buckets'][-1], ('+Inf', 2))
+
+    def test_payload_size_is_read_from_the_serialized_body(self):
+        """The received message's body is measured as is, not re-serialized."""
+        body = b'x' * 300
+        with mock.patch('json.dumps') as dumps:
+            record_task_received(request=mock.Mock(task_name=TASK_NAME, body=body))
+        dumps.assert_not_called()
+
+        metrics = get_task_metrics([TASK_NAME])[TASK_NAME]
+        self.assertEqual((metrics['payload_bytes']['count'], metrics['payload_bytes']['sum']), (1, 300))
+
+    def test_reads_flush_buffered_observations(self):
+        """Observations show up without waiting for another observation."""
+        observe('runtime_ms', TASK_NAME, 42)
+
+        self.assertEqual(get_task_metrics([TASK_NAME])[TASK_NAME]['runtime_ms']['sum'], 42)
+
+    def test_queue_depths_sum_priority_lists(self):
+        """A queue's depth adds up the Redis lists of all its priority steps."""
+        lengths = {'realtime': 2, 'realtime:3': 1, 'bulk_email:9': 40}
+        pipeline = mock.Mock()
+        calls = []
+        pipeline.llen.side_effect = calls.append
+        pipeline.execute.side_effect = lambda: [lengths.get(name, 0) for name in calls]
+
+        with mock.patch('system_monitor.task_metrics.redis.Redis.from_url') as from_url:
+            from_url.return_value.pipeline.return_value = pipeline
+            depths = read_queue_depths(
+                ['realtime', 'bulk_email'], {'priority_steps': list(range(10)), 'sep': ':'}
+            )
+
+        self.assertEqual(depths, {'realtime': 3, 'bulk_email': 40})
+        self.assertEqual(pipeline.execute.call_count, 1)
+
+
+@override_settings(SEND_WELCOME_EMAIL=False)
+class TaskMetricsApiTests(APITestCase):
+    """Test the task metrics endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('system_monitor:task-metrics')
+        self.admin = User.objects.create_user(email='admin@example.com', is_staff=True)
+        run_task_hooks()
+        cache.set(QUEUE_DEPTHS_KEY, {'sampled_at': '2026-10-18T08:00:00+00:00', 'queues': {'realtime': 3}})
+
+    def test_json_metrics(self):
+        """Staff get per-task histograms and the last queue depth sample."""
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tasks'][TASK_NAME]['runtime_ms']['count'], 1)
+        self.assertEqual(response.data['queues']['queues'], {'realtime': 3})
+
+    def test_prometheus_exposition(self):
+        """format=prometheus renders the Prometheus text format."""
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get(self.url, {'format': 'prometheus'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(f'celery_task_wait_seconds_bucket{{le="0.25",task="{TASK_NAME}"}} 1.0', body)
+        self.assertIn(f'celery_task_runtime_seconds_count{{task="{TASK_NAME}"}} 1.0', body)
+        self.assertIn('celery_queue_depth{queue="realtime"} 3.0', body)
+
+    def test_requires_staff(self):
+        """Regular users cannot read task metrics."""
+        self.client.force_authenticate(User.objects.create_user(email='user@example.com'))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 403)
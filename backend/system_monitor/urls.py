@@ -0,0 +1,10 @@
+"""URL configuration for the system endpoints (/api/v1/system/)."""
+from django.urls import path
+
+from .views import TaskMetricsView
+
+app_name = 'system_monitor'
+
+urlpatterns = [
+    path('tasks/metrics/', TaskMetricsView.as_view(), name='task-metrics'),
+]
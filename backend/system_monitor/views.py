@@ -1,3 +1,28 @@
-from django.shortcuts import render
+from celery import current_app
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from apps.notifications.debounce import suppressed_counts
+from .renderers import PrometheusRenderer
+from .task_metrics import get_queue_depths, get_task_metrics
+
+
+class TaskMetricsView(APIView):
+    """
+    Celery task metrics: broker wait, runtime and payload size histograms,
+    retry, failure and debounce counters per task, and the last queue
+    depth sample. Served as JSON, or in the Prometheus text format with
+    ``?format=prometheus`` or ``Accept: text/plain``.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request):
+        task_names = sorted(name for name in current_app.tasks if not name.startswith('celery.'))
+        tasks = get_task_metrics(task_names)
+        for task_name, count in suppressed_counts().items():
+            if count:
+                tasks.setdefault(task_name, {})['debounce_suppressed'] = count
+        return Response({'tasks': tasks, 'queues': get_queue_depths()})